@@ -0,0 +1,55 @@
+import asyncio
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Query
+
+from app.services.history_service import get_writer
+
+router = APIRouter(prefix="/history", tags=["Prediction History"])
+
+
+@router.get("/rollups/crops")
+async def crop_rollups(
+    granularity: Literal["hour", "day"] = "hour",
+    location: Optional[str] = None,
+    crop: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Per hour or day (UTC buckets starting in [start, end), epoch seconds) and crop: how
+    often it was suitable / marginal / unsuitable and recommended, and its mean
+    confidence. Summed over all locations unless `location` is given. Read from the
+    rollups, never from raw rows; records still buffered by the writer are not included.
+    """
+    return await asyncio.to_thread(get_writer().store.crop_rollups, granularity, location, crop, start, end, limit)
+
+
+@router.get("/rollups/locations")
+async def location_rollups(
+    granularity: Literal["hour", "day"] = "hour",
+    location: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """Per hour or day and location: predictions by outcome and the mean inputs."""
+    return await asyncio.to_thread(get_writer().store.location_rollups, granularity, location, start, end, limit)
+
+
+@router.get("/predictions")
+async def predictions(
+    location: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """The audit trail: recorded /predict/ calls, newest first, with inputs and per-crop scores."""
+    return await asyncio.to_thread(get_writer().store.predictions, location, start, end, limit)
+
+
+@router.get("/stats")
+async def history_stats():
+    """Writer state: buffered records, overflow policy, and records queued / dropped / written / failed."""
+    return get_writer().stats()
@@ -0,0 +1,101 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import JOB_POLL_SECONDS
+from app.core.schemas import RetrainRequest
+from app.models import registry
+from app.models.crop_recommendation import get_model_version, get_registry_version
+from app.services.job_service import TERMINAL, get_store
+
+router = APIRouter(prefix="/jobs", tags=["Background Jobs"])
+
+# a comment line every this many seconds keeps idle event streams open through proxies
+_KEEPALIVE_SECONDS = 15
+
+
+@router.post("/retrain", status_code=202)
+async def retrain(request: RetrainRequest):
+    """Queue a generate -> train -> calibrate -> evaluate -> publish run; follow it on /jobs/{id}/events."""
+    return await asyncio.to_thread(get_store().enqueue, "retrain", request.model_dump())
+
+
+@router.get("/")
+async def list_jobs(limit: int = 50):
+    return await asyncio.to_thread(get_store().list, limit)
+
+
+@router.get("/models")
+async def list_models():
+    """Published model versions (newest first) and the one this process serves."""
+    return {
+        "serving": {"version": get_registry_version(), "model_version": get_model_version()},
+        "versions": await asyncio.to_thread(registry.list_versions),
+    }
+
+
+@router.post("/models/{version}/activate")
+async def activate_model(version: str):
+    """Serve a published version (e.g. roll back); workers switch within MODEL_RELOAD_CHECK_SECONDS."""
+    try:
+        await asyncio.to_thread(registry.activate, version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"version": version}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = await asyncio.to_thread(get_store().request_cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    The job's event log as Server-Sent Events (`status`, `stage` with per-stage seconds,
+    `progress`, `evaluation`, `error`), then new events as they happen. The stream ends
+    after the final status. Reconnecting with Last-Event-ID resumes after that event.
+    """
+    store = get_store()
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        after = 0
+
+    async def stream():
+        nonlocal after
+        idle = 0.0
+        while True:
+            events = await asyncio.to_thread(store.events, job_id, after)
+            for event in events:
+                after = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps({'ts': event['ts'], **event['data']})}\n\n"
+                if event["type"] == "status" and event["data"]["status"] in TERMINAL:
+                    return
+            if events:
+                idle = 0.0
+            elif idle >= _KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS / 2)
+            idle += JOB_POLL_SECONDS / 2
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,116 @@
+import asyncio
+from typing import List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+from app.api.placement import FarmLayout
+from app.core.config import LAYOUT_MAX_TOWERS
+from app.core.serialization import encode, encoded_response, negotiate
+from app.services.layout_service import DEFAULT_TOLERANCE_M, LayoutNotFound, get_store, layout_columns
+from app.services.optimization_service import greedy_tower_placement
+
+router = APIRouter(prefix="/layouts", tags=["Layout Store"])
+
+
+class LayoutVersion(BaseModel):
+    towers: Optional[List[Tuple[float, float]]] = Field(None, max_length=LAYOUT_MAX_TOWERS, description="Tower (x, y) positions in meters")
+    layout: Optional[FarmLayout] = Field(None, description="Place towers as POST /placement/ does instead of passing them")
+    farm_length: Optional[float] = Field(None, gt=0, description="Farm length in meters (taken from `layout` when omitted)")
+    farm_width: Optional[float] = Field(None, gt=0, description="Farm width in meters (taken from `layout` when omitted)")
+    min_spacing: Optional[float] = Field(None, gt=0, description="Tower spacing in meters (taken from `layout` when omitted)")
+    crops: Optional[List[Optional[str]]] = Field(None, description="Crop per tower, e.g. from POST /placement/assign; null = none")
+    note: str = Field("", max_length=500)
+
+
+def _not_found(e: LayoutNotFound) -> HTTPException:
+    return HTTPException(status_code=404, detail=e.args[0])
+
+
+@router.get("/")
+async def list_layouts():
+    """Saved layout names with their number of versions and the latest version's metadata."""
+    return await asyncio.to_thread(get_store().names)
+
+
+@router.post("/{name}")
+async def save_layout(name: str, body: LayoutVersion):
+    """Saves a new version of the named layout and returns its metadata (with `version`)."""
+    if (body.towers is None) == (body.layout is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of towers or layout")
+    if body.layout is None and (body.farm_length is None or body.farm_width is None):
+        raise HTTPException(status_code=422, detail="farm_length and farm_width are required with towers")
+
+    def save():
+        towers, geometry = body.towers, (body.farm_length, body.farm_width, body.min_spacing)
+        if body.layout is not None:
+            towers = greedy_tower_placement(**body.layout.model_dump())
+            placed = (body.layout.farm_length, body.layout.farm_width, body.layout.min_spacing)
+            geometry = tuple(given if given is not None else default for given, default in zip(geometry, placed))
+        return get_store().save(name, towers, *geometry, crops=body.crops, note=body.note)
+
+    try:
+        return await asyncio.to_thread(save)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/{name}")
+async def layout_versions(name: str):
+    """Every version's metadata, newest first."""
+    try:
+        return await asyncio.to_thread(get_store().versions, name)
+    except LayoutNotFound as e:
+        raise _not_found(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/{name}/diff")
+async def diff_layout_versions(
+    name: str,
+    request: Request,
+    old: int = Query(..., ge=1, description="Base version"),
+    new: Optional[int] = Query(None, ge=1, description="Compared version (default: the latest)"),
+    tolerance: float = Query(DEFAULT_TOLERANCE_M, ge=0, description="Towers displaced by at most this (m) are unchanged"),
+    max_move: Optional[float] = Query(None, gt=0, description="Towers displaced by more than this (m) are removed + added (default: just under half the spacing)"),
+    format: Optional[Literal["json", "msgpack"]] = None,
+):
+    """
+    Towers added, removed and moved between two versions, and towers whose crop changed.
+    A tower is matched to the other version's nearest tower within max_move when that one
+    is also its nearest. Columnar arrays of indices into each version and offsets.
+    """
+    fmt = negotiate(request.headers.get("accept"), format)
+    try:
+        result = await asyncio.to_thread(get_store().diff, name, old, new, tolerance, max_move)
+    except LayoutNotFound as e:
+        raise _not_found(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return encoded_response(encode(result, fmt), fmt)
+
+
+@router.get("/{name}/{version}")
+async def get_layout(
+    name: str,
+    version: str,
+    request: Request,
+    format: Optional[Literal["json", "msgpack"]] = None,
+):
+    """One version ("latest" or a number): metadata plus columnar tower_x / tower_y / crop."""
+    fmt = negotiate(request.headers.get("accept"), format)
+    if version != "latest" and not version.isdigit():
+        raise HTTPException(status_code=422, detail="version must be a number or 'latest'")
+
+    def load():
+        meta, records = get_store().load(name, None if version == "latest" else int(version))
+        return encode(layout_columns(meta, records), fmt)
+
+    try:
+        body = await asyncio.to_thread(load)
+    except LayoutNotFound as e:
+        raise _not_found(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return encoded_response(body, fmt)
@@ -6,6 +6,8 @@ import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, f1_score, classification_report, confusion_matrix
 
+from app.core.telemetry import CACHE_REQUESTS
+
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 BASE = Path(__file__).resolve().parent.parent
 MODELS = BASE / "models"
@@ -14,6 +16,9 @@ MODEL_FILE = MODELS / "placement_model.pkl"
 ENCODER_FILE = MODELS / "crop_encoder.pkl"
 PLOT_FILE = MODELS / "data" / "class_distribution.png"
 
+# The summary only changes when the model, encoder or dataset changes on disk
+_summary_cache = {"key": None, "value": None}
+
 
 @router.get("/distribution")
 def get_distribution_image():
@@ -27,6 +32,17 @@ def get_metrics_summary():
     if not MODEL_FILE.exists() or not ENCODER_FILE.exists() or not DATA.exists():
         raise HTTPException(status_code=404, detail="Model, encoder or dataset missing")
 
+    key = tuple((p.stat().st_mtime_ns, p.stat().st_size) for p in (MODEL_FILE, ENCODER_FILE, DATA))
+    if _summary_cache["key"] == key:
+        CACHE_REQUESTS.labels("metrics_summary", "hit").inc()
+        return JSONResponse(_summary_cache["value"])
+    CACHE_REQUESTS.labels("metrics_summary", "miss").inc()
+    summary = _compute_summary()
+    _summary_cache.update(key=key, value=summary)
+    return JSONResponse(summary)
+
+
+def _compute_summary() -> dict:
     model = joblib.load(MODEL_FILE)
     encoder = joblib.load(ENCODER_FILE)
     df = pd.read_csv(DATA)
@@ -45,9 +61,9 @@ def get_metrics_summary():
     report = classification_report(yte, ypred, zero_division=0, output_dict=True)
     cm = confusion_matrix(yte, ypred).tolist()
 
-    return JSONResponse({
+    return {
         "accuracy": acc,
         "weighted_f1": f1_w,
         "classification_report": report,
         "confusion_matrix": cm,
-    })
+    }
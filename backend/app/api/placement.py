@@ -1,6 +1,28 @@
-from fastapi import APIRouter, HTTPException
+import datetime as dt
+from typing import Annotated, Dict, List, Literal, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from app.services.placement_service import optimize_tower_placement
+from app.core.config import (
+    ANNEAL_MAX_TIME_BUDGET_SECONDS,
+    ANNEAL_RESTARTS,
+    ANNEAL_TIME_BUDGET_SECONDS,
+    CAPACITY_MAX_CONFIGS,
+    MICROCLIMATE_MAX_SENSORS,
+    PLACEMENT_BATCH_MAX_CONFIGS,
+)
+from app.core.crop_catalog import READING_COLUMNS
+from app.core.schemas import PredictionInput, SensorPoint
+from app.core.serialization import encode, encoded_response, negotiate
+from app.services.assignment_service import plan_assignment
+from app.services.capacity_service import capacity
+from app.services.executor import WorkloadRejected, run_workload
+from app.services.placement_batch_service import place_batch
+from app.services.placement_service import place_towers_async
+from app.services.profiling_service import maybe_profile
+from app.services.shading_service import simulate_shading
 
 router = APIRouter(
     prefix="/placement",
@@ -10,29 +32,224 @@ router = APIRouter(
 # -------------------------------
 # REQUEST SCHEMA
 # -------------------------------
-class PlacementRequest(BaseModel):
+class FarmLayout(BaseModel):
     farm_length: float = Field(..., gt=0, le=100, description="Farm length in meters (0 < length ≤ 100)")
     farm_width: float = Field(..., gt=0, le=100, description="Farm width in meters (0 < width ≤ 100)")
     min_spacing: float = Field(..., ge=0.5, le=10, description="Minimum spacing between towers (0.5 ≤ spacing ≤ 10)")
     max_towers: int = Field(..., ge=1, le=1000, description="Maximum number of towers (1 ≤ max_towers ≤ 1000)")
+
+
+class RectObstacle(BaseModel):
+    shape: Literal["rect"]
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+
+
+class CircleObstacle(BaseModel):
+    shape: Literal["circle"]
+    x: float
+    y: float
+    radius: float = Field(..., gt=0)
+
+
+class PlacementRequest(FarmLayout):
     cell_size_m: float = Field(None, gt=0, le=100, description="Optional grid cell size in meters; if provided, visualization will use this cell size")
+    sensor_points: Optional[List[SensorPoint]] = Field(None, max_length=MICROCLIMATE_MAX_SENSORS, description="Optional in-farm sensor readings with x/y positions; adds a per-cell suitability heatmap and per-tower scores")
+    interpolation: Literal["idw", "kriging"] = Field("idw", description="How sensor readings are interpolated over the grid")
+    output: Literal["image", "tiles"] = Field("image", description="image = one PNG; tiles = a zoomable z/x/y tile pyramid rendered on demand")
+    engine: Literal["hex", "anneal"] = Field("hex", description="hex = lattice placer; anneal = Poisson-disk seeding + simulated annealing, for sites with obstacles or irregular edges")
+    obstacles: List[Union[RectObstacle, CircleObstacle]] = Field(default_factory=list, max_length=100, description="Keep-out areas in tower coordinates (x along length, y along width)")
+    boundary: Optional[List[Tuple[float, float]]] = Field(None, min_length=3, max_length=500, description="Optional site boundary polygon; towers must lie inside it")
+    time_budget_s: float = Field(ANNEAL_TIME_BUDGET_SECONDS, gt=0, le=ANNEAL_MAX_TIME_BUDGET_SECONDS, description="Wall-clock budget for engine=anneal")
+    restarts: int = Field(ANNEAL_RESTARTS, ge=1, le=32, description="Independent annealing restarts (engine=anneal)")
+    seed: Optional[int] = Field(None, ge=0, description="Base seed for engine=anneal; each restart derives its own")
+
+
+class BatchPlacementRequest(BaseModel):
+    configs: List[PlacementRequest] = Field(..., min_length=1, max_length=PLACEMENT_BATCH_MAX_CONFIGS, description="Farm configurations, as for POST /placement/")
+    render: bool = Field(False, description="Also render each layout (its `output`: image or tiles); by default only layouts are computed")
+
+
+FarmSide = Annotated[float, Field(gt=0, le=100)]
+Spacing = Annotated[float, Field(ge=0.5, le=10)]
+TowerCap = Annotated[int, Field(ge=1, le=1000)]
+
+
+class CapacityRequest(BaseModel):
+    farm_length: Union[FarmSide, List[FarmSide]] = Field(..., description="Farm length in meters, or a list of lengths")
+    farm_width: Union[FarmSide, List[FarmSide]] = Field(..., description="Farm width in meters, or a list of widths")
+    min_spacing: Union[Spacing, List[Spacing]] = Field(..., description="Minimum spacing in meters, or a list of spacings")
+    max_towers: Union[TowerCap, List[TowerCap]] = Field(1000, description="Tower cap, or a list of caps")
+    binding_spacing: bool = Field(False, description="Also search the spacing at which each farm reaches max_towers (limited number of distinct farm sizes and caps)")
+
+
+class ShadingRequest(BaseModel):
+    towers: Optional[List[Tuple[float, float]]] = Field(None, min_length=1, max_length=1000, description="Tower (x, y) positions in meters")
+    layout: Optional[FarmLayout] = Field(None, description="Place towers as POST /placement/ does instead of passing them")
+    tower_height_m: float = Field(2.0, gt=0, le=10, description="Tower height in meters")
+    tower_radius_m: float = Field(0.15, gt=0, le=1, description="Tower radius in meters")
+    latitude: float = Field(..., ge=-90, le=90, description="Site latitude in degrees")
+    start_date: dt.date = Field(..., description="First day of the season")
+    end_date: dt.date = Field(..., description="Last day of the season (inclusive)")
+    step_minutes: int = Field(15, ge=1, le=60, description="Sun-path time step")
+    orientation_deg: float = Field(0.0, ge=0, lt=360, description="Compass bearing of the farm's +y axis (0: +y points north)")
+    readings: Optional[PredictionInput] = Field(None, description="Site readings with sunlight_hours as measured in the open; adds per-tower scores with shaded sunlight")
+
+
+class CropLimit(BaseModel):
+    min: int = Field(0, ge=0, description="Minimum number of towers growing this crop")
+    max: Optional[int] = Field(None, ge=0, description="Maximum number of towers growing this crop")
+
+
+class AssignmentRequest(BaseModel):
+    towers: Optional[List[Tuple[float, float]]] = Field(None, max_length=1000, description="Tower (x, y) positions in meters")
+    layout: Optional[FarmLayout] = Field(None, description="Place towers as POST /placement/ does instead of passing them")
+    suitability: Optional[List[List[Optional[float]]]] = Field(None, description="Per-tower suitability (towers x crops); null forbids the pair")
+    crops: Optional[List[str]] = Field(None, description="Columns of suitability (default: the crop catalog)")
+    cell_suitability: Optional[Dict[str, List[List[Optional[float]]]]] = Field(None, description="Per-crop cell grids, e.g. the microclimate heatmap confidence")
+    cell_size_m: Optional[float] = Field(None, gt=0, le=100, description="Cell size of cell_suitability in meters")
+    crop_limits: Dict[str, CropLimit] = Field(default_factory=dict)
+    no_adjacent_same: List[str] = Field(default_factory=list, description="Crops that neighbouring towers may not both grow")
+    incompatible_pairs: List[Tuple[str, str]] = Field(default_factory=list, description="Crop pairs that may not grow on neighbouring towers")
+    adjacency_m: Optional[float] = Field(None, gt=0, description="Towers closer than this are neighbours (default: just over the tower spacing)")
 
 # -------------------------------
 # API ENDPOINT
 # -------------------------------
 @router.post("/")
-def place_towers(request: PlacementRequest):
+async def place_towers(
+    request: PlacementRequest,
+    http_request: Request,
+    response: Response,
+    layout: Literal["rows", "columnar"] = "rows",
+    format: Optional[Literal["json", "msgpack"]] = None,
+):
     """
-    Optimizes aeroponic tower placement based on farm parameters
+    Optimizes aeroponic tower placement based on farm parameters.
+    Tower x runs along farm_length and y along farm_width; the `grid` block and the
+    microclimate heatmap both have rows along the width (y) and columns along the
+    length (x), so heatmap[row][col] is grid cell row, col.
+    layout=columnar returns the positions as parallel `tower_x` / `tower_y` arrays instead
+    of `tower_positions`; the body is JSON unless MessagePack is negotiated.
     """
+    fmt = negotiate(http_request.headers.get("accept"), format)
     try:
-        result = optimize_tower_placement(
-            farm_length=request.farm_length,
-            farm_width=request.farm_width,
-            min_spacing=request.min_spacing,
-            max_towers=request.max_towers,
+        result = await place_towers_async(request.model_dump(), request.output, profile=maybe_profile(http_request, response, "placement"))
+        if layout == "columnar":
+            positions = np.asarray(result.pop("tower_positions"), dtype=float).reshape(-1, 2)
+            result["tower_x"], result["tower_y"] = positions.T.copy()
+        # keep headers set on the injected response (profiling)
+        return encoded_response(encode(result, fmt), fmt, headers=dict(response.headers))
+    except WorkloadRejected:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Placement optimization failed: {str(e)}")
+
+
+@router.post("/batch")
+async def place_towers_batch(request: BatchPlacementRequest):
+    """
+    Computes many placements in one request, streamed as NDJSON: one line per config
+    ({"index", "config_key", "duplicate_of", "result"} or an "error" with its
+    "status_code"), in completion order, then a {"summary"} line with tower counts and
+    packing density per config. Equivalent configs are computed once.
+    """
+    configs = [config.model_dump() for config in request.configs]
+
+    async def lines():
+        async for row in place_batch(configs, request.render):
+            yield encode(row) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/capacity")
+async def placement_capacity(request: CapacityRequest):
+    """
+    How many towers POST /placement/ (hex engine, no obstacles) would place, without
+    placing or rendering anything. Lists are broadcast against each other (equal lengths,
+    or scalars), so a whole spacing curve or a set of farm sizes is one request. Returns
+    columnar arrays per config: `total_towers` (exactly the placer's count),
+    `lattice_towers` (its count without the cap), `max_towers_binding`, the density as
+    `towers_per_100m2` and `packing_ratio`. With binding_spacing=true also
+    `binding_spacing`, the largest spacing (in 1 cm steps) at which that farm reaches
+    max_towers, or null if none does.
+    """
+    fields = (request.farm_length, request.farm_width, request.min_spacing, request.max_towers)
+    configs = max(len(f) if isinstance(f, list) else 1 for f in fields)
+    if configs > CAPACITY_MAX_CONFIGS:
+        raise HTTPException(status_code=422, detail=f"At most {CAPACITY_MAX_CONFIGS} configs per request")
+    try:
+        return await run_workload("render", capacity, *fields, request.binding_spacing)
+    except WorkloadRejected:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/shading")
+async def placement_shading(request: ShadingRequest):
+    """
+    Simulates how much the towers shade each other over a date range: per tower the
+    mean daily hours of direct sun (`sunlight_hours`), against `clear_sky_hours` for an
+    unshaded tower, and their ratio `sun_fraction`. With `readings`, every tower is
+    also scored with its sunlight_hours scaled by its sun fraction (`scores`).
+    """
+    readings = None
+    if request.readings is not None:
+        readings = [getattr(request.readings, column) for column in READING_COLUMNS]
+    try:
+        return await run_workload(
+            "render",
+            simulate_shading,
+            request.towers,
+            request.tower_height_m,
+            request.tower_radius_m,
+            request.latitude,
+            request.start_date,
+            request.end_date,
+            request.step_minutes,
+            request.orientation_deg,
+            readings=readings,
+            layout=request.layout.model_dump() if request.layout else None,
+        )
+    except WorkloadRejected:
+        raise
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/assign")
+async def assign_crops_to_towers(request: AssignmentRequest):
+    """
+    Assigns at most one crop per tower, maximizing total suitability under the crop
+    limits and adjacency rules (exact without adjacency rules, otherwise heuristic
+    with the optimality gap reported)
+    """
+    try:
+        return await run_workload(
+            "render",
+            plan_assignment,
+            towers=request.towers,
+            layout=request.layout.model_dump() if request.layout else None,
+            suitability=request.suitability,
+            crops=request.crops,
+            cell_suitability=request.cell_suitability,
             cell_size_m=request.cell_size_m,
+            limits={crop: limit.model_dump() for crop, limit in request.crop_limits.items()},
+            no_adjacent_same=request.no_adjacent_same,
+            incompatible_pairs=request.incompatible_pairs,
+            adjacency_m=request.adjacency_m,
         )
-        return result
+    except WorkloadRejected:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Placement optimization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Crop assignment failed: {str(e)}")
@@ -1,6 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from app.services.ml_service import predict_crop_scores
-from app.core.schemas import PredictionInput
+import time
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from app.services.executor import run_workload
+from app.services.ml_service import predict_crop_scores, score_batch
+from app.services.sweep_service import sweep_encoded, validate_axes
+from app.services.forecast_service import forecast_timeline_encoded, get_forecast
+from app.services.drift_service import drift_report, observe_readings
+from app.services.history_service import record_prediction
+from app.services.profiling_service import maybe_profile
+from app.core.config import EXPLAIN_MAX_ROWS
+from app.core.schemas import ForecastRequest, PredictionBatch, PredictionInput, SweepRequest
+from app.core.serialization import encoded_response, negotiate
 
 router = APIRouter(
     prefix="/predict",
@@ -8,16 +20,168 @@ router = APIRouter(
 )
 
 @router.post("/")
-def predict(input_data: PredictionInput):
-    result = predict_crop_scores(
+async def predict(
+    input_data: PredictionInput,
+    request: Request,
+    response: Response,
+    mode: Optional[Literal["full", "pruned"]] = None,
+    explain: bool = False,
+    # free-form site label (farm, tower) the call is filed under in /history
+    location: str = Query("", max_length=64),
+):
+    inputs = (
         input_data.temperature,
         input_data.humidity,
         input_data.sunlight_hours,
         input_data.water_ph,
         input_data.air_quality_index,
-        input_data.wind_speed
+        input_data.wind_speed,
+    )
+    observe_readings((inputs,))
+    # Model scoring is CPU-bound: run it in the process pool (429 when its queue is full)
+    result = await run_workload(
+        "predict",
+        predict_crop_scores,
+        *inputs,
+        mode,
+        explain=explain,
+        profile=maybe_profile(request, response, "predict"),
     )
+    # buffered only; the history writer stores it in the background, filed under the
+    # version of the worker that scored it
+    await record_prediction(inputs, result, mode, location, result.pop("model_version", None))
     # If prediction returned an error key, surface as HTTP 400
     if isinstance(result, dict) and result.get("error"):
         raise HTTPException(status_code=400, detail=result.get("error"))
     return result
+
+
+@router.post("/batch")
+async def predict_batch(
+    batch: PredictionBatch,
+    request: Request,
+    response: Response,
+    mode: Optional[Literal["full", "pruned"]] = None,
+    layout: Literal["rows", "columnar"] = "rows",
+    format: Optional[Literal["json", "msgpack"]] = None,
+    explain: bool = False,
+):
+    """
+    Scores many readings in one model pass. layout=rows returns one object per reading
+    (per-crop entries as in /predict/, without explanations); layout=columnar returns
+    parallel arrays, with (readings x crops) matrices for the scores. The body is JSON
+    unless the client accepts application/msgpack or passes format=msgpack.
+    explain=true adds per-feature contributions (at most EXPLAIN_MAX_ROWS readings).
+    """
+    fmt = negotiate(request.headers.get("accept"), format)
+    if explain and len(batch.readings) > EXPLAIN_MAX_ROWS:
+        raise HTTPException(status_code=422, detail=f"explain=true is limited to {EXPLAIN_MAX_ROWS} readings per batch")
+    readings = [
+        (r.temperature, r.humidity, r.sunlight_hours, r.water_ph, r.air_quality_index, r.wind_speed)
+        for r in batch.readings
+    ]
+    observe_readings(readings)
+    try:
+        body = await run_workload(
+            "predict",
+            score_batch,
+            readings,
+            mode,
+            layout,
+            fmt,
+            explain,
+            profile=maybe_profile(request, response, "predict"),
+        )
+    except RuntimeError as e:
+        # model artifacts missing
+        raise HTTPException(status_code=503, detail=str(e))
+    # keep headers set on the injected response (profiling)
+    return encoded_response(body, fmt, headers=dict(response.headers))
+
+
+@router.post("/sweep")
+async def predict_sweep(
+    sweep: SweepRequest,
+    request: Request,
+    response: Response,
+    mode: Optional[Literal["full", "pruned"]] = None,
+    format: Optional[Literal["json", "msgpack"]] = None,
+):
+    """
+    What-if sweep: scores every crop over a 1-D or 2-D grid of one or two readings
+    (start to stop inclusive, by step) with the other `base` readings fixed. Returns
+    the axis values and grid-shaped arrays: `status` and `recommended` per point,
+    `suitability_class`, `confidence` and `agronomic_ok` per crop and point.
+    """
+    fmt = negotiate(request.headers.get("accept"), format)
+    axes = [axis.model_dump() for axis in sweep.axes]
+    try:
+        validate_axes(axes)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        body = await run_workload(
+            "predict",
+            sweep_encoded,
+            sweep.base.model_dump(),
+            axes,
+            mode,
+            fmt,
+            profile=maybe_profile(request, response, "predict"),
+        )
+    except RuntimeError as e:
+        # model artifacts missing
+        raise HTTPException(status_code=503, detail=str(e))
+    return encoded_response(body, fmt, headers=dict(response.headers))
+
+
+@router.post("/forecast")
+async def predict_forecast(
+    forecast: ForecastRequest,
+    request: Request,
+    response: Response,
+    mode: Optional[Literal["full", "pruned"]] = None,
+    format: Optional[Literal["json", "msgpack"]] = None,
+):
+    """
+    Suitability timeline: every crop scored hour by hour over the next `hours` of the
+    weather forecast for (lat, lon), with the readings the forecast does not cover held
+    fixed. Returns per-hour `status` and `recommended`, per crop and hour
+    `suitability_class` and `confidence`, and per crop the `windows` of consecutive
+    hours in which it stays suitable.
+    """
+    fmt = negotiate(request.headers.get("accept"), format)
+    try:
+        # blocking upstream call on a cache miss
+        series = await run_in_threadpool(get_forecast, forecast.lat, forecast.lon)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Unable to fetch the forecast for this location")
+    try:
+        body = await run_workload(
+            "predict",
+            forecast_timeline_encoded,
+            series.window(time.time(), forecast.hours),
+            forecast.model_dump(include={"sunlight_hours", "water_ph", "air_quality_index"}),
+            mode,
+            fmt,
+            min_class=forecast.min_class,
+            min_confidence=forecast.min_confidence,
+            min_window_hours=forecast.min_window_hours,
+            profile=maybe_profile(request, response, "predict"),
+        )
+    except RuntimeError as e:
+        # model artifacts missing
+        raise HTTPException(status_code=503, detail=str(e))
+    return encoded_response(body, fmt, headers=dict(response.headers))
+
+
+@router.get("/drift")
+async def input_drift():
+    """
+    How far recent /predict and /predict/batch readings have drifted from the model's
+    training data: per feature the PSI and (binned) KS distance over the last
+    DRIFT_WINDOW_READINGS readings, a status (stable / moderate / drift, or warming_up
+    while the window is small), and the share of readings outside the histogram range.
+    Computed on the event loop, which owns the monitor, from a few hundred counters.
+    """
+    return drift_report()
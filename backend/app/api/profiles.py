@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.services.profiling_service import is_admin, list_profile_files, load_profile
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"])
+
+
+def _require_admin(token):
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/")
+def list_profiles(x_admin_token: str = Header(None)):
+    """Stored request profiles, newest first (bounded ring, see PROFILE_RING_SIZE)."""
+    _require_admin(x_admin_token)
+    profiles = []
+    for path in list_profile_files():
+        profile = load_profile(path.stem)
+        if profile is not None:
+            profiles.append({
+                "id": profile["id"],
+                "route": profile["route"],
+                "created": profile["created"],
+                "wall_seconds": profile["wall_seconds"],
+                "samples": profile["samples"],
+                "peak_traced_bytes": profile["peak_traced_bytes"],
+            })
+    return {"profiles": profiles}
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, x_admin_token: str = Header(None)):
+    _require_admin(x_admin_token)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/{profile_id}/collapsed", response_class=PlainTextResponse)
+def get_collapsed_stacks(profile_id: str, x_admin_token: str = Header(None)):
+    """Collapsed stacks, one `frame;frame;... count` line each (flamegraph.pl / speedscope input)."""
+    _require_admin(x_admin_token)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse("\n".join(profile["collapsed_stacks"]) + "\n")
@@ -0,0 +1,100 @@
+import os
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+
+from app.core.config import STATIC_IMMUTABLE_MAX_AGE
+from app.core.telemetry import STATIC_BYTES_SENT, STATIC_RESPONSES
+from app.services.executor import run_workload
+from app.services.static_service import (
+    FORMATS,
+    available_formats,
+    original_path,
+    report_variants,
+    resolve_variant,
+    stem_hash,
+)
+
+# Registered before the /static mount; other files under app/data are still served by the mount
+router = APIRouter(
+    prefix="/static",
+    tags=["Static Images"]
+)
+
+IMMUTABLE = f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # weak comparison, as required for If-None-Match
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def cached_file_response(request: Request, path, media_type: str, etag: str, immutable: bool, vary: Optional[str] = None) -> Response:
+    """FileResponse with our ETag and Cache-Control, or an empty 304 when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE if immutable else "no-cache"}
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/{stem}.png/variants")
+async def get_image_variants(stem: str):
+    """
+    Encodes every variant of a layout image (once) and reports bytes and encode time
+    for each, next to the original's size and render time.
+    """
+    report = await run_workload("render", report_variants, stem)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Unknown image")
+    return report
+
+
+@router.get("/{stem}.png")
+async def get_image(
+    stem: str,
+    request: Request,
+    format: Optional[Literal["png", "png8", "webp"]] = Query(None, description="Request an encoding; by default the original PNG, or lossless WebP when Accept lists image/webp"),
+    size: Literal["full", "thumb"] = "full",
+):
+    """
+    A generated layout image. Without `format` the response is negotiated on the Accept
+    header: lossless WebP for clients that list image/webp, else the original PNG. The
+    palettized png8 is sent only for format=png8. Variants are encoded on first request
+    and then served from disk.
+    """
+    if original_path(stem) is None:
+        raise HTTPException(status_code=404, detail="Unknown image")
+    if format and format not in available_formats():
+        raise HTTPException(status_code=406, detail=f"{format} encoding is not available on this server")
+    accept = request.headers.get("accept")
+    # cached variants are served straight from the event loop; only encoding goes to the render pool
+    resolved = resolve_variant(stem, size, format, accept, encode=False)
+    if resolved is None:
+        resolved = await run_workload("render", resolve_variant, stem, size, format, accept)
+        if resolved is None:
+            raise HTTPException(status_code=404, detail="Unknown image")
+    variant, path = resolved
+
+    digest = stem_hash(stem)
+    if digest is None:
+        # not content-hashed (images from before hashing): revalidate on every use
+        stat = os.stat(original_path(stem))
+        digest = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    response = cached_file_response(
+        request,
+        path,
+        FORMATS[variant.split(".")[1]],
+        etag=f'"{digest}-{variant}"',
+        immutable=stem_hash(stem) is not None,
+        vary=None if format else "Accept",
+    )
+    STATIC_RESPONSES.labels(response.status_code).inc()
+    if response.status_code == 200:
+        STATIC_BYTES_SENT.labels(variant).inc(os.stat(path).st_size)
+    return response
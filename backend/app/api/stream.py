@@ -0,0 +1,99 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+
+from app.core.config import STREAM_MAX_LINE_BYTES
+from app.services import stream_service
+
+router = APIRouter(prefix="/stream", tags=["Streaming Ingestion"])
+
+
+@router.post("/ingest")
+async def ingest_ndjson(request: Request):
+    """
+    Ingest an NDJSON body (one reading per line; `tower_id` plus the `/predict/`
+    fields and an optional epoch `timestamp`). The body is parsed as it arrives; a line
+    longer than STREAM_MAX_LINE_BYTES ends the request with 413 (lines before it are kept).
+    """
+    accepted = rejected = 0
+    errors = []
+    # the unfinished last line; only new chunks are searched for newlines
+    pending = bytearray()
+    line_no = 1
+
+    def consume(lines):
+        nonlocal accepted, rejected, line_no
+        a, r, e = stream_service.ingest_lines((line.decode("utf-8", "replace") for line in lines), first_line=line_no)
+        accepted += a
+        rejected += r
+        errors.extend(e[:stream_service.MAX_REPORTED_ERRORS - len(errors)])
+        line_no += len(lines)
+
+    def too_long():
+        return HTTPException(status_code=413, detail=f"Line {line_no} is longer than {STREAM_MAX_LINE_BYTES} bytes")
+
+    async for chunk in request.stream():
+        *lines, rest = chunk.split(b"\n")
+        if lines:
+            lines[0] = bytes(pending) + lines[0]
+            for offset, line in enumerate(lines):
+                if len(line) > STREAM_MAX_LINE_BYTES:
+                    consume(lines[:offset])
+                    raise too_long()
+            consume(lines)
+            pending = bytearray(rest)
+        else:
+            pending += rest
+        if len(pending) > STREAM_MAX_LINE_BYTES:
+            raise too_long()
+    if pending.strip():
+        consume([bytes(pending)])
+    return {"accepted": accepted, "rejected": rejected, "errors": errors}
+
+
+@router.websocket("/ingest")
+async def ingest_websocket(websocket: WebSocket):
+    """Each text message holds one or more NDJSON lines. Only rejections are answered."""
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_text()
+            _, rejected, errors = stream_service.ingest_lines(message.splitlines())
+            if rejected:
+                await websocket.send_json({"rejected": rejected, "errors": errors})
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/subscribe")
+async def subscribe(websocket: WebSocket, towers: Optional[str] = None):
+    """
+    Push `tower_update` events when a tower's scored result changes. `towers` is an
+    optional comma-separated filter. The latest known result per tower is sent first.
+    """
+    await websocket.accept()
+    tower_ids = set(towers.split(",")) if towers else None
+    subscription = stream_service.subscribe(tower_ids)
+    try:
+        for event in stream_service.latest_events(tower_ids):
+            await websocket.send_json(event)
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream_service.unsubscribe(subscription)
+
+
+@router.get("/towers/{tower_id}")
+async def tower(tower_id: str):
+    """Rolling-window mean/min/max and the latest scored result for one tower."""
+    snapshot = stream_service.tower_snapshot(tower_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown tower")
+    return snapshot
+
+
+@router.get("/stats")
+async def stream_stats():
+    return stream_service.stats()
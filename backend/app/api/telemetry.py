@@ -0,0 +1,29 @@
+from anyio import to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.telemetry import MODEL_INFO, THREADPOOL, render_prometheus
+from app.models.crop_recommendation import get_calibrated_model, get_model_version
+
+# Separate from the /metrics router, which reports model quality (accuracy, F1, ...)
+router = APIRouter(prefix="/telemetry", tags=["Telemetry"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Runtime metrics in the Prometheus text format: per-stage latency histograms,
+    cache hit/miss counters, model version and thread-pool occupancy.
+    """
+    # Sync route handlers run on anyio's default thread limiter; tasks_waiting is the queue depth
+    stats = to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL.labels("busy").set(stats.borrowed_tokens)
+    THREADPOOL.labels("capacity").set(stats.total_tokens)
+    THREADPOOL.labels("queue_depth").set(stats.tasks_waiting)
+
+    MODEL_INFO.clear()
+    MODEL_INFO.labels(get_model_version() or "none", str(get_calibrated_model() is not None).lower()).set(1)
+
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
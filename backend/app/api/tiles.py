@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Request
+
+from app.api.static import cached_file_response
+from app.services.executor import run_workload
+from app.services.tile_service import LAYOUT_HASH, render_tile, tile_path
+
+# Registered before the /static mount so tiles that do not exist yet are rendered on demand
+router = APIRouter(
+    prefix="/static/tiles",
+    tags=["Layout Tiles"]
+)
+
+
+@router.get("/{layout_hash}/{z}/{x}/{y}.png")
+async def get_tile(layout_hash: str, z: int, x: int, y: int, request: Request):
+    """
+    One 256 px tile of a stored layout; rendered on the first request and then served
+    from disk. Tiles are keyed by the layout hash, so they never change.
+    """
+    if not LAYOUT_HASH.match(layout_hash):
+        raise HTTPException(status_code=404, detail="Unknown layout or tile")
+    # tiles already on disk are served straight from the event loop; only rendering goes to the render pool
+    path = tile_path(layout_hash, z, x, y)
+    if not path.exists():
+        path = await run_workload("render", render_tile, layout_hash, z, x, y)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Unknown layout or tile")
+    return cached_file_response(request, path, "image/png", etag=f'"{layout_hash}-{z}-{x}-{y}"', immutable=True)
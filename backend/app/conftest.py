@@ -0,0 +1,11 @@
+import pytest
+
+from app.core import telemetry
+
+
+@pytest.fixture
+def metrics_registry(monkeypatch):
+    """A telemetry registry of the test's own, so throwaway metrics stay out of /telemetry/metrics."""
+    registry = []
+    monkeypatch.setattr(telemetry, "_REGISTRY", registry)
+    return registry
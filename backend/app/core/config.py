@@ -3,16 +3,6 @@
 APP_NAME = "Aeroponic Tower Placement System"
 VERSION = "1.0"
 
-# Crop constraints and list
-CROP_CONSTRAINTS = {
-	"lettuce": {"temp": (15, 25), "hum": (50, 80), "sun": (4, 6), "ph": (5.5, 6.5), "aqi": 120, "wind": (0.3, 1.5)},
-	"basil": {"temp": (20, 30), "hum": (50, 70), "sun": (6, 8), "ph": (5.5, 6.8), "aqi": 130, "wind": (0.3, 2.0)},
-	"parsley": {"temp": (18, 25), "hum": (50, 75), "sun": (4, 6), "ph": (5.5, 6.5), "aqi": 120, "wind": (0.3, 1.5)},
-	"mint": {"temp": (18, 28), "hum": (55, 80), "sun": (4, 6), "ph": (5.5, 6.5), "aqi": 125, "wind": (0.4, 2.0)},
-	"rosemary": {"temp": (20, 30), "hum": (40, 65), "sun": (6, 8), "ph": (6.0, 7.0), "aqi": 140, "wind": (0.5, 2.5)}
-}
-CROPS = list(CROP_CONSTRAINTS.keys())
-
 # Model paths
 import pathlib
 
@@ -25,6 +15,206 @@ ENCODER_PATH = MODELS_DIR / "crop_encoder.pkl"
 
 # Calibrated model (optional). If present, API will prefer this for calibrated probabilities
 CALIBRATED_MODEL_PATH = MODELS_DIR / "placement_model_calibrated.pkl"
+# Per-class calibration table for MODEL_PATH (python -m app.models.calibration). Preferred
+# over the wrapper above: it is applied to one base-model pass instead of k fold models
+CALIBRATION_LUT_PATH = MODELS_DIR / "placement_model_calibration.json"
 
 # Minimum confidence (%) required to include a crop in `recommended_crops`
 RECOMMENDATION_CONFIDENCE_THRESHOLD = 74
+
+# Optional per-crop specialist models (train with `python app/models/train_model.py --specialists`)
+SPECIALIST_MODELS_PATH = MODELS_DIR / "crop_specialists.pkl"
+
+# Crop catalog: one row of agronomic bounds per crop. Add crops by editing the CSV;
+# CROP_CATALOG holds the compiled bound arrays used by the vectorized rule engine.
+from app.core.crop_catalog import load_catalog
+
+CROP_CATALOG_PATH = MODELS_DIR / "crop_catalog.csv"
+CROP_CATALOG = load_catalog(CROP_CATALOG_PATH)
+CROP_CONSTRAINTS = CROP_CATALOG.as_constraints()
+CROPS = CROP_CATALOG.names
+
+# Telemetry and caching
+import os
+
+# Per-stage histograms/counters exposed on /telemetry/metrics; set TELEMETRY_ENABLED=0 to disable
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") != "0"
+
+# Weather lookups are cached per ~1 km tile (coords rounded to 2 decimals) for this long
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+
+# Forecast timelines (POST /predict/forecast): hourly series from FORECAST_PROVIDER
+# ("openweather", or "stub" for offline runs and tests), cached per ~1 km tile and issue time
+FORECAST_PROVIDER = os.getenv("FORECAST_PROVIDER", "openweather")
+FORECAST_MAX_HOURS = int(os.getenv("FORECAST_MAX_HOURS", "120"))
+# Upstream forecasts are reissued this often; a cached tile is refetched once a newer issue is due,
+# but at most once per FORECAST_RECHECK_SECONDS while the upstream has not published it yet
+FORECAST_ISSUE_INTERVAL_SECONDS = int(os.getenv("FORECAST_ISSUE_INTERVAL_SECONDS", "10800"))
+FORECAST_RECHECK_SECONDS = float(os.getenv("FORECAST_RECHECK_SECONDS", "600"))
+FORECAST_CACHE_MAX_ENTRIES = 1024
+
+# Per-request profiling: send `X-Profile: 1` (or ?profile=1) with `X-Admin-Token: <token>`.
+# Disabled unless PROFILING_ADMIN_TOKEN is set.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN") or None
+PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "20"))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.002"))
+
+# CPU-bound work (model scoring, image rendering) runs in process pools, one per workload
+# class, so it does not fight over the GIL with request handling. Workers per pool;
+# 0 runs the work on the thread pool instead.
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+# Max queued + running jobs per workload class; beyond this requests get 429 + Retry-After
+WORKLOAD_QUEUE_LIMITS = {
+	"predict": int(os.getenv("PREDICT_QUEUE_LIMIT", "64")),
+	"render": int(os.getenv("RENDER_QUEUE_LIMIT", "8")),
+	# one job per annealing restart
+	"anneal": int(os.getenv("ANNEAL_QUEUE_LIMIT", "16")),
+}
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+# Scoring mode: "full" sends every crop to the model; "pruned" runs the agronomic
+# checks first and only scores crops that pass them, so cost tracks viable crops.
+SCORING_MODE = os.getenv("SCORING_MODE", "full")
+# Route each crop to its specialist model when crop_specialists.pkl is present
+USE_SPECIALIST_MODELS = os.getenv("USE_SPECIALIST_MODELS", "0") == "1"
+
+# POST /predict/batch: readings per request (the whole batch is scored in one "predict" job)
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "100000"))
+# POST /predict/sweep: grid points per request (a 500 x 500 grid)
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "250000"))
+# explain=true roughly doubles the model pass of a large batch (and keeps a
+# (trees x features) gather per pair in memory), so explained batches are capped lower
+EXPLAIN_MAX_ROWS = int(os.getenv("EXPLAIN_MAX_ROWS", "2000"))
+
+# Streaming ingestion (/stream). Readings are folded into per-tower ring buffers of
+# STREAM_BUCKET_SECONDS-wide buckets (mean/min/max per bucket), so memory per tower is
+# fixed regardless of the send rate; windows are rounded to whole buckets.
+STREAM_BUCKET_SECONDS = float(os.getenv("STREAM_BUCKET_SECONDS", "10"))
+# Rolling windows reported per tower; the first one feeds the model
+STREAM_WINDOWS_SECONDS = [float(w) for w in os.getenv("STREAM_WINDOWS_SECONDS", "60,300,900").split(",")]
+STREAM_MAX_TOWERS = int(os.getenv("STREAM_MAX_TOWERS", "5000"))
+STREAM_RESCORE_INTERVAL_SECONDS = float(os.getenv("STREAM_RESCORE_INTERVAL_SECONDS", "0.5"))
+STREAM_SUBSCRIBER_QUEUE = int(os.getenv("STREAM_SUBSCRIBER_QUEUE", "1000"))
+# Longest NDJSON line POST /stream/ingest buffers (a line may hold an array of readings)
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1 << 20)))
+# A tower is rescored only when its windowed mean moves to another bin of this size
+# (or its validation/gating outcome changes)
+STREAM_QUANTIZATION = {
+	"temperature": 0.5,
+	"humidity": 2.0,
+	"sunlight_hours": 0.25,
+	"water_ph": 0.05,
+	"air_quality_index": 5.0,
+	"wind_speed": 0.1,
+}
+
+# Microclimate heatmaps: interpolated cells are snapped to these bins for the model
+# pass (rules still see exact values), so identical environments are scored once
+HEATMAP_QUANTIZATION = dict(STREAM_QUANTIZATION)
+MICROCLIMATE_MAX_CELLS = 40000
+MICROCLIMATE_MAX_SENSORS = 100
+
+# Annealing placement engine (engine="anneal" on /placement/): independent restarts
+# share one wall-clock budget and run in the "anneal" process pool
+ANNEAL_RESTARTS = int(os.getenv("ANNEAL_RESTARTS", "4"))
+ANNEAL_TIME_BUDGET_SECONDS = float(os.getenv("ANNEAL_TIME_BUDGET_SECONDS", "2.0"))
+ANNEAL_MAX_TIME_BUDGET_SECONDS = float(os.getenv("ANNEAL_MAX_TIME_BUDGET_SECONDS", "30"))
+
+# POST /placement/batch: configs per request, and how many unique configs run at once
+# (one render job each; kept within the render queue limit so a batch is never rejected by
+# itself). Anneal configs are further limited so their restarts fit ANNEAL_QUEUE_LIMIT.
+PLACEMENT_BATCH_MAX_CONFIGS = int(os.getenv("PLACEMENT_BATCH_MAX_CONFIGS", "200"))
+PLACEMENT_BATCH_CONCURRENCY = max(1, min(
+	int(os.getenv("PLACEMENT_BATCH_CONCURRENCY", str(max(1, PROCESS_POOL_WORKERS)))),
+	WORKLOAD_QUEUE_LIMITS["render"],
+))
+
+# POST /placement/capacity: configs per request, distinct (farm, cap) combinations per
+# request when the binding spacing is asked for (a search over up to ~950 spacings each),
+# and the spacings searched (the API's min_spacing range, in 1 cm steps)
+CAPACITY_MAX_CONFIGS = int(os.getenv("CAPACITY_MAX_CONFIGS", "10000"))
+CAPACITY_MAX_BINDING_CONFIGS = int(os.getenv("CAPACITY_MAX_BINDING_CONFIGS", "100"))
+CAPACITY_SPACING_RANGE = (0.5, 10.0)
+CAPACITY_SPACING_STEP = 0.01
+
+# Tower self-shading (POST /placement/shading): sun below SHADING_MIN_ELEVATION_DEG is not
+# counted as direct sunlight (it also bounds how far a shadow reaches), each tower's
+# sun-facing silhouette is sampled along SHADING_LATERAL_SAMPLES vertical lines
+SHADING_MAX_DAYS = int(os.getenv("SHADING_MAX_DAYS", "366"))
+SHADING_MIN_ELEVATION_DEG = float(os.getenv("SHADING_MIN_ELEVATION_DEG", "5"))
+SHADING_LATERAL_SAMPLES = 8
+
+# Named layout store (/layouts): every saved version is a directory with a packed .npy of
+# the towers (x, y, crop code) and a JSON sidecar; versions are loaded memory-mapped
+LAYOUT_STORE_DIR = pathlib.Path(os.getenv("LAYOUT_STORE_DIR", str(BASE_DIR / "layouts")))
+LAYOUT_MAX_TOWERS = int(os.getenv("LAYOUT_MAX_TOWERS", "100000"))
+
+# Model registry: retraining jobs publish versioned artifacts here and CURRENT names the
+# served one. Serving processes check CURRENT at most this often and load a new version
+# without a restart; without a registry the artifacts above are served.
+MODEL_REGISTRY_DIR = pathlib.Path(os.getenv("MODEL_REGISTRY_DIR", str(MODELS_DIR / "registry")))
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "2"))
+
+# Retraining jobs (POST /jobs/retrain): a SQLite queue drained by a runner in the API
+# process; each job runs `python -m app.models.retrain` in its own subprocess
+JOBS_DB_PATH = pathlib.Path(os.getenv("JOBS_DB_PATH", str(BASE_DIR / "jobs" / "jobs.sqlite3")))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# A job whose process died with the API (not one that failed) is run again up to this many times
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Limits for the training subprocess; 0 disables a limit. It runs at a lower priority
+# with RETRAIN_N_JOBS sklearn threads so serving keeps the CPU it needs.
+RETRAIN_MAX_MEMORY_MB = int(os.getenv("RETRAIN_MAX_MEMORY_MB", "4096"))
+RETRAIN_MAX_CPU_SECONDS = int(os.getenv("RETRAIN_MAX_CPU_SECONDS", "1800"))
+RETRAIN_TIMEOUT_SECONDS = float(os.getenv("RETRAIN_TIMEOUT_SECONDS", "3600"))
+RETRAIN_NICE = int(os.getenv("RETRAIN_NICE", "10"))
+RETRAIN_N_JOBS = int(os.getenv("RETRAIN_N_JOBS", "1"))
+
+# Prediction history (/history): POST /predict/ calls are buffered in memory and written
+# by a background writer in batches of up to HISTORY_BATCH_ROWS, at least every
+# HISTORY_FLUSH_SECONDS, together with hourly/daily rollups per location and crop
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") != "0"
+HISTORY_DB_PATH = pathlib.Path(os.getenv("HISTORY_DB_PATH", str(BASE_DIR / "history" / "history.sqlite3")))
+HISTORY_BUFFER_MAX = int(os.getenv("HISTORY_BUFFER_MAX", "10000"))
+HISTORY_BATCH_ROWS = int(os.getenv("HISTORY_BATCH_ROWS", "500"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1"))
+# When the buffer is full: "drop_oldest", "drop_newest", or "block" (the request waits up
+# to HISTORY_BLOCK_SECONDS for the writer to make room, then its record is dropped)
+HISTORY_OVERFLOW = os.getenv("HISTORY_OVERFLOW", "drop_oldest")
+HISTORY_BLOCK_SECONDS = float(os.getenv("HISTORY_BLOCK_SECONDS", "0.05"))
+
+# Input drift (GET /predict/drift): /predict readings are counted into DRIFT_BINS fixed
+# bins per feature over DRIFT_FEATURE_RANGES (plus one bin below and one above) for the
+# last DRIFT_WINDOW_READINGS readings, and compared with the training data's histograms:
+# a registry version's own, else DRIFT_REFERENCE_PATH (built from DRIFT_TRAINING_DATASET
+# on first use). PSI at or above the thresholds
+# marks a feature "moderate" / "drift"; below DRIFT_MIN_READINGS it is "warming_up".
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "1") != "0"
+DRIFT_REFERENCE_PATH = MODELS_DIR / "input_reference.json"
+DRIFT_TRAINING_DATASET = MODELS_DIR / "aeroponic_crop_suitability_dataset.csv"
+DRIFT_FEATURE_RANGES = {
+	"temperature": (0.0, 45.0),
+	"humidity": (20.0, 100.0),
+	"sunlight_hours": (0.0, 24.0),
+	"water_ph": (4.5, 8.0),
+	"air_quality_index": (0.0, 500.0),
+	"wind_speed": (0.0, 5.0),
+}
+DRIFT_BINS = 50
+DRIFT_WINDOW_READINGS = int(os.getenv("DRIFT_WINDOW_READINGS", "10000"))
+DRIFT_MIN_READINGS = int(os.getenv("DRIFT_MIN_READINGS", "200"))
+DRIFT_PSI_THRESHOLDS = (0.1, 0.25)
+
+# Tile pyramid for placement layouts (output="tiles" on /placement/)
+TILE_SIZE = 256
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "8"))
+# Cell labels and tower numbers are drawn once they are at least this many pixels apart
+TILE_LABEL_MIN_PX = 28
+
+# Static delivery of generated layout images (GET /static/<name>.png): content-hashed
+# names are cached for a year; variants are encoded once and kept under app/data/variants
+STATIC_IMMUTABLE_MAX_AGE = 31536000
+IMAGE_THUMBNAIL_PX = int(os.getenv("IMAGE_THUMBNAIL_PX", "480"))
+# The layouts are flat-coloured charts; 128 palette entries keep the anti-aliased edges clean
+IMAGE_PALETTE_COLORS = 128
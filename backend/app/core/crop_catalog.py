@@ -0,0 +1,101 @@
+"""
+Crop catalog: per-crop agronomic bounds loaded from `models/crop_catalog.csv`
+and compiled into NumPy arrays, so constraint checks, AQI penalties and
+explanation flags are evaluated for every reading x crop in one vectorized step.
+
+Readings are (n, 6) arrays in READING_COLUMNS order.
+"""
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+READING_COLUMNS = ["temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"]
+
+# Range-checked features: catalog column prefix, legacy CROP_CONSTRAINTS key, reading column index
+RANGE_FEATURES = [
+    ("temp", "temp", 0),
+    ("hum", "hum", 1),
+    ("sun", "sun", 2),
+    ("ph", "ph", 3),
+    ("wind", "wind", 5),
+]
+AQI_COLUMN = 4
+
+# Same fallbacks the per-crop `c.get(key, (0, 999))` lookups used for missing bounds
+_DEFAULT_LOWER = 0.0
+_DEFAULT_UPPER = 999.0
+
+
+class CropCatalog:
+    """Compiled bound arrays; row i of every array belongs to `names[i]`."""
+
+    def __init__(self, names: Sequence[str], lower: np.ndarray, upper: np.ndarray, aqi_max: np.ndarray):
+        self.names: List[str] = list(names)
+        self.lower = np.asarray(lower, dtype=float)      # (n_crops, 5) in RANGE_FEATURES order
+        self.upper = np.asarray(upper, dtype=float)      # (n_crops, 5)
+        self.aqi_max = np.asarray(aqi_max, dtype=float)  # (n_crops,), NaN = no AQI limit
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self._range_columns = [col for _, _, col in RANGE_FEATURES]
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CropCatalog":
+        lower = np.column_stack([df.get(f"{p}_min", pd.Series(np.nan, index=df.index)).to_numpy(float) for p, _, _ in RANGE_FEATURES])
+        upper = np.column_stack([df.get(f"{p}_max", pd.Series(np.nan, index=df.index)).to_numpy(float) for p, _, _ in RANGE_FEATURES])
+        lower = np.where(np.isnan(lower), _DEFAULT_LOWER, lower)
+        upper = np.where(np.isnan(upper), _DEFAULT_UPPER, upper)
+        aqi = df.get("aqi_max", pd.Series(np.nan, index=df.index)).to_numpy(float)
+        return cls(df["crop"].astype(str).tolist(), lower, upper, aqi)
+
+    def subset(self, indices) -> "CropCatalog":
+        indices = np.asarray(indices, dtype=int)
+        return CropCatalog([self.names[i] for i in indices], self.lower[indices], self.upper[indices], self.aqi_max[indices])
+
+    def as_constraints(self) -> Dict[str, dict]:
+        """Legacy CROP_CONSTRAINTS view: {crop: {"temp": (lo, hi), ..., "aqi": max}}."""
+        constraints = {}
+        for i, name in enumerate(self.names):
+            entry = {key: (_number(self.lower[i, j]), _number(self.upper[i, j])) for j, (_, key, _) in enumerate(RANGE_FEATURES)}
+            if not np.isnan(self.aqi_max[i]):
+                entry["aqi"] = _number(self.aqi_max[i])
+            constraints[name] = entry
+        return constraints
+
+    # ---------------------------------------------
+    # VECTORIZED RULES (readings: (n, 6) -> (n, n_crops))
+    # ---------------------------------------------
+    def agronomic_mask(self, readings: np.ndarray) -> np.ndarray:
+        """Strict range checks on temperature, humidity, sunlight, pH and wind (AQI is a soft penalty)."""
+        values = np.asarray(readings, dtype=float)[:, self._range_columns][:, None, :]
+        return ((self.lower[None] <= values) & (values <= self.upper[None])).all(axis=2)
+
+    def aqi_penalty(self, readings: np.ndarray) -> np.ndarray:
+        """Multiplier in [0.1, 1] for readings whose AQI exceeds each crop's limit."""
+        aqi = np.asarray(readings, dtype=float)[:, AQI_COLUMN][:, None]
+        limit = self.aqi_max[None, :]
+        scale = np.maximum(20.0, limit)
+        with np.errstate(invalid="ignore"):
+            penalty = np.maximum(0.1, 1.0 - (aqi - limit) / scale)
+            over = ~np.isnan(limit) & (aqi > limit)
+        return np.where(over, penalty, 1.0)
+
+    def explanation_flags(self, readings: np.ndarray):
+        """(temperature_ok, humidity_ok) masks backing the textual explanations."""
+        readings = np.asarray(readings, dtype=float)
+        t, h = readings[:, 0][:, None], readings[:, 1][:, None]
+        temperature_ok = (self.lower[None, :, 0] <= t) & (t <= self.upper[None, :, 0])
+        humidity_ok = (self.lower[None, :, 1] <= h) & (h <= self.upper[None, :, 1])
+        return temperature_ok, humidity_ok
+
+
+def _number(value: float):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def load_catalog(path: Path) -> CropCatalog:
+    return CropCatalog.from_frame(pd.read_csv(path))
@@ -1,5 +1,9 @@
+from typing import List, Literal, Optional
+
 from pydantic import BaseModel, Field
 
+from app.core.config import FORECAST_MAX_HOURS, PREDICT_BATCH_MAX_ROWS, RECOMMENDATION_CONFIDENCE_THRESHOLD
+
 class PredictionInput(BaseModel):
     temperature: float = Field(..., ge=0, le=45)
     humidity: float = Field(..., ge=20, le=100)
@@ -7,3 +11,51 @@ class PredictionInput(BaseModel):
     water_ph: float = Field(..., ge=4.5, le=8.0)
     air_quality_index: float = Field(..., ge=0, le=500)
     wind_speed: float = Field(..., ge=0, le=5)
+
+class PredictionBatch(BaseModel):
+    readings: List[PredictionInput] = Field(..., min_length=1, max_length=PREDICT_BATCH_MAX_ROWS)
+
+class SensorReading(PredictionInput):
+    tower_id: str = Field(..., min_length=1, max_length=64)
+    # epoch seconds; the server clock is used when omitted
+    timestamp: Optional[float] = None
+
+class SensorPoint(PredictionInput):
+    # position on the farm in meters (x along farm_length, y along farm_width)
+    x: float = Field(..., ge=0, le=100)
+    y: float = Field(..., ge=0, le=100)
+
+class SweepAxis(BaseModel):
+    variable: Literal["temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"]
+    start: float
+    stop: float
+    step: float = Field(..., gt=0)
+
+class SweepRequest(BaseModel):
+    # the readings held fixed; swept variables take their values from `axes`
+    base: PredictionInput
+    axes: List[SweepAxis] = Field(..., min_length=1, max_length=2)
+
+class ForecastRequest(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    hours: int = Field(72, ge=1, le=FORECAST_MAX_HOURS)
+    # readings the forecast does not cover, held fixed over the horizon
+    sunlight_hours: float = Field(..., ge=0, le=24)
+    water_ph: float = Field(..., ge=4.5, le=8.0)
+    air_quality_index: float = Field(..., ge=0, le=500)
+    # an hour is suitable for a crop at this class and confidence (%) or better
+    min_class: int = Field(2, ge=1, le=2)
+    min_confidence: float = Field(RECOMMENDATION_CONFIDENCE_THRESHOLD, ge=0, le=100)
+    min_window_hours: int = Field(1, ge=1)
+
+class RetrainRequest(BaseModel):
+    samples_per_crop: int = Field(800, ge=50, le=20000)
+    # dataset generation seed; a random one is used (and reported) when omitted
+    seed: Optional[int] = None
+    n_estimators: int = Field(400, ge=10, le=2000)
+    specialists: bool = False
+    calibrate: bool = True
+    # the new version is published (and served) only at this hold-out accuracy or better
+    min_accuracy: float = Field(0.0, ge=0, le=1)
+    publish: bool = True
@@ -0,0 +1,86 @@
+"""
+Negotiated encodings for large responses (/predict/batch, /placement/).
+
+The default is JSON written by orjson, which serializes numpy arrays natively;
+FastAPI's jsonable_encoder walks every nested object in Python first. Clients
+that list a MessagePack media type in Accept (or pass ?format=msgpack) get
+MessagePack instead. Missing values (NaN) in numpy arrays are null in both
+formats, so the two decode to the same structure.
+
+The layout (rows of objects or parallel arrays) is chosen by the route; this
+module only encodes.
+"""
+from typing import Optional
+
+import numpy as np
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # optional: without it only JSON is offered
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+MEDIA_TYPES = {"json": JSON, "msgpack": MSGPACK}
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _to_builtin(obj):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f":
+            missing = np.isnan(obj)
+            if missing.any():
+                values = obj.astype(object)
+                values[missing] = None
+                return values.tolist()
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        value = obj.item()
+        return None if isinstance(value, float) and value != value else value
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def negotiate(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """
+    "json" or "msgpack". An explicit ?format= wins (406 when it cannot be served);
+    otherwise MessagePack is used only when Accept lists it with q > 0.
+    """
+    if requested:
+        if requested == "msgpack" and msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack is not available on this server")
+        return requested
+    if msgpack is None or not accept:
+        return "json"
+    for part in accept.split(","):
+        media, _, params = part.strip().partition(";")
+        if media.strip().lower() in MSGPACK_TYPES:
+            q = params.replace(" ", "").partition("q=")[2]
+            try:
+                if not q or float(q) > 0:
+                    return "msgpack"
+            except ValueError:
+                return "msgpack"
+    return "json"
+
+
+def encode(payload, fmt: str = "json") -> bytes:
+    if fmt == "msgpack":
+        return msgpack.packb(payload, default=_to_builtin, use_bin_type=True)
+    # non-contiguous arrays and numpy scalars that orjson does not take natively go through _to_builtin
+    return orjson.dumps(payload, default=_to_builtin, option=_ORJSON_OPTIONS)
+
+
+def encoded_response(body: bytes, fmt: str, headers: Optional[dict] = None) -> Response:
+    """A response for an already encoded body; Vary: Accept because the encoding was negotiated."""
+    return Response(content=body, media_type=MEDIA_TYPES[fmt], headers={"Vary": "Accept", **(headers or {})})
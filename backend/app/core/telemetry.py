@@ -0,0 +1,421 @@
+"""
+Lightweight in-process metrics (counters, gauges, histograms) rendered in the
+Prometheus text exposition format.
+
+Kept dependency-free on purpose: an observation is a bisect over the bucket
+bounds plus two additions under a lock (well under a microsecond), so the hot
+paths can be instrumented per stage. Set TELEMETRY_ENABLED=0 to turn every
+observation into a no-op.
+"""
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import TELEMETRY_ENABLED
+
+# Latency buckets in seconds: 100 µs .. 30 s
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        ...
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        if not TELEMETRY_ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        if not TELEMETRY_ENABLED:
+            return
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+    def _render_child(self, key, child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def timed(child) -> Callable:
+    """Decorator observing the wall time of every call (including failed ones)."""
+    def decorator(fn):
+        if not TELEMETRY_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def drain() -> list:
+    """
+    Return and reset counter/histogram data accumulated in this process.
+    Process-pool workers ship this back with each result so the parent's
+    scrape endpoint still sees per-stage timings of offloaded work.
+    """
+    deltas = []
+    for metric in list(_REGISTRY):
+        for key, child in list(metric._children.items()):
+            if isinstance(child, _HistogramChild):
+                with child._lock:
+                    if not any(child.counts):
+                        continue
+                    deltas.append((metric.name, key, list(child.counts), child.sum))
+                    child.counts = [0] * len(child.counts)
+                    child.sum = 0.0
+            elif isinstance(child, _CounterChild):
+                with child._lock:
+                    if not child.value:
+                        continue
+                    deltas.append((metric.name, key, child.value, None))
+                    child.value = 0
+    return deltas
+
+
+def merge(deltas: list) -> None:
+    """Add the output of drain() (usually from another process) to this process' metrics."""
+    by_name = {m.name: m for m in _REGISTRY}
+    for name, key, counts, total in deltas:
+        metric = by_name.get(name)
+        if metric is None:
+            continue
+        child = metric.labels(*key)
+        if isinstance(child, _HistogramChild):
+            with child._lock:
+                child.counts = [a + b for a, b in zip(child.counts, counts)]
+                child.sum += total
+        elif isinstance(child, _CounterChild):
+            with child._lock:
+                child.value += counts
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware recording request latency per route template (not raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TELEMETRY_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                route = "/static" if scope["path"].startswith("/static/") else "unmatched"
+            HTTP_REQUEST_SECONDS.labels(route, scope["method"], status[0]).observe(time.perf_counter() - start)
+
+
+def render_prometheus(extra: Optional[Iterable[str]] = None) -> str:
+    lines: List[str] = []
+    for metric in list(_REGISTRY):
+        lines.extend(metric.render())
+    if extra:
+        lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------
+# APPLICATION METRICS
+# ---------------------------------------------
+PREDICT_STAGE_SECONDS = Histogram(
+    "aeroponic_predict_stage_seconds",
+    "Time spent in each stage of predict_crop_scores",
+    ["stage"],
+)
+PREDICTIONS_TOTAL = Counter(
+    "aeroponic_predictions_total",
+    "predict_crop_scores calls by outcome",
+    ["outcome"],
+)
+PLACEMENT_SECONDS = Histogram(
+    "aeroponic_placement_seconds",
+    "Time spent in greedy_tower_placement",
+)
+RENDER_STAGE_SECONDS = Histogram(
+    "aeroponic_render_stage_seconds",
+    "Time spent rendering layouts (draw = building artists, png_write = rasterize + encode + write, tile = one pyramid tile)",
+    ["stage"],
+)
+PLACEMENT_BATCH_CONFIGS = Counter(
+    "aeroponic_placement_batch_configs_total",
+    "Configs in /placement/batch requests by outcome (computed, duplicate = served from an equivalent config, failed)",
+    ["outcome"],
+)
+JOBS_FINISHED = Counter(
+    "aeroponic_jobs_finished_total",
+    "Background jobs by kind and final status (succeeded, failed, cancelled)",
+    ["kind", "status"],
+)
+HISTORY_RECORDS = Counter(
+    "aeroponic_history_records_total",
+    "Prediction history records (queued, dropped = buffer full, written, failed = batch not written)",
+    ["result"],
+)
+HISTORY_BUFFER = Gauge(
+    "aeroponic_history_buffer",
+    "Prediction history records waiting for the writer (buffered) and the buffer size (capacity)",
+    ["state"],
+)
+HISTORY_WRITE_SECONDS = Histogram(
+    "aeroponic_history_write_seconds",
+    "Time spent writing one batch of history records and its rollups",
+)
+ASSIGNMENT_SECONDS = Histogram(
+    "aeroponic_assignment_seconds",
+    "Time spent in assign_crops",
+)
+WEATHER_FETCH_SECONDS = Histogram(
+    "aeroponic_weather_fetch_seconds",
+    "Time spent in fetch_environment_by_coords, including cache hits",
+)
+FORECAST_FETCH_SECONDS = Histogram(
+    "aeroponic_forecast_fetch_seconds",
+    "Time spent fetching forecast series from the upstream (cache misses only)",
+    ["provider"],
+)
+CACHE_REQUESTS = Counter(
+    "aeroponic_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+IMAGE_ENCODE_SECONDS = Histogram(
+    "aeroponic_image_encode_seconds",
+    "Time spent encoding one layout image variant (png8, webp, thumbnails)",
+    ["variant"],
+)
+STATIC_BYTES_SENT = Counter(
+    "aeroponic_static_bytes_sent_total",
+    "Layout image bytes sent by variant; 304 responses send none",
+    ["variant"],
+)
+STATIC_RESPONSES = Counter(
+    "aeroponic_static_responses_total",
+    "Layout image responses by status (200 or 304)",
+    ["status"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "aeroponic_http_request_duration_seconds",
+    "HTTP request latency by route template, method and status",
+    ["route", "method", "status"],
+)
+MODEL_INFO = Gauge(
+    "aeroponic_model_info",
+    "Loaded model artifacts; the value is always 1",
+    ["version", "calibrated"],
+)
+WORKLOAD = Gauge(
+    "aeroponic_workload",
+    "Admission-controlled CPU workloads (in_flight = queued + running, limit = max before 429)",
+    ["workload", "state"],
+)
+WORKLOAD_REJECTED = Counter(
+    "aeroponic_workload_rejected_total",
+    "Requests rejected with 429/503 because a workload queue was full or the pool failed",
+    ["workload", "reason"],
+)
+THREADPOOL = Gauge(
+    "aeroponic_threadpool",
+    "Worker thread pool used for sync route handlers (busy, capacity, queue_depth)",
+    ["state"],
+)
+STREAM_READINGS = Counter(
+    "aeroponic_stream_readings_total",
+    "Sensor readings received on /stream by result (accepted/rejected)",
+    ["result"],
+)
+STREAM_TOWER_CHECKS = Counter(
+    "aeroponic_stream_tower_checks_total",
+    "Updated towers checked by the stream rescorer (skipped = same quantized inputs, rescored, deferred = predict queue full)",
+    ["decision"],
+)
+STREAM_EVENTS = Counter(
+    "aeroponic_stream_events_total",
+    "Change events for stream subscribers (sent, dropped = subscriber queue full)",
+    ["result"],
+)
+STREAM_TOWERS = Gauge(
+    "aeroponic_stream_towers",
+    "Stream state (tracked towers, slab capacity, subscribers)",
+    ["state"],
+)
+MICROCLIMATE_STAGE_SECONDS = Histogram(
+    "aeroponic_microclimate_stage_seconds",
+    "Time spent in compute_microclimate (interpolate = sensor interpolation over the grid, score = batched scoring)",
+    ["stage"],
+)
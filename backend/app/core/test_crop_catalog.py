@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from app.core.config import CROP_CATALOG, CROP_CONSTRAINTS, CROPS
+from app.core.crop_catalog import CropCatalog
+
+
+def _legacy_agronomic_ok(c, t, h, s, ph, w):
+    return (
+        c["temp"][0] <= t <= c["temp"][1]
+        and c["hum"][0] <= h <= c["hum"][1]
+        and c["sun"][0] <= s <= c["sun"][1]
+        and c["ph"][0] <= ph <= c["ph"][1]
+        and c["wind"][0] <= w <= c["wind"][1]
+    )
+
+
+def test_catalog_matches_legacy_constraints():
+    assert CROPS == ["lettuce", "basil", "parsley", "mint", "rosemary"]
+    assert CROP_CONSTRAINTS["basil"] == {"temp": (20, 30), "hum": (50, 70), "sun": (6, 8), "ph": (5.5, 6.8), "wind": (0.3, 2), "aqi": 130}
+
+
+def test_vectorized_rules_match_per_crop_checks():
+    rng = np.random.default_rng(0)
+    readings = np.column_stack([
+        rng.uniform(10, 35, 500), rng.uniform(35, 90, 500), rng.uniform(2, 10, 500),
+        rng.uniform(5.0, 7.2, 500), rng.uniform(20, 200, 500), rng.uniform(0.1, 3.0, 500),
+    ])
+    mask = CROP_CATALOG.agronomic_mask(readings)
+    penalty = CROP_CATALOG.aqi_penalty(readings)
+    for i, (t, h, s, ph, aqi, w) in enumerate(readings.tolist()):
+        for j, crop in enumerate(CROPS):
+            c = CROP_CONSTRAINTS[crop]
+            assert mask[i, j] == _legacy_agronomic_ok(c, t, h, s, ph, w)
+            expected = max(0.1, 1.0 - (aqi - c["aqi"]) / max(20.0, float(c["aqi"]))) if aqi > c["aqi"] else 1.0
+            assert penalty[i, j] == expected
+    assert mask.any()
+
+
+def test_missing_bounds_fall_back_to_defaults():
+    catalog = CropCatalog.from_frame(pd.DataFrame({"crop": ["kale"], "temp_min": [10], "temp_max": [20]}))
+    assert catalog.as_constraints()["kale"]["hum"] == (0, 999)
+    readings = np.array([[15, 60, 5, 6.0, 300, 1.0]])
+    assert catalog.agronomic_mask(readings).tolist() == [[True]]
+    assert catalog.aqi_penalty(readings).tolist() == [[1.0]]
@@ -0,0 +1,34 @@
+import numpy as np
+import orjson
+import pytest
+
+from app.core.serialization import encode, negotiate
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def test_negotiation():
+    assert negotiate(None) == "json"
+    assert negotiate("application/json, */*") == "json"
+    assert negotiate("application/x-msgpack, application/json;q=0.5") == "msgpack"
+    assert negotiate("application/msgpack;q=0") == "json"
+    assert negotiate("application/msgpack", requested="json") == "json"
+
+
+def test_json_and_msgpack_decode_alike():
+    payload = {
+        "scores": np.array([[1.5, np.nan], [2.0, 3.25]]),
+        "ok": np.array([[True, False], [False, True]]),
+        "x": np.arange(6, dtype=float).reshape(2, 3).T[0],  # non-contiguous
+        "positions": [(0.0, 1.5), (2.5, 1.5)],
+        "count": np.int64(3),
+    }
+    expected = {
+        "scores": [[1.5, None], [2.0, 3.25]],
+        "ok": [[True, False], [False, True]],
+        "x": [0.0, 3.0],
+        "positions": [[0.0, 1.5], [2.5, 1.5]],
+        "count": 3,
+    }
+    assert orjson.loads(encode(payload)) == expected
+    assert msgpack.unpackb(encode(payload, "msgpack")) == expected
@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+from app.core import telemetry
+
+
+def test_histogram_renders_cumulative_buckets(metrics_registry):
+    hist = telemetry.Histogram("test_latency_seconds", "test histogram", ["stage"], buckets=(0.1, 1.0))
+    child = hist.labels("a")
+    for value in (0.05, 0.5, 0.5, 5.0):
+        child.observe(value)
+
+    lines = hist.render()
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{stage="a"} 4' in lines
+    assert metrics_registry == [hist]
+
+
+def test_prometheus_route_exposes_request_and_stage_metrics():
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/")
+    response = client.get("/telemetry/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'aeroponic_http_request_duration_seconds_count{route="/",method="GET",status="200"}' in body
+    assert "# TYPE aeroponic_predict_stage_seconds histogram" in body
+    assert 'aeroponic_threadpool{state="capacity"}' in body
+    # metrics created by other tests are not in the app's registry
+    assert "test_latency_seconds" not in body
@@ -0,0 +1,10 @@
+import os
+import uuid
+from pathlib import Path
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write through a temporary file and a rename, so concurrent writers of the same file leave one of them intact."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
@@ -1,5 +1,9 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
@@ -8,8 +12,43 @@ from app.api.predict import router as predict_router
 from app.api.placement import router as placement_router
 from app.api.environment import router as environment_router
 from app.api.metrics import router as metrics_router
+from app.api.telemetry import router as telemetry_router
+from app.api.profiles import router as profiles_router
+from app.api.stream import router as stream_router
+from app.api.tiles import router as tiles_router
+from app.api.static import router as static_router
+from app.api.jobs import router as jobs_router
+from app.api.history import router as history_router
+from app.api.layouts import router as layouts_router
+from app.core.telemetry import RequestTimingMiddleware
+from app.models.crop_recommendation import run_model_watcher
+from app.services.executor import WorkloadRejected, shutdown_pool, start_pools
+from app.services.history_service import run_history_writer
+from app.services.job_service import run_jobs
+from app.services.stream_service import run_rescorer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_pools()
+    rescorer = asyncio.create_task(run_rescorer())
+    # a running retraining job keeps going across a restart and is picked up again
+    jobs = asyncio.create_task(run_jobs())
+    history = asyncio.create_task(run_history_writer())
+    # reload checks for this process, off the event loop (pool workers check on their own)
+    watcher = asyncio.create_task(run_model_watcher())
+    yield
+    watcher.cancel()
+    rescorer.cancel()
+    jobs.cancel()
+    # the writer stores what is still buffered before it exits
+    history.cancel()
+    # wait for every task to unwind (a job's cleanup, an in-flight rescoring pass) before the pools go
+    await asyncio.gather(watcher, rescorer, jobs, history, return_exceptions=True)
+    shutdown_pool()
 
-app = FastAPI(title="Aeroponic Optimization API")
+
+app = FastAPI(title="Aeroponic Optimization API", lifespan=lifespan)
 
 # CORS (for frontend)
 app.add_middleware(
@@ -19,12 +58,31 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTimingMiddleware)
+
+
+@app.exception_handler(WorkloadRejected)
+async def workload_rejected_handler(request: Request, exc: WorkloadRejected):
+    # Fail fast instead of queueing unboundedly behind CPU-bound work
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Register routers
 app.include_router(predict_router)
 app.include_router(placement_router)
 app.include_router(environment_router)
 app.include_router(metrics_router)
+app.include_router(telemetry_router)
+app.include_router(profiles_router)
+app.include_router(stream_router)
+app.include_router(tiles_router)
+app.include_router(static_router)
+app.include_router(jobs_router)
+app.include_router(history_router)
+app.include_router(layouts_router)
 
 # Serve generated images and other static data (absolute path for reliability)
 STATIC_DIR = Path(__file__).resolve().parent / "data"
@@ -33,5 +91,5 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Aeroponic Optimization API is running"}
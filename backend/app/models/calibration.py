@@ -0,0 +1,260 @@
+"""
+Post-hoc probability calibration of the shared forest with per-class lookup tables.
+
+A CalibratedClassifierCV wrapper (placement_model_calibrated.pkl) keeps one forest per
+fold and averages them, so every prediction runs k forests. Here the calibration is
+learned once, as a monotone map per class from the forest's probability to the
+observed frequency, and serving applies it to one pass of the base forest:
+
+- isotonic: piecewise-linear table (breakpoints from IsotonicRegression)
+- sigmoid: Platt scaling, two coefficients per class
+
+Rows are renormalized to sum to 1 afterwards, as CalibratedClassifierCV does.
+
+The tables are fitted on out-of-fold probabilities of forests with the base model's
+hyperparameters over the training split, so the hold-out split stays untouched for
+the comparison. Run from the backend/ folder after training:
+
+    python -m app.models.calibration [--method sigmoid|isotonic] [--folds 5] [--no-wrapper]
+
+Writes the --method table to CALIBRATION_LUT_PATH (picked up at startup, in place
+of the wrapper) and calibration_report.md, which compares reliability, ECE and
+latency of the base forest, both tables and k-fold CalibratedClassifierCV wrappers.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import CALIBRATION_LUT_PATH, MODEL_PATH
+
+BASE = Path(__file__).parent
+REPORT_PATH = BASE / "calibration_report.md"
+METHODS = ("isotonic", "sigmoid")
+RELIABILITY_BINS = 10
+
+
+class ProbabilityCalibrator:
+    """Per-class calibration tables; `transform` maps (n, classes) probabilities to calibrated ones."""
+
+    def __init__(self, method: str, classes: Sequence, tables: List[List[List[float]]], base_model_version: Optional[str] = None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown calibration method {method!r}; expected one of {METHODS}")
+        self.method = method
+        self.classes = list(classes)
+        # isotonic: [breakpoints x, values y] per class; sigmoid: [[a, b]] per class
+        self.tables = [[np.asarray(part, dtype=float) for part in table] for table in tables]
+        self.base_model_version = base_model_version
+
+    def transform(self, probabilities: np.ndarray) -> np.ndarray:
+        probabilities = np.asarray(probabilities, dtype=float)
+        calibrated = np.empty_like(probabilities)
+        for k, table in enumerate(self.tables):
+            if self.method == "isotonic":
+                calibrated[:, k] = np.interp(probabilities[:, k], table[0], table[1])
+            else:
+                a, b = table[0]
+                calibrated[:, k] = 1.0 / (1.0 + np.exp(-(a * probabilities[:, k] + b)))
+        total = calibrated.sum(axis=1, keepdims=True)
+        # a row every table maps to 0 carries no information: uniform, as CalibratedClassifierCV does
+        return np.divide(calibrated, total, out=np.full_like(calibrated, 1.0 / len(self.tables)), where=total > 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "classes": [int(c) for c in self.classes],
+            "tables": [[part.tolist() for part in table] for table in self.tables],
+            "base_model_version": self.base_model_version,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ProbabilityCalibrator":
+        return cls(data["method"], data["classes"], data["tables"], data.get("base_model_version"))
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: Path) -> "ProbabilityCalibrator":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+class CalibratedForest:
+    """The base forest with a calibration table applied to its probabilities (one forest pass)."""
+
+    def __init__(self, base, calibrator: ProbabilityCalibrator):
+        self.base = base
+        self.calibrator = calibrator
+        self.classes_ = base.classes_
+        self.n_features_in_ = base.n_features_in_
+
+    def calibrate(self, probabilities: np.ndarray) -> np.ndarray:
+        return self.calibrator.transform(probabilities)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.calibrate(self.base.predict_proba(X))
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(self.classes_)[self.predict_proba(X).argmax(axis=1)]
+
+
+def fit_calibrator(probabilities: np.ndarray, y: np.ndarray, classes: Sequence, method: str = "sigmoid", base_model_version: Optional[str] = None) -> ProbabilityCalibrator:
+    """One-vs-rest table per class from (held-out) forest probabilities and true labels."""
+    from sklearn.isotonic import IsotonicRegression
+    from sklearn.linear_model import LogisticRegression
+
+    probabilities, y = np.asarray(probabilities, dtype=float), np.asarray(y)
+    tables = []
+    for k, label in enumerate(classes):
+        target = (y == label).astype(float)
+        if method == "isotonic":
+            iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(probabilities[:, k], target)
+            tables.append([iso.X_thresholds_.tolist(), iso.y_thresholds_.tolist()])
+        else:
+            platt = LogisticRegression(C=1e6).fit(probabilities[:, [k]], target)
+            tables.append([[float(platt.coef_[0, 0]), float(platt.intercept_[0])]])
+    return ProbabilityCalibrator(method, classes, tables, base_model_version)
+
+
+def out_of_fold_probabilities(model, X, y, folds: int = 5) -> np.ndarray:
+    """predict_proba of each training row from a clone of `model` fitted on the other folds."""
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    return cross_val_predict(clone(model), X, y, cv=cv, method="predict_proba")
+
+
+# ---------------------------------------------
+# EVALUATION
+# ---------------------------------------------
+def reliability(probabilities: np.ndarray, y: np.ndarray, classes: Sequence, bins: int = RELIABILITY_BINS):
+    """Top-label reliability: per confidence bin (count, mean confidence, accuracy), and the ECE."""
+    confidence = probabilities.max(axis=1)
+    correct = np.asarray(classes)[probabilities.argmax(axis=1)] == np.asarray(y)
+    index = np.minimum((confidence * bins).astype(int), bins - 1)
+    table = []
+    ece = 0.0
+    for b in range(bins):
+        selected = index == b
+        if not selected.any():
+            table.append((0, None, None))
+            continue
+        mean_conf, accuracy = float(confidence[selected].mean()), float(correct[selected].mean())
+        ece += selected.mean() * abs(mean_conf - accuracy)
+        table.append((int(selected.sum()), mean_conf, accuracy))
+    return table, float(ece)
+
+
+def _summary(name, probabilities, y, classes, single_ms, batch_ms):
+    from sklearn.metrics import log_loss
+
+    onehot = (np.asarray(y)[:, None] == np.asarray(classes)[None, :]).astype(float)
+    table, ece = reliability(probabilities, y, classes)
+    return {
+        "name": name,
+        "accuracy": float((np.asarray(classes)[probabilities.argmax(axis=1)] == np.asarray(y)).mean()),
+        "ece": ece,
+        "brier": float(((probabilities - onehot) ** 2).sum(axis=1).mean()),
+        "log_loss": float(log_loss(y, np.clip(probabilities, 1e-15, 1), labels=classes)),
+        "single_ms": single_ms,
+        "batch_ms": batch_ms,
+        "reliability": table,
+    }
+
+
+def _latency_ms(predict_proba, X_single, X_batch, repeats: int = 30):
+    # best of n: the forest passes are deterministic, so the minimum is the least noisy estimate
+    def best(X, n):
+        times = []
+        for _ in range(n):
+            start = time.perf_counter()
+            predict_proba(X)
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+    return best(X_single, repeats), best(X_batch, max(3, repeats // 4))
+
+
+def main(argv=None):
+    import joblib
+    from sklearn.base import clone
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.model_selection import StratifiedKFold
+
+    from app.core.config import CROPS
+    from app.models.crop_recommendation import artifact_version
+    from app.models.train_model import encode_and_split, load_dataset
+
+    parser = argparse.ArgumentParser(description="Fit the post-hoc calibration table for the shared model")
+    parser.add_argument("--method", choices=METHODS, default="sigmoid", help="table to save (both are compared)")
+    parser.add_argument("--folds", type=int, default=5, help="folds for the out-of-fold probabilities (and the comparison wrappers)")
+    parser.add_argument("--no-wrapper", action="store_true", help="skip fitting the CalibratedClassifierCV wrappers for the comparison")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(MODEL_PATH)
+    _, Xtr, Xte, ytr, yte = encode_and_split(load_dataset())
+    classes = model.classes_
+    folds = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42)
+
+    start = time.perf_counter()
+    held_out = out_of_fold_probabilities(model, Xtr, ytr, args.folds)
+    oof_seconds = time.perf_counter() - start
+    calibrators = {method: fit_calibrator(held_out, ytr, classes, method, artifact_version(MODEL_PATH)) for method in METHODS}
+    calibrators[args.method].save(CALIBRATION_LUT_PATH)
+
+    # a /predict/ call scores one row per crop
+    X_single = Xte.iloc[:len(CROPS)]
+    candidates = [("base forest", model)]
+    candidates += [(f"lookup table ({method})", CalibratedForest(model, calibrators[method])) for method in METHODS]
+    if not args.no_wrapper:
+        for method in METHODS:
+            wrapper = CalibratedClassifierCV(clone(model), method=method, cv=folds).fit(Xtr, ytr)
+            candidates.append((f"CalibratedClassifierCV ({method}, cv={args.folds})", wrapper))
+
+    rows = []
+    for name, candidate in candidates:
+        single_ms, batch_ms = _latency_ms(candidate.predict_proba, X_single, Xte)
+        rows.append(_summary(name, candidate.predict_proba(Xte), yte.to_numpy(), classes, single_ms, batch_ms))
+
+    lines = [
+        "# Probability calibration",
+        "",
+        f"{len(yte)} hold-out rows (the train_model.py test split). The lookup tables were fitted on "
+        f"{args.folds}-fold out-of-fold probabilities over the {len(ytr)} training rows ({oof_seconds:.1f} s); "
+        f"the {args.method} table was saved. "
+        "ECE is the top-label expected calibration error over "
+        f"{RELIABILITY_BINS} confidence bins. Latency is the best-of-n predict_proba time for one "
+        f"/predict/ call ({len(X_single)} rows) and for the whole hold-out split.",
+        "",
+        "| Model | Accuracy | ECE | Brier | Log loss | Single call (ms) | Hold-out batch (ms) |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['name']} | {r['accuracy']:.2%} | {r['ece']:.4f} | {r['brier']:.4f} | {r['log_loss']:.4f} | "
+            f"{r['single_ms']:.2f} | {r['batch_ms']:.2f} |"
+        )
+    lines += [
+        "",
+        "## Reliability (top-label confidence bins: count, mean confidence, accuracy)",
+        "",
+        "| Bin | " + " | ".join(r["name"] for r in rows) + " |",
+        "|---|" + "---|" * len(rows),
+    ]
+    for b in range(RELIABILITY_BINS):
+        cells = []
+        for r in rows:
+            count, conf, acc = r["reliability"][b]
+            cells.append(f"{count}: {conf:.2f} / {acc:.2f}" if count else "-")
+        lines.append(f"| {b / RELIABILITY_BINS:.1f}-{(b + 1) / RELIABILITY_BINS:.1f} | " + " | ".join(cells) + " |")
+
+    REPORT_PATH.write_text("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"\nSaved {CALIBRATION_LUT_PATH} and {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Cost and agreement of the scoring modes against the default (full mode, shared model).
+
+Run from the backend/ folder after training (add --specialists to train_model.py
+to include the per-crop specialist rows):
+
+    python -m app.models.compare_scoring_modes
+
+Readings are the distinct environments of the training hold-out split. Writes
+scoring_modes_report.md next to this file.
+"""
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import CROP_CATALOG
+from app.models.crop_recommendation import get_specialists, is_model_available
+from app.models.train_model import encode_and_split, load_dataset
+from app.services.ml_service import READING_COLUMNS, predict_crop_scores, score_readings
+
+BASE = Path(__file__).parent
+REPORT_PATH = BASE / "scoring_modes_report.md"
+SINGLE_CALL_SAMPLE = 300
+
+CONFIGS = [
+    ("full", False),
+    ("pruned", False),
+    ("full", True),
+    ("pruned", True),
+]
+
+
+def holdout_readings():
+    le, _, Xte, _, yte = encode_and_split(load_dataset())
+    crops = le.inverse_transform(Xte["crop_type"].astype(int))
+    readings, row_index = np.unique(Xte[READING_COLUMNS].to_numpy(float), axis=0, return_inverse=True)
+    crop_index = np.array([CROP_CATALOG.index[c] for c in crops])
+    return readings, row_index.ravel(), crop_index, yte.to_numpy()
+
+
+def single_call_latencies(readings, mode, use_specialists):
+    by_eligible = {}
+    for reading in readings:
+        start = time.perf_counter()
+        result = predict_crop_scores(*reading, mode=mode, use_specialists=use_specialists)
+        elapsed = time.perf_counter() - start
+        eligible = sum(1 for s in result.get("all_scores", []) if s["agronomic_ok"])
+        by_eligible.setdefault(eligible, []).append(elapsed)
+    return by_eligible
+
+
+def main():
+    if not is_model_available():
+        raise SystemExit("Model artifacts not available; run train_model.py first")
+    have_specialists = get_specialists() is not None
+    readings, row_index, crop_index, labels = holdout_readings()
+    sample = readings[np.random.default_rng(0).choice(len(readings), min(SINGLE_CALL_SAMPLE, len(readings)), replace=False)]
+
+    baseline = score_readings(readings, mode="full", use_specialists=False)
+    rows = []
+    latency_tables = {}
+    for mode, use_specialists in CONFIGS:
+        if use_specialists and not have_specialists:
+            continue
+        name = f"{mode} / {'specialists' if use_specialists else 'shared'}"
+        start = time.perf_counter()
+        result = score_readings(readings, mode=mode, use_specialists=use_specialists)
+        batch_seconds = time.perf_counter() - start
+
+        eligible = baseline["agronomic_ok"] & result["model_scored"]
+        predicted = result["suitability_class"][row_index, crop_index]
+        rows.append({
+            "name": name,
+            "pairs": int(result["model_scored"].sum()),
+            "batch_ms": batch_seconds * 1000,
+            "recommendation_agreement": float((result["recommended"] == baseline["recommended"]).mean()),
+            "class_agreement": float((result["suitability_class"][eligible] == baseline["suitability_class"][eligible]).mean()),
+            "confidence_delta": float(np.abs(result["confidence"][eligible] - baseline["confidence"][eligible]).mean()),
+            "label_accuracy": float((predicted == labels).mean()),
+        })
+        latency_tables[name] = single_call_latencies(sample, mode, use_specialists)
+
+    lines = [
+        "# Scoring modes: cost and agreement",
+        "",
+        f"{len(readings)} distinct hold-out readings x {len(CROP_CATALOG)} crops ({len(labels)} labelled rows). "
+        "Agreement is measured against full mode with the shared model, on pairs that are agronomically eligible "
+        "(the only ones that can be recommended). Label accuracy compares the predicted class of each hold-out row's "
+        "crop with its dataset label; pruned mode reports class 0 for crops it skips.",
+        "",
+        "| Mode / model | Pairs scored | Batch time (ms) | Recommendation agreement | Class agreement (eligible) | Mean abs. confidence delta | Label accuracy |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['name']} | {r['pairs']} | {r['batch_ms']:.1f} | {r['recommendation_agreement']:.2%} | "
+            f"{r['class_agreement']:.2%} | {r['confidence_delta']:.2f} | {r['label_accuracy']:.2%} |"
+        )
+    if not have_specialists:
+        lines += ["", "Specialist models not found (train with `python app/models/train_model.py --specialists`)."]
+
+    lines += [
+        "",
+        f"## Single-call latency by number of eligible crops (median ms, {len(sample)} readings)",
+        "",
+        "| Mode / model | " + " | ".join(str(k) for k in range(len(CROP_CATALOG) + 1)) + " |",
+        "|---|" + "---:|" * (len(CROP_CATALOG) + 1),
+    ]
+    for name, by_eligible in latency_tables.items():
+        cells = [f"{statistics.median(by_eligible[k]) * 1000:.2f}" if k in by_eligible else "-" for k in range(len(CROP_CATALOG) + 1)]
+        lines.append(f"| {name} | " + " | ".join(cells) + " |")
+
+    REPORT_PATH.write_text("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"\nSaved {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
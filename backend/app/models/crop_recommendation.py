@@ -1,47 +1,199 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
 
 import joblib
 import pandas as pd
 
 
-from app.core.config import CROPS, MODEL_PATH, ENCODER_PATH, CALIBRATED_MODEL_PATH
-
-_model = None
-_calibrated = None
-_encoder = None
-
-try:
-    _model = joblib.load(MODEL_PATH)
-except Exception as e:
-    print(f"Warning: failed to load model from {MODEL_PATH}: {e}")
-
-try:
-    # calibrated wrapper (CalibratedClassifierCV) if available
-    _calibrated = joblib.load(CALIBRATED_MODEL_PATH)
-except Exception:
-    _calibrated = None
-
-try:
-    _encoder = joblib.load(ENCODER_PATH)
-except Exception as e:
-    print(f"Warning: failed to load encoder from {ENCODER_PATH}: {e}")
+from app.core.config import (
+    CROPS,
+    MODEL_PATH,
+    ENCODER_PATH,
+    CALIBRATED_MODEL_PATH,
+    CALIBRATION_LUT_PATH,
+    SPECIALIST_MODELS_PATH,
+    MODEL_RELOAD_CHECK_SECONDS,
+)
+from app.models import registry
+from app.models.registry import artifact_version
+from app.models.calibration import CalibratedForest, ProbabilityCalibrator
+
+
+class ServingModel(NamedTuple):
+    """One loaded set of artifacts. It is swapped as a whole, so a caller holding it scores and labels with one version."""
+    model: object
+    calibrated: object
+    encoder: object
+    specialists: Optional[dict]
+    version: Optional[str]
+
+    @property
+    def available(self) -> bool:
+        return (self.model is not None or self.calibrated is not None) and self.encoder is not None
+
+    @property
+    def scoring_model(self):
+        """The calibrated model if available (better probability estimates), else the base model."""
+        return self.calibrated or self.model
+
+
+_serving = ServingModel(None, None, None, None, None)
+# registry version being served (None: the artifacts in app/models), and the last one
+# CURRENT named when it was checked, which may have failed to load
+_registry_version = None
+_attempted_version = None
+_next_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def _load(model_path, encoder_path, calibration_path, specialists_path, wrapper_path=None) -> ServingModel:
+    """Load one set of artifacts."""
+    model = calibrated = encoder = specialists = version = None
+    try:
+        model = joblib.load(model_path)
+    except Exception as e:
+        print(f"Warning: failed to load model from {model_path}: {e}")
+
+    calibrator = None
+    if model is not None and Path(calibration_path).exists():
+        # calibration table for the base model (python -m app.models.calibration), replaces the wrapper
+        try:
+            calibrator = ProbabilityCalibrator.load(calibration_path)
+        except Exception as e:
+            print(f"Warning: failed to load calibration table from {calibration_path}: {e}")
+        if calibrator is not None and calibrator.base_model_version != artifact_version(model_path):
+            print(f"Warning: {calibration_path} was fitted for another model; ignoring it")
+            calibrator = None
+
+    if calibrator is not None:
+        calibrated = CalibratedForest(model, calibrator)
+    elif wrapper_path is not None:
+        try:
+            # calibrated wrapper (CalibratedClassifierCV) if available
+            calibrated = joblib.load(wrapper_path)
+        except Exception:
+            calibrated = None
+
+    try:
+        encoder = joblib.load(encoder_path)
+    except Exception as e:
+        print(f"Warning: failed to load encoder from {encoder_path}: {e}")
+
+    try:
+        # per-crop specialists ({crop code: model}), optional
+        specialists = joblib.load(specialists_path)
+    except Exception:
+        specialists = None
+
+    if calibrator is not None:
+        version = f"{artifact_version(model_path)}+{artifact_version(calibration_path)}"
+    elif calibrated is not None:
+        version = artifact_version(wrapper_path)
+    elif model is not None:
+        version = artifact_version(model_path)
+    return ServingModel(model, calibrated, encoder, specialists, version)
+
+
+def _load_version(version) -> ServingModel:
+    if version is None:
+        return _load(MODEL_PATH, ENCODER_PATH, CALIBRATION_LUT_PATH, SPECIALIST_MODELS_PATH, CALIBRATED_MODEL_PATH)
+    # a published version is self-contained: no fallback to the wrapper fitted for app/models
+    folder = registry.version_dir(version)
+    return _load(*(folder / registry.ARTIFACTS[name] for name in ("model", "encoder", "calibration", "specialists")))
+
+
+def reload_if_changed(force: bool = False) -> bool:
+    """
+    Serve the registry's CURRENT version if it changed since the last check (checked at
+    most every MODEL_RELOAD_CHECK_SECONDS unless `force`); without CURRENT, the artifacts
+    in app/models. A version that fails to load is skipped and the loaded one keeps
+    serving. Returns True when other artifacts were loaded.
+    """
+    global _serving, _registry_version, _attempted_version, _next_check
+    now = time.monotonic()
+    if not force and now < _next_check:
+        return False
+    if not _reload_lock.acquire(blocking=force):
+        # another thread is checking
+        return False
+    try:
+        _next_check = now + MODEL_RELOAD_CHECK_SECONDS
+        version = registry.current_version()
+        if version == _attempted_version:
+            return False
+        _attempted_version = version
+        serving = _load_version(version)
+        if not serving.available:
+            print(f"Warning: model version {version or 'app/models'} could not be loaded; still serving {_registry_version or 'app/models'}")
+            return False
+        _serving, _registry_version = serving, version
+        print(f"Loaded model version {version or 'app/models'} ({serving.version})")
+        return True
+    finally:
+        _reload_lock.release()
+
+
+# the registry's current version when there is one (and it loads), else the artifacts in app/models
+if not reload_if_changed(force=True):
+    _serving = _load_version(None)
+
+
+def get_serving() -> ServingModel:
+    """The artifacts being served, as one snapshot: take it once per request."""
+    return _serving
 
 
 def get_model():
     """Return the base (un-calibrated) model."""
-    return _model
+    return _serving.model
 
 
 def get_calibrated_model():
-    """Return a calibrated model wrapper if available, else None."""
-    return _calibrated
+    """
+    Return the calibrated model if available, else None: the base model with its
+    calibration table (one forest pass) or else a CalibratedClassifierCV wrapper.
+    """
+    return _serving.calibrated
 
 
 def get_encoder():
-    return _encoder
+    return _serving.encoder
+
+
+def get_specialists():
+    """Return {encoded crop code: specialist model} if trained, else None."""
+    return _serving.specialists
+
+
+def get_model_version():
+    """Content hash of the model used for serving (calibrated model preferred), or None."""
+    return _serving.version
+
+
+def get_registry_version():
+    """Name of the registry version being served, or None for the artifacts in app/models."""
+    return _registry_version
 
 
 def is_model_available():
-    return (_model is not None or _calibrated is not None) and _encoder is not None
+    return _serving.available
+
+
+async def run_model_watcher(interval: float = MODEL_RELOAD_CHECK_SECONDS) -> None:
+    """
+    Background task started by the app lifespan: the API process's reload checks, run
+    on a worker thread so loading a new version never blocks the event loop. The getters
+    above only read what the last check loaded; pool workers check from ml_service.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(reload_if_changed, True)
+        except Exception as e:
+            print(f"Warning: model version check failed: {e}")
 
 crops = CROPS
 
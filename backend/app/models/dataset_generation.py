@@ -4,13 +4,27 @@ from pathlib import Path
 import pandas as pd
 
 
-CROPS = {
-    "lettuce":  {"temp": (15, 25), "humidity": (50, 80), "sunlight": (4, 6), "ph": (5.5, 6.5), "aqi": 120, "wind": (0.3, 1.5)},
-    "basil":    {"temp": (20, 30), "humidity": (50, 70), "sunlight": (6, 8), "ph": (5.5, 6.8), "aqi": 130, "wind": (0.3, 2.0)},
-    "parsley":  {"temp": (18, 25), "humidity": (50, 75), "sunlight": (4, 6), "ph": (5.5, 6.5), "aqi": 120, "wind": (0.3, 1.5)},
-    "mint":     {"temp": (18, 28), "humidity": (55, 80), "sunlight": (4, 6), "ph": (5.5, 6.5), "aqi": 125, "wind": (0.4, 2.0)},
-    "rosemary": {"temp": (20, 30), "humidity": (40, 65), "sunlight": (6, 8), "ph": (6.0, 7.0), "aqi": 140, "wind": (0.5, 2.5)},
-}
+# Bounds come from the shared crop catalog (also read by app.core.config), so this
+# script stays runnable on its own: `python app/models/dataset_generation.py`
+CATALOG_PATH = Path(__file__).parent / "crop_catalog.csv"
+
+
+def load_crops(path: Path = CATALOG_PATH) -> dict:
+    catalog = pd.read_csv(path)
+    return {
+        row.crop: {
+            "temp": (row.temp_min, row.temp_max),
+            "humidity": (row.hum_min, row.hum_max),
+            "sunlight": (row.sun_min, row.sun_max),
+            "ph": (row.ph_min, row.ph_max),
+            "aqi": row.aqi_max,
+            "wind": (row.wind_min, row.wind_max),
+        }
+        for row in catalog.itertuples(index=False)
+    }
+
+
+CROPS = load_crops()
 
 
 def percentage_to_class_3way(pct: float) -> int:
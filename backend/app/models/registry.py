@@ -0,0 +1,112 @@
+"""
+Versioned model artifacts published by retraining jobs (python -m app.models.retrain).
+
+    registry/
+        CURRENT               name of the version being served
+        <version>/            placement_model.pkl, crop_encoder.pkl, metrics.json,
+                              input_reference.json (drift reference histograms) and,
+                              when fitted, placement_model_calibration.json, crop_specialists.pkl
+
+A version directory is written under a temporary name and renamed into place, then
+CURRENT is replaced atomically, so a reader sees either the old or the new version
+complete. Serving processes check CURRENT (crop_recommendation.reload_if_changed) and
+load a new version without a restart. Without a registry the artifacts in app/models
+are served as before.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+from app.core.config import MODEL_REGISTRY_DIR
+
+ARTIFACTS = {
+    "model": "placement_model.pkl",
+    "encoder": "crop_encoder.pkl",
+    "calibration": "placement_model_calibration.json",
+    "specialists": "crop_specialists.pkl",
+    "reference": "input_reference.json",
+}
+REQUIRED = ("model", "encoder")
+METRICS_FILE = "metrics.json"
+POINTER = "CURRENT"
+# version directory names (retrain publishes <UTC stamp>-<model hash>)
+VERSION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def artifact_version(path) -> Optional[str]:
+    """Short content hash of a model artifact, used to tell deployed models apart."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+    except OSError:
+        return None
+
+
+def _root(registry: Optional[Path]) -> Path:
+    return Path(registry if registry is not None else MODEL_REGISTRY_DIR)
+
+
+def version_dir(version: str, registry: Optional[Path] = None) -> Path:
+    return _root(registry) / version
+
+
+def current_version(registry: Optional[Path] = None) -> Optional[str]:
+    try:
+        version = (_root(registry) / POINTER).read_text().strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def activate(version: str, registry: Optional[Path] = None) -> None:
+    """Point CURRENT at a published version (also used to roll back)."""
+    if not VERSION_NAME.match(version) or not all((version_dir(version, registry) / ARTIFACTS[name]).exists() for name in REQUIRED):
+        raise ValueError(f"Unknown model version {version!r}")
+    tmp = _root(registry) / f".{POINTER}.tmp"
+    tmp.write_text(version + "\n")
+    os.replace(tmp, _root(registry) / POINTER)
+
+
+def publish(source: Path, version: str, metrics: dict, registry: Optional[Path] = None, make_current: bool = True) -> Path:
+    """Copy the artifacts found in `source` into a new version directory and, by default, serve it."""
+    source, registry = Path(source), _root(registry)
+    if not VERSION_NAME.match(version):
+        raise ValueError(f"Invalid model version name {version!r}")
+    missing = [ARTIFACTS[name] for name in REQUIRED if not (source / ARTIFACTS[name]).exists()]
+    if missing:
+        raise ValueError(f"Cannot publish {version}: missing {', '.join(missing)}")
+    target = version_dir(version, registry)
+    if target.exists():
+        raise ValueError(f"Model version {version!r} already exists")
+    staging = registry / f".{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for filename in ARTIFACTS.values():
+        if (source / filename).exists():
+            shutil.copy2(source / filename, staging / filename)
+    (staging / METRICS_FILE).write_text(json.dumps(metrics, indent=2))
+    os.rename(staging, target)
+    if make_current:
+        activate(version, registry)
+    return target
+
+
+def list_versions(registry: Optional[Path] = None) -> List[dict]:
+    """Published versions, newest first, with their metrics."""
+    registry = _root(registry)
+    if not registry.is_dir():
+        return []
+    current = current_version(registry)
+    versions = []
+    for path in sorted(registry.iterdir(), reverse=True):
+        if not path.is_dir() or path.name.startswith("."):
+            continue
+        try:
+            metrics = json.loads((path / METRICS_FILE).read_text())
+        except (OSError, ValueError):
+            metrics = None
+        versions.append({"version": path.name, "current": path.name == current, "metrics": metrics})
+    return versions
@@ -0,0 +1,234 @@
+"""
+Retraining pipeline: generate -> train -> calibrate -> evaluate -> publish.
+
+Runs in its own process, started by the job runner (app/services/job_service.py) for
+a queued retraining job; progress, per-stage timings and the outcome go to the job's
+event log. It can also be run by hand from the backend/ folder:
+
+    python -m app.models.retrain --job <id>             # a queued job
+    python -m app.models.retrain [--samples-per-crop 800] [--n-estimators 400] [--no-calibrate] ...
+
+- generate: a fresh synthetic dataset (dataset_generation.generate, which already labels
+  the 3 classes, so convert_dataset_to_3class.py is not needed)
+- train: the shared model (train_model.shared_model), grown in steps of trees to report
+  progress (warm_start with a fixed random_state gives the same forest as one fit),
+  and optionally the per-crop specialists
+- calibrate: the Platt lookup table from out-of-fold probabilities (app.models.calibration)
+- evaluate: hold-out accuracy, weighted F1, confusion matrix and ECE, next to the
+  accuracy of the model being served on the same rows
+- publish: a new registry version made current (app.models.registry) when the hold-out
+  accuracy reaches min_accuracy; serving processes pick it up without a restart
+
+Everything is written to a work directory first; only publish touches the registry.
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import warnings
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import joblib
+
+from app.core.config import ENCODER_PATH, JOBS_DB_PATH, MODEL_PATH, RETRAIN_N_JOBS
+from app.core.crop_catalog import READING_COLUMNS
+from app.models import dataset_generation, registry
+from app.models.registry import artifact_version
+from app.models.calibration import fit_calibrator, out_of_fold_probabilities, reliability
+from app.models.train_model import encode_and_split, predict_with_specialists, shared_model, train_specialists
+from app.services.drift_service import save_reference
+
+STAGES = ("generate", "train", "calibrate", "evaluate", "publish")
+DEFAULTS = {
+    "samples_per_crop": 800,
+    "seed": None,
+    "n_estimators": 400,
+    "specialists": False,
+    "calibrate": True,
+    "min_accuracy": 0.0,
+    "publish": True,
+}
+# trees added per training step (one progress event each)
+_TREE_STEPS = 8
+
+
+def _served_accuracy(Xte_raw, yte, registry_dir: Optional[Path]) -> Optional[float]:
+    """Hold-out accuracy of the base model being served, or None when it cannot score these crops."""
+    version = registry.current_version(registry_dir)
+    folder = registry.version_dir(version, registry_dir) if version else None
+    try:
+        model = joblib.load(folder / registry.ARTIFACTS["model"] if folder else MODEL_PATH)
+        encoder = joblib.load(folder / registry.ARTIFACTS["encoder"] if folder else ENCODER_PATH)
+        X = Xte_raw.copy()
+        X["crop_type"] = encoder.transform(X["crop_type"])
+        return round(float((model.predict(X) == yte.to_numpy()).mean()), 4)
+    except Exception:
+        return None
+
+
+def run_pipeline(
+    params: dict,
+    workdir: Path,
+    progress: Callable[[str, dict], None],
+    registry_dir: Optional[Path] = None,
+    n_jobs: int = RETRAIN_N_JOBS,
+    job_id: Optional[str] = None,
+) -> dict:
+    """Run every stage; `progress(type, data)` receives stage and progress events. Returns the job result."""
+    from sklearn.metrics import confusion_matrix, f1_score
+
+    params = {**DEFAULTS, **params}
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    timings = {}
+
+    @contextmanager
+    def stage(name):
+        started, state = time.perf_counter(), "failed"
+        progress("stage", {"stage": name, "state": "started"})
+        try:
+            yield
+            state = "finished"
+        finally:
+            timings[name] = round(time.perf_counter() - started, 3)
+            progress("stage", {"stage": name, "state": state, "seconds": timings[name]})
+
+    with stage("generate"):
+        # recorded in the result, so the dataset can be generated again
+        params["seed"] = seed = params["seed"] if params["seed"] is not None else int(time.time())
+        random.seed(seed)
+        dataset = dataset_generation.generate(samples_per_crop=params["samples_per_crop"])
+        dataset.to_csv(workdir / "dataset.csv", index=False)
+        progress("progress", {"stage": "generate", "fraction": 1.0, "rows": len(dataset)})
+
+    with stage("train"):
+        encoder, Xtr, Xte, ytr, yte = encode_and_split(dataset)
+        total = params["n_estimators"]
+        model = shared_model(n_estimators=0, n_jobs=n_jobs)
+        model.set_params(warm_start=True)
+        with warnings.catch_warnings():
+            # balanced class weights are recomputed on the same rows at every step
+            warnings.filterwarnings("ignore", message="class_weight presets")
+            for step in range(1, _TREE_STEPS + 1):
+                model.set_params(n_estimators=max(1, round(total * step / _TREE_STEPS)))
+                model.fit(Xtr, ytr)
+                progress("progress", {"stage": "train", "fraction": round(step / _TREE_STEPS, 3), "trees": len(model.estimators_)})
+        model.set_params(warm_start=False)
+        joblib.dump(model, workdir / registry.ARTIFACTS["model"])
+        joblib.dump(encoder, workdir / registry.ARTIFACTS["encoder"])
+        # what /predict/drift compares production readings with
+        save_reference(dataset[READING_COLUMNS].to_numpy(float), workdir / registry.ARTIFACTS["reference"], f"retrain seed {seed}")
+        specialists = None
+        if params["specialists"]:
+            specialists = train_specialists(Xtr, ytr, n_jobs=n_jobs)
+            joblib.dump(specialists, workdir / registry.ARTIFACTS["specialists"])
+
+    calibrator = None
+    if params["calibrate"]:
+        with stage("calibrate"):
+            held_out = out_of_fold_probabilities(model, Xtr, ytr)
+            calibrator = fit_calibrator(held_out, ytr, model.classes_, "sigmoid", artifact_version(workdir / registry.ARTIFACTS["model"]))
+            calibrator.save(workdir / registry.ARTIFACTS["calibration"])
+
+    with stage("evaluate"):
+        probabilities = model.predict_proba(Xte)
+        if calibrator is not None:
+            probabilities = calibrator.transform(probabilities)
+        predicted = model.classes_[probabilities.argmax(axis=1)]
+        _, ece = reliability(probabilities, yte.to_numpy(), model.classes_)
+        Xte_raw = Xte.copy()
+        Xte_raw["crop_type"] = encoder.inverse_transform(Xte["crop_type"])
+        evaluation = {
+            "rows": int(len(yte)),
+            "accuracy": round(float((predicted == yte.to_numpy()).mean()), 4),
+            "weighted_f1": round(float(f1_score(yte, predicted, average="weighted")), 4),
+            "ece": round(ece, 4),
+            "confusion_matrix": confusion_matrix(yte, predicted, labels=model.classes_).tolist(),
+            "served_accuracy": _served_accuracy(Xte_raw, yte, registry_dir),
+        }
+        if specialists is not None:
+            evaluation["specialists_accuracy"] = round(float((predict_with_specialists(specialists, Xte) == yte).mean()), 4)
+        progress("evaluation", evaluation)
+
+    result = {"evaluation": evaluation, "stage_seconds": timings, "params": params, "published": None}
+    if not params["publish"]:
+        return result
+    if evaluation["accuracy"] < params["min_accuracy"]:
+        result["published"] = {"version": None, "reason": f"hold-out accuracy {evaluation['accuracy']} is below min_accuracy {params['min_accuracy']}"}
+        return result
+
+    with stage("publish"):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        version = f"{stamp}-{artifact_version(workdir / registry.ARTIFACTS['model'])[:8]}"
+        metrics = {
+            "version": version,
+            "job_id": job_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "dataset_rows": int(len(dataset)),
+            "evaluation": evaluation,
+            "stage_seconds": timings,
+            "params": params,
+        }
+        registry.publish(workdir, version, metrics, registry_dir)
+    result["stage_seconds"] = timings
+    result["published"] = {"version": version}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain, evaluate and publish the crop suitability model")
+    parser.add_argument("--job", help="run this queued job (parameters and progress in the job store)")
+    parser.add_argument("--db", default=str(JOBS_DB_PATH), help="job store of --job")
+    parser.add_argument("--registry", default=None, help="model registry (default MODEL_REGISTRY_DIR)")
+    parser.add_argument("--samples-per-crop", type=int, default=DEFAULTS["samples_per_crop"])
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--n-estimators", type=int, default=DEFAULTS["n_estimators"])
+    parser.add_argument("--specialists", action="store_true")
+    parser.add_argument("--no-calibrate", action="store_true")
+    parser.add_argument("--min-accuracy", type=float, default=DEFAULTS["min_accuracy"])
+    parser.add_argument("--no-publish", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.job is None:
+        params = {
+            "samples_per_crop": args.samples_per_crop,
+            "seed": args.seed,
+            "n_estimators": args.n_estimators,
+            "specialists": args.specialists,
+            "calibrate": not args.no_calibrate,
+            "min_accuracy": args.min_accuracy,
+            "publish": not args.no_publish,
+        }
+        with tempfile.TemporaryDirectory() as workdir:
+            result = run_pipeline(params, Path(workdir), lambda type, data: print(type, json.dumps(data)), args.registry)
+        print(json.dumps(result, indent=2))
+        return
+
+    from app.services.job_service import JobStore
+
+    store = JobStore(Path(args.db))
+    job = store.get(args.job)
+    if job is None:
+        sys.exit(f"Unknown job {args.job}")
+    workdir = store.workdir(args.job)
+    try:
+        result = run_pipeline(job["params"], workdir, lambda type, data: store.add_event(args.job, type, data), args.registry, job_id=args.job)
+    except BaseException as e:
+        store.add_event(args.job, "error", {"error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc(limit=5)})
+        store.finish(args.job, "failed", error=f"{type(e).__name__}: {e}")
+        raise
+    else:
+        store.finish(args.job, "succeeded", result=result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
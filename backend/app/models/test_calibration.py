@@ -0,0 +1,44 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.isotonic import IsotonicRegression
+
+from app.models.calibration import CalibratedForest, ProbabilityCalibrator, fit_calibrator, reliability
+
+
+def _probabilities(rng, n=400):
+    y = rng.integers(0, 3, n)
+    # overconfident scores for the true class
+    logits = rng.normal(size=(n, 3)) + 2.5 * np.eye(3)[y]
+    p = np.exp(logits)
+    return p / p.sum(axis=1, keepdims=True), y
+
+
+def test_tables_match_sklearn_and_round_trip():
+    rng = np.random.default_rng(0)
+    p, y = _probabilities(rng)
+    calibrator = fit_calibrator(p, y, [0, 1, 2], "isotonic")
+    expected = np.column_stack([
+        IsotonicRegression(y_min=0, y_max=1, out_of_bounds="clip").fit(p[:, k], y == k).predict(p[:, k]) for k in range(3)
+    ])
+    expected /= expected.sum(axis=1, keepdims=True)
+    assert np.allclose(calibrator.transform(p), expected)
+
+    for method in ("isotonic", "sigmoid"):
+        calibrator = fit_calibrator(p, y, [0, 1, 2], method, "abc")
+        restored = ProbabilityCalibrator.from_dict(calibrator.to_dict())
+        calibrated = restored.transform(p)
+        assert restored.base_model_version == "abc" and np.allclose(calibrated, calibrator.transform(p))
+        assert np.allclose(calibrated.sum(axis=1), 1.0)
+        # fitted in-sample, the tables cannot make the top-label calibration worse
+        assert reliability(calibrated, y, [0, 1, 2])[1] <= reliability(p, y, [0, 1, 2])[1]
+
+
+def test_calibrated_forest_is_one_base_pass():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(300, 4))
+    y = (X[:, 0] + 0.5 * rng.normal(size=300) > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    calibrator = fit_calibrator(forest.predict_proba(X), y, forest.classes_)
+    model = CalibratedForest(forest, calibrator)
+    assert np.array_equal(model.predict_proba(X), calibrator.transform(forest.predict_proba(X)))
+    assert np.array_equal(model.predict(X), model.predict_proba(X).argmax(axis=1))
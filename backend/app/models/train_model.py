@@ -1,3 +1,4 @@
+import argparse
 from pathlib import Path
 import pandas as pd
 import joblib
@@ -7,42 +8,101 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, f1_score, classification_report, confusion_matrix
 
 BASE = Path(__file__).parent
-df = pd.read_csv(BASE / "aeroponic_crop_suitability_dataset.csv")
-
-le = LabelEncoder()
-df["crop_type"] = le.fit_transform(df["crop_type"])
-
-X = df[
-    ["crop_type","temperature","humidity","sunlight_hours",
-     "water_ph","air_quality_index","wind_speed"]
-]
-# use new 3-class label
-y = df["suitability_class"]
-
-# stratified split
-Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
-
-model = RandomForestClassifier(
-    n_estimators=400,
-    max_depth=14,
-    min_samples_leaf=3,
-    class_weight="balanced",
-    n_jobs=-1,
-    random_state=42,
-)
-
-model.fit(Xtr, ytr)
-pred = model.predict(Xte)
-
-acc = accuracy_score(yte, pred)
-f1_w = f1_score(yte, pred, average="weighted")
-
-print(f"Accuracy: {acc:.4f}")
-print(f"Weighted F1: {f1_w:.4f}")
-print("Classification report:")
-print(classification_report(yte, pred, zero_division=0))
-print("Confusion matrix:")
-print(confusion_matrix(yte, pred))
-
-joblib.dump(model, BASE / "placement_model.pkl")
-joblib.dump(le, BASE / "crop_encoder.pkl")
+FEATURES = ["crop_type", "temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"]
+# Specialists see only the readings; the crop is implied by which model is used
+READING_FEATURES = FEATURES[1:]
+
+
+def load_dataset(path=BASE / "aeroponic_crop_suitability_dataset.csv"):
+    return pd.read_csv(path)
+
+
+def encode_and_split(df):
+    """Encode crop names and make the stratified train/test split shared by every model."""
+    df = df.copy()
+    le = LabelEncoder()
+    df["crop_type"] = le.fit_transform(df["crop_type"])
+    X = df[FEATURES]
+    # use new 3-class label
+    y = df["suitability_class"]
+    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+    return le, Xtr, Xte, ytr, yte
+
+
+def shared_model(n_estimators=400, n_jobs=-1):
+    """The unfitted shared model (also grown in steps by the retraining pipeline, app.models.retrain)."""
+    return RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=14,
+        min_samples_leaf=3,
+        class_weight="balanced",
+        n_jobs=n_jobs,
+        random_state=42,
+    )
+
+
+def train_shared_model(Xtr, ytr):
+    model = shared_model()
+    model.fit(Xtr, ytr)
+    return model
+
+
+def train_specialists(Xtr, ytr, n_jobs=-1):
+    """One small forest per crop, keyed by encoded crop code."""
+    specialists = {}
+    for code in sorted(Xtr["crop_type"].unique()):
+        rows = Xtr["crop_type"] == code
+        model = RandomForestClassifier(
+            n_estimators=60,
+            max_depth=10,
+            min_samples_leaf=3,
+            class_weight="balanced",
+            n_jobs=n_jobs,
+            random_state=42,
+        )
+        model.fit(Xtr.loc[rows, READING_FEATURES], ytr[rows])
+        specialists[int(code)] = model
+    return specialists
+
+
+def predict_with_specialists(specialists, X):
+    pred = pd.Series(0, index=X.index)
+    for code, model in specialists.items():
+        rows = X["crop_type"] == code
+        if rows.any():
+            pred[rows] = model.predict(X.loc[rows, READING_FEATURES])
+    return pred
+
+
+def report(name, yte, pred):
+    acc = accuracy_score(yte, pred)
+    f1_w = f1_score(yte, pred, average="weighted")
+
+    print(f"[{name}] Accuracy: {acc:.4f}")
+    print(f"[{name}] Weighted F1: {f1_w:.4f}")
+    print("Classification report:")
+    print(classification_report(yte, pred, zero_division=0))
+    print("Confusion matrix:")
+    print(confusion_matrix(yte, pred))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the crop suitability model")
+    parser.add_argument("--specialists", action="store_true", help="also train per-crop specialist models (crop_specialists.pkl)")
+    args = parser.parse_args(argv)
+
+    le, Xtr, Xte, ytr, yte = encode_and_split(load_dataset())
+
+    model = train_shared_model(Xtr, ytr)
+    report("shared", yte, model.predict(Xte))
+    joblib.dump(model, BASE / "placement_model.pkl")
+    joblib.dump(le, BASE / "crop_encoder.pkl")
+
+    if args.specialists:
+        specialists = train_specialists(Xtr, ytr)
+        report("specialists", yte, predict_with_specialists(specialists, Xte))
+        joblib.dump(specialists, BASE / "crop_specialists.pkl")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Metaheuristic tower placement for sites with obstacles and irregular edges.
+
+greedy_tower_placement lays a hex lattice over the whole rectangle. That is
+optimal for an empty rectangle but wastes space around keep-out areas and slanted
+edges. This engine seeds a layout by Poisson-disk sampling (Bridson) and refines
+it by simulated annealing:
+
+- insert: a random point (near an existing tower or anywhere on the site) is
+  added when it is clear; this is the only move that raises the objective.
+- remove: a random tower is dropped with probability exp(-1 / T).
+- jitter: a random tower moves by a Gaussian step. The move is kept by
+  Metropolis on a compaction term (x + y, in units of min_spacing). Pushing
+  towers toward one corner merges scattered gaps into holes that inserts can fill.
+
+The temperature cools geometrically over the wall-clock budget. Spacing checks
+use a grid of cells narrower than min_spacing / sqrt(2), so each cell holds at
+most one tower and a check looks at a 5 x 5 block.
+
+Restarts are independent. The first starts from the hex lattice (minus blocked
+points), so the result is never worse than the lattice; the rest start from
+Poisson-disk seeds. Each restart gets its own seed and runs as a job in the
+"anneal" process pool, and the layout with the most towers is kept.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import ANNEAL_RESTARTS, ANNEAL_TIME_BUDGET_SECONDS
+from app.services.executor import WorkloadRejected, run_workload
+
+# Positions are rounded to centimetres like the hex placer. Checks use a slightly
+# larger spacing/margin so the rounded layout still satisfies min_spacing.
+ROUNDING_ALLOWANCE = 0.015
+POISSON_CANDIDATES = 30
+POISSON_SEED_ATTEMPTS = 200
+P_INSERT = 0.3
+P_REMOVE = 0.05
+T_START = 1.0
+T_END = 0.02
+MAX_HISTORY = 50
+
+
+class Site:
+    """The farm rectangle minus keep-out obstacles, optionally clipped to a boundary polygon."""
+
+    def __init__(
+        self,
+        farm_length: float,
+        farm_width: float,
+        min_spacing: float,
+        obstacles: Sequence[dict] = (),
+        boundary: Optional[Sequence[Tuple[float, float]]] = None,
+    ):
+        if farm_length <= 0 or farm_width <= 0 or min_spacing <= 0:
+            raise ValueError("Farm dimensions and min_spacing must be positive")
+        self.farm_length = float(farm_length)
+        self.farm_width = float(farm_width)
+        self.min_spacing = float(min_spacing)
+        # towers keep half the spacing from edges and obstacles, as the hex placer does with the farm edge
+        self.margin = self.min_spacing / 2.0
+        self.rects: List[Tuple[float, float, float, float]] = []
+        self.circles: List[Tuple[float, float, float]] = []
+        for obstacle in obstacles:
+            shape = obstacle.get("shape")
+            if shape == "rect":
+                self.rects.append((obstacle["x_min"], obstacle["y_min"], obstacle["x_max"], obstacle["y_max"]))
+            elif shape == "circle":
+                self.circles.append((obstacle["x"], obstacle["y"], obstacle["radius"]))
+            else:
+                raise ValueError(f"Unknown obstacle shape {shape!r}")
+        self.boundary = [(float(x), float(y)) for x, y in boundary] if boundary else None
+        if self.boundary is not None and len(self.boundary) < 3:
+            raise ValueError("boundary needs at least 3 vertices")
+        self.edges = list(zip(self.boundary, self.boundary[1:] + self.boundary[:1])) if self.boundary else []
+
+    def sampling_box(self, margin: float) -> Tuple[float, float, float, float]:
+        x_lo, y_lo, x_hi, y_hi = margin, margin, self.farm_length - margin, self.farm_width - margin
+        if self.boundary:
+            xs, ys = zip(*self.boundary)
+            x_lo, x_hi = max(x_lo, min(xs) + margin), min(x_hi, max(xs) - margin)
+            y_lo, y_hi = max(y_lo, min(ys) + margin), min(y_hi, max(ys) - margin)
+        return x_lo, x_hi, y_lo, y_hi
+
+    def allows(self, x: float, y: float, margin: Optional[float] = None, edge_slack: float = 0.0) -> bool:
+        """Whether a tower centred at (x, y) keeps `margin` from the farm edge, the boundary and every obstacle."""
+        m = self.margin if margin is None else margin
+        if not (m - edge_slack <= x <= self.farm_length - m + edge_slack and m - edge_slack <= y <= self.farm_width - m + edge_slack):
+            return False
+        m2 = m * m
+        for x0, y0, x1, y1 in self.rects:
+            dx = max(x0 - x, 0.0, x - x1)
+            dy = max(y0 - y, 0.0, y - y1)
+            if dx * dx + dy * dy < m2:
+                return False
+        for cx, cy, r in self.circles:
+            if math.hypot(x - cx, y - cy) < r + m:
+                return False
+        if self.edges:
+            inside = False
+            for (ax, ay), (bx, by) in self.edges:
+                if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                    inside = not inside
+                if _segment_distance_sq(x, y, ax, ay, bx, by) < m2:
+                    return False
+            if not inside:
+                return False
+        return True
+
+
+def _segment_distance_sq(px, py, ax, ay, bx, by) -> float:
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    ex, ey = px - (ax + t * dx), py - (ay + t * dy)
+    return ex * ex + ey * ey
+
+
+class _SpatialGrid:
+    """
+    Tower positions bucketed into cells small enough that each holds at most one
+    tower (any two towers are at least min_spacing apart). `spacing` is the
+    distance clear() enforces; it may exceed min_spacing by up to 40%.
+    """
+
+    def __init__(self, farm_length: float, farm_width: float, min_spacing: float, spacing: Optional[float] = None):
+        self.spacing = spacing or min_spacing
+        self.cell = min_spacing / math.sqrt(2) * 0.999
+        self.nx = int(farm_length / self.cell) + 1
+        self.ny = int(farm_width / self.cell) + 1
+        self.cells = [[-1] * self.nx for _ in range(self.ny)]
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.live: List[int] = []  # slots in use, for O(1) random choice
+        self.where: List[int] = []  # slot -> index in live (-1 when free)
+        self.free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.live)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return min(max(int(x / self.cell), 0), self.nx - 1), min(max(int(y / self.cell), 0), self.ny - 1)
+
+    def clear(self, x: float, y: float, ignore: int = -1) -> bool:
+        """No other tower closer than the spacing."""
+        ci, cj = self._cell(x, y)
+        xs, ys, spacing = self.xs, self.ys, self.spacing
+        for j in range(max(cj - 2, 0), min(cj + 3, self.ny)):
+            row = self.cells[j]
+            for i in range(max(ci - 2, 0), min(ci + 3, self.nx)):
+                k = row[i]
+                if k >= 0 and k != ignore:
+                    # hypot rounds exactly like the hex placer's math.dist
+                    if math.hypot(xs[k] - x, ys[k] - y) < spacing:
+                        return False
+        return True
+
+    def add(self, x: float, y: float) -> int:
+        if self.free:
+            k = self.free.pop()
+            self.xs[k], self.ys[k] = x, y
+            self.where[k] = len(self.live)
+        else:
+            k = len(self.xs)
+            self.xs.append(x)
+            self.ys.append(y)
+            self.where.append(len(self.live))
+        self.live.append(k)
+        i, j = self._cell(x, y)
+        self.cells[j][i] = k
+        return k
+
+    def remove(self, k: int) -> None:
+        i, j = self._cell(self.xs[k], self.ys[k])
+        self.cells[j][i] = -1
+        idx, last = self.where[k], self.live[-1]
+        self.live[idx] = last
+        self.where[last] = idx
+        self.live.pop()
+        self.where[k] = -1
+        self.free.append(k)
+
+    def move(self, k: int, x: float, y: float) -> None:
+        i, j = self._cell(self.xs[k], self.ys[k])
+        self.cells[j][i] = -1
+        self.xs[k], self.ys[k] = x, y
+        i, j = self._cell(x, y)
+        self.cells[j][i] = k
+
+    def positions(self) -> List[Tuple[float, float]]:
+        return [(self.xs[k], self.ys[k]) for k in self.live]
+
+
+def hex_lattice(farm_length: float, farm_width: float, min_spacing: float) -> List[Tuple[float, float]]:
+    """
+    Every point greedy_tower_placement would place without a tower cap, in the same
+    order. The spacing check uses the grid instead of scanning all placed towers.
+    """
+    grid = _SpatialGrid(farm_length, farm_width, min_spacing)
+    positions = []
+    vertical_spacing = min_spacing * math.sqrt(3) / 2
+    row = 0
+    y = min_spacing / 2.0
+    while y <= farm_width - min_spacing / 2.0:
+        x = min_spacing / 2.0 + ((min_spacing / 2.0) if row % 2 == 1 else 0.0)
+        while x <= farm_length - min_spacing / 2.0:
+            candidate = (round(x, 2), round(y, 2))
+            if grid.clear(*candidate):
+                grid.add(*candidate)
+                positions.append(candidate)
+            x += min_spacing
+        y += vertical_spacing
+        row += 1
+    return positions
+
+
+def lattice_positions(site: Site, max_towers: int) -> List[Tuple[float, float]]:
+    """The hex placer's lattice over the full rectangle, minus points that fall in keep-out areas."""
+    # rounding can nudge lattice points up to 5 mm past the edge margin
+    kept = [p for p in hex_lattice(site.farm_length, site.farm_width, site.min_spacing) if site.allows(p[0], p[1], edge_slack=0.006)]
+    return kept[:max_towers]
+
+
+def poisson_disk(site: Site, grid: _SpatialGrid, rng: random.Random, max_towers: int, margin: float) -> None:
+    """Bridson sampling into `grid`; new fronts are started until POISSON_SEED_ATTEMPTS random points in a row fail."""
+    x_lo, x_hi, y_lo, y_hi = site.sampling_box(margin)
+    if x_lo > x_hi or y_lo > y_hi:
+        return
+    spacing = grid.spacing
+    misses = 0
+    while len(grid) < max_towers and misses < POISSON_SEED_ATTEMPTS:
+        x, y = rng.uniform(x_lo, x_hi), rng.uniform(y_lo, y_hi)
+        if not (site.allows(x, y, margin) and grid.clear(x, y)):
+            misses += 1
+            continue
+        misses = 0
+        active = [grid.add(x, y)]
+        while active and len(grid) < max_towers:
+            idx = rng.randrange(len(active))
+            px, py = grid.xs[active[idx]], grid.ys[active[idx]]
+            for _ in range(POISSON_CANDIDATES):
+                angle = rng.uniform(0.0, 2 * math.pi)
+                r = spacing * math.sqrt(rng.uniform(1.0, 4.0))
+                cx, cy = px + r * math.cos(angle), py + r * math.sin(angle)
+                if site.allows(cx, cy, margin) and grid.clear(cx, cy):
+                    active.append(grid.add(cx, cy))
+                    break
+            else:
+                active[idx] = active[-1]
+                active.pop()
+
+
+def anneal_restart(
+    site_args: dict,
+    max_towers: int,
+    seed: int,
+    deadline: float,
+    from_lattice: bool = False,
+) -> dict:
+    """
+    One independent restart, run until `deadline` (epoch seconds) or until
+    max_towers are placed. Returns the best layout found and its convergence stats.
+    """
+    started = time.time()
+    site = Site(**site_args)
+    rng = random.Random(seed)
+    spacing = site.min_spacing + ROUNDING_ALLOWANCE
+    margin = site.margin + ROUNDING_ALLOWANCE / 2
+    grid = _SpatialGrid(site.farm_length, site.farm_width, site.min_spacing, spacing)
+    if from_lattice:
+        # already rounded and min_spacing apart; later moves and inserts keep the allowance
+        for x, y in lattice_positions(site, max_towers):
+            grid.add(x, y)
+    else:
+        poisson_disk(site, grid, rng, max_towers, margin)
+    initial = len(grid)
+    best = grid.positions()
+    history = [(0.0, initial)]
+    time_to_best = 0.0
+    accepted = {"insert": 0, "remove": 0, "jitter": 0}
+    x_lo, x_hi, y_lo, y_hi = site.sampling_box(margin)
+    iterations = 0
+    temperature = T_START
+    step = site.min_spacing / 2
+
+    while len(grid) < max_towers and x_lo <= x_hi and y_lo <= y_hi:
+        if iterations % 128 == 0:
+            now = time.time()
+            if now >= deadline:
+                break
+            progress = (now - started) / max(deadline - started, 1e-9)
+            temperature = T_START * (T_END / T_START) ** progress
+            step = site.min_spacing * max(0.5 * (1 - progress), 0.02)
+        iterations += 1
+        u = rng.random()
+        if u < P_INSERT or not grid.live:
+            if grid.live and rng.random() < 0.5:
+                k = grid.live[rng.randrange(len(grid.live))]
+                angle = rng.uniform(0.0, 2 * math.pi)
+                r = spacing * rng.uniform(1.0, 1.5)
+                x, y = grid.xs[k] + r * math.cos(angle), grid.ys[k] + r * math.sin(angle)
+            else:
+                x, y = rng.uniform(x_lo, x_hi), rng.uniform(y_lo, y_hi)
+            if site.allows(x, y, margin) and grid.clear(x, y):
+                grid.add(x, y)
+                accepted["insert"] += 1
+                if len(grid) > len(best):
+                    best = grid.positions()
+                    time_to_best = time.time() - started
+                    if len(history) < MAX_HISTORY:
+                        history.append((round(time_to_best, 3), len(best)))
+        elif u < P_INSERT + P_REMOVE:
+            if rng.random() < math.exp(-1.0 / temperature):
+                grid.remove(grid.live[rng.randrange(len(grid.live))])
+                accepted["remove"] += 1
+        else:
+            k = grid.live[rng.randrange(len(grid.live))]
+            x, y = grid.xs[k], grid.ys[k]
+            nx, ny = x + rng.gauss(0.0, step), y + rng.gauss(0.0, step)
+            if site.allows(nx, ny, margin) and grid.clear(nx, ny, ignore=k):
+                delta = ((nx - x) + (ny - y)) / site.min_spacing
+                if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                    grid.move(k, nx, ny)
+                    accepted["jitter"] += 1
+
+    return {
+        "positions": [(round(x, 2), round(y, 2)) for x, y in best],
+        "stats": {
+            "seed": seed,
+            "start": "lattice" if from_lattice else "poisson_disk",
+            "initial_towers": initial,
+            "best_towers": len(best),
+            "iterations": iterations,
+            "accepted": accepted,
+            "time_to_best_seconds": round(time_to_best, 3),
+            "elapsed_seconds": round(time.time() - started, 3),
+            "history": history,
+        },
+    }
+
+
+def _restart_plan(restarts: int, seed: Optional[int]) -> List[Tuple[int, bool]]:
+    seeds = np.random.SeedSequence(seed).spawn(max(1, restarts))
+    return [(int(s.generate_state(1)[0]), i == 0) for i, s in enumerate(seeds)]
+
+
+def _best_layout(site_args: dict, runs: List[dict], time_budget_s: float, elapsed: float) -> dict:
+    # most towers wins; ties go to the earlier restart
+    best_index = max(range(len(runs)), key=lambda i: (len(runs[i]["positions"]), -i))
+    site = Site(**site_args)
+    return {
+        "engine": "anneal",
+        "positions": runs[best_index]["positions"],
+        "stats": {
+            "restarts": len(runs),
+            "best_restart": best_index,
+            "lattice_towers": len(lattice_positions(site, 10 ** 9)),
+            "time_budget_seconds": time_budget_s,
+            "elapsed_seconds": round(elapsed, 3),
+            "runs": [run["stats"] for run in runs],
+        },
+    }
+
+
+def anneal_tower_placement(
+    farm_length: float,
+    farm_width: float,
+    min_spacing: float,
+    max_towers: int,
+    obstacles: Sequence[dict] = (),
+    boundary: Optional[Sequence[Tuple[float, float]]] = None,
+    restarts: int = ANNEAL_RESTARTS,
+    time_budget_s: float = ANNEAL_TIME_BUDGET_SECONDS,
+    seed: Optional[int] = None,
+) -> dict:
+    """In-process variant for scripts and benchmarks: restarts run one after another, each with an equal share of the budget."""
+    site_args = dict(farm_length=farm_length, farm_width=farm_width, min_spacing=min_spacing, obstacles=list(obstacles), boundary=boundary)
+    Site(**site_args)  # validate before starting
+    started = time.time()
+    plan = _restart_plan(restarts, seed)
+    share = time_budget_s / len(plan)
+    runs = [anneal_restart(site_args, max_towers, s, time.time() + share, from_lattice) for s, from_lattice in plan]
+    return _best_layout(site_args, runs, time_budget_s, time.time() - started)
+
+
+async def anneal_tower_placement_async(
+    farm_length: float,
+    farm_width: float,
+    min_spacing: float,
+    max_towers: int,
+    obstacles: Sequence[dict] = (),
+    boundary: Optional[Sequence[Tuple[float, float]]] = None,
+    restarts: int = ANNEAL_RESTARTS,
+    time_budget_s: float = ANNEAL_TIME_BUDGET_SECONDS,
+    seed: Optional[int] = None,
+) -> dict:
+    """
+    Restarts run concurrently as "anneal" workload jobs and share one wall-clock
+    deadline; a restart that only starts near the deadline still returns its seed
+    layout. Restarts that the queue rejects are skipped while at least one runs.
+    """
+    site_args = dict(farm_length=farm_length, farm_width=farm_width, min_spacing=min_spacing, obstacles=list(obstacles), boundary=boundary)
+    Site(**site_args)  # validate before starting
+    started = time.time()
+    deadline = started + time_budget_s
+    outcomes = await asyncio.gather(
+        *(run_workload("anneal", anneal_restart, site_args, max_towers, s, deadline, from_lattice) for s, from_lattice in _restart_plan(restarts, seed)),
+        return_exceptions=True,
+    )
+    runs = [o for o in outcomes if not isinstance(o, BaseException)]
+    failures = [o for o in outcomes if isinstance(o, BaseException)]
+    if failures and (not runs or not all(isinstance(o, WorkloadRejected) for o in failures)):
+        raise failures[0]
+    return _best_layout(site_args, runs, time_budget_s, time.time() - started)
@@ -0,0 +1,314 @@
+"""
+Crop-to-tower assignment: give each placed tower at most one crop so that total
+suitability is maximal, subject to per-crop min/max tower counts and adjacency
+rules between neighbouring towers.
+
+Without adjacency rules this is a transportation (min-cost flow) problem: towers
+supply one unit, crops demand between min and max units. Its constraint matrix is
+totally unimodular, so the simplex vertex HiGHS returns is already integral and
+optimal. Adjacency rules add pairwise constraints that break that property. The
+LP is then only a relaxation: its value is an upper bound, the fractional
+solution is rounded greedily and improved by single-tower moves, and the
+remaining optimality gap against the bound is reported.
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import coo_matrix
+
+from app.core.config import CROPS
+from app.core.telemetry import ASSIGNMENT_SECONDS
+from app.services.optimization_service import greedy_tower_placement
+
+INTEGRAL_TOLERANCE = 1e-6
+LOCAL_SEARCH_PASSES = 20
+
+_ASSIGNMENT_SECONDS = ASSIGNMENT_SECONDS.labels()
+
+
+class AssignmentInfeasible(ValueError):
+    """No assignment satisfies the crop limits and adjacency rules."""
+
+
+def suitability_from_cells(
+    towers: Sequence[Tuple[float, float]],
+    cell_suitability: Dict[str, List[list]],
+    cell_size_m: float,
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Per-tower suitability looked up from per-crop cell grids laid out like the
+    microclimate heatmap (rows along y, columns along x). Missing cells are NaN.
+    """
+    crops = list(cell_suitability)
+    xy = np.array(towers, dtype=float).reshape(-1, 2)
+    matrix = np.full((len(xy), len(crops)), np.nan)
+    for j, crop in enumerate(crops):
+        grid = np.array([[np.nan if v is None else v for v in row] for row in cell_suitability[crop]], dtype=float)
+        if grid.ndim != 2 or grid.size == 0:
+            raise ValueError(f"Cell grid for {crop!r} must be a non-empty 2-D list")
+        rows = np.clip((xy[:, 1] // cell_size_m).astype(int), 0, grid.shape[0] - 1)
+        cols = np.clip((xy[:, 0] // cell_size_m).astype(int), 0, grid.shape[1] - 1)
+        matrix[:, j] = grid[rows, cols]
+    return crops, matrix
+
+
+def adjacent_pairs(towers: np.ndarray, adjacency_m: Optional[float] = None) -> Tuple[np.ndarray, float]:
+    """
+    Index pairs (i < k) of towers closer than adjacency_m. The default is just over
+    the median nearest-neighbour distance (the spacing of a hex layout).
+    """
+    n = len(towers)
+    if n < 2:
+        return np.empty((0, 2), dtype=int), adjacency_m or 0.0
+    d = np.hypot(towers[:, :1] - towers[:, 0], towers[:, 1:] - towers[:, 1])
+    if adjacency_m is None:
+        np.fill_diagonal(d, np.inf)
+        adjacency_m = float(np.median(d.min(axis=1))) * 1.01
+    i, k = np.nonzero(np.triu(d <= adjacency_m, k=1))
+    return np.column_stack([i, k]), adjacency_m
+
+
+def _conflicting_crops(crops: List[str], no_adjacent_same: Sequence[str], incompatible_pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+    """(crops x crops) symmetric matrix: True where two neighbours may not grow this pair."""
+    index = {c: j for j, c in enumerate(crops)}
+    conflict = np.zeros((len(crops), len(crops)), dtype=bool)
+    for crop in no_adjacent_same:
+        if crop not in index:
+            raise ValueError(f"Unknown crop {crop!r} in no_adjacent_same")
+        conflict[index[crop], index[crop]] = True
+    for a, b in incompatible_pairs:
+        if a not in index or b not in index:
+            raise ValueError(f"Unknown crop in incompatible pair {(a, b)!r}")
+        conflict[index[a], index[b]] = conflict[index[b], index[a]] = True
+    return conflict
+
+
+def _limits(crops: List[str], limits: Optional[Dict[str, dict]], n_towers: int) -> Tuple[np.ndarray, np.ndarray]:
+    lower = np.zeros(len(crops), dtype=int)
+    upper = np.full(len(crops), n_towers, dtype=int)
+    for crop, bounds in (limits or {}).items():
+        if crop not in crops:
+            raise ValueError(f"Unknown crop {crop!r} in crop limits")
+        j = crops.index(crop)
+        lower[j] = bounds.get("min") or 0
+        upper[j] = min(n_towers, bounds["max"]) if bounds.get("max") is not None else n_towers
+        if lower[j] > upper[j]:
+            raise ValueError(f"Crop {crop!r}: min {lower[j]} is above max {upper[j]}")
+    if lower.sum() > n_towers:
+        raise AssignmentInfeasible(f"Crop minimums need {lower.sum()} towers but only {n_towers} are placed")
+    return lower, upper
+
+
+def _solve_relaxation(score, allowed, lower, upper, pairs, conflict):
+    """The LP over allowed (tower, crop) pairs. Returns (x matrix, bound) or raises AssignmentInfeasible."""
+    n, c = score.shape
+    tower_of, crop_of = np.nonzero(allowed)
+    v = len(tower_of)
+    var = np.full((n, c), -1)
+    var[tower_of, crop_of] = np.arange(v)
+    if v == 0:
+        # no towers, or every pair forbidden: nothing to solve
+        if lower.any():
+            raise AssignmentInfeasible("No assignment satisfies the crop limits and adjacency rules")
+        return np.zeros((n, c)), 0.0
+
+    rows, cols, vals, rhs = [], [], [], []
+    r = 0
+    # each tower grows at most one crop
+    rows.append(tower_of)
+    cols.append(np.arange(v))
+    vals.append(np.ones(v))
+    rhs.append(np.ones(n))
+    r += n
+    # crop counts: sum <= max and -sum <= -min
+    rows.append(r + crop_of)
+    cols.append(np.arange(v))
+    vals.append(np.ones(v))
+    rhs.append(upper.astype(float))
+    r += c
+    rows.append(r + crop_of)
+    cols.append(np.arange(v))
+    vals.append(-np.ones(v))
+    rhs.append(-lower.astype(float))
+    r += c
+    # adjacency: x[i, a] + x[k, b] <= 1 for every neighbour pair and conflicting crop pair
+    a_idx, b_idx = np.nonzero(conflict)
+    if len(pairs) and len(a_idx):
+        left = var[pairs[:, 0][:, None], a_idx[None, :]].ravel()
+        right = var[pairs[:, 1][:, None], b_idx[None, :]].ravel()
+        keep = (left >= 0) & (right >= 0)
+        left, right = left[keep], right[keep]
+        m = len(left)
+        rows += [r + np.arange(m), r + np.arange(m)]
+        cols += [left, right]
+        vals += [np.ones(m), np.ones(m)]
+        rhs.append(np.ones(m))
+        r += m
+
+    a_ub = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(r, v)).tocsr()
+    result = linprog(-score[tower_of, crop_of], A_ub=a_ub, b_ub=np.concatenate(rhs), bounds=(0, 1), method="highs-ds")
+    if result.status == 2:
+        raise AssignmentInfeasible("No assignment satisfies the crop limits and adjacency rules")
+    if result.status != 0:
+        raise RuntimeError(f"Assignment solver failed: {result.message}")
+    x = np.zeros((n, c))
+    x[tower_of, crop_of] = result.x
+    return x, -result.fun
+
+
+def _is_feasible_move(i, j, assignment, counts, lower, upper, allowed, neighbours, conflict):
+    if not allowed[i, j] or counts[j] >= upper[j]:
+        return False
+    current = assignment[i]
+    if current >= 0 and counts[current] <= lower[current]:
+        return False
+    return not any(assignment[k] >= 0 and conflict[j, assignment[k]] for k in neighbours[i])
+
+
+def _round_and_improve(x, score, allowed, lower, upper, neighbours, conflict):
+    """Greedy rounding of the fractional LP solution followed by single-tower improving moves."""
+    n, c = score.shape
+    assignment = np.full(n, -1)
+    counts = np.zeros(c, dtype=int)
+    free_lower = np.zeros(c, dtype=int)
+
+    def place(i, j):
+        if assignment[i] >= 0:
+            counts[assignment[i]] -= 1
+        assignment[i] = j
+        counts[j] += 1
+
+    # most confident towers first; each takes its best LP crop that is still feasible
+    preference = np.lexsort((-score, -x))
+    for i in np.argsort(-x.max(axis=1), kind="stable"):
+        for j in preference[i]:
+            if x[i, j] <= INTEGRAL_TOLERANCE and score[i, j] <= 0:
+                break
+            if _is_feasible_move(i, j, assignment, counts, free_lower, upper, allowed, neighbours, conflict):
+                place(i, j)
+                break
+
+    # top up crops still below their minimum with the cheapest feasible towers
+    for j in np.flatnonzero(counts < lower):
+        loss = np.where(assignment >= 0, score[np.arange(n), np.maximum(assignment, 0)], 0.0) - score[:, j]
+        for i in np.argsort(loss, kind="stable"):
+            if counts[j] >= lower[j]:
+                break
+            if assignment[i] != j and _is_feasible_move(i, j, assignment, counts, lower, upper, allowed, neighbours, conflict):
+                place(i, j)
+
+    for _ in range(LOCAL_SEARCH_PASSES):
+        improved = False
+        for i in range(n):
+            current = score[i, assignment[i]] if assignment[i] >= 0 else 0.0
+            for j in np.argsort(-score[i]):
+                if score[i, j] <= current + 1e-9:
+                    break
+                if _is_feasible_move(i, j, assignment, counts, lower, upper, allowed, neighbours, conflict):
+                    place(i, j)
+                    improved = True
+                    break
+        if not improved:
+            break
+    return assignment
+
+
+def assign_crops(
+    towers: Sequence[Tuple[float, float]],
+    suitability,
+    crops: Sequence[str],
+    limits: Optional[Dict[str, dict]] = None,
+    no_adjacent_same: Sequence[str] = (),
+    incompatible_pairs: Sequence[Tuple[str, str]] = (),
+    adjacency_m: Optional[float] = None,
+) -> dict:
+    """
+    Assign at most one crop per tower maximizing total suitability.
+
+    `suitability` is (towers x crops); NaN/None marks a pair that is not allowed.
+    `limits` maps crop -> {"min": int, "max": int}. `no_adjacent_same` lists crops
+    that two neighbouring towers may not both grow; `incompatible_pairs` lists crop
+    pairs that may not grow side by side. Towers are neighbours when closer than
+    `adjacency_m` (see adjacent_pairs for the default).
+    """
+    start = time.perf_counter()
+    crops = list(crops)
+    if not crops:
+        raise ValueError("At least one crop is required")
+    xy = np.array(towers, dtype=float).reshape(-1, 2)
+    score = np.array(suitability, dtype=float).reshape(len(xy), len(crops))
+    allowed = np.isfinite(score)
+    score = np.where(allowed, score, 0.0)
+    lower, upper = _limits(crops, limits, len(xy))
+    conflict = _conflicting_crops(crops, no_adjacent_same, incompatible_pairs)
+    pairs, adjacency_m = adjacent_pairs(xy, adjacency_m) if conflict.any() else (np.empty((0, 2), dtype=int), adjacency_m)
+
+    x, bound = _solve_relaxation(score, allowed, lower, upper, pairs, conflict)
+    integral = bool(np.all((x < INTEGRAL_TOLERANCE) | (x > 1 - INTEGRAL_TOLERANCE)))
+    if integral:
+        assignment = np.where(x.max(axis=1) > 0.5, x.argmax(axis=1), -1)
+    else:
+        neighbours = [[] for _ in range(len(xy))]
+        for i, k in pairs.tolist():
+            neighbours[i].append(k)
+            neighbours[k].append(i)
+        assignment = _round_and_improve(x, score, allowed, lower, upper, neighbours, conflict)
+        short = [crop for j, crop in enumerate(crops) if (assignment == j).sum() < lower[j]]
+        if short:
+            raise AssignmentInfeasible(f"Could not find an assignment meeting the minimum tower count for {', '.join(short)}")
+
+    assigned = assignment >= 0
+    total = float(score[np.flatnonzero(assigned), assignment[assigned]].sum())
+    gap = 0.0 if integral else max(0.0, bound - total) / max(abs(bound), 1e-9)
+    elapsed = time.perf_counter() - start
+    _ASSIGNMENT_SECONDS.observe(elapsed)
+    return {
+        "status": "optimal" if integral else "heuristic",
+        "assignments": [
+            {"tower": i, "x": x_, "y": y_, "crop": crops[a] if a >= 0 else None, "suitability": float(score[i, a]) if a >= 0 else None}
+            for i, ((x_, y_), a) in enumerate(zip(xy.tolist(), assignment.tolist()))
+        ],
+        "crop_counts": {crop: int((assignment == j).sum()) for j, crop in enumerate(crops)},
+        "unassigned_towers": int((~assigned).sum()),
+        "total_suitability": round(total, 4),
+        "upper_bound": round(float(bound), 4),
+        "optimality_gap": round(gap, 6),
+        "adjacency_m": adjacency_m if len(pairs) else None,
+        "adjacent_pairs": int(len(pairs)),
+        "elapsed_seconds": round(elapsed, 4),
+    }
+
+
+def plan_assignment(
+    towers: Optional[Sequence[Tuple[float, float]]] = None,
+    layout: Optional[dict] = None,
+    suitability: Optional[Sequence[Sequence[Optional[float]]]] = None,
+    crops: Optional[Sequence[str]] = None,
+    cell_suitability: Optional[Dict[str, List[list]]] = None,
+    cell_size_m: Optional[float] = None,
+    **rules,
+) -> dict:
+    """
+    Entry point for POST /placement/assign: towers come from `towers` or are placed
+    from `layout` (greedy_tower_placement arguments); suitability is a per-tower
+    matrix (columns = `crops`, default the catalog) or per-crop cell grids.
+    """
+    if (towers is None) == (layout is None):
+        raise ValueError("Provide exactly one of towers or layout")
+    if (suitability is None) == (cell_suitability is None):
+        raise ValueError("Provide exactly one of suitability or cell_suitability")
+    if towers is None:
+        towers = greedy_tower_placement(**layout)
+    if cell_suitability is not None:
+        if not cell_size_m:
+            raise ValueError("cell_size_m is required with cell_suitability")
+        crops, matrix = suitability_from_cells(towers, cell_suitability, cell_size_m)
+    else:
+        crops = list(crops or CROPS)
+        matrix = np.array([[np.nan if v is None else v for v in row] for row in suitability], dtype=float)
+        # with no towers the matrix is empty ([] has shape (0,)) and the assignment is too
+        if matrix.shape != (len(towers), len(crops)) and len(towers):
+            raise ValueError(f"suitability must be {len(towers)} towers x {len(crops)} crops, got {matrix.shape}")
+    return assign_crops(towers, matrix.reshape(len(towers), len(crops)), crops, **rules)
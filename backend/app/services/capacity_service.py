@@ -0,0 +1,255 @@
+"""
+Tower capacity of the hex placer for many farm sizes and spacings at once.
+
+greedy_tower_placement walks a hex lattice row by row, rounds every point to the
+centimetre and keeps it when no kept tower is closer than min_spacing. The rounding
+regularly pulls a point just under min_spacing from a neighbour (for some spacings,
+every diagonal pair of two rows), so the number placed is often well below the
+lattice size and has no closed form. It is counted here with array operations instead
+of placing towers one by one:
+
+- the lattice coordinates are accumulated and rounded exactly as the placer does it
+  (np.add.accumulate adds in the same order as its `x += min_spacing` loop);
+- min_spacing >= 0.5 m and rounding moves a point by at most 5 mm, so a point can only
+  be too close to its left neighbour and to the nearest points of the previous row;
+- one row of every config is resolved per step: points too close to a kept point of the
+  previous row are dropped, and in each run of remaining points that are too close to
+  their left neighbour every second one is kept, as the greedy walk keeps them.
+
+The counts equal len(greedy_tower_placement(...)) without a tower cap (see
+test_capacity_service.py); distances within 1e-9 of min_spacing are rechecked with
+math.hypot itself.
+"""
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.config import CAPACITY_MAX_BINDING_CONFIGS, CAPACITY_SPACING_RANGE, CAPACITY_SPACING_STEP
+
+# lattice points (configs x rows x points per row, padded) counted together: at most
+# _CHUNK_CELLS, and padding is kept to a third of a chunk unless it is small anyway
+_CHUNK_CELLS = 1 << 22
+_SMALL_CHUNK_CELLS = 1 << 14
+_SQRT3 = math.sqrt(3)
+# binding spacing search: configs per block, and the candidate spacings per config tested in
+# the first round (doubling each round up to the maximum)
+_BINDING_BLOCK = 1024
+_BINDING_WINDOW = 8
+_BINDING_MAX_WINDOW = 64
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    round(v, 2) elementwise for v >= 0: the nearest cent, ties to even. Half cents are
+    common here (half of a spacing given in cm), so the tie test is exact: 200 * v is
+    split into two exactly computed parts (Dekker) and compared with the midpoint 2k + 1.
+    """
+    k = np.floor(values * 100.0)
+    split = values * 134217729.0  # 2**27 + 1
+    high = split - (split - values)
+    low = values - high
+    above = (200.0 * high - (2.0 * k + 1.0)) + 200.0 * low
+    return (k + ((above > 0) | ((above == 0) & (k % 2 == 1)))) / 100.0
+
+
+def _accumulate(start: np.ndarray, step: np.ndarray, limit: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """start, start + step, ... while <= limit, per config: rounded values and the valid mask."""
+    n = max(int(np.max((limit - start) / step, initial=0.0)) + 2, 1)
+    steps = np.empty((len(start), n))
+    steps[:, 0] = start
+    steps[:, 1:] = step[:, None]
+    values = np.add.accumulate(steps, axis=1)
+    valid = values <= limit[:, None]
+    return _round2(np.where(valid, values, 0.0)), valid
+
+
+def _closer(dx: np.ndarray, dy: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    """math.hypot(dx, dy) < spacing elementwise (NaN pairs are never closer)."""
+    d2, s2 = dx * dx + dy * dy, spacing * spacing
+    gap = d2 - s2
+    closer = gap < 0
+    ambiguous = np.abs(gap) <= 1e-9 * s2
+    if ambiguous.any():
+        dy, spacing = np.broadcast_to(dy, dx.shape), np.broadcast_to(spacing, dx.shape)
+        for index in zip(*np.nonzero(ambiguous)):
+            closer[index] = math.hypot(dx[index], dy[index]) < spacing[index]
+    return closer
+
+
+def _shift(values: np.ndarray, offset: int, fill) -> np.ndarray:
+    """values[:, j + offset] at column j, `fill` outside the row."""
+    if offset == 0:
+        return values
+    shifted = np.full_like(values, fill)
+    if offset > 0:
+        shifted[:, :-offset] = values[:, offset:]
+    else:
+        shifted[:, -offset:] = values[:, :offset]
+    return shifted
+
+
+def _count_chunk(length: np.ndarray, width: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    half = spacing / 2.0
+    ys, rows = _accumulate(half, spacing * _SQRT3 / 2, width - half)
+    # even rows start at half a spacing, odd rows a further half spacing in
+    even, even_ok = _accumulate(half + 0.0, spacing, length - half)
+    odd, odd_ok = _accumulate(half + half, spacing, length - half)
+    width_ = max(even.shape[1], odd.shape[1])
+    xs = [np.pad(a, ((0, 0), (0, width_ - a.shape[1])), constant_values=np.nan) for a in (even, odd)]
+    oks = [np.pad(a, ((0, 0), (0, width_ - a.shape[1]))) for a in (even_ok, odd_ok)]
+
+    s = spacing[:, None]
+    columns = np.arange(width_)
+    counts = np.zeros(len(spacing), dtype=np.int64)
+    prev_x = prev_kept = None
+    for r in range(ys.shape[1]):
+        if not rows[:, r].any():
+            break
+        x = xs[r % 2]
+        free = oks[r % 2] & rows[:, r, None]
+        if r:
+            dy = (ys[:, r] - ys[:, r - 1])[:, None]
+            # the nearest points of the previous row: left and right of a point in an even row
+            # (odd rows start half a spacing further in), left and right in the other case
+            for offset in ((-1, 0) if r % 2 == 0 else (0, 1)):
+                kept = _shift(prev_kept, offset, False)
+                free &= ~(kept & _closer(x - _shift(prev_x, offset, np.nan), dy, s))
+        # too close to the left neighbour (same row: the distance is |dx| exactly)
+        linked = np.zeros_like(free)
+        linked[:, 1:] = (x[:, 1:] - x[:, :-1]) < s
+        starts = free & ~(linked & _shift(free, -1, False))
+        run_start = np.maximum.accumulate(np.where(starts, columns, 0), axis=1)
+        kept = free & ((columns - run_start) % 2 == 0)
+        counts += kept.sum(axis=1)
+        prev_x, prev_kept = x, kept
+    return counts
+
+
+def lattice_counts(farm_length, farm_width, min_spacing) -> np.ndarray:
+    """
+    Towers greedy_tower_placement places without a tower cap, for broadcast arrays of
+    farm lengths, widths and spacings (min_spacing >= 0.5 m, as the API requires).
+    """
+    length, width, spacing = (np.asarray(a, dtype=float) for a in np.broadcast_arrays(farm_length, farm_width, min_spacing))
+    shape = length.shape
+    length, width, spacing = length.ravel(), width.ravel(), spacing.ravel()
+    counts = np.zeros(length.size, dtype=np.int64)
+    usable = (length > 0) & (width > 0) & (spacing > 0)
+    if np.any(usable & (spacing < 0.5)):
+        raise ValueError("min_spacing must be at least 0.5 m")
+    # similar lattices together, so little of a chunk is padding: row lengths within 20% of
+    # each other, then by the number of rows
+    columns = np.where(usable, length / np.where(usable, spacing, 1.0), 0.0) + 2
+    rows = np.where(usable, width / np.where(usable, spacing, 1.0), 0.0) * (2 / _SQRT3) + 2
+    order = np.flatnonzero(usable)[np.lexsort((rows[usable], np.floor(np.log(columns[usable]) / np.log(1.2))))]
+    start = 0
+    while start < len(order):
+        stop, cells = start + 1, columns[order[start]] * rows[order[start]]
+        while stop < len(order):
+            cells += columns[order[stop]] * rows[order[stop]]
+            padded = (stop - start + 1) * columns[order[start:stop + 1]].max() * rows[order[start:stop + 1]].max()
+            if padded > _CHUNK_CELLS or padded > 1.5 * cells + _SMALL_CHUNK_CELLS:
+                break
+            stop += 1
+        chunk = order[start:stop]
+        counts[chunk] = _count_chunk(length[chunk], width[chunk], spacing[chunk])
+        start = stop
+    return counts.reshape(shape)
+
+
+def spacing_grid() -> np.ndarray:
+    """Spacings searched for the binding spacing, largest first."""
+    lo, hi = CAPACITY_SPACING_RANGE
+    steps = int(round((hi - lo) / CAPACITY_SPACING_STEP))
+    return np.round(hi - np.arange(steps + 1) * CAPACITY_SPACING_STEP, 6)
+
+
+def _lattice_bound(length: np.ndarray, width: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    """Lattice points before rounding drops any (an upper bound on the count), broadcast."""
+    half = spacing / 2.0
+
+    def points(limit, start, step):
+        # a little slack: the placer accumulates, so its last point may land a hair inside
+        return np.maximum(np.floor((limit - start) / step + 1e-6) + 1, 0)
+
+    rows = points(width, half, spacing * _SQRT3 / 2)
+    return np.ceil(rows / 2) * points(length, spacing, spacing) + np.floor(rows / 2) * points(length, 1.5 * spacing, spacing)
+
+
+def binding_spacings(farm_length, farm_width, max_towers) -> np.ndarray:
+    """
+    The largest spacing on spacing_grid() at which the placer reaches max_towers, i.e. where
+    max_towers starts to bind as the spacing shrinks, per config (NaN when it never does in
+    the range). Coordinate rounding makes the count uneven in the spacing, so a smaller
+    spacing may still fall short and the grid is searched in order: all configs advance
+    together through their next few candidates, so every round is one lattice_counts call.
+    """
+    length, width, cap = (np.atleast_1d(np.asarray(a, dtype=float)) for a in np.broadcast_arrays(farm_length, farm_width, max_towers))
+    grid = spacing_grid()
+    result = np.full(len(length), np.nan)
+    for block in range(0, len(length), _BINDING_BLOCK):
+        keys = slice(block, block + _BINDING_BLOCK)
+        # spacings whose unrounded lattice cannot reach max_towers are ruled out cheaply
+        candidates = _lattice_bound(length[keys, None], width[keys, None], grid) >= cap[keys, None]
+        rank = np.cumsum(candidates, axis=1, dtype=np.int32)
+        open_ = np.arange(len(candidates))[rank[:, -1] > 0]
+        searched, window = 0, _BINDING_WINDOW
+        while len(open_):
+            take = candidates[open_] & (rank[open_] > searched) & (rank[open_] <= searched + window)
+            key, column = np.nonzero(take)  # per key, largest spacing first
+            key = open_[key]
+            counts = lattice_counts(length[keys][key], width[keys][key], grid[column])
+            reached = counts >= cap[keys][key]
+            found, first = np.unique(key[reached], return_index=True)
+            result[block + found] = grid[column[reached][first]]
+            searched += window
+            window = min(2 * window, _BINDING_MAX_WINDOW)
+            open_ = open_[~np.isin(open_, found) & (rank[open_, -1] > searched)]
+    return result
+
+
+def binding_spacing(farm_length: float, farm_width: float, max_towers: int) -> Optional[float]:
+    """binding_spacings for one config; None when max_towers never binds in the range."""
+    spacing = binding_spacings(farm_length, farm_width, max_towers)[0]
+    return None if np.isnan(spacing) else float(spacing)
+
+
+def capacity(farm_length, farm_width, min_spacing, max_towers, binding: bool = False) -> dict:
+    """
+    Columnar capacity table for broadcast lists of farm sizes, spacings and tower caps:
+    the placer's tower count (`total_towers`, what POST /placement/ returns), the count
+    without the cap, density, whether max_towers binds and, with `binding`, the binding
+    spacing (at most CAPACITY_MAX_BINDING_CONFIGS distinct farm sizes and caps).
+    """
+    try:
+        length, width, spacing, cap = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(a, dtype=float)) for a in (farm_length, farm_width, min_spacing, max_towers))
+        )
+    except ValueError:
+        raise ValueError("farm_length, farm_width, min_spacing and max_towers must be numbers or lists of one common length")
+    cap = cap.astype(np.int64)
+    lattice = lattice_counts(length, width, spacing)
+    total = np.minimum(lattice, cap)
+    area = length * width
+    ideal = area * 2.0 / (_SQRT3 * spacing ** 2)
+    if binding:
+        keys, inverse = np.unique(np.column_stack([length, width, cap]), axis=0, return_inverse=True)
+        if len(keys) > CAPACITY_MAX_BINDING_CONFIGS:
+            raise ValueError(f"binding_spacing is limited to {CAPACITY_MAX_BINDING_CONFIGS} distinct farm sizes and caps per request")
+        spacings = binding_spacings(keys[:, 0], keys[:, 1], keys[:, 2])[inverse.ravel()]
+    result = {
+        "configs": len(length),
+        "farm_length": length.tolist(),
+        "farm_width": width.tolist(),
+        "min_spacing": spacing.tolist(),
+        "max_towers": cap.tolist(),
+        "lattice_towers": lattice.tolist(),
+        "total_towers": total.tolist(),
+        "max_towers_binding": (lattice >= cap).tolist(),
+        "towers_per_100m2": np.round(100.0 * total / area, 3).tolist(),
+        "packing_ratio": np.round(total / ideal, 4).tolist(),
+    }
+    if binding:
+        result["binding_spacing"] = [None if np.isnan(b) else b for b in spacings.tolist()]
+    return result
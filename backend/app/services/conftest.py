@@ -0,0 +1,14 @@
+import pytest
+
+from app.services import executor, placement_service, static_service, tile_service
+
+
+@pytest.fixture
+def outputs(tmp_path, monkeypatch):
+    """Renders into tmp_path; on threads, since a patch does not reach spawned pool workers."""
+    monkeypatch.setattr(executor, "PROCESS_POOL_WORKERS", 0)
+    monkeypatch.setattr(placement_service, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(static_service, "STATIC_DIR", tmp_path)
+    monkeypatch.setattr(static_service, "STATIC_VARIANT_DIR", tmp_path / "variants")
+    monkeypatch.setattr(tile_service, "STATIC_TILE_DIR", tmp_path / "tiles")
+    return tmp_path
@@ -0,0 +1,125 @@
+"""
+Per-feature contributions for random-forest predictions (Saabas' tree-path method).
+
+In one tree, the prediction at a leaf equals the root value plus the change in node
+value at every split on the way down. Each change is credited to the feature split
+on, so the forest average becomes
+
+    probability = bias + sum(contribution per feature)
+
+with bias the mean root value. The path sums only depend on the tree, so they are
+computed once per leaf over the flattened forest (all trees concatenated). A
+prediction then needs the leaf of each tree, which `model.apply` returns in one
+pass. Averaging the leaf values gives exactly the probabilities predict_proba
+returns, so explained predictions need no second forest pass. Explaining a row
+costs one gather of n_trees x n_features values.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.telemetry import PREDICT_STAGE_SECONDS
+
+# Up to this many rows the per-tree values are gathered in one (rows, trees, ...) array;
+# larger batches accumulate tree by tree, which streams memory better
+_GATHER_ROWS = 256
+
+# id(model) -> (model, paths); the model is kept so its id cannot be reused by a reloaded one
+_PATHS: Dict[int, Tuple[object, "ForestPaths"]] = {}
+# the gather on top of the leaf pass, i.e. the cost of explaining
+_STAGE_CONTRIBUTIONS = PREDICT_STAGE_SECONDS.labels("contributions")
+
+
+class ForestPaths:
+    """Flattened nodes, leaf values and root-to-leaf contribution sums of a fitted forest classifier."""
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        counts = np.array([tree.node_count for tree in trees])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        self.n_trees = len(trees)
+
+        feature = np.concatenate([tree.feature for tree in trees])
+        threshold = np.concatenate([tree.threshold for tree in trees])
+        left = np.concatenate([np.where(tree.children_left >= 0, tree.children_left + o, -1) for tree, o in zip(trees, self.offsets)])
+        right = np.concatenate([np.where(tree.children_right >= 0, tree.children_right + o, -1) for tree, o in zip(trees, self.offsets)])
+        value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+        if not np.allclose(value.sum(axis=1), 1.0):
+            # scikit-learn < 1.4 stores class counts; newer versions store the fractions predict_proba returns
+            value = value / value.sum(axis=1, keepdims=True)
+
+        n_nodes, n_features = len(feature), model.n_features_in_
+        contributions = np.zeros((n_nodes, n_features, value.shape[1]))
+        # breadth-first over all trees at once: a child inherits its parent's sums plus its own step
+        frontier = self.offsets
+        while len(frontier):
+            split = frontier[left[frontier] >= 0]
+            children = np.concatenate([left[split], right[split]])
+            parents = np.concatenate([split, split])
+            contributions[children] = contributions[parents]
+            contributions[children, feature[parents], :] += value[children] - value[parents]
+            frontier = children
+
+        # the flattened trees (global node ids), also used to evaluate the forest over grids (sweep_service)
+        self.feature, self.threshold, self.left, self.right, self.value = feature, threshold, left, right, value
+
+        leaves = np.flatnonzero(left < 0)
+        self.leaf_row = np.full(n_nodes, -1)
+        self.leaf_row[leaves] = np.arange(len(leaves))
+        self.n_classes = value.shape[1]
+        self.leaf_value = value[leaves]
+        # row leaf * n_classes + class holds that leaf's per-feature sums for the class
+        self.leaf_contributions = np.ascontiguousarray(contributions[leaves].transpose(0, 2, 1)).reshape(-1, n_features)
+        self.bias = value[self.offsets].mean(axis=0)
+
+
+def supports(model) -> bool:
+    estimators = getattr(model, "estimators_", None)
+    return bool(estimators) and hasattr(model, "apply") and hasattr(model, "classes_") and all(hasattr(e, "tree_") for e in estimators)
+
+
+def forest_paths(model) -> ForestPaths:
+    # models are loaded once per process (and per reloaded version), so the table is built once per worker
+    entry = _PATHS.get(id(model))
+    if entry is None or entry[0] is not model:
+        if len(_PATHS) >= 8:
+            # older versions after hot reloads
+            _PATHS.clear()
+        entry = _PATHS[id(model)] = (model, ForestPaths(model))
+    return entry[1]
+
+
+def _sum_over_trees(table: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """table[index].sum(axis=1) for an (m, trees) index, added in tree order either way."""
+    if len(index) <= _GATHER_ROWS:
+        return table[index].sum(axis=1)
+    total = np.zeros((len(index),) + table.shape[1:])
+    for column in np.ascontiguousarray(index.T):
+        total += table[column]
+    return total
+
+
+def predict_with_contributions(model, X) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (probabilities (m, classes), bias (m,), contributions (m, features)) from one forest
+    pass. Bias and contributions are for each row's predicted class, the argmax of
+    its probabilities, so bias + contributions.sum(1) equals that class's probability.
+    """
+    paths = forest_paths(model)
+    applied = np.asarray(model.apply(X))
+    t0 = time.perf_counter()
+    leaves = paths.leaf_row[applied + paths.offsets]
+    # summed in tree order, as predict_proba does, so the probabilities match it exactly
+    probabilities = _sum_over_trees(paths.leaf_value, leaves) / paths.n_trees
+    predicted = probabilities.argmax(axis=1)
+    contributions = _sum_over_trees(paths.leaf_contributions, leaves * paths.n_classes + predicted[:, None]) / paths.n_trees
+    _STAGE_CONTRIBUTIONS.observe(time.perf_counter() - t0)
+    return probabilities, paths.bias[predicted], contributions
+
+
+def explainer_for(model, fallback=None) -> Optional[object]:
+    """The forest whose paths explain `model`: itself, or `fallback` for wrappers such as calibrated models."""
+    if supports(model):
+        return model
+    return fallback if fallback is not None and supports(fallback) else None
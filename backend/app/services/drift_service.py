@@ -0,0 +1,249 @@
+"""
+Input drift: how far recent /predict readings have moved from the data the model
+was trained on.
+
+Each feature is counted into fixed bins: DRIFT_BINS equal bins over its
+DRIFT_FEATURE_RANGES range, plus one bin for values below it and one above. The
+training side is a reference file holding those bin counts: retraining jobs write
+one into every registry version; for the artifacts in app/models it is built from
+their training CSV (DRIFT_TRAINING_DATASET) the first time it is needed. The serving side keeps the same
+histograms for a sliding window of recent readings. The window is a ring of
+_SUBWINDOWS sub-histograms: the oldest is cleared when the newest fills up, so the
+window always covers the last 3/4 to all of DRIFT_WINDOW_READINGS readings.
+
+Memory is fixed (features x bins x sub-windows counters) whatever the traffic.
+Recording a reading is a handful of float operations and list increments in the
+request handler (~1-2 us). Statistics are computed only when /predict/drift is read:
+
+- PSI, the population stability index, sum((live - ref) * ln(live / ref)) over bin
+  shares, with shares floored at _PSI_FLOOR;
+- KS, the largest gap between the two cumulative distributions at the bin edges,
+  a lower bound on the Kolmogorov-Smirnov distance of the raw values.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.core.config import (
+    DRIFT_BINS,
+    DRIFT_ENABLED,
+    DRIFT_FEATURE_RANGES,
+    DRIFT_MIN_READINGS,
+    DRIFT_PSI_THRESHOLDS,
+    DRIFT_REFERENCE_PATH,
+    DRIFT_TRAINING_DATASET,
+    DRIFT_WINDOW_READINGS,
+)
+from app.core.crop_catalog import READING_COLUMNS
+from app.models import registry
+
+REFERENCE_SCHEMA_VERSION = 1
+_SUBWINDOWS = 4
+_PSI_FLOOR = 1e-4
+# readings per call from which observe_readings histograms with numpy instead of a loop
+_BATCH_ROWS = 64
+
+
+def feature_edges() -> dict:
+    """Per reading column: (low, high, bins) of the histogram, in READING_COLUMNS order."""
+    return {column: (*map(float, DRIFT_FEATURE_RANGES[column]), DRIFT_BINS) for column in READING_COLUMNS}
+
+
+def histogram(values, low: float, high: float, bins: int) -> np.ndarray:
+    """Counts in bins + 2 bins: below low, `bins` equal bins over [low, high), at or above high."""
+    values = np.asarray(values, dtype=float)
+    # the same arithmetic as DriftMonitor.observe, so both put a value in the same bin
+    index = np.clip(np.floor((values - low) * (bins / (high - low)) + 1.0), 0, bins + 1).astype(np.int64)
+    return np.bincount(index, minlength=bins + 2)
+
+
+def build_reference(readings, source: str = "") -> dict:
+    """Reference histograms of training readings ((n, 6) array-like in READING_COLUMNS order)."""
+    readings = np.asarray(readings, dtype=float).reshape(-1, len(READING_COLUMNS))
+    features = {}
+    for j, (column, (low, high, bins)) in enumerate(feature_edges().items()):
+        features[column] = {"range": [low, high], "bins": bins, "counts": histogram(readings[:, j], low, high, bins).tolist()}
+    return {
+        "schema_version": REFERENCE_SCHEMA_VERSION,
+        "source": source,
+        "rows": len(readings),
+        "created_at": time.time(),
+        "features": features,
+    }
+
+
+def save_reference(readings, path: Path, source: str = "") -> dict:
+    reference = build_reference(readings, source)
+    Path(path).write_text(json.dumps(reference))
+    return reference
+
+
+def load_reference(path: Path) -> Optional[dict]:
+    try:
+        reference = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    if reference.get("schema_version") != REFERENCE_SCHEMA_VERSION or set(reference.get("features", ())) != set(READING_COLUMNS):
+        return None
+    return reference
+
+
+def _dataset_reference() -> Optional[dict]:
+    """Reference of the training CSV behind the app/models artifacts, saved to DRIFT_REFERENCE_PATH."""
+    import pandas as pd
+
+    try:
+        readings = pd.read_csv(DRIFT_TRAINING_DATASET, usecols=READING_COLUMNS)[READING_COLUMNS].to_numpy(float)
+        return save_reference(readings, DRIFT_REFERENCE_PATH, DRIFT_TRAINING_DATASET.name)
+    except (OSError, ValueError) as e:
+        print(f"Warning: no drift reference ({e})")
+        return None
+
+
+def drift_statistics(live: np.ndarray, reference: np.ndarray) -> dict:
+    """PSI and binned KS between two count vectors over the same bins."""
+    live_share = live / max(live.sum(), 1)
+    reference_share = reference / max(reference.sum(), 1)
+    p, q = np.maximum(live_share, _PSI_FLOOR), np.maximum(reference_share, _PSI_FLOOR)
+    return {
+        "psi": round(float(np.sum((p - q) * np.log(p / q))), 4),
+        "ks": round(float(np.max(np.abs(np.cumsum(live_share) - np.cumsum(reference_share)))), 4),
+    }
+
+
+def drift_status(psi: float, readings: int) -> str:
+    if readings < DRIFT_MIN_READINGS:
+        return "warming_up"
+    moderate, drift = DRIFT_PSI_THRESHOLDS
+    return "drift" if psi >= drift else "moderate" if psi >= moderate else "stable"
+
+
+class DriftMonitor:
+    """
+    Sliding-window histograms of the six readings. observe() runs on the event loop
+    for every reading; everything else only when drift is reported.
+    """
+
+    def __init__(self, window: int = DRIFT_WINDOW_READINGS, subwindows: int = _SUBWINDOWS):
+        edges = feature_edges()
+        self.edges = edges
+        # every feature has DRIFT_BINS + 2 counters; those of feature j start at j * stride
+        stride = DRIFT_BINS + 2
+        self._lows = tuple(low for low, _, _ in edges.values())
+        self._scales = tuple(bins / (high - low) for low, high, bins in edges.values())
+        self._offsets = tuple(j * stride for j in range(len(edges)))
+        self._size = len(edges) * stride
+        self.subwindow_readings = max(1, window // subwindows)
+        self._windows = [[0] * self._size for _ in range(subwindows)]
+        self._current = self._windows[0]
+        self._slot = 0
+        self._filled = 0
+        self.observed = 0
+        self.reference = None
+        self.reference_version = ()  # () = not loaded yet
+
+    def observe(self, values: Sequence[float]) -> None:
+        """Count one reading (READING_COLUMNS order)."""
+        current, lows, scales, offsets = self._current, self._lows, self._scales, self._offsets
+        last = DRIFT_BINS + 1
+        for j, value in enumerate(values):
+            # 1..DRIFT_BINS inside the range; int() truncates (-1, 0) to 0, the "below" bin
+            b = int((value - lows[j]) * scales[j] + 1.0)
+            current[offsets[j] + (b if 0 < b < last else 0 if b <= 0 else last)] += 1
+        self._advance()
+
+    def observe_batch(self, readings: np.ndarray) -> None:
+        """observe() for every row of an (n, 6) array, one histogram per sub-window it spans."""
+        start = 0
+        while start < len(readings):
+            rows = readings[start:start + self.subwindow_readings - self._filled]
+            counts = np.concatenate([histogram(rows[:, j], low, high, bins) for j, (low, high, bins) in enumerate(self.edges.values())])
+            self._current[:] = (np.asarray(self._current) + counts).tolist()
+            start += len(rows)
+            self._advance(len(rows))
+
+    def _advance(self, readings: int = 1) -> None:
+        self.observed += readings
+        self._filled += readings
+        if self._filled == self.subwindow_readings:
+            # the oldest sub-window makes room for the next one
+            self._slot = (self._slot + 1) % len(self._windows)
+            self._current = self._windows[self._slot] = [0] * self._size
+            self._filled = 0
+
+    def window_counts(self) -> np.ndarray:
+        """(features x bins + 2) counts over the sliding window."""
+        return np.sum(self._windows, axis=0).reshape(len(self.edges), -1)
+
+    def load_reference(self) -> Optional[dict]:
+        """The reference of the model being served: its registry version's, else DRIFT_REFERENCE_PATH."""
+        from app.models.crop_recommendation import get_registry_version
+
+        version = get_registry_version()
+        if version != self.reference_version:
+            if version:
+                reference = load_reference(registry.version_dir(version) / registry.ARTIFACTS["reference"])
+            else:
+                reference = load_reference(DRIFT_REFERENCE_PATH) or _dataset_reference()
+            self.reference, self.reference_version = reference, version
+        return self.reference
+
+    def report(self) -> dict:
+        reference = self.load_reference()
+        counts = self.window_counts()
+        readings = int(counts[0].sum())
+        features = {}
+        for j, (column, (low, high, bins)) in enumerate(self.edges.items()):
+            live = counts[j]
+            entry = {
+                "below_range": round(float(live[0]) / max(readings, 1), 4),
+                "above_range": round(float(live[-1]) / max(readings, 1), 4),
+            }
+            stored = reference["features"][column] if reference else None
+            if stored is None:
+                entry.update(psi=None, ks=None, status="no_reference")
+            elif (stored["range"], stored["bins"]) != ([low, high], bins):
+                entry.update(psi=None, ks=None, status="incompatible_reference")
+            else:
+                entry.update(drift_statistics(live, np.asarray(stored["counts"], dtype=float)))
+                entry["status"] = drift_status(entry["psi"], readings)
+            features[column] = entry
+        return {
+            "enabled": DRIFT_ENABLED,
+            "window_readings": readings,
+            "observed": self.observed,
+            "reference": None if reference is None else {
+                "model_version": self.reference_version,
+                "source": reference.get("source"),
+                "rows": reference.get("rows"),
+                "created_at": reference.get("created_at"),
+            },
+            "drifted": [column for column, entry in features.items() if entry["status"] == "drift"],
+            "features": features,
+        }
+
+
+_monitor = DriftMonitor()
+
+
+def get_monitor() -> DriftMonitor:
+    return _monitor
+
+
+def observe_readings(readings: Sequence[Sequence[float]]) -> None:
+    """Count /predict readings into the drift window (a no-op with DRIFT_ENABLED=0)."""
+    if not DRIFT_ENABLED:
+        return
+    if len(readings) < _BATCH_ROWS:
+        for values in readings:
+            _monitor.observe(values)
+    else:
+        _monitor.observe_batch(np.asarray(readings, dtype=float))
+
+
+def drift_report() -> dict:
+    return _monitor.report()
+
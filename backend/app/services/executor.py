@@ -0,0 +1,134 @@
+"""
+Process-pool offload for CPU-bound work with per-workload admission control.
+
+sklearn inference and matplotlib rendering hold the GIL for most of their run
+time, so running them on FastAPI's thread pool stalls every other request. Route
+handlers instead `await run_workload(...)`, which:
+
+- rejects immediately with WorkloadRejected (-> 429 + Retry-After) when the
+  workload class already has WORKLOAD_QUEUE_LIMITS[...] jobs queued or running,
+- otherwise runs the function in that class' own ProcessPoolExecutor (or on the
+  thread pool when PROCESS_POOL_WORKERS=0) and merges the worker's telemetry back.
+  Separate pools keep a burst of slow renders from delaying model scoring.
+
+Profiled requests (see profiling_service) run on the thread pool so the
+sampling profiler and tracemalloc observe the work in this process.
+
+Admission bookkeeping happens on the event loop thread, so plain counters suffice.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core import telemetry
+from app.core.config import PROCESS_POOL_WORKERS, RETRY_AFTER_SECONDS, WORKLOAD_QUEUE_LIMITS
+from app.core.telemetry import WORKLOAD, WORKLOAD_REJECTED
+from app.services.profiling_service import run_profiled
+
+logger = logging.getLogger("aeroponic.executor")
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+_in_flight: Dict[str, int] = {name: 0 for name in WORKLOAD_QUEUE_LIMITS}
+
+for _name, _limit in WORKLOAD_QUEUE_LIMITS.items():
+    WORKLOAD.labels(_name, "limit").set(_limit)
+    WORKLOAD.labels(_name, "in_flight").set(0)
+
+
+class WorkloadRejected(Exception):
+    """Raised when a workload cannot be admitted; mapped to 429/503 with Retry-After."""
+
+    def __init__(self, workload: str, status_code: int, detail: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(detail)
+        self.workload = workload
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def _init_worker():
+    # Import (and thereby load model artifacts) once per worker instead of on the first job
+    import app.services.ml_service  # noqa: F401
+    import app.services.placement_service  # noqa: F401
+
+
+def _call_in_worker(fn: Callable, args: tuple, kwargs: dict):
+    try:
+        return fn(*args, **kwargs), telemetry.drain()
+    except BaseException:
+        telemetry.drain()
+        raise
+
+
+def get_pool(workload: str) -> Optional[ProcessPoolExecutor]:
+    if PROCESS_POOL_WORKERS <= 0:
+        return None
+    pool = _pools.get(workload)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(workload)
+            if pool is None:
+                # spawn: forking a process that already runs event-loop and worker threads is unsafe
+                pool = ProcessPoolExecutor(
+                    max_workers=PROCESS_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+                _pools[workload] = pool
+                logger.info(f"Started {workload} process pool with {PROCESS_POOL_WORKERS} workers")
+    return pool
+
+
+async def start_pools() -> None:
+    """Spawn every workload's workers and wait until they are ready, so the first requests don't pay for model loading."""
+    warmups = []
+    for workload in WORKLOAD_QUEUE_LIMITS:
+        pool = get_pool(workload)
+        if pool is not None:
+            warmups.append(asyncio.wrap_future(pool.submit(int)))
+    await asyncio.gather(*warmups)
+
+
+def shutdown_pool(workload: Optional[str] = None, wait: bool = True) -> None:
+    """Shut down one workload's pool, or all of them."""
+    with _pool_lock:
+        names = [workload] if workload else list(_pools)
+        pools = [_pools.pop(name) for name in names if name in _pools]
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+async def run_workload(workload: str, fn: Callable, *args, profile=None, **kwargs):
+    """Run `fn(*args, **kwargs)` for the given workload class, subject to its queue limit."""
+    limit = WORKLOAD_QUEUE_LIMITS[workload]
+    if _in_flight[workload] >= limit:
+        WORKLOAD_REJECTED.labels(workload, "queue_full").inc()
+        raise WorkloadRejected(workload, 429, f"Server busy: too many pending {workload} requests")
+
+    _in_flight[workload] += 1
+    WORKLOAD.labels(workload, "in_flight").set(_in_flight[workload])
+    try:
+        if profile is not None:
+            return await run_in_threadpool(run_profiled, profile, fn, *args, **kwargs)
+        pool = get_pool(workload)
+        if pool is None:
+            return await run_in_threadpool(fn, *args, **kwargs)
+        try:
+            result, deltas = await asyncio.get_running_loop().run_in_executor(pool, _call_in_worker, fn, args, kwargs)
+        except BrokenProcessPool:
+            logger.error("Process pool broke (worker crashed or was killed); restarting it")
+            shutdown_pool(workload, wait=False)
+            WORKLOAD_REJECTED.labels(workload, "pool_failure").inc()
+            raise WorkloadRejected(workload, 503, "Worker pool restarting, please retry")
+        telemetry.merge(deltas)
+        return result
+    finally:
+        _in_flight[workload] -= 1
+        WORKLOAD.labels(workload, "in_flight").set(_in_flight[workload])
@@ -0,0 +1,303 @@
+"""
+Hour-by-hour crop suitability over a weather forecast.
+
+A provider returns a ForecastSeries for a location: hourly temperature, humidity and
+wind speed from `start`, plus the time the upstream issued the forecast. Providers
+are pluggable (PROVIDERS, FORECAST_PROVIDER): "openweather" reads the 3-hourly
+5-day forecast and interpolates it to hours; "stub" makes deterministic diurnal
+curves, for tests and offline runs.
+
+Series are cached per ~1 km tile (coords rounded to 2 decimals, as in
+weather_service) and issue time. A tile is only refetched once a newer issue is due
+(FORECAST_ISSUE_INTERVAL_SECONDS) and, while the upstream has not published it yet,
+at most once per FORECAST_RECHECK_SECONDS.
+
+The timeline holds the other readings fixed and scores every hour x crop in one
+score_readings call (the same validation, gating, rules and penalties as
+/predict/batch), then finds the windows of consecutive hours in which each crop
+stays suitable.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from app.core import serialization
+from app.core.config import (
+    FORECAST_CACHE_MAX_ENTRIES,
+    FORECAST_ISSUE_INTERVAL_SECONDS,
+    FORECAST_MAX_HOURS,
+    FORECAST_PROVIDER,
+    FORECAST_RECHECK_SECONDS,
+    RECOMMENDATION_CONFIDENCE_THRESHOLD,
+)
+from app.core.telemetry import CACHE_REQUESTS, FORECAST_FETCH_SECONDS
+from app.services import weather_service
+from app.services.ml_service import READING_COLUMNS, score_readings
+from app.services.sweep_service import STATUSES, status_codes
+
+HOUR = 3600
+# readings a forecast provides; the others are held fixed over the horizon
+FORECAST_COLUMNS = ("temperature", "humidity", "wind_speed")
+
+_CACHE_HIT = CACHE_REQUESTS.labels("forecast", "hit")
+_CACHE_MISS = CACHE_REQUESTS.labels("forecast", "miss")
+
+
+class ForecastSeries:
+    """Hourly forecast values from `start` (epoch seconds), issued at `issued_at`."""
+
+    def __init__(self, issued_at: int, start: int, values: Dict[str, np.ndarray], provider: str = ""):
+        self.issued_at = int(issued_at)
+        self.start = int(start)
+        self.values = {column: np.asarray(values[column], dtype=float) for column in FORECAST_COLUMNS}
+        self.provider = provider
+
+    def __len__(self) -> int:
+        return len(self.values["temperature"])
+
+    def window(self, now: float, hours: int) -> "ForecastSeries":
+        """Up to `hours` hours from the one containing `now` (past hours are dropped)."""
+        first = min(max(0, int((now - self.start) // HOUR)), len(self))
+        return ForecastSeries(
+            self.issued_at,
+            self.start + first * HOUR,
+            {column: v[first:first + hours] for column, v in self.values.items()},
+            self.provider,
+        )
+
+
+def issue_slot(now: float) -> int:
+    """The most recent scheduled issue time at `now`."""
+    return int(now // FORECAST_ISSUE_INTERVAL_SECONDS * FORECAST_ISSUE_INTERVAL_SECONDS)
+
+
+def tile_of(lat: float, lon: float) -> Tuple[float, float]:
+    return round(lat, 2), round(lon, 2)
+
+
+# ---------------------------------------------
+# PROVIDERS
+# ---------------------------------------------
+class ForecastProvider(ABC):
+    """An upstream of hourly forecasts; `fetch` returns a ForecastSeries for a location."""
+
+    name = "base"
+
+    @abstractmethod
+    def fetch(self, lat: float, lon: float, now: float) -> ForecastSeries:
+        ...
+
+
+class OpenWeatherForecast(ForecastProvider):
+    """
+    OpenWeather's 5-day forecast (3-hour steps), linearly interpolated to hours. The API
+    does not report when a forecast was issued, so the issue slot at fetch time is used.
+    """
+
+    name = "openweather"
+
+    def fetch(self, lat: float, lon: float, now: float) -> ForecastSeries:
+        url = (
+            f"{weather_service.BASE_URL}/forecast"
+            f"?lat={lat}&lon={lon}&appid={weather_service.API_KEY}&units=metric"
+        )
+        response = requests.get(url, timeout=5)
+        if response.status_code != 200:
+            raise ValueError("Forecast unavailable for this location")
+
+        steps = response.json()["list"]
+        times = np.array([step["dt"] for step in steps], dtype=float)
+        start = int(math.ceil(times[0] / HOUR) * HOUR)
+        hours = np.arange(start, times[-1] + 1, HOUR, dtype=float)
+        raw = {
+            "temperature": [step["main"]["temp"] for step in steps],
+            "humidity": [step["main"]["humidity"] for step in steps],
+            "wind_speed": [step["wind"]["speed"] for step in steps],
+        }
+        values = {column: np.round(np.interp(hours, times, raw[column]), 2) for column in FORECAST_COLUMNS}
+        return ForecastSeries(issue_slot(now), start, values, self.name)
+
+
+class StubForecast(ForecastProvider):
+    """
+    Deterministic forecasts for tests and offline runs: diurnal temperature and humidity
+    curves in local solar time, shifted by latitude and varied slightly per issue.
+    """
+
+    name = "stub"
+
+    def fetch(self, lat: float, lon: float, now: float) -> ForecastSeries:
+        issued_at = issue_slot(now)
+        hours = FORECAST_MAX_HOURS + FORECAST_ISSUE_INTERVAL_SECONDS // HOUR
+        times = issued_at + HOUR * np.arange(hours)
+        solar_hour = (times / HOUR + lon / 15.0) % 24
+        # warmest mid-afternoon, most humid before dawn
+        daily = np.sin(2 * np.pi * (solar_hour - 9) / 24)
+        rng = np.random.default_rng([int(abs(lat) * 100), int(abs(lon) * 100), issued_at])
+        drift = np.cumsum(rng.normal(0, 0.15, hours))
+        values = {
+            "temperature": np.round(31 - 0.25 * abs(lat) + 6 * daily + drift, 2),
+            "humidity": np.round(np.clip(68 - 18 * daily - 2 * drift, 20, 100), 1),
+            "wind_speed": np.round(np.clip(1.8 + 0.8 * daily + rng.normal(0, 0.2, hours), 0, 5), 2),
+        }
+        return ForecastSeries(issued_at, issued_at, values, self.name)
+
+
+PROVIDERS = {OpenWeatherForecast.name: OpenWeatherForecast, StubForecast.name: StubForecast}
+
+_provider: Optional[ForecastProvider] = None
+
+
+def get_provider() -> ForecastProvider:
+    global _provider
+    if _provider is None:
+        if FORECAST_PROVIDER not in PROVIDERS:
+            raise ValueError(f"Unknown forecast provider {FORECAST_PROVIDER!r}; expected one of {sorted(PROVIDERS)}")
+        _provider = PROVIDERS[FORECAST_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider: Optional[ForecastProvider]) -> None:
+    """Replace the upstream (None goes back to FORECAST_PROVIDER) and drop cached series."""
+    global _provider
+    _provider = provider
+    clear_cache()
+
+
+# ---------------------------------------------
+# CACHE
+# ---------------------------------------------
+# (tile, issued_at) -> series, least recently used first
+_series: "OrderedDict[Tuple[Tuple[float, float], int], ForecastSeries]" = OrderedDict()
+# tile -> (last upstream check, latest issued_at seen)
+_latest: Dict[Tuple[float, float], Tuple[float, int]] = {}
+_cache_lock = threading.Lock()
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _series.clear()
+        _latest.clear()
+
+
+def get_forecast(lat: float, lon: float, now: Optional[float] = None) -> ForecastSeries:
+    """The latest cached series for the tile of (lat, lon), fetched when a newer issue is due."""
+    now = time.time() if now is None else now
+    tile = tile_of(lat, lon)
+    with _cache_lock:
+        latest = _latest.get(tile)
+        if latest is not None:
+            checked_at, issued_at = latest
+            series = _series.get((tile, issued_at))
+            due = issue_slot(now) > issued_at and now - checked_at >= FORECAST_RECHECK_SECONDS
+            if series is not None and not due:
+                _series.move_to_end((tile, issued_at))
+                _CACHE_HIT.inc()
+                return series
+    _CACHE_MISS.inc()
+
+    provider = get_provider()
+    t0 = time.perf_counter()
+    series = provider.fetch(*tile, now)
+    FORECAST_FETCH_SECONDS.labels(provider.name).observe(time.perf_counter() - t0)
+    with _cache_lock:
+        # an unchanged issue keeps the series already cached
+        series = _series.setdefault((tile, series.issued_at), series)
+        _series.move_to_end((tile, series.issued_at))
+        _latest[tile] = (now, max(series.issued_at, _latest.get(tile, (0, 0))[1]))
+        while len(_series) > FORECAST_CACHE_MAX_ENTRIES:
+            _series.popitem(last=False)
+    return series
+
+
+# ---------------------------------------------
+# TIMELINE
+# ---------------------------------------------
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def suitable_windows(suitable: np.ndarray, min_hours: int = 1) -> List[Tuple[int, int, int]]:
+    """(row, start, end) of every run of True along the rows of a 2-D mask, end exclusive."""
+    edges = np.diff(np.pad(suitable.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    keep = ends - starts >= min_hours
+    return list(zip(rows[keep].tolist(), starts[keep].tolist(), ends[keep].tolist()))
+
+
+def forecast_timeline(
+    series: ForecastSeries,
+    fixed: dict,
+    mode: Optional[str] = None,
+    min_class: int = 2,
+    min_confidence: float = RECOMMENDATION_CONFIDENCE_THRESHOLD,
+    min_window_hours: int = 1,
+) -> dict:
+    """
+    Every hour of `series` x every crop, with `fixed` holding the readings the forecast
+    does not cover. An hour counts as suitable for a crop when the reading is scored, the
+    crop passes the agronomic checks, and it reaches `min_class` and `min_confidence`.
+    Per-crop arrays have the crop first; `windows` lists the runs of suitable hours
+    (end exclusive) of at least `min_window_hours` per crop.
+    """
+    readings = np.column_stack([
+        series.values[column] if column in FORECAST_COLUMNS else np.full(len(series), float(fixed[column]))
+        for column in READING_COLUMNS
+    ])
+    result = score_readings(readings, mode=mode)
+    status = status_codes(result)
+    confidence = np.ascontiguousarray(result["confidence"].T)
+    suitability = np.ascontiguousarray(result["suitability_class"].T, dtype=np.int8)
+    suitable = (
+        (status == STATUSES.index("scored"))[None, :]
+        & result["agronomic_ok"].T
+        & (suitability >= min_class)
+        & (np.nan_to_num(confidence) >= min_confidence)
+    )
+
+    crops = list(result["crops"])
+    windows: Dict[str, List[dict]] = {crop: [] for crop in crops}
+    for row, start, end in suitable_windows(suitable, min_window_hours):
+        window = confidence[row, start:end]
+        windows[crops[row]].append({
+            "start_hour": start,
+            "end_hour": end,
+            "hours": end - start,
+            "start": _iso(series.start + start * HOUR),
+            "end": _iso(series.start + end * HOUR),
+            "min_confidence": round(float(window.min()), 2),
+            "mean_confidence": round(float(window.mean()), 2),
+        })
+
+    return {
+        "provider": series.provider,
+        "issued_at": _iso(series.issued_at),
+        "start": _iso(series.start),
+        "step_seconds": HOUR,
+        "hours": len(series),
+        "forecast": series.values,
+        "fixed": {column: fixed[column] for column in READING_COLUMNS if column not in FORECAST_COLUMNS},
+        "crops": crops,
+        "status_labels": list(STATUSES),
+        "status": status,
+        # index into crops, -1 when nothing is recommended
+        "recommended": result["recommended"],
+        "suitability_class": suitability,
+        "confidence": confidence,
+        "suitable_hours": suitable.sum(axis=1),
+        "windows": windows,
+        "model_rows": result["model_rows"],
+    }
+
+
+def forecast_timeline_encoded(series: ForecastSeries, fixed: dict, mode: Optional[str] = None, fmt: str = "json", **thresholds) -> bytes:
+    """forecast_timeline() encoded in the worker."""
+    return serialization.encode(forecast_timeline(series, fixed, mode, **thresholds), fmt)
@@ -0,0 +1,490 @@
+"""
+Prediction history: an audit trail of POST /predict/ calls with hourly and daily rollups.
+
+Recording never touches the disk in the request path. record_prediction turns the
+inputs and result into a flat record and appends it to an in-memory buffer of at
+most HISTORY_BUFFER_MAX records; HISTORY_OVERFLOW decides what happens when the
+writer falls behind (drop the oldest record, drop the new one, or make the request
+wait briefly for room). The writer task, started by the app lifespan, drains the
+buffer in batches of up to HISTORY_BATCH_ROWS at least every HISTORY_FLUSH_SECONDS
+and writes each batch in one SQLite transaction on a worker thread.
+
+The same transaction updates the rollups: per (hour or day, location) the number of
+predictions, their outcomes and input sums, and per (hour or day, location, crop)
+the class counts, recommendations and confidence sums. A batch is aggregated in
+memory first, so a flush is one upsert per touched rollup row, and the /history
+analytics read rollup rows only; raw rows are read only to list the audit trail.
+Buckets are aligned to UTC.
+
+The buffer is owned by the event loop thread, so no locks are needed.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import (
+    HISTORY_BATCH_ROWS,
+    HISTORY_BLOCK_SECONDS,
+    HISTORY_BUFFER_MAX,
+    HISTORY_DB_PATH,
+    HISTORY_ENABLED,
+    HISTORY_FLUSH_SECONDS,
+    HISTORY_OVERFLOW,
+)
+from app.core.crop_catalog import READING_COLUMNS
+from app.core.telemetry import HISTORY_BUFFER, HISTORY_RECORDS, HISTORY_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+# outcome of a /predict/ call, as stored in `status`
+STATUSES = ("scored", "rule_rejected", "error")
+
+_QUEUED = HISTORY_RECORDS.labels("queued")
+_DROPPED = HISTORY_RECORDS.labels("dropped")
+_WRITTEN = HISTORY_RECORDS.labels("written")
+_FAILED = HISTORY_RECORDS.labels("failed")
+
+_INPUTS = ", ".join(READING_COLUMNS)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    location TEXT NOT NULL,
+    mode TEXT,
+    model_version TEXT,
+    status TEXT NOT NULL,
+    recommended TEXT,
+    {", ".join(f"{c} REAL NOT NULL" for c in READING_COLUMNS)},
+    scores TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS predictions_location_ts ON predictions (location, ts);
+CREATE TABLE IF NOT EXISTS rollup_locations (
+    granularity TEXT NOT NULL,
+    location TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    predictions INTEGER NOT NULL,
+    scored INTEGER NOT NULL,
+    rule_rejected INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    {", ".join(f"{c}_sum REAL NOT NULL" for c in READING_COLUMNS)},
+    PRIMARY KEY (granularity, location, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollup_locations_start ON rollup_locations (granularity, start);
+CREATE TABLE IF NOT EXISTS rollup_crops (
+    granularity TEXT NOT NULL,
+    location TEXT NOT NULL,
+    crop TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    predictions INTEGER NOT NULL,
+    suitable INTEGER NOT NULL,
+    marginal INTEGER NOT NULL,
+    unsuitable INTEGER NOT NULL,
+    recommended INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    confidence_count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, location, crop, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollup_crops_start ON rollup_crops (granularity, crop, start);
+"""
+_LOCATION_COUNTS = ("predictions", "scored", "rule_rejected", "errors") + tuple(f"{c}_sum" for c in READING_COLUMNS)
+_CROP_COUNTS = ("predictions", "suitable", "marginal", "unsuitable", "recommended", "confidence_sum", "confidence_count")
+
+
+def _upsert(table: str, keys: Sequence[str], counts: Sequence[str]) -> str:
+    columns = ", ".join((*keys, *counts))
+    placeholders = ", ".join("?" * (len(keys) + len(counts)))
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in counts)
+    return f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) ON CONFLICT DO UPDATE SET {updates}"
+
+
+_UPSERT_LOCATIONS = _upsert("rollup_locations", ("granularity", "location", "start"), _LOCATION_COUNTS)
+_UPSERT_CROPS = _upsert("rollup_crops", ("granularity", "location", "crop", "start"), _CROP_COUNTS)
+_INSERT_PREDICTION = (
+    f"INSERT INTO predictions (ts, location, mode, model_version, status, recommended, {_INPUTS}, scores, error) "
+    f"VALUES ({', '.join('?' * (8 + len(READING_COLUMNS)))})"
+)
+
+
+def prediction_record(
+    inputs: Sequence[float],
+    result: dict,
+    mode: Optional[str] = None,
+    location: str = "",
+    model_version: Optional[str] = None,
+    ts: Optional[float] = None,
+) -> dict:
+    """One history record from predict_crop_scores' inputs (READING_COLUMNS order) and result."""
+    if result.get("error"):
+        status = "error"
+    elif result.get("rule_rejection"):
+        status = "rule_rejected"
+    else:
+        status = "scored"
+    recommended = result.get("recommended_crops") or []
+    return {
+        "ts": time.time() if ts is None else ts,
+        "location": location,
+        "mode": mode,
+        "model_version": model_version,
+        "status": status,
+        "recommended": recommended[0] if recommended else None,
+        "inputs": tuple(float(v) for v in inputs),
+        # crop -> (suitability class, confidence or None when the model was skipped)
+        "scores": {s["crop"]: (s["suitability_class"], s["confidence"]) for s in result.get("all_scores") or []},
+        "error": result.get("error"),
+    }
+
+
+def rollup_deltas(records: Iterable[dict]) -> Tuple[Dict[tuple, list], Dict[tuple, list]]:
+    """Per-bucket increments for rollup_locations and rollup_crops from a batch of records."""
+    locations: Dict[tuple, list] = {}
+    crops: Dict[tuple, list] = {}
+    for record in records:
+        status, location = record["status"], record["location"]
+        for granularity, width in GRANULARITIES.items():
+            start = int(record["ts"] // width * width)
+            row = locations.setdefault((granularity, location, start), [0] * len(_LOCATION_COUNTS))
+            row[0] += 1
+            row[1 + STATUSES.index(status)] += 1
+            for k, value in enumerate(record["inputs"], start=4):
+                row[k] += value
+            for crop, (suitability, confidence) in record["scores"].items():
+                counts = crops.setdefault((granularity, location, crop, start), [0] * len(_CROP_COUNTS))
+                counts[0] += 1
+                counts[3 - suitability] += 1
+                counts[4] += crop == record["recommended"]
+                if confidence is not None:
+                    counts[5] += confidence
+                    counts[6] += 1
+    return locations, crops
+
+
+class HistoryStore:
+    """Raw prediction rows and their rollups in one SQLite file (WAL mode)."""
+
+    def __init__(self, path: Path = HISTORY_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one connection per batch or query: writes and reads run on pool threads
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def write(self, records: List[dict]) -> None:
+        """Insert a batch of records and fold it into the rollups, in one transaction."""
+        locations, crops = rollup_deltas(records)
+        rows = [
+            (
+                r["ts"], r["location"], r["mode"], r["model_version"], r["status"], r["recommended"],
+                *r["inputs"],
+                json.dumps(r["scores"], separators=(",", ":")) if r["scores"] else None,
+                r["error"],
+            )
+            for r in records
+        ]
+        with self._connect() as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_INSERT_PREDICTION, rows)
+                conn.executemany(_UPSERT_LOCATIONS, [(*key, *counts) for key, counts in locations.items()])
+                conn.executemany(_UPSERT_CROPS, [(*key, *counts) for key, counts in crops.items()])
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _range(start: Optional[float], end: Optional[float]) -> Tuple[str, list]:
+        clauses, args = [], []
+        if start is not None:
+            clauses.append("start >= ?")
+            args.append(start)
+        if end is not None:
+            clauses.append("start < ?")
+            args.append(end)
+        return "".join(f" AND {c}" for c in clauses), args
+
+    def crop_rollups(
+        self,
+        granularity: str,
+        location: Optional[str] = None,
+        crop: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """Per-bucket crop counts, for one location or summed over all of them."""
+        where, args = self._range(start, end)
+        if location is not None:
+            where += " AND location = ?"
+            args.append(location)
+        if crop is not None:
+            where += " AND crop = ?"
+            args.append(crop)
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in _CROP_COUNTS)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT start, crop, {sums} FROM rollup_crops WHERE granularity = ?{where} "
+                "GROUP BY start, crop ORDER BY start DESC, crop DESC LIMIT ?",
+                (granularity, *args, limit),
+            ).fetchall()
+        result = []
+        for row in reversed(rows):
+            row = dict(row)
+            n, confidence_count = row["predictions"], row.pop("confidence_count")
+            confidence_sum = row.pop("confidence_sum")
+            row["suitable_rate"] = round(row["suitable"] / n, 4)
+            row["recommended_rate"] = round(row["recommended"] / n, 4)
+            row["mean_confidence"] = round(confidence_sum / confidence_count, 2) if confidence_count else None
+            result.append(row)
+        return result
+
+    def location_rollups(
+        self,
+        granularity: str,
+        location: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """Per-bucket prediction counts and mean inputs for each location."""
+        where, args = self._range(start, end)
+        if location is not None:
+            where += " AND location = ?"
+            args.append(location)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM rollup_locations WHERE granularity = ?{where} ORDER BY start DESC, location DESC LIMIT ?",
+                (granularity, *args, limit),
+            ).fetchall()
+        result = []
+        for row in reversed(rows):
+            row = dict(row)
+            del row["granularity"]
+            n = row["predictions"]
+            row["mean_inputs"] = {c: round(row.pop(f"{c}_sum") / n, 3) for c in READING_COLUMNS}
+            result.append(row)
+        return result
+
+    def predictions(
+        self,
+        location: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[dict]:
+        """Raw records, newest first (the audit trail; served from the (location, ts) and ts indexes)."""
+        clauses, args = [], []
+        if location is not None:
+            clauses.append("location = ?")
+            args.append(location)
+        if start is not None:
+            clauses.append("ts >= ?")
+            args.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            args.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM predictions{where} ORDER BY ts DESC LIMIT ?", (*args, limit)).fetchall()
+        result = []
+        for row in rows:
+            row = dict(row)
+            row["inputs"] = {c: row.pop(c) for c in READING_COLUMNS}
+            row["scores"] = json.loads(row["scores"]) if row["scores"] else {}
+            result.append(row)
+        return result
+
+
+class HistoryWriter:
+    """Bounded in-memory buffer of records, drained into a HistoryStore in batches."""
+
+    def __init__(
+        self,
+        store: Optional[HistoryStore] = None,
+        max_records: int = HISTORY_BUFFER_MAX,
+        batch_rows: int = HISTORY_BATCH_ROWS,
+        flush_seconds: float = HISTORY_FLUSH_SECONDS,
+        overflow: str = HISTORY_OVERFLOW,
+        block_seconds: float = HISTORY_BLOCK_SECONDS,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r} (expected one of {', '.join(OVERFLOW_POLICIES)})")
+        self._store = store
+        self.max_records = max_records
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self._buffer: deque = deque()
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self.counts = {"queued": 0, "dropped": 0, "written": 0, "failed": 0, "batches": 0}
+        self.last_flush_seconds: Optional[float] = None
+
+    @property
+    def store(self) -> HistoryStore:
+        # created on first use, so importing the API does not create the database
+        if self._store is None:
+            self._store = HistoryStore(HISTORY_DB_PATH)
+        return self._store
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def _drop(self, n: int = 1) -> None:
+        self.counts["dropped"] += n
+        _DROPPED.inc(n)
+
+    async def record(self, record: dict) -> bool:
+        """Buffer a record without waiting for the disk; False when it was dropped."""
+        if len(self._buffer) >= self.max_records:
+            if self.overflow == "drop_newest":
+                self._drop()
+                return False
+            if self.overflow == "drop_oldest":
+                self._buffer.popleft()
+                self._drop()
+            else:
+                self._room.clear()
+                self._wake.set()
+                try:
+                    await asyncio.wait_for(self._room.wait(), self.block_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                if len(self._buffer) >= self.max_records:
+                    self._drop()
+                    return False
+        self._buffer.append(record)
+        self.counts["queued"] += 1
+        _QUEUED.inc()
+        if len(self._buffer) >= self.batch_rows:
+            self._wake.set()
+        return True
+
+    def _take(self) -> List[dict]:
+        n = min(len(self._buffer), self.batch_rows)
+        batch = [self._buffer.popleft() for _ in range(n)]
+        self._room.set()
+        return batch
+
+    def _written(self, batch: List[dict], seconds: float) -> None:
+        self.counts["written"] += len(batch)
+        self.counts["batches"] += 1
+        self.last_flush_seconds = seconds
+        _WRITTEN.inc(len(batch))
+        HISTORY_WRITE_SECONDS.observe(seconds)
+
+    def _failed(self, batch: List[dict]) -> None:
+        # a batch the database refused is dropped rather than retried forever
+        logger.exception("Writing %d history records failed", len(batch))
+        self.counts["failed"] += len(batch)
+        _FAILED.inc(len(batch))
+
+    async def flush(self) -> int:
+        """Write everything buffered so far, one transaction per batch; returns the records written."""
+        written = 0
+        while self._buffer:
+            batch = self._take()
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.store.write, batch)
+            except Exception:
+                self._failed(batch)
+                continue
+            self._written(batch, time.perf_counter() - started)
+            written += len(batch)
+        self._update_gauges()
+        return written
+
+    def flush_sync(self) -> None:
+        """Write what is left on the calling thread (shutdown, when the loop is going away)."""
+        while self._buffer:
+            batch = self._take()
+            started = time.perf_counter()
+            try:
+                self.store.write(batch)
+            except Exception:
+                self._failed(batch)
+                continue
+            self._written(batch, time.perf_counter() - started)
+
+    async def run(self) -> None:
+        """Flush whenever a batch is full, and at least every flush_seconds."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # a timer instead of wait_for, which can swallow the shutdown cancellation
+                # when it races with a full batch waking the writer
+                timer = loop.call_later(self.flush_seconds, self._wake.set)
+                try:
+                    await self._wake.wait()
+                finally:
+                    timer.cancel()
+                self._wake.clear()
+                await self.flush()
+        finally:
+            self.flush_sync()
+
+    def _update_gauges(self) -> None:
+        HISTORY_BUFFER.labels("buffered").set(len(self._buffer))
+        HISTORY_BUFFER.labels("capacity").set(self.max_records)
+
+    def stats(self) -> dict:
+        self._update_gauges()
+        return {
+            "buffered": len(self._buffer),
+            "capacity": self.max_records,
+            "overflow": self.overflow,
+            **self.counts,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+_writer = HistoryWriter()
+
+
+def get_writer() -> HistoryWriter:
+    return _writer
+
+
+async def record_prediction(
+    inputs: Sequence[float],
+    result: dict,
+    mode: Optional[str] = None,
+    location: str = "",
+    model_version: Optional[str] = None,
+) -> bool:
+    """
+    Called by POST /predict/ after scoring with the model version the worker reported;
+    only appends to the buffer.
+    """
+    if not HISTORY_ENABLED:
+        return False
+    return await _writer.record(prediction_record(inputs, result, mode, location, model_version))
+
+
+async def run_history_writer() -> None:
+    """Background task started by the app lifespan."""
+    await _writer.run()
@@ -0,0 +1,339 @@
+"""
+Background jobs (model retraining) queued in SQLite and run one at a time in subprocesses.
+
+The queue is a SQLite database (JOBS_DB_PATH, WAL mode): a `jobs` table with one
+row per job and a `job_events` table holding its append-only event log (status
+changes, stage start/finish with timings, progress). The job's process writes its
+own events and final status, so the log and the outcome do not depend on the API
+process; GET /jobs/{id}/events replays the log and follows it as Server-Sent Events.
+
+run_jobs, started by the app lifespan, claims the oldest queued job and runs
+`python -m app.models.retrain --job <id>` in a new session at a lower priority with
+memory and CPU limits (RETRAIN_*), killing it after RETRAIN_TIMEOUT_SECONDS or on
+cancellation. Jobs survive API restarts: at startup, a job still marked running
+whose process is alive is watched until it exits; one whose process is gone is
+queued again, up to JOB_MAX_ATTEMPTS runs.
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from app.core.config import (
+    BASE_DIR,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_SECONDS,
+    JOBS_DB_PATH,
+    RETRAIN_MAX_CPU_SECONDS,
+    RETRAIN_MAX_MEMORY_MB,
+    RETRAIN_NICE,
+    RETRAIN_TIMEOUT_SECONDS,
+)
+from app.core.telemetry import JOBS_FINISHED
+
+try:
+    import resource
+except ImportError:  # not on Windows: the subprocess then runs without limits
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+TERMINAL = ("succeeded", "failed", "cancelled")
+# lines of the job's output kept in the error of a job that died without reporting
+_LOG_TAIL_LINES = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pid INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id);
+"""
+
+
+class JobStore:
+    """The job queue and event log in one SQLite file; safe to use from several processes."""
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one short-lived connection per call: the store is used from the event loop,
+        # threads and the job processes
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def workdir(self, job_id: str) -> Path:
+        return self.path.parent / job_id
+
+    def log_path(self, job_id: str) -> Path:
+        return self.path.parent / f"{job_id}.log"
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def _event(self, conn: sqlite3.Connection, job_id: str, type: str, data: dict) -> int:
+        return conn.execute(
+            "INSERT INTO job_events (job_id, ts, type, data) VALUES (?, ?, ?, ?)",
+            (job_id, time.time(), type, json.dumps(data)),
+        ).lastrowid
+
+    def enqueue(self, kind: str, params: dict) -> dict:
+        job_id = uuid.uuid4().hex[:16]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), time.time()),
+            )
+            self._event(conn, job_id, "status", {"status": "queued"})
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, limit: int = 50) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self) -> Optional[dict]:
+        """Mark the oldest queued job running and return it (None when the queue is empty)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, pid = NULL WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+            self._event(conn, row["id"], "status", {"status": "running"})
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def set_pid(self, job_id: str, pid: int) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET pid = ? WHERE id = ?", (pid, job_id))
+
+    def add_event(self, job_id: str, type: str, data: dict) -> int:
+        with self._connect() as conn:
+            return self._event(conn, job_id, type, data)
+
+    def events(self, job_id: str, after: int = 0) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, ts, type, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                (job_id, after),
+            ).fetchall()
+        return [{"id": r["id"], "ts": r["ts"], "type": r["type"], "data": json.loads(r["data"])} for r in rows]
+
+    def finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        """Record the outcome unless the job already has one; the status event ends its log."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ? AND status NOT IN {TERMINAL}",
+                (status, time.time(), json.dumps(result) if result is not None else None, error, job_id),
+            ).rowcount
+            if updated:
+                self._event(conn, job_id, "status", {"status": status, "error": error, "result": result})
+            conn.execute("COMMIT")
+        return bool(updated)
+
+    def request_cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued job now; flag a running one for the runner to stop."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        job = self.get(job_id)
+        if job is not None and job["status"] == "queued":
+            self.finish(job_id, "cancelled")
+            job = self.get(job_id)
+        return job
+
+    def recover(self, is_alive) -> List[dict]:
+        """
+        After a restart: requeue running jobs whose process is gone (or fail them after
+        JOB_MAX_ATTEMPTS runs). Returns the running jobs whose process is still alive.
+        """
+        alive = []
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+        for job in map(self._job, rows):
+            if job["pid"] and is_alive(job["pid"]):
+                alive.append(job)
+            elif job["attempts"] >= JOB_MAX_ATTEMPTS:
+                self.finish(job["id"], "failed", error=f"Interrupted {job['attempts']} times")
+            else:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET status = 'queued', pid = NULL WHERE id = ? AND status = 'running'", (job["id"],))
+                    self._event(conn, job["id"], "status", {"status": "queued", "reason": "interrupted"})
+        return alive
+
+
+_store: Optional[JobStore] = None
+
+
+def get_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore(JOBS_DB_PATH)
+    return _store
+
+
+# ---------------------------------------------
+# RUNNER
+# ---------------------------------------------
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _limit_resources() -> None:
+    """preexec_fn of the job process: lower priority, cap address space and CPU time."""
+    if RETRAIN_NICE:
+        os.nice(RETRAIN_NICE)
+    if resource is None:
+        return
+    if RETRAIN_MAX_MEMORY_MB:
+        limit = RETRAIN_MAX_MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if RETRAIN_MAX_CPU_SECONDS:
+        resource.setrlimit(resource.RLIMIT_CPU, (RETRAIN_MAX_CPU_SECONDS, RETRAIN_MAX_CPU_SECONDS))
+
+
+def _kill(pid: int) -> None:
+    # the job runs in its own session, so its process group goes with it
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _log_tail(path: Path) -> str:
+    try:
+        return "\n".join(path.read_text(errors="replace").splitlines()[-_LOG_TAIL_LINES:])
+    except OSError:
+        return ""
+
+
+async def _supervise(store: JobStore, job_id: str, pid: int, exited, started: float) -> None:
+    """Wait for the job process to exit, stopping it on cancellation or timeout."""
+    while not exited():
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        job = await asyncio.to_thread(store.get, job_id)
+        if job["cancel_requested"]:
+            _kill(pid)
+            await asyncio.to_thread(store.finish, job_id, "cancelled")
+        elif RETRAIN_TIMEOUT_SECONDS and time.time() - started > RETRAIN_TIMEOUT_SECONDS:
+            _kill(pid)
+            await asyncio.to_thread(store.finish, job_id, "failed", None, f"Timed out after {RETRAIN_TIMEOUT_SECONDS:.0f} s")
+
+
+async def run_job(store: JobStore, job: dict, registry: Optional[Path] = None) -> dict:
+    """Run a claimed job in its own process and return its final state."""
+    log = store.log_path(job["id"])
+    command = [sys.executable, "-m", "app.models.retrain", "--job", job["id"], "--db", str(store.path)]
+    if registry is not None:
+        command += ["--registry", str(registry)]
+    with open(log, "ab") as output:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=str(BASE_DIR.parent),
+            stdout=output,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True,
+            preexec_fn=_limit_resources,
+        )
+    await asyncio.to_thread(store.set_pid, job["id"], process.pid)
+    waiter = asyncio.create_task(process.wait())
+    try:
+        await _supervise(store, job["id"], process.pid, waiter.done, job["started_at"] or time.time())
+    finally:
+        if not waiter.done():
+            # the runner was cancelled (API shutdown): leave the job running, it is adopted on restart
+            waiter.cancel()
+    # a no-op unless the process died without recording an outcome (killed, out of memory, crashed)
+    await asyncio.to_thread(store.finish, job["id"], "failed", None, f"Exited with status {process.returncode}\n{_log_tail(log)}".strip())
+    job = await asyncio.to_thread(store.get, job["id"])
+    JOBS_FINISHED.labels(job["kind"], job["status"]).inc()
+    return job
+
+
+async def _watch(store: JobStore, job: dict) -> None:
+    """Follow a job process started by a previous API process until it exits."""
+    await _supervise(store, job["id"], job["pid"], lambda: not pid_alive(job["pid"]), job["started_at"] or time.time())
+    await asyncio.to_thread(store.finish, job["id"], "failed", None, f"Exited without a result\n{_log_tail(store.log_path(job['id']))}".strip())
+    job = await asyncio.to_thread(store.get, job["id"])
+    JOBS_FINISHED.labels(job["kind"], job["status"]).inc()
+
+
+async def run_jobs(store: Optional[JobStore] = None, poll: float = JOB_POLL_SECONDS) -> None:
+    """Background task started by the app lifespan: run queued jobs one at a time."""
+    store = store or get_store()
+    watchers = [asyncio.create_task(_watch(store, job)) for job in await asyncio.to_thread(store.recover, pid_alive)]
+    try:
+        while True:
+            try:
+                job = await asyncio.to_thread(store.claim)
+                if job is None:
+                    await asyncio.sleep(poll)
+                    continue
+                job = await run_job(store, job)
+                logger.info("Job %s finished: %s", job["id"], job["status"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job runner pass failed")
+                await asyncio.sleep(poll)
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
@@ -0,0 +1,266 @@
+"""
+Named, versioned tower layouts.
+
+    layouts/
+        <name>/
+            <version>/        towers.npy   packed records, 18 bytes per tower:
+                                           x, y (float64 m) and crop (int16 code, -1 = none)
+                              layout.json  farm geometry, spacing, the crop names the codes
+                                           index, tower count, note, created_at
+
+A version directory is written under a temporary name and renamed into place (as in
+the model registry), so readers only ever see complete versions, and two writers
+racing for the same version number do not overwrite each other: the rename of the
+loser fails and it takes the next number.
+
+towers.npy is a plain .npy file, loaded with np.load(mmap_mode="r"): opening a
+version maps the file and reads only the pages that are used. diff_layouts compares
+two versions with k-d tree queries instead of a pairwise loop.
+"""
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.core.config import LAYOUT_MAX_TOWERS, LAYOUT_STORE_DIR
+
+TOWER_DTYPE = np.dtype([("x", "<f8"), ("y", "<f8"), ("crop", "<i2")])
+TOWERS_FILE = "towers.npy"
+META_FILE = "layout.json"
+NO_CROP = -1
+# towers within this distance of their old position count as unchanged
+DEFAULT_TOLERANCE_M = 0.01
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+_SAVE_ATTEMPTS = 5
+
+
+class LayoutNotFound(LookupError):
+    """No layout (or version) with this name."""
+
+
+def pack_towers(towers, crops: Optional[Sequence[Optional[str]]] = None) -> Tuple[np.ndarray, List[str]]:
+    """Packed tower records and the crop names their codes index (sorted)."""
+    xy = np.asarray(towers, dtype=float).reshape(-1, 2)
+    records = np.empty(len(xy), dtype=TOWER_DTYPE)
+    records["x"], records["y"] = xy[:, 0], xy[:, 1]
+    records["crop"] = NO_CROP
+    names: List[str] = []
+    if crops is not None:
+        if len(crops) != len(xy):
+            raise ValueError(f"crops has {len(crops)} entries for {len(xy)} towers")
+        labels = np.array(["" if c is None else str(c) for c in crops], dtype=object)
+        names, codes = np.unique(labels, return_inverse=True)
+        names = names.tolist()
+        if names and names[0] == "":
+            # unassigned towers sort first
+            codes, names = codes - 1, names[1:]
+        records["crop"] = codes.ravel()
+    return records, names
+
+
+def crop_labels(records: np.ndarray, names: Sequence[str]) -> np.ndarray:
+    """Per-tower crop names (None where unassigned) as an object array."""
+    return np.array(list(names) + [None], dtype=object)[np.where(records["crop"] >= 0, records["crop"], len(names))]
+
+
+def diff_layouts(
+    old: np.ndarray,
+    new: np.ndarray,
+    old_crops: Sequence[str] = (),
+    new_crops: Sequence[str] = (),
+    tolerance: float = DEFAULT_TOLERANCE_M,
+    max_move: float = 0.5,
+) -> dict:
+    """
+    Towers of `old` matched to towers of `new`: a pair matches when each is the other's
+    nearest tower within max_move. A matched pair further apart than `tolerance` has
+    moved; unmatched old towers were removed and unmatched new towers added. With
+    max_move below half the tower spacing every tower has at most one candidate.
+    Returns columnar index arrays into both layouts.
+    """
+    old_xy = np.column_stack([old["x"], old["y"]])
+    new_xy = np.column_stack([new["x"], new["y"]])
+    n_old, n_new = len(old_xy), len(new_xy)
+    matched_new = np.full(n_old, -1)
+    if n_old and n_new:
+        _, forward = cKDTree(new_xy).query(old_xy, distance_upper_bound=max_move)
+        _, backward = cKDTree(old_xy).query(new_xy, distance_upper_bound=max_move)
+        backward = np.append(backward, n_old)  # forward == n_new: no candidate
+        mutual = (forward < n_new) & (backward[np.minimum(forward, n_new)] == np.arange(n_old))
+        matched_new[mutual] = forward[mutual]
+    pairs_old = np.flatnonzero(matched_new >= 0)
+    pairs_new = matched_new[pairs_old]
+    offset = new_xy[pairs_new] - old_xy[pairs_old]
+    distance = np.hypot(offset[:, 0], offset[:, 1])
+    moved = distance > tolerance
+    added = np.setdiff1d(np.arange(n_new), pairs_new, assume_unique=True)
+    removed = np.flatnonzero(matched_new < 0)
+    old_labels, new_labels = crop_labels(old, old_crops)[pairs_old], crop_labels(new, new_crops)[pairs_new]
+    recropped = old_labels != new_labels
+
+    return {
+        "counts": {
+            "old_towers": n_old,
+            "new_towers": n_new,
+            "unchanged": int((~moved).sum()),
+            "moved": int(moved.sum()),
+            "added": len(added),
+            "removed": len(removed),
+            "crop_changed": int(recropped.sum()),
+        },
+        "added": {"index": added, "x": new_xy[added, 0], "y": new_xy[added, 1]},
+        "removed": {"index": removed, "x": old_xy[removed, 0], "y": old_xy[removed, 1]},
+        "moved": {
+            "old_index": pairs_old[moved],
+            "new_index": pairs_new[moved],
+            "dx": offset[moved, 0],
+            "dy": offset[moved, 1],
+            "distance": distance[moved],
+        },
+        "crop_changed": {
+            "old_index": pairs_old[recropped],
+            "new_index": pairs_new[recropped],
+            "old_crop": old_labels[recropped].tolist(),
+            "new_crop": new_labels[recropped].tolist(),
+        },
+    }
+
+
+class LayoutStore:
+    def __init__(self, root: Path = LAYOUT_STORE_DIR):
+        self.root = Path(root)
+
+    def _dir(self, name: str) -> Path:
+        if not _NAME.match(name):
+            raise ValueError("Layout names are 1-64 letters, digits, '_', '-' or '.', starting with a letter or digit")
+        return self.root / name
+
+    def _version_numbers(self, name: str) -> List[int]:
+        folder = self._dir(name)
+        if not folder.is_dir():
+            return []
+        return sorted(int(p.name) for p in folder.iterdir() if p.name.isdigit() and (p / META_FILE).exists())
+
+    def save(
+        self,
+        name: str,
+        towers,
+        farm_length: float,
+        farm_width: float,
+        min_spacing: Optional[float] = None,
+        crops: Optional[Sequence[Optional[str]]] = None,
+        note: str = "",
+    ) -> dict:
+        """Store `towers` ((n, 2) positions, optional per-tower crop names) as the next version of `name`."""
+        folder = self._dir(name)
+        records, crop_names = pack_towers(towers, crops)
+        if len(records) > LAYOUT_MAX_TOWERS:
+            raise ValueError(f"At most {LAYOUT_MAX_TOWERS} towers per layout")
+        folder.mkdir(parents=True, exist_ok=True)
+        staging = folder / f".staging-{os.getpid()}-{time.monotonic_ns()}"
+        staging.mkdir()
+        try:
+            np.save(staging / TOWERS_FILE, records)
+            for _ in range(_SAVE_ATTEMPTS):
+                version = max(self._version_numbers(name), default=0) + 1
+                meta = {
+                    "name": name,
+                    "version": version,
+                    "created_at": time.time(),
+                    "farm_length": farm_length,
+                    "farm_width": farm_width,
+                    "min_spacing": min_spacing,
+                    "towers": len(records),
+                    "crops": crop_names,
+                    "note": note,
+                }
+                (staging / META_FILE).write_text(json.dumps(meta))
+                try:
+                    os.rename(staging, folder / str(version))
+                    return meta
+                except OSError:
+                    # another writer took this version first
+                    continue
+            raise RuntimeError(f"Could not save layout {name!r}: too many concurrent writers")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def meta(self, name: str, version: int) -> dict:
+        try:
+            return json.loads((self._dir(name) / str(version) / META_FILE).read_text())
+        except (OSError, ValueError):
+            raise LayoutNotFound(f"Layout {name!r} has no version {version}")
+
+    def latest(self, name: str) -> int:
+        versions = self._version_numbers(name)
+        if not versions:
+            raise LayoutNotFound(f"No layout named {name!r}")
+        return versions[-1]
+
+    def load(self, name: str, version: Optional[int] = None, mmap: bool = True) -> Tuple[dict, np.ndarray]:
+        """A version's metadata and its tower records (memory-mapped, read-only by default); latest when version is None."""
+        version = self.latest(name) if version is None else version
+        meta = self.meta(name, version)
+        records = np.load(self._dir(name) / str(version) / TOWERS_FILE, mmap_mode="r" if mmap else None)
+        return meta, records
+
+    def versions(self, name: str) -> List[dict]:
+        """Every version's metadata, newest first."""
+        numbers = self._version_numbers(name)
+        if not numbers:
+            raise LayoutNotFound(f"No layout named {name!r}")
+        return [self.meta(name, v) for v in reversed(numbers)]
+
+    def names(self) -> List[dict]:
+        if not self.root.is_dir():
+            return []
+        layouts = []
+        for path in sorted(self.root.iterdir()):
+            if path.is_dir() and _NAME.match(path.name):
+                numbers = self._version_numbers(path.name)
+                if numbers:
+                    layouts.append({"name": path.name, "versions": len(numbers), "latest": self.meta(path.name, numbers[-1])})
+        return layouts
+
+    def diff(
+        self,
+        name: str,
+        old_version: int,
+        new_version: Optional[int] = None,
+        tolerance: float = DEFAULT_TOLERANCE_M,
+        max_move: Optional[float] = None,
+    ) -> dict:
+        """
+        diff_layouts between two versions (new_version defaults to the latest); max_move
+        defaults to just under half the smaller min_spacing of the two (0.5 m if unknown).
+        """
+        old_meta, old = self.load(name, old_version)
+        new_meta, new = self.load(name, new_version)
+        if max_move is None:
+            spacings = [m["min_spacing"] for m in (old_meta, new_meta) if m.get("min_spacing")]
+            max_move = 0.499 * min(spacings) if spacings else 0.5
+        result = diff_layouts(old, new, old_meta["crops"], new_meta["crops"], tolerance, max_move)
+        return {"name": name, "old_version": old_meta["version"], "new_version": new_meta["version"], "tolerance": tolerance, "max_move": max_move, **result}
+
+
+_store = LayoutStore()
+
+
+def get_store() -> LayoutStore:
+    return _store
+
+
+def layout_columns(meta: dict, records: np.ndarray) -> dict:
+    """API body of a version: its metadata plus columnar tower_x / tower_y / crop."""
+    return {
+        **meta,
+        "tower_x": np.ascontiguousarray(records["x"]),
+        "tower_y": np.ascontiguousarray(records["y"]),
+        "crop": crop_labels(records, meta["crops"]).tolist(),
+    }
@@ -0,0 +1,178 @@
+"""
+Intra-farm microclimate: interpolate in-farm sensor readings over the placement
+grid and score every cell for every crop.
+
+Interpolation is vectorized over all cells at once. "idw" is inverse-distance
+weighting. "kriging" is a lightweight ordinary kriging: an exponential variogram
+whose range and sill are fixed heuristically instead of fitted. Each is one
+(cells x sensors) weight matrix shared by all six features.
+
+Neighbouring cells usually have near-identical conditions. Cells are therefore
+scored through score_readings with HEATMAP_QUANTIZATION: the model sees each
+distinct quantized environment once, while the rules (validation, gating,
+agronomic checks, penalties) still use every cell's exact values.
+"""
+import math
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import HEATMAP_QUANTIZATION, MICROCLIMATE_MAX_CELLS
+from app.core.crop_catalog import READING_COLUMNS
+from app.core.telemetry import MICROCLIMATE_STAGE_SECONDS
+from app.services.ml_service import score_readings
+
+INTERPOLATION_METHODS = ("idw", "kriging")
+IDW_POWER = 2.0
+
+_STAGE_INTERPOLATE = MICROCLIMATE_STAGE_SECONDS.labels("interpolate")
+_STAGE_SCORE = MICROCLIMATE_STAGE_SECONDS.labels("score")
+_QUANT_STEPS = np.array([HEATMAP_QUANTIZATION[c] for c in READING_COLUMNS])
+
+
+def _distances(targets: np.ndarray, sources: np.ndarray) -> np.ndarray:
+    return np.hypot(targets[:, :1] - sources[:, 0], targets[:, 1:] - sources[:, 1])
+
+
+def idw_weights(targets: np.ndarray, sources: np.ndarray, power: float = IDW_POWER) -> np.ndarray:
+    """(targets x sources) normalized inverse-distance weights; a target on a sensor takes its value."""
+    d = _distances(targets, sources)
+    exact = d == 0
+    with np.errstate(divide="ignore"):
+        w = 1.0 / d ** power
+    hit = exact.any(axis=1)
+    w[hit] = exact[hit]
+    return w / w.sum(axis=1, keepdims=True)
+
+
+def kriging_weights(targets: np.ndarray, sources: np.ndarray, range_m: Optional[float] = None, nugget: float = 1e-6) -> np.ndarray:
+    """
+    Ordinary kriging weights with an exponential covariance C(h) = exp(-3h / range).
+    The range defaults to half the sensors' bounding-box diagonal (at least 1 m).
+    """
+    p = len(sources)
+    if p == 1:
+        return np.ones((len(targets), 1))
+    if range_m is None:
+        extent = sources.max(axis=0) - sources.min(axis=0)
+        range_m = max(1.0, float(np.hypot(*extent)) / 2)
+
+    def covariance(h):
+        return np.exp(-3.0 * h / range_m)
+
+    # [C 1; 1' 0] [w; mu] = [c; 1], solved once for every target
+    system = np.ones((p + 1, p + 1))
+    system[:p, :p] = covariance(_distances(sources, sources)) + nugget * np.eye(p)
+    system[p, p] = 0.0
+    rhs = np.ones((p + 1, len(targets)))
+    rhs[:p] = covariance(_distances(targets, sources)).T
+    return np.linalg.solve(system, rhs)[:p].T
+
+
+def interpolate(targets: np.ndarray, sensor_xy: np.ndarray, sensor_values: np.ndarray, method: str = "idw") -> np.ndarray:
+    """Interpolated (targets x features) values."""
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"Unknown interpolation method {method!r}; expected one of {INTERPOLATION_METHODS}")
+    weights = idw_weights(targets, sensor_xy) if method == "idw" else kriging_weights(targets, sensor_xy)
+    values = weights @ sensor_values
+    # Kriging weights can be negative; keep results inside the observed range
+    return np.clip(values, sensor_values.min(axis=0), sensor_values.max(axis=0))
+
+
+def cell_centers(farm_length: float, farm_width: float, cell: float) -> Tuple[int, int, np.ndarray]:
+    """Grid over the farm; x runs along farm_length (columns), y along farm_width (rows), as in tower_positions."""
+    n_cols = max(1, int(math.ceil(farm_length / cell)))
+    n_rows = max(1, int(math.ceil(farm_width / cell)))
+    xs = np.minimum((np.arange(n_cols) + 0.5) * cell, farm_length)
+    ys = np.minimum((np.arange(n_rows) + 0.5) * cell, farm_width)
+    gx, gy = np.meshgrid(xs, ys)
+    return n_rows, n_cols, np.column_stack([gx.ravel(), gy.ravel()])
+
+
+def compute_microclimate(
+    sensor_points: Sequence[dict],
+    farm_length: float,
+    farm_width: float,
+    cell_size_m: float,
+    towers: Sequence[Tuple[float, float]] = (),
+    method: str = "idw",
+) -> dict:
+    """
+    Per-crop suitability heatmap over the farm grid plus per-tower scores.
+
+    `sensor_points` are dicts with `x`, `y` (meters) and the six reading fields.
+    Heatmap arrays are row-major (n_rows x n_cols) lists; confidence is null for
+    cells that fail validation or the hard gating rules.
+    """
+    if not sensor_points:
+        raise ValueError("At least one sensor point is required")
+    t0 = time.perf_counter()
+    sensor_xy = np.array([(p["x"], p["y"]) for p in sensor_points], dtype=float)
+    sensor_values = np.array([[p[c] for c in READING_COLUMNS] for p in sensor_points], dtype=float)
+    n_rows, n_cols, centers = cell_centers(farm_length, farm_width, cell_size_m)
+    if len(centers) > MICROCLIMATE_MAX_CELLS:
+        raise ValueError(f"Heatmap would have {len(centers)} cells (limit {MICROCLIMATE_MAX_CELLS}); use a larger cell_size_m")
+    tower_xy = np.array(towers, dtype=float).reshape(-1, 2)
+    values = interpolate(np.vstack([centers, tower_xy]), sensor_xy, sensor_values, method)
+    t1 = time.perf_counter()
+    _STAGE_INTERPOLATE.observe(t1 - t0)
+
+    # One batched pass for cells and towers
+    batch = score_readings(values, quantization=_QUANT_STEPS)
+    _STAGE_SCORE.observe(time.perf_counter() - t1)
+
+    n_cells = len(centers)
+    crops = batch["crops"]
+    scored = batch["valid"] & ~batch["rule_rejected"] & ~batch["impossible"]
+    unscored_cells = ~scored[:n_cells]
+
+    def grid(column: np.ndarray) -> List[list]:
+        cells = column.astype(object)
+        cells[unscored_cells] = None
+        return cells.reshape(n_rows, n_cols).tolist()
+
+    heatmap = {
+        crop: {
+            "confidence": grid(batch["confidence"][:n_cells, j]),
+            "suitability_class": grid(batch["suitability_class"][:n_cells, j]),
+            "suitable_cells": int((batch["agronomic_ok"][:n_cells, j] & (batch["suitability_class"][:n_cells, j] == 2)).sum()),
+        }
+        for j, crop in enumerate(crops)
+    }
+    best = batch["recommended"][:n_cells]
+    best_crop = np.array(crops + [None], dtype=object)[np.where(best >= 0, best, len(crops))]
+
+    tower_scores = []
+    for i, (x, y) in enumerate(tower_xy.tolist()):
+        k = n_cells + i
+        rec = batch["recommended"][k]
+        tower_scores.append({
+            "x": x,
+            "y": y,
+            "inputs": {c: round(float(v), 3) for c, v in zip(READING_COLUMNS, values[k])},
+            "recommended_crops": [crops[rec]] if rec >= 0 else [],
+            "scores": [
+                {
+                    "crop": crop,
+                    "suitability_class": int(batch["suitability_class"][k, j]),
+                    "confidence": None if not scored[k] else float(batch["confidence"][k, j]),
+                    "agronomic_ok": bool(batch["agronomic_ok"][k, j]),
+                }
+                for j, crop in enumerate(crops)
+            ],
+        })
+
+    return {
+        "method": method,
+        "cell_size_m": cell_size_m,
+        "n_rows": n_rows,
+        "n_cols": n_cols,
+        "n_sensors": len(sensor_points),
+        "crops": crops,
+        "heatmap": heatmap,
+        "best_crop": best_crop.reshape(n_rows, n_cols).tolist(),
+        "tower_scores": tower_scores,
+        "model_rows": batch["model_rows"],
+        "elapsed_seconds": round(time.perf_counter() - t0, 4),
+    }
@@ -1,19 +1,43 @@
 import logging
-from typing import List
+import time
+from typing import List, Optional
 
 import numpy as np
 import pandas as pd
 
-from app.core.config import CROP_CONSTRAINTS, CROPS, RECOMMENDATION_CONFIDENCE_THRESHOLD
-from app.models.crop_recommendation import (
-    get_model,
-    get_calibrated_model,
-    get_encoder,
-    is_model_available,
+from app.core.config import (
+    CROP_CATALOG,
+    CROP_CONSTRAINTS,
+    RECOMMENDATION_CONFIDENCE_THRESHOLD,
+    SCORING_MODE,
+    USE_SPECIALIST_MODELS,
 )
+from app.core.crop_catalog import READING_COLUMNS, CropCatalog
+from app.core import serialization
+from app.core.telemetry import PREDICT_STAGE_SECONDS, PREDICTIONS_TOTAL
+from app.services import contribution_service, grid_service
+from app.models.crop_recommendation import ServingModel, get_serving, reload_if_changed
 
 logger = logging.getLogger("ml_service")
 
+FEATURE_COLUMNS = ["crop_type"] + READING_COLUMNS
+SCORING_MODES = ("full", "pruned")
+BATCH_LAYOUTS = ("rows", "columnar")
+MODEL_UNAVAILABLE = "Model artifacts not available. Run training or place model/encoder .pkl files in backend/app/models"
+
+_CROP_CODE_CACHE: dict = {}
+
+# Pre-bound metric children keep per-request instrumentation to a few hundred ns
+_STAGE_VALIDATION = PREDICT_STAGE_SECONDS.labels("validation")
+_STAGE_GATING = PREDICT_STAGE_SECONDS.labels("gating")
+_STAGE_FEATURES = PREDICT_STAGE_SECONDS.labels("feature_build")
+_STAGE_MODEL = PREDICT_STAGE_SECONDS.labels("model_call")
+_STAGE_POSTPROCESS = PREDICT_STAGE_SECONDS.labels("penalty_explanation")
+_OUTCOME_SCORED = PREDICTIONS_TOTAL.labels("scored")
+_OUTCOME_REJECTED = PREDICTIONS_TOTAL.labels("rule_rejection")
+_OUTCOME_INVALID = PREDICTIONS_TOTAL.labels("invalid")
+_OUTCOME_UNAVAILABLE = PREDICTIONS_TOTAL.labels("unavailable")
+
 
 def validate_inputs(temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed):
     if not (0 <= temperature <= 50):
@@ -69,18 +93,426 @@ def extreme_condition_penalty(temperature, humidity, sunlight_hours, air_quality
     return penalty
 
 
-def generate_explanation(crop, temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed):
+def _explanation_text(temperature_ok, humidity_ok, water_ph, air_quality_index) -> List[str]:
     reasons = []
-    c = CROP_CONSTRAINTS.get(crop, {})
-    if temperature <= c.get("temp", (0, 999))[1]:
+    if temperature_ok:
         reasons.append("Temperature within preferred range")
-    if humidity >= c.get("hum", (0, 0))[0]:
+    if humidity_ok:
         reasons.append("Humidity within preferred range")
     reasons.append(f"pH input: {water_ph}")
     reasons.append(f"AQI input: {air_quality_index}")
     return reasons
 
 
+def generate_explanation(crop, temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed):
+    c = CROP_CONSTRAINTS.get(crop, {})
+    t_lo, t_hi = c.get("temp", (0, 999))
+    h_lo, h_hi = c.get("hum", (0, 999))
+    return _explanation_text(
+        t_lo <= temperature <= t_hi,
+        h_lo <= humidity <= h_hi,
+        water_ph,
+        air_quality_index,
+    )
+
+
+# ---------------------------------------------
+# VECTORIZED RULES (readings: (n, 6) in READING_COLUMNS order)
+# ---------------------------------------------
+def _as_readings(readings) -> np.ndarray:
+    return np.asarray(readings, dtype=float).reshape(-1, len(READING_COLUMNS))
+
+
+def validation_mask(readings: np.ndarray) -> np.ndarray:
+    """Rows that pass validate_inputs."""
+    t, h, s, ph, aqi, w = readings.T
+    return (
+        (0 <= t) & (t <= 50)
+        & (20 <= h) & (h <= 100)
+        & (0 <= s) & (s <= 24)
+        & (4.5 <= ph) & (ph <= 8.0)
+        & (0 <= aqi) & (aqi <= 500)
+        & (0 <= w) & (w <= 5.0)
+    )
+
+
+def gating_mask(readings: np.ndarray) -> np.ndarray:
+    """Rows that pass validate_and_gate_inputs."""
+    t, ph, aqi = readings[:, 0], readings[:, 3], readings[:, 4]
+    return ~((t > 40) | (t < 10) | (ph < 4.8) | (ph > 7.2) | (aqi > 180))
+
+
+def impossible_mask(readings: np.ndarray) -> np.ndarray:
+    t, h, aqi = readings[:, 0], readings[:, 1], readings[:, 4]
+    return ((t >= 45) & (h >= 95)) | (aqi >= 400)
+
+
+def extreme_penalty_vector(readings: np.ndarray) -> np.ndarray:
+    """extreme_condition_penalty for every row."""
+    t, h, s, aqi = readings[:, 0], readings[:, 1], readings[:, 2], readings[:, 4]
+    penalty = np.ones(len(readings))
+    penalty = np.where(t > 40, penalty * 0.4, penalty)
+    penalty = np.where(h > 90, penalty * 0.6, penalty)
+    penalty = np.where(s > 12, penalty * 0.7, penalty)
+    return np.where(aqi > 180, penalty * 0.6, penalty)
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    # Python's round() (correctly rounded) rather than np.round, so batch and single-reading results match exactly
+    # (once per distinct value: quantized batches repeat the same scores many times)
+    distinct, inverse = np.unique(values, return_inverse=True)
+    flat = distinct.tolist()
+    rounded = np.fromiter((round(v, digits) for v in flat), dtype=float, count=len(flat))
+    return rounded[inverse].reshape(values.shape)
+
+
+def _encoded_crops(encoder, catalog: CropCatalog) -> np.ndarray:
+    """Encoder codes for the catalog's crops, computed once per loaded encoder."""
+    key = (id(encoder), id(catalog))
+    cached = _CROP_CODE_CACHE.get(key)
+    # the encoder is kept with its codes so a reloaded encoder cannot match a stale id
+    if cached is None or cached[0] is not encoder:
+        codes = np.asarray(encoder.transform(catalog.names), dtype=float) if encoder is not None else np.zeros(len(catalog))
+        _CROP_CODE_CACHE.clear()
+        cached = _CROP_CODE_CACHE[key] = (encoder, codes)
+    return cached[1]
+
+
+def _model_outputs(model, input_df, explainer=None):
+    """
+    Return (raw predictions, class probabilities, explained) for every row in one model pass.
+    For classifiers `predict` is the argmax of `predict_proba`, so it is derived
+    instead of traversing the forest twice; regressors fall back to `predict`.
+
+    With an `explainer` forest (see contribution_service) `explained` is (bias,
+    contributions) for each row's predicted class, else None. When the explainer is
+    the model itself, or the base of a CalibratedForest, the probabilities come from
+    the same leaf pass.
+    """
+    n = len(input_df)
+    if explainer is not None and explainer is getattr(model, "base", model):
+        probabilities, bias, contributions = contribution_service.predict_with_contributions(explainer, input_df)
+        if explainer is not model:
+            # the contributions explain the forest's own probabilities, before calibration
+            probabilities = model.calibrate(probabilities)
+        return np.asarray(model.classes_)[probabilities.argmax(axis=1)], probabilities, (bias, contributions)
+    explained = contribution_service.predict_with_contributions(explainer, input_df)[1:] if explainer is not None else None
+    if hasattr(model, "predict_proba"):
+        try:
+            probabilities = np.asarray(model.predict_proba(input_df), dtype=float)
+            return np.asarray(model.classes_)[probabilities.argmax(axis=1)], probabilities, explained
+        except Exception:
+            pass
+    probabilities = np.zeros((n, 1))
+    try:
+        raw_preds = np.asarray(model.predict(input_df))
+    except Exception:
+        raw_preds = np.zeros(n)
+    return raw_preds, probabilities, explained
+
+
+def _as_scores(raw_preds, probabilities, size: int):
+    raw_confidence = probabilities.max(axis=1) * 100 if probabilities.shape[1] > 0 else np.zeros(size)
+    try:
+        raw_scores = np.asarray(raw_preds, dtype=float)
+    except (TypeError, ValueError):
+        raw_scores = np.zeros(size)
+    return raw_scores, raw_confidence
+
+
+def _model_scores(serving: ServingModel, readings: np.ndarray, catalog: CropCatalog, mask: Optional[np.ndarray] = None, specialists: Optional[dict] = None, explain: bool = False):
+    """
+    Score reading x crop pairs with `serving`'s models, by default all of them in a single model pass.
+
+    `mask` (n_readings, n_crops) restricts scoring to the selected pairs (pruned mode).
+    `specialists` ({crop code: model}) routes each crop's pairs to its own model;
+    crops without a specialist go to the shared model in one pass.
+    Returns (raw scores, raw confidence %, explained): the first two as (n_readings, n_crops)
+    arrays, NaN where not scored. With `explain`, `explained` is (bias, contributions) in
+    percentage points of the predicted class's probability, (n_readings, n_crops) and
+    (n_readings, n_crops, FEATURE_COLUMNS); otherwise None.
+    """
+    t0 = time.perf_counter()
+    n, c = len(readings), len(catalog)
+    model = serving.scoring_model
+    codes = _encoded_crops(serving.encoder, catalog)
+    if mask is None:
+        rows, cols = np.divmod(np.arange(n * c), c)
+    else:
+        rows, cols = np.nonzero(mask)
+
+    # (pair selector, model, include crop code column)
+    groups = []
+    shared = np.ones(len(rows), dtype=bool)
+    if specialists:
+        for j in np.unique(cols):
+            specialist = specialists.get(int(codes[j]))
+            if specialist is not None:
+                selected = cols == j
+                groups.append((selected, specialist, False))
+                shared &= ~selected
+    if shared.any():
+        groups.append((shared, model, True))
+
+    raw_scores = np.full((n, c), np.nan)
+    raw_confidence = np.full((n, c), np.nan)
+    if explain:
+        bias = np.full((n, c), np.nan)
+        contributions = np.full((n, c, len(FEATURE_COLUMNS)), np.nan)
+    feature_seconds, model_seconds = time.perf_counter() - t0, 0.0
+    for selected, group_model, with_crop in groups:
+        t1 = time.perf_counter()
+        r, j = rows[selected], cols[selected]
+        if with_crop:
+            features = np.empty((len(r), len(FEATURE_COLUMNS)))
+            features[:, 0] = codes[j]
+            features[:, 1:] = readings[r]
+            input_df = pd.DataFrame(features, columns=FEATURE_COLUMNS)
+        else:
+            input_df = pd.DataFrame(readings[r], columns=READING_COLUMNS)
+        t2 = time.perf_counter()
+        # a calibrated wrapper is explained by the shared base forest it calibrates
+        explainer = contribution_service.explainer_for(group_model, serving.model if with_crop else None) if explain else None
+        raw_preds, probabilities, explained = _model_outputs(group_model, input_df, explainer)
+        t3 = time.perf_counter()
+        feature_seconds += t2 - t1
+        model_seconds += t3 - t2
+        raw_scores[r, j], raw_confidence[r, j] = _as_scores(raw_preds, probabilities, len(r))
+        if explained is not None:
+            bias[r, j] = explained[0] * 100
+            # specialists see no crop_type column: the crop is fixed by the model choice
+            contributions[r, j] = explained[1] * 100 if with_crop else np.column_stack([np.zeros(len(r)), explained[1] * 100])
+    _STAGE_FEATURES.observe(feature_seconds)
+    if groups:
+        _STAGE_MODEL.observe(model_seconds)
+    return raw_scores, raw_confidence, ((bias, contributions) if explain else None)
+
+
+def _postprocess(readings: np.ndarray, raw_scores: np.ndarray, raw_confidence: np.ndarray, catalog: CropCatalog):
+    """Apply the extreme-condition and per-crop AQI penalties and map raw scores to classes 0..2."""
+    penalty = extreme_penalty_vector(readings)[:, None] * catalog.aqi_penalty(readings)
+    confidence = _round(raw_confidence * penalty, 2)
+    # pairs skipped in pruned mode stay NaN and map to class 0
+    suitability = np.clip(np.rint(np.nan_to_num(raw_scores)), 0, 2).astype(int)
+    return suitability, confidence, _round(raw_scores, 3)
+
+
+def _recommend(suitability: np.ndarray, confidence: np.ndarray, agronomic_ok: np.ndarray) -> np.ndarray:
+    """
+    Per row, the index of the recommended crop or -1: among agronomically eligible
+    crops take the highest class, then the highest confidence (first crop on ties),
+    and require RECOMMENDATION_CONFIDENCE_THRESHOLD.
+    """
+    # confidence is in [0, 100], so class * 1000 + confidence orders by class first
+    key = np.where(agronomic_ok, suitability * 1000.0 + np.nan_to_num(confidence), -np.inf)
+    best = key.argmax(axis=1) if key.shape[1] else np.zeros(len(key), dtype=int)
+    rows = np.arange(len(key))
+    ok = agronomic_ok.any(axis=1) & (confidence[rows, best] >= RECOMMENDATION_CONFIDENCE_THRESHOLD)
+    return np.where(ok, best, -1)
+
+
+def _resolve_mode(mode: Optional[str], use_specialists: Optional[bool], serving: ServingModel):
+    mode = mode or SCORING_MODE
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode {mode!r}; expected one of {SCORING_MODES}")
+    if use_specialists is None:
+        use_specialists = USE_SPECIALIST_MODELS
+    return mode, (serving.specialists if use_specialists else None)
+
+
+def score_readings(
+    readings,
+    catalog: Optional[CropCatalog] = None,
+    mode: Optional[str] = None,
+    use_specialists: Optional[bool] = None,
+    quantization: Optional[np.ndarray] = None,
+    explain: bool = False,
+    model_outputs: Optional[tuple] = None,
+    serving: Optional[ServingModel] = None,
+) -> dict:
+    """
+    Batch scoring core: evaluate every reading x crop pair at once.
+
+    `readings` is an (n, 6) array-like in READING_COLUMNS order. Returns arrays
+    aligned with `crops`; rows that are invalid, rule-rejected or impossible are
+    flagged by the corresponding masks and never reach the model. Per row and crop
+    the values equal what predict_crop_scores returns for that single reading.
+
+    mode="pruned" only sends agronomically eligible pairs to the model; the others
+    keep NaN scores (`model_scored` is False) and can never be recommended anyway.
+
+    `quantization` (one step per reading column) snaps readings to bin centers for
+    the model pass only, so identical environments are scored once; the rules
+    still use the exact values. `model_rows` is the number of rows sent to models.
+
+    `explain` adds per-feature contributions to the model probability of each pair's
+    predicted class (`contribution_bias`, `contributions` over `contribution_features`),
+    in percentage points and NaN where the model did not run.
+
+    `model_outputs` ((raw scores, raw confidence %), both (n_readings, n_crops)) replaces
+    the model pass with values computed elsewhere, e.g. sweep_service's evaluation of
+    the forest over a grid; the rules, penalties and recommendations still run here.
+    `serving` is the model snapshot those outputs came from.
+    """
+    if serving is None:
+        # the scoring entry points run in pool workers (or worker threads), so they pick up
+        # a new registry version between calls without blocking the event loop
+        reload_if_changed()
+        serving = get_serving()
+    if not serving.available:
+        raise RuntimeError(MODEL_UNAVAILABLE)
+    mode, specialists = _resolve_mode(mode, use_specialists, serving)
+    catalog = catalog or CROP_CATALOG
+    readings = _as_readings(readings)
+    n, c = len(readings), len(catalog)
+
+    valid = validation_mask(readings)
+    gated = gating_mask(readings)
+    rule_rejected = valid & ~gated
+    impossible = valid & gated & impossible_mask(readings)
+    scored = valid & gated & ~impossible
+
+    suitability = np.zeros((n, c), dtype=int)
+    confidence = np.full((n, c), np.nan)
+    model_raw = np.full((n, c), np.nan)
+    confidence[rule_rejected] = 100.0
+    agronomic_ok = catalog.agronomic_mask(readings) & scored[:, None]
+
+    rows = np.flatnonzero(scored)
+    model_rows = 0
+    if explain:
+        contribution_bias = np.full((n, c), np.nan)
+        contributions = np.full((n, c, len(FEATURE_COLUMNS)), np.nan)
+    if rows.size:
+        mask = agronomic_ok[rows] if mode == "pruned" else None
+        model_input = readings[rows]
+        if model_outputs is not None:
+            raw_scores, raw_confidence = (np.asarray(values, dtype=float)[rows] for values in model_outputs)
+            if mask is not None:
+                raw_scores, raw_confidence = np.where(mask, raw_scores, np.nan), np.where(mask, raw_confidence, np.nan)
+            model_input, quantization, explained = None, None, None
+        elif quantization is not None:
+            steps = np.asarray(quantization, dtype=float)
+            model_input, inverse = np.unique((np.floor(model_input / steps) + 0.5) * steps, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            if mask is not None:
+                merged = np.zeros((len(model_input), c), dtype=bool)
+                np.logical_or.at(merged, inverse, mask)
+                mask = merged
+        if model_input is not None:
+            raw_scores, raw_confidence, explained = _model_scores(serving, model_input, catalog, mask, specialists, explain)
+        model_rows = int(np.isfinite(raw_scores).sum())
+        if quantization is not None:
+            raw_scores, raw_confidence = raw_scores[inverse], raw_confidence[inverse]
+            if explained is not None:
+                explained = (explained[0][inverse], explained[1][inverse])
+            if mode == "pruned":
+                # a bin shared with an eligible cell was scored; keep only this row's own eligible pairs
+                raw_scores = np.where(agronomic_ok[rows], raw_scores, np.nan)
+                raw_confidence = np.where(agronomic_ok[rows], raw_confidence, np.nan)
+                if explained is not None:
+                    explained = (np.where(agronomic_ok[rows], explained[0], np.nan), np.where(agronomic_ok[rows][..., None], explained[1], np.nan))
+        suitability[rows], confidence[rows], model_raw[rows] = _postprocess(readings[rows], raw_scores, raw_confidence, catalog)
+        if explained is not None:
+            contribution_bias[rows] = _round(explained[0], 3)
+            contributions[rows] = _round(explained[1], 3)
+
+    result = {
+        "crops": catalog.names,
+        "valid": valid,
+        "rule_rejected": rule_rejected,
+        "impossible": impossible,
+        "agronomic_ok": agronomic_ok,
+        "suitability_class": suitability,
+        "confidence": confidence,
+        "model_raw_score": model_raw,
+        "model_scored": ~np.isnan(model_raw),
+        "model_rows": model_rows,
+        "recommended": _recommend(suitability, confidence, agronomic_ok),
+    }
+    if explain:
+        result.update(contribution_features=FEATURE_COLUMNS, contribution_bias=contribution_bias, contributions=contributions)
+    return result
+
+
+def _grid_forest(model):
+    """(forest, calibrate) when grid_service can walk `model`, else None."""
+    if contribution_service.supports(model):
+        return model, None
+    base = getattr(model, "base", None)
+    if base is not None and contribution_service.supports(base):
+        return base, model.calibrate
+    return None
+
+
+def _grid_model_outputs(serving: ServingModel, base: np.ndarray, axes, catalog: CropCatalog, specialists: Optional[dict]):
+    """(raw scores, raw confidence %) for every grid point x crop, or None when a model is not a forest."""
+    model = serving.scoring_model
+    codes = _encoded_crops(serving.encoder, catalog)
+    columns = [READING_COLUMNS.index(name) for name, _ in axes]
+    size = int(np.prod([len(values) for _, values in axes]))
+    raw_scores = np.empty((size, len(catalog)))
+    raw_confidence = np.empty((size, len(catalog)))
+    for j, code in enumerate(codes):
+        specialist = specialists.get(int(code)) if specialists else None
+        walkable = _grid_forest(specialist if specialist is not None else model)
+        if walkable is None:
+            return None
+        forest, calibrate = walkable
+        # specialists see the readings only; the shared model has the crop code first
+        fixed, offset = (base, 0) if specialist is not None else (np.concatenate([[code], base]), 1)
+        probabilities = grid_service.forest_grid_proba(forest, fixed, [(col + offset, values) for col, (_, values) in zip(columns, axes)])
+        probabilities = probabilities.reshape(size, -1)
+        if calibrate is not None:
+            probabilities = calibrate(probabilities)
+        raw_scores[:, j], raw_confidence[:, j] = _as_scores(np.asarray(forest.classes_)[probabilities.argmax(axis=1)], probabilities, size)
+    return raw_scores, raw_confidence
+
+
+def score_grid(
+    base,
+    axes,
+    catalog: Optional[CropCatalog] = None,
+    mode: Optional[str] = None,
+    use_specialists: Optional[bool] = None,
+) -> dict:
+    """
+    score_readings over every point of a 1-D or 2-D grid: `axes` is [(reading column,
+    ascending values)], the other columns stay at `base` (one reading). Points are in
+    C order over the axes (the last axis varies fastest).
+
+    The model outputs come from grid_service, which walks each forest once for the
+    whole grid instead of once per point; a model it cannot walk (a CalibratedClassifierCV
+    wrapper) gets the usual model pass.
+    """
+    catalog = catalog or CROP_CATALOG
+    base = _as_readings(base)[0]
+    mesh = np.meshgrid(*[np.asarray(values, dtype=float) for _, values in axes], indexing="ij")
+    readings = np.tile(base, (mesh[0].size, 1))
+    for (name, _), values in zip(axes, mesh):
+        readings[:, READING_COLUMNS.index(name)] = values.ravel()
+    outputs = None
+    reload_if_changed()
+    serving = get_serving()
+    if serving.available:
+        t0 = time.perf_counter()
+        outputs = _grid_model_outputs(serving, base, axes, catalog, _resolve_mode(mode, use_specialists, serving)[1])
+        _STAGE_MODEL.observe(time.perf_counter() - t0)
+    return score_readings(readings, catalog, mode, use_specialists, model_outputs=outputs, serving=serving)
+
+
+def _contribution_entry(bias: float, contributions: np.ndarray) -> Optional[dict]:
+    if np.isnan(bias):
+        # the scoring model is not a forest the contributions can be read from
+        return None
+    return {
+        # the forest's probability (before any calibration) that the contributions add up to
+        "model_probability": round(float(bias + contributions.sum()), 3),
+        "bias": round(float(bias), 3),
+        "features": {name: round(float(v), 3) for name, v in zip(FEATURE_COLUMNS, contributions)},
+    }
+
+
 def predict_crop_scores(
     temperature: float,
     humidity: float,
@@ -88,25 +520,44 @@ def predict_crop_scores(
     water_ph: float,
     air_quality_index: float,
     wind_speed: float,
+    mode: Optional[str] = None,
+    use_specialists: Optional[bool] = None,
+    explain: bool = False,
 ) -> dict:
-    if not is_model_available():
-        return {"error": "Model artifacts not available. Run training or place model/encoder .pkl files in backend/app/models"}
-
-    # prefer calibrated model for better probability estimates
-    model = get_calibrated_model() or get_model()
-    encoder = get_encoder()
+    """
+    Scores one reading for every crop. With `explain`, each model-scored entry also
+    gets `contributions`: the model probability (%) of its predicted class split into
+    a bias and one term per feature (see contribution_service). `model_version` is the
+    version of the model this process scored with.
+    """
+    reload_if_changed()
+    # one snapshot: a reload landing mid-request cannot mix versions
+    serving = get_serving()
+    if not serving.available:
+        _OUTCOME_UNAVAILABLE.inc()
+        return {"error": MODEL_UNAVAILABLE}
+    mode, specialists = _resolve_mode(mode, use_specialists, serving)
+    version = serving.version
+    catalog = CROP_CATALOG
 
     # validate
+    t0 = time.perf_counter()
     error = validate_inputs(temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed)
+    t1 = time.perf_counter()
+    _STAGE_VALIDATION.observe(t1 - t0)
     if error:
-        return {"error": error, "recommended_crops": [], "all_scores": []}
+        _OUTCOME_INVALID.inc()
+        return {"error": error, "recommended_crops": [], "all_scores": [], "model_version": version}
 
     # Hard-rule gating before any ML work
     passes, reason = validate_and_gate_inputs(temperature, water_ph, air_quality_index)
+    impossible = passes and is_impossible_condition(temperature, humidity, air_quality_index)
+    _STAGE_GATING.observe(time.perf_counter() - t1)
     if not passes:
+        _OUTCOME_REJECTED.inc()
         # Return a rule-based rejection for all crops
         results = []
-        for crop in CROPS:
+        for crop in catalog.names:
             results.append({
                 "crop": crop,
                 "suitability_class": 0,
@@ -115,89 +566,131 @@ def predict_crop_scores(
                 "agronomic_ok": False,
                 "explanation": ["Rule-based rejection: " + reason],
             })
-        return {"all_scores": results, "recommended_crops": [], "rule_rejection": True}
+        return {"all_scores": results, "recommended_crops": [], "rule_rejection": True, "model_version": version}
 
-    if is_impossible_condition(temperature, humidity, air_quality_index):
-        return {"error": "Environmental conditions are unsuitable for aeroponic crop growth", "recommended_crops": [], "all_scores": []}
+    if impossible:
+        _OUTCOME_INVALID.inc()
+        return {"error": "Environmental conditions are unsuitable for aeroponic crop growth", "recommended_crops": [], "all_scores": [], "model_version": version}
 
-    results: List[dict] = []
+    # strict agronomic checks (AQI handled softly via penalty), all crops at once
+    readings = _as_readings((temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed))
+    agronomic_ok = catalog.agronomic_mask(readings)
 
-    for crop in CROPS:
-        c = CROP_CONSTRAINTS.get(crop, {})
-        # strict agronomic checks (except AQI handled softly)
-        agronomic_ok = (
-            c.get("temp", (0, 999))[0] <= temperature <= c.get("temp", (0, 999))[1]
-            and c.get("hum", (0, 999))[0] <= humidity <= c.get("hum", (0, 999))[1]
-            and c.get("sun", (0, 999))[0] <= sunlight_hours <= c.get("sun", (0, 999))[1]
-            and c.get("ph", (0, 999))[0] <= water_ph <= c.get("ph", (0, 999))[1]
-            and c.get("wind", (0, 999))[0] <= wind_speed <= c.get("wind", (0, 999))[1]
-        )
+    # One feature row per crop (per eligible crop when pruned), scored in a single model pass
+    raw_scores, raw_confidence, explained = _model_scores(serving, readings, catalog, agronomic_ok if mode == "pruned" else None, specialists, explain)
+    t4 = time.perf_counter()
 
-        # Always compute model prediction/probabilities so we can return confidence for all crops
-        crop_encoded = encoder.transform([crop])[0] if encoder is not None else 0
-        input_df = pd.DataFrame([{"crop_type": crop_encoded, "temperature": temperature, "humidity": humidity, "sunlight_hours": sunlight_hours, "water_ph": water_ph, "air_quality_index": air_quality_index, "wind_speed": wind_speed}])
-        input_df = input_df[["crop_type", "temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"]]
+    suitability, confidence, model_raw = _postprocess(readings, raw_scores, raw_confidence, catalog)
+    temperature_ok, humidity_ok = catalog.explanation_flags(readings)
 
-        # Get model output; support classifiers (with predict_proba) and regressors
-        try:
-            raw_pred = model.predict(input_df)[0]
-        except Exception:
-            raw_pred = 0
-
-        # Probabilities: only available for classifiers
-        if hasattr(model, "predict_proba"):
-            try:
-                probabilities = model.predict_proba(input_df)[0]
-            except Exception:
-                probabilities = [0.0]
-        else:
-            probabilities = [0.0]
-
-        raw_confidence = max(probabilities) * 100 if len(probabilities) > 0 else 0.0
-        penalty = extreme_condition_penalty(temperature, humidity, sunlight_hours, air_quality_index)
-
-        crop_aqi_max = c.get("aqi") or c.get("aqi_max")
-        if crop_aqi_max is not None and air_quality_index > crop_aqi_max:
-            excess = air_quality_index - crop_aqi_max
-            scale = max(20.0, float(crop_aqi_max))
-            aqi_penalty = max(0.1, 1.0 - (excess / scale))
-            penalty *= aqi_penalty
-
-        final_confidence = round(raw_confidence * penalty, 2)
+    results: List[dict] = []
+    for i, crop in enumerate(catalog.names):
+        explanation = _explanation_text(temperature_ok[0, i], humidity_ok[0, i], water_ph, air_quality_index)
+        if np.isnan(model_raw[0, i]):
+            # pruned: failed the agronomic checks, so the model was skipped
+            explanation.append("Not scored: outside agronomic range")
+            results.append({
+                "crop": crop,
+                "suitability_class": 0,
+                "model_raw_score": None,
+                "confidence": None,
+                "agronomic_ok": False,
+                "explanation": explanation,
+            })
+            continue
+        entry = {
+            "crop": crop,
+            "suitability_class": int(suitability[0, i]),
+            "model_raw_score": float(model_raw[0, i]),
+            "confidence": float(confidence[0, i]),
+            "agronomic_ok": bool(agronomic_ok[0, i]),
+            "explanation": explanation,
+        }
+        if explained is not None:
+            entry["contributions"] = _contribution_entry(explained[0][0, i], explained[1][0, i])
+        results.append(entry)
 
-        # Interpret raw_pred: if model is regressor, raw_pred may be continuous; clip/round to 0..3
-        try:
-            raw_score = float(raw_pred)
-        except Exception:
-            raw_score = 0.0
+    # Only consider agronomically-eligible crops for recommendations
+    best = _recommend(suitability, confidence, agronomic_ok)[0]
+    recommended = [catalog.names[best]] if best >= 0 else []
 
-        # Map model output to 3-class range [0,2]
-        suitability_class = int(np.clip(np.rint(raw_score), 0, 2))
-        prediction = suitability_class
-        agronomic_flag = bool(agronomic_ok)
+    _STAGE_POSTPROCESS.observe(time.perf_counter() - t4)
+    _OUTCOME_SCORED.inc()
+    return {"all_scores": results, "recommended_crops": recommended, "model_version": version}
 
-        # Include raw model score for visibility
-        model_raw = round(raw_score, 3)
 
-        explanation = generate_explanation(crop, temperature, humidity, sunlight_hours, water_ph, air_quality_index, wind_speed)
+def batch_columns(result: dict) -> dict:
+    """
+    score_readings output as a columnar payload: one entry per reading in the flat
+    columns, and (readings x crops) arrays aligned with `crops` for the scores.
+    """
+    n = len(result["valid"])
+    status = np.full(n, "scored", dtype=object)
+    status[~result["valid"]] = "invalid"
+    status[result["rule_rejected"]] = "rule_rejected"
+    status[result["impossible"]] = "impossible"
+    crops = np.array(list(result["crops"]) + [None], dtype=object)
+    return {
+        "rows": n,
+        "crops": list(result["crops"]),
+        "status": status.tolist(),
+        "recommended_crop": crops[result["recommended"]].tolist(),
+        "suitability_class": result["suitability_class"],
+        "confidence": result["confidence"],
+        "model_raw_score": result["model_raw_score"],
+        "agronomic_ok": result["agronomic_ok"],
+        **({
+            "contribution_features": result["contribution_features"],
+            "contribution_bias": result["contribution_bias"],
+            "contributions": result["contributions"],
+        } if "contributions" in result else {}),
+    }
+
+
+def _column(values: np.ndarray) -> list:
+    if values.dtype.kind != "f":
+        return values.tolist()
+    return [None if v != v else v for v in values.tolist()]
+
+
+def batch_rows(columns: dict) -> dict:
+    """The same payload as one object per reading, with per-crop entries shaped like /predict/'s all_scores."""
+    crops = columns["crops"]
+    per_crop = [
+        (
+            crop,
+            _column(columns["suitability_class"][:, j]),
+            _column(columns["model_raw_score"][:, j]),
+            _column(columns["confidence"][:, j]),
+            _column(columns["agronomic_ok"][:, j]),
+        )
+        for j, crop in enumerate(crops)
+    ]
+    results = []
+    for i, (status, recommended) in enumerate(zip(columns["status"], columns["recommended_crop"])):
         results.append({
-            "crop": crop,
-            "suitability_class": int(prediction),
-            "model_raw_score": model_raw,
-            "confidence": final_confidence,
-            "agronomic_ok": agronomic_flag,
-            "explanation": explanation,
+            "status": status,
+            "recommended_crops": [recommended] if recommended else [],
+            "all_scores": [
+                {"crop": crop, "suitability_class": suit[i], "model_raw_score": raw[i], "confidence": conf[i], "agronomic_ok": ok[i]}
+                for crop, suit, raw, conf, ok in per_crop
+            ],
         })
+    if "contributions" in columns:
+        names = columns["contribution_features"]
+        for i, j in zip(*np.nonzero(~np.isnan(columns["contribution_bias"]))):
+            results[i]["all_scores"][j]["contributions"] = {
+                "bias": float(columns["contribution_bias"][i, j]),
+                "features": dict(zip(names, columns["contributions"][i, j].tolist())),
+            }
+    return {"rows": columns["rows"], "crops": crops, "results": results}
 
-    # Only consider agronomically-eligible crops for recommendations
-    eligible = [r for r in results if r.get("agronomic_ok")]
-    recommended = []
-    if eligible:
-        max_score = max(item["suitability_class"] for item in eligible)
-        best_crops = [item for item in eligible if item["suitability_class"] == max_score]
-        if best_crops:
-            best_crop = max(best_crops, key=lambda x: x.get("confidence", 0))
-            if best_crop.get("confidence", 0) >= RECOMMENDATION_CONFIDENCE_THRESHOLD:
-                recommended = [best_crop["crop"]]
-
-    return {"all_scores": results, "recommended_crops": recommended}
+
+def score_batch(readings, mode: Optional[str] = None, layout: str = "rows", fmt: str = "json", explain: bool = False) -> bytes:
+    """
+    Score a batch and return the encoded response body. Layout conversion and
+    encoding happen here so that they run in the worker with the scoring, not on
+    the event loop.
+    """
+    columns = batch_columns(score_readings(readings, mode=mode, explain=explain))
+    return serialization.encode(columns if layout == "columnar" else batch_rows(columns), fmt)
@@ -1,14 +1,17 @@
 import os
 import math
 import logging
+import time
 import uuid
 from typing import List, Tuple
 
 import matplotlib
 matplotlib.use("Agg")  # IMPORTANT: non-GUI backend
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle, Rectangle
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Polygon, Rectangle
+
+from app.core.telemetry import PLACEMENT_SECONDS, RENDER_STAGE_SECONDS, timed
 
 # Setup logger
 logger = logging.getLogger("aeroponic.optimization")
@@ -19,9 +22,13 @@ if not logger.hasHandlers():
     logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+_RENDER_DRAW = RENDER_STAGE_SECONDS.labels("draw")
+_RENDER_PNG_WRITE = RENDER_STAGE_SECONDS.labels("png_write")
+
 # ---------------------------------------------
 # GREEDY PLACEMENT ALGORITHM
 # ---------------------------------------------
+@timed(PLACEMENT_SECONDS.labels())
 def greedy_tower_placement(
     farm_length: float,
     farm_width: float,
@@ -95,6 +102,8 @@ def generate_placement_image(
     min_spacing: float,
     output_path: str,
     cell_size_m: float = None,
+    obstacles: List[dict] = None,
+    boundary: List[Tuple[float, float]] = None,
 ) -> None:
     """
     Generates and saves a visualization image of the tower placement.
@@ -105,15 +114,21 @@ def generate_placement_image(
         farm_length (float): Length of the farm in meters.
         min_spacing (float): Minimum spacing between towers in meters.
         output_path (str): Path to save the generated image.
+        obstacles (List[dict]): Optional keep-out areas ("rect" or "circle" shapes) to draw.
+        boundary (List[Tuple[float, float]]): Optional site boundary polygon to draw.
     """
     try:
-        fig, ax = plt.subplots(figsize=(10, 8))
+        t0 = time.perf_counter()
+        # Figure API instead of pyplot: no global figure state shared between threads/requests
+        fig = Figure(figsize=(10, 8))
+        ax = fig.subplots()
         ax.set_facecolor("#ffffff")
 
-        # Compute grid dimensions (use provided cell_size_m if given, else min_spacing)
+        # Compute grid dimensions (use provided cell_size_m if given, else min_spacing);
+        # x runs along farm_length (columns), y along farm_width (rows), as in the positions
         cell = cell_size_m if (cell_size_m and cell_size_m > 0) else min_spacing
-        n_cols = max(1, int(math.ceil(farm_width / cell)))
-        n_rows = max(1, int(math.ceil(farm_length / cell)))
+        n_cols = max(1, int(math.ceil(farm_length / cell)))
+        n_rows = max(1, int(math.ceil(farm_width / cell)))
 
         # Map tower positions to grid cells (row, col)
         allowed_cells = set()
@@ -129,8 +144,8 @@ def generate_placement_image(
             for col in range(n_cols):
                 cell_x = col * cell
                 cell_y = row * cell
-                cell_w = cell if (cell_x + cell) <= farm_width else max(0.0, farm_width - cell_x)
-                cell_h = cell if (cell_y + cell) <= farm_length else max(0.0, farm_length - cell_y)
+                cell_w = cell if (cell_x + cell) <= farm_length else max(0.0, farm_length - cell_x)
+                cell_h = cell if (cell_y + cell) <= farm_width else max(0.0, farm_width - cell_y)
                 if (row, col) in allowed_cells:
                     face = '#dcfce7'  # light green
                     edge = '#86efac'
@@ -149,9 +164,20 @@ def generate_placement_image(
                 ax.text(cell_x + cell_w / 2.0, cell_y + cell_h / 2.0, f"{row_label}{col_label}", ha='center', va='center', fontsize=8, color='#0b3954', zorder=2)
 
         # Farm boundary
-        farm = Rectangle((0, 0), farm_width, farm_length, linewidth=2, edgecolor="#0b3d91", facecolor="none", zorder=3)
+        farm = Rectangle((0, 0), farm_length, farm_width, linewidth=2, edgecolor="#0b3d91", facecolor="none", zorder=3)
         ax.add_patch(farm)
 
+        # Keep-out areas and the site boundary, in tower coordinates
+        for obstacle in obstacles or []:
+            if obstacle["shape"] == "rect":
+                patch = Rectangle((obstacle["x_min"], obstacle["y_min"]), obstacle["x_max"] - obstacle["x_min"], obstacle["y_max"] - obstacle["y_min"])
+            else:
+                patch = Circle((obstacle["x"], obstacle["y"]), obstacle["radius"])
+            patch.set(facecolor="#94a3b8", edgecolor="#475569", alpha=0.8, zorder=3)
+            ax.add_patch(patch)
+        if boundary:
+            ax.add_patch(Polygon(boundary, closed=True, linewidth=2, linestyle="--", edgecolor="#0b3d91", facecolor="none", zorder=3))
+
         # Draw tower markers on top
         for i, (x, y) in enumerate(positions):
             tower = Circle((x, y), radius=0.28, color="#0b5cff", zorder=4)
@@ -159,10 +185,10 @@ def generate_placement_image(
             ax.text(x, y + 0.45, f"{i+1}", ha="center", fontsize=9, fontweight="bold", color="#021124", zorder=5)
 
         # Axes & ticks
-        ax.set_xlim(0, farm_width)
-        ax.set_ylim(0, farm_length)
-        ax.set_xlabel("Width (meters)")
-        ax.set_ylabel("Length (meters)")
+        ax.set_xlim(0, farm_length)
+        ax.set_ylim(0, farm_width)
+        ax.set_xlabel("Length (meters)")
+        ax.set_ylabel("Width (meters)")
         ax.set_title("Optimized Aeroponic Tower Placement", fontsize=14, fontweight="bold", pad=12)
 
         # Legend
@@ -170,9 +196,11 @@ def generate_placement_image(
         legend_handles = [Patch(facecolor='#dcfce7', edgecolor='#86efac', label='Cells eligible for towers'), Patch(facecolor='none', edgecolor='#cbd5e1', label='Grid cells')]
         ax.legend(handles=legend_handles, loc='upper right')
 
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=220)
-        plt.close()
+        fig.tight_layout()
+        t1 = time.perf_counter()
+        _RENDER_DRAW.observe(t1 - t0)
+        fig.savefig(output_path, dpi=220)
+        _RENDER_PNG_WRITE.observe(time.perf_counter() - t1)
         logger.info(f"Placement image saved to {output_path}")
     except Exception as e:
         logger.error(f"Error generating placement image: {e}")
@@ -0,0 +1,139 @@
+"""
+Batch placement: many farm configurations in one request.
+
+Configs that would produce the same response are computed once. A config's key is
+its canonical JSON with `output` left out when nothing is rendered; the rest map to
+it and are reported with `duplicate_of`. Unique configs run through
+place_towers_async (the POST /placement/ pipeline) at most PLACEMENT_BATCH_CONCURRENCY
+at a time, so a batch keeps every pool worker busy without overrunning the render
+queue. Anneal configs also take one anneal queue slot per restart, so their restarts
+together stay within that queue's limit instead of being rejected (and skipped). Results are yielded as they complete, each tagged with the index of its
+config, and a summary of tower counts and packing density comes last.
+"""
+import asyncio
+import json
+import math
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Dict, List, Tuple
+
+from app.core.config import PLACEMENT_BATCH_CONCURRENCY, WORKLOAD_QUEUE_LIMITS
+from app.core.telemetry import PLACEMENT_BATCH_CONFIGS
+from app.services.executor import WorkloadRejected
+from app.services.placement_service import place_towers_async
+
+_COMPUTED = PLACEMENT_BATCH_CONFIGS.labels("computed")
+_DUPLICATE = PLACEMENT_BATCH_CONFIGS.labels("duplicate")
+_FAILED = PLACEMENT_BATCH_CONFIGS.labels("failed")
+
+# config fields repeated in the summary rows
+SUMMARY_FIELDS = ("farm_length", "farm_width", "min_spacing", "max_towers", "engine")
+
+
+def config_key(config: dict, render: bool) -> str:
+    if not render:
+        config = {k: v for k, v in config.items() if k != "output"}
+    return json.dumps(config, sort_keys=True, separators=(",", ":"))
+
+
+def packing(config: dict, total_towers: int) -> dict:
+    """
+    Towers per 100 m2 of the farm rectangle, and the share of the ideal hex packing
+    (2 / (sqrt(3) * spacing^2) towers per m2) over that rectangle that was reached.
+    """
+    area = config["farm_length"] * config["farm_width"]
+    ideal = area * 2.0 / (math.sqrt(3.0) * config["min_spacing"] ** 2)
+    return {
+        "towers_per_100m2": round(100.0 * total_towers / area, 3),
+        "packing_ratio": round(total_towers / ideal, 4),
+    }
+
+
+class _RestartSlots:
+    """A batch's share of the anneal queue: a config holds one slot per restart while it runs."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self._free = asyncio.Semaphore(total)
+        # one config takes its slots at a time, so two can't each hold part of what they need
+        self._gate = asyncio.Lock()
+
+    @asynccontextmanager
+    async def hold(self, restarts: int):
+        # more restarts than the queue admits: the extra ones are skipped as for a single request
+        needed, taken = min(restarts, self.total), 0
+        try:
+            async with self._gate:
+                while taken < needed:
+                    await self._free.acquire()
+                    taken += 1
+            yield
+        finally:
+            for _ in range(taken):
+                self._free.release()
+
+
+async def _place(key: str, config: dict, render: bool, slots: asyncio.Semaphore, restart_slots: _RestartSlots) -> Tuple[str, dict]:
+    annealing = restart_slots.hold(config["restarts"]) if config.get("engine") == "anneal" else nullcontext()
+    async with slots, annealing:
+        try:
+            return key, await place_towers_async(config, config["output"] if render else "none")
+        except WorkloadRejected as e:
+            return key, {"error": e.detail, "status_code": e.status_code}
+        except ValueError as e:
+            return key, {"error": str(e), "status_code": 422}
+        except Exception as e:
+            return key, {"error": f"Placement optimization failed: {str(e)}", "status_code": 500}
+
+
+async def place_batch(configs: List[dict], render: bool = False) -> AsyncIterator[dict]:
+    """
+    Yield {"index", "config_key", "duplicate_of", "result" | "error"} per config as
+    layouts complete (duplicates right after their first occurrence), then
+    {"summary": {...}} with one row per config in input order.
+    """
+    started = time.perf_counter()
+    groups: Dict[str, List[int]] = {}
+    for i, config in enumerate(configs):
+        groups.setdefault(config_key(config, render), []).append(i)
+    keys = list(groups)
+    key_index = {key: k for k, key in enumerate(keys)}
+    slots = asyncio.Semaphore(PLACEMENT_BATCH_CONCURRENCY)
+    restart_slots = _RestartSlots(WORKLOAD_QUEUE_LIMITS["anneal"])
+    tasks = [asyncio.ensure_future(_place(key, configs[groups[key][0]], render, slots, restart_slots)) for key in keys]
+
+    rows: List[dict] = [None] * len(configs)
+    try:
+        for done in asyncio.as_completed(tasks):
+            key, outcome = await done
+            first, *duplicates = groups[key]
+            failed = "error" in outcome
+            (_FAILED if failed else _COMPUTED).inc()
+            _DUPLICATE.inc(len(duplicates))
+            for i in (first, *duplicates):
+                row = {"index": i, "config_key": key_index[key], "duplicate_of": None if i == first else first}
+                if failed:
+                    row.update(outcome)
+                else:
+                    row["result"] = outcome
+                rows[i] = {
+                    "index": i,
+                    **{field: configs[i][field] for field in SUMMARY_FIELDS},
+                    "total_towers": None if failed else outcome["total_towers"],
+                    **(dict.fromkeys(("towers_per_100m2", "packing_ratio")) if failed else packing(configs[i], outcome["total_towers"])),
+                }
+                yield row
+    finally:
+        # the client went away: don't keep computing layouts nobody will read
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "summary": {
+            "configs": len(configs),
+            "unique_configs": len(keys),
+            "failed": sum(1 for row in rows if row["total_towers"] is None),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "rows": rows,
+        }
+    }
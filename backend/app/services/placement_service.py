@@ -1,8 +1,14 @@
+import time
 import uuid
 from pathlib import Path
 
 import math
+from app.services.annealing_service import Site, anneal_tower_placement_async, lattice_positions
+from app.services.executor import run_workload
+from app.services.microclimate_service import compute_microclimate
 from app.services.optimization_service import greedy_tower_placement, generate_placement_image
+from app.services.static_service import publish_image
+from app.services.tile_service import save_layout
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
@@ -13,35 +19,60 @@ def optimize_tower_placement(
     min_spacing: float = 2.5,
     max_towers: int = 15,
     cell_size_m: float = None,
+    sensor_points: list = None,
+    interpolation: str = "idw",
+    obstacles: list = None,
+    boundary: list = None,
+    positions: list = None,
+    output: str = "image",
 ):
-    # Use the greedy placer that respects spacing and max_towers
-    positions = greedy_tower_placement(
-        farm_length=farm_length,
-        farm_width=farm_width,
-        min_spacing=min_spacing,
-        max_towers=max_towers,
-    )
+    if positions is not None:
+        # layout computed elsewhere (the annealing engine); only render and describe it
+        pass
+    elif obstacles or boundary:
+        # hex lattice minus the points that fall in keep-out areas or outside the boundary
+        positions = lattice_positions(Site(farm_length, farm_width, min_spacing, obstacles or (), boundary), max_towers)
+    else:
+        # Use the greedy placer that respects spacing and max_towers
+        positions = greedy_tower_placement(
+            farm_length=farm_length,
+            farm_width=farm_width,
+            min_spacing=min_spacing,
+            max_towers=max_towers,
+        )
 
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    image_filename = f"optimized_tower_layout_{uuid.uuid4().hex}.png"
-    image_path = DATA_DIR / image_filename
+    # compute grid metadata to return (use provided cell_size_m if given)
+    cell = cell_size_m if (cell_size_m and cell_size_m > 0) else min_spacing
 
-    # Generate visualization; pass optional cell_size_m for grid drawing
-    generate_placement_image(
-        positions=positions,
-        farm_width=farm_width,
-        farm_length=farm_length,
-        min_spacing=min_spacing,
-        cell_size_m=cell_size_m,
-        output_path=str(image_path),
-    )
+    tiles = None
+    image_path = image_url = None
+    if output == "tiles":
+        # tiles are rendered lazily by GET /static/tiles/...; only the layout is stored here
+        tiles = save_layout(positions, farm_length, farm_width, min_spacing, cell, obstacles, boundary)
+    elif output == "image":
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        rendered = DATA_DIR / f".render_{uuid.uuid4().hex}.png"
 
-    image_url = "/static/" + image_filename
+        # Generate visualization; pass optional cell_size_m for grid drawing
+        t0 = time.perf_counter()
+        generate_placement_image(
+            positions=positions,
+            farm_width=farm_width,
+            farm_length=farm_length,
+            min_spacing=min_spacing,
+            cell_size_m=cell_size_m,
+            output_path=str(rendered),
+            obstacles=obstacles,
+            boundary=boundary,
+        )
+        # named after its bytes, so the URL can be cached as immutable
+        image_path = publish_image(rendered, "optimized_tower_layout", time.perf_counter() - t0)
 
-    # compute grid metadata to return (use provided cell_size_m if given)
-    cell = cell_size_m if (cell_size_m and cell_size_m > 0) else min_spacing
-    n_cols = max(1, int(math.ceil(farm_width / cell)))
-    n_rows = max(1, int(math.ceil(farm_length / cell)))
+        image_url = "/static/" + image_path.name
+    # x runs along farm_length (columns), y along farm_width (rows), as in tower_positions
+    # and the microclimate heatmap
+    n_cols = max(1, int(math.ceil(farm_length / cell)))
+    n_rows = max(1, int(math.ceil(farm_width / cell)))
     eligible = []
     for (x, y) in positions:
         col = int(x // cell)
@@ -53,15 +84,67 @@ def optimize_tower_placement(
         if label not in eligible:
             eligible.append(label)
 
-    return {
+    result = {
         "total_towers": len(positions),
         "tower_positions": positions,
-        "image_file": str(image_path),
+        "image_file": str(image_path) if image_path else None,
         "image_url": image_url,
+        "image_thumbnail_url": image_url + "?size=thumb" if image_url else None,
         "grid": {
-            "cell_size_m": min_spacing,
+            "cell_size_m": cell,
             "n_rows": n_rows,
             "n_cols": n_cols,
             "eligible_cells": eligible,
         },
     }
+    if tiles:
+        result["tiles"] = tiles
+    if sensor_points:
+        # Per-cell suitability from in-farm sensors, on the same cell size as the grid above
+        result["microclimate"] = compute_microclimate(sensor_points, farm_length, farm_width, cell, positions, interpolation)
+    return result
+
+
+async def place_towers_async(config: dict, output: str = "image", profile=None) -> dict:
+    """
+    The POST /placement/ pipeline for one validated PlacementRequest (as a dict):
+    with engine=anneal the restarts run as "anneal" jobs first, then placement,
+    rendering and the microclimate run as one "render" job. output="none" skips
+    rendering (layout and grid only).
+    """
+    obstacles = config.get("obstacles") or []
+    annealed = None
+    if config.get("engine") == "anneal":
+        # restarts run as separate "anneal" jobs within the shared wall-clock budget
+        annealed = await anneal_tower_placement_async(
+            config["farm_length"],
+            config["farm_width"],
+            config["min_spacing"],
+            config["max_towers"],
+            obstacles=obstacles,
+            boundary=config.get("boundary"),
+            restarts=config["restarts"],
+            time_budget_s=config["time_budget_s"],
+            seed=config.get("seed"),
+        )
+    # Placement + rendering is CPU-bound: run it in the process pool (429 when its queue is full)
+    result = await run_workload(
+        "render",
+        optimize_tower_placement,
+        farm_length=config["farm_length"],
+        farm_width=config["farm_width"],
+        min_spacing=config["min_spacing"],
+        max_towers=config["max_towers"],
+        cell_size_m=config.get("cell_size_m"),
+        sensor_points=config.get("sensor_points") or None,
+        interpolation=config.get("interpolation", "idw"),
+        obstacles=obstacles,
+        boundary=config.get("boundary"),
+        positions=annealed["positions"] if annealed else None,
+        output=output,
+        profile=profile,
+    )
+    result["engine"] = config.get("engine", "hex")
+    if annealed:
+        result["annealing"] = annealed["stats"]
+    return result
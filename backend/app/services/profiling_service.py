@@ -0,0 +1,191 @@
+"""
+Opt-in, per-request CPU and allocation profiling.
+
+A request is profiled only when PROFILING_ADMIN_TOKEN is configured, the
+request carries `X-Profile: 1` (or `?profile=1`) and `X-Admin-Token` matches
+the setting. Everything else goes through `maybe_profile`'s fast path, which
+returns None without touching the request when profiling is disabled.
+
+The CPU profile comes from a sampling thread reading the handler thread's
+stack via sys._current_frames(); allocations come from tracemalloc. Both are
+process-wide resources, so only one request is profiled at a time.
+"""
+import collections
+import hmac
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from app.core.config import (
+    PROFILE_DIR,
+    PROFILE_RING_SIZE,
+    PROFILE_SAMPLE_INTERVAL_SECONDS,
+    PROFILING_ADMIN_TOKEN,
+)
+
+logger = logging.getLogger("aeroponic.profiling")
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+TOP_ALLOCATION_SITES = 25
+
+_profiling_lock = threading.Lock()
+_ring_lock = threading.Lock()
+
+
+def is_admin(token: Optional[str]) -> bool:
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILING_ADMIN_TOKEN.encode())
+
+
+def maybe_profile(request, response, route: str) -> Optional["RequestProfile"]:
+    """
+    Return a RequestProfile context manager if the request opted in, else None.
+    Pass it to run_workload(..., profile=...), which runs profiled calls inline
+    on a worker thread so the sampler sees the actual work.
+    """
+    if not PROFILING_ADMIN_TOKEN:
+        return None
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not flag or flag in ("0", "false"):
+        return None
+    if not is_admin(request.headers.get("x-admin-token")):
+        response.headers["X-Profile-Status"] = "forbidden"
+        return None
+    return RequestProfile(route, response)
+
+
+def run_profiled(profile: "RequestProfile", fn, *args, **kwargs):
+    with profile:
+        return fn(*args, **kwargs)
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, target_ident: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """Profiles the current thread between __enter__ and __exit__ and stores the result."""
+
+    def __init__(self, route: str, response):
+        self.route = route
+        self.response = response
+        self.profile_id = uuid.uuid4().hex
+        self._sampler = None
+        self._owns_tracemalloc = False
+
+    def __enter__(self):
+        if not _profiling_lock.acquire(blocking=False):
+            self.response.headers["X-Profile-Status"] = "busy"
+            return self
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        self._sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_SECONDS)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._sampler is None:
+            return False
+        try:
+            wall = time.perf_counter() - self._start
+            self._sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+        finally:
+            _profiling_lock.release()
+
+        stats = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]).statistics("lineno")[:TOP_ALLOCATION_SITES]
+        profile = {
+            "id": self.profile_id,
+            "route": self.route,
+            "created": time.time(),
+            "wall_seconds": wall,
+            "failed": exc_type is not None,
+            "sample_interval_seconds": PROFILE_SAMPLE_INTERVAL_SECONDS,
+            "samples": self._sampler.samples,
+            "collapsed_stacks": [f"{stack} {count}" for stack, count in self._sampler.stacks.most_common()],
+            "peak_traced_bytes": peak,
+            "top_allocations": [
+                {"site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size_bytes": s.size, "count": s.count}
+                for s in stats
+            ],
+        }
+        try:
+            store_profile(profile)
+            self.response.headers["X-Profile-Id"] = self.profile_id
+        except OSError as e:
+            logger.error(f"Failed to store profile {self.profile_id}: {e}")
+            self.response.headers["X-Profile-Status"] = "store-failed"
+        return False
+
+
+# ---------------------------------------------
+# ON-DISK RING
+# ---------------------------------------------
+def store_profile(profile: dict) -> Path:
+    """Write a profile and evict the oldest ones beyond PROFILE_RING_SIZE."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{profile['id']}.json"
+    with _ring_lock:
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(profile))
+        tmp.replace(path)
+        for old in list_profile_files()[PROFILE_RING_SIZE:]:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def list_profile_files() -> List[Path]:
+    """Stored profiles, newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    return sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = PROFILE_DIR / f"{profile_id}.json"
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,258 @@
+"""
+Tower self-shading: how much direct sun each tower of a layout gets once its
+neighbours' shadows are taken into account.
+
+Towers are vertical cylinders of one height and radius on flat ground. The sun path
+comes from the solar declination and hour angle at the site latitude, in local solar
+time, on every day of the date range. At each time step a tower's sun-facing
+silhouette is sampled along SHADING_LATERAL_SAMPLES vertical lines. A ray from the
+tower surface towards the sun is blocked when it enters another cylinder below its
+top, so each line is shaded from the ground up to the highest such point, and the
+tower's sunlit share at that step is the unshaded share of its silhouette.
+
+Everything is vectorized over (occluder pair x time step x line):
+
+- a spatial grid with cells as wide as the longest possible shadow gives the pairs
+  that can shade each other at all;
+- per pair, only the time steps whose sun azimuth points from the tower at the
+  occluder (within the angle the two cylinders subtend) are tested, found with a
+  binary search over the steps sorted by azimuth;
+- the shadow heights are reduced per (tower, step, line) with np.maximum.at.
+
+Sunlight below SHADING_MIN_ELEVATION_DEG is ignored by the simulation and by the
+clear-sky reference alike; it carries little energy and would make shadows
+arbitrarily long.
+"""
+import datetime as dt
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    HEATMAP_QUANTIZATION,
+    SHADING_LATERAL_SAMPLES,
+    SHADING_MAX_DAYS,
+    SHADING_MIN_ELEVATION_DEG,
+)
+from app.core.crop_catalog import READING_COLUMNS
+from app.services.ml_service import score_readings
+from app.services.optimization_service import greedy_tower_placement
+
+# (tower x step x line) cells of one shadow buffer, and (pair x step) candidates per batch
+_CHUNK_CELLS = 1 << 22
+_CANDIDATE_BATCH = 1 << 19
+_SUNLIGHT = READING_COLUMNS.index("sunlight_hours")
+_QUANT_STEPS = np.array([HEATMAP_QUANTIZATION[c] for c in READING_COLUMNS])
+
+
+def declination(day_of_year: np.ndarray) -> np.ndarray:
+    """Solar declination in radians (Spencer's Fourier series)."""
+    g = 2 * np.pi * (np.asarray(day_of_year) - 1) / 365.0
+    return (
+        0.006918 - 0.399912 * np.cos(g) + 0.070257 * np.sin(g)
+        - 0.006758 * np.cos(2 * g) + 0.000907 * np.sin(2 * g)
+        - 0.002697 * np.cos(3 * g) + 0.00148 * np.sin(3 * g)
+    )
+
+
+def sun_path(
+    latitude: float,
+    start: dt.date,
+    end: dt.date,
+    step_minutes: int = 15,
+    orientation_deg: float = 0.0,
+    min_elevation_deg: float = SHADING_MIN_ELEVATION_DEG,
+) -> Tuple[np.ndarray, int]:
+    """
+    Unit sun directions (steps x 3: farm x, farm y, up) at the midpoints of
+    step_minutes intervals from start to end (inclusive), keeping only steps with the
+    sun above min_elevation_deg, and the number of days. orientation_deg is the
+    compass bearing of the farm's +y axis (0: +y north, +x east).
+    """
+    days = (end - start).days + 1
+    if days < 1:
+        raise ValueError("end_date must not be before start_date")
+    if days > SHADING_MAX_DAYS:
+        raise ValueError(f"At most {SHADING_MAX_DAYS} days per simulation")
+    if not 1 <= step_minutes <= 60:
+        raise ValueError("step_minutes must be between 1 and 60")
+    doy = np.array([(start + dt.timedelta(days=d)).timetuple().tm_yday for d in range(days)])
+    delta = declination(doy)[:, None]
+    hour_angle = np.radians(15.0 * ((np.arange(24 * 60 // step_minutes) + 0.5) * step_minutes / 60.0 - 12.0))[None, :]
+    phi = math.radians(latitude)
+    east = -np.cos(delta) * np.sin(hour_angle)
+    north = np.sin(delta) * math.cos(phi) - np.cos(delta) * math.sin(phi) * np.cos(hour_angle)
+    up = math.sin(phi) * np.sin(delta) + math.cos(phi) * np.cos(delta) * np.cos(hour_angle)
+    theta = math.radians(orientation_deg)
+    x = east * math.cos(theta) - north * math.sin(theta)
+    y = north * math.cos(theta) + east * math.sin(theta)
+    keep = up > math.sin(math.radians(min_elevation_deg))
+    return np.column_stack([x[keep], y[keep], up[keep]]), days
+
+
+def candidate_pairs(xy: np.ndarray, reach: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(tower, occluder) index pairs closer than reach, found through a grid of reach-wide cells."""
+    cells = np.floor((xy - xy.min(axis=0)) / reach).astype(np.int64)
+    stride = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * stride + cells[:, 1] + 1
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    towers, occluders = [], []
+    for ox in (-1, 0, 1):
+        for oy in (-1, 0, 1):
+            target = keys + ox * stride + oy
+            lo = np.searchsorted(sorted_keys, target, side="left")
+            counts = np.searchsorted(sorted_keys, target, side="right") - lo
+            i = np.repeat(np.arange(len(xy)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            towers.append(i)
+            occluders.append(order[np.repeat(lo, counts) + offsets])
+    i, j = np.concatenate(towers), np.concatenate(occluders)
+    d = np.hypot(*(xy[j] - xy[i]).T)
+    keep = (i != j) & (d < reach)
+    return i[keep], j[keep]
+
+
+def _shadow_chunk(xy, i, j, sun, height, radius, lateral) -> np.ndarray:
+    """Highest shadow point on every (tower, step, line) for the time steps in `sun`."""
+    n_steps, k = len(sun), len(lateral)
+    horizontal = np.hypot(sun[:, 0], sun[:, 1])
+    ux, uy, tan_elevation = sun[:, 0] / horizontal, sun[:, 1] / horizontal, sun[:, 2] / horizontal
+    azimuth = np.arctan2(uy, ux)
+    order = np.argsort(azimuth)
+    wrapped = np.concatenate([azimuth[order], azimuth[order] + 2 * np.pi])
+
+    delta = xy[j] - xy[i]
+    d = np.hypot(delta[:, 0], delta[:, 1])
+    # the sun must point from the tower at the occluder within the angle both cylinders subtend
+    half_angle = np.arcsin(np.minimum(1.0, 2 * radius / d)) + 1e-9
+    low = np.mod(np.arctan2(delta[:, 1], delta[:, 0]) - half_angle + np.pi, 2 * np.pi) - np.pi
+    lo = np.searchsorted(wrapped, low, side="left")
+    counts = np.searchsorted(wrapped, low + 2 * half_angle, side="right") - lo
+
+    shadow = np.zeros(len(xy) * n_steps * k)
+    surface = np.sqrt(radius ** 2 - lateral ** 2)
+    ends = np.cumsum(counts)
+    first = 0
+    while first < len(counts):
+        last = max(int(np.searchsorted(ends, ends[first] - counts[first] + _CANDIDATE_BATCH // k, side="right")), first + 1)
+        c = counts[first:last]
+        pair = np.repeat(np.arange(first, last), c)
+        step = order[(np.repeat(lo[first:last], c) + np.arange(c.sum()) - np.repeat(np.cumsum(c) - c, c)) % n_steps]
+        first = last
+        along = delta[pair, 0] * ux[step] + delta[pair, 1] * uy[step]
+        across = delta[pair, 1] * ux[step] - delta[pair, 0] * uy[step]
+        # rays enter the occluder at least `along - 2 radius` out; most pass over its top
+        near = height - (along - 2 * radius) * tan_elevation[step] > 0
+        pair, step, along, across = pair[near], step[near], along[near], across[near]
+        # each line's ray starts on the tower surface and runs along the sun azimuth
+        offset = across[:, None] - lateral[None, :]
+        inside = np.abs(offset) < radius
+        entry = along[:, None] - surface[None, :] - np.sqrt(np.maximum(radius ** 2 - offset ** 2, 0.0))
+        top = height - entry * tan_elevation[step][:, None]
+        hit = inside & (entry > 0) & (top > 0)
+        rows, lines = np.nonzero(hit)
+        cells = (i[pair[rows]] * n_steps + step[rows]) * k + lines
+        np.maximum.at(shadow, cells, np.minimum(top[rows, lines], height))
+    return shadow.reshape(len(xy), n_steps, k)
+
+
+def shade_towers(
+    towers: Sequence[Tuple[float, float]],
+    height: float,
+    radius: float,
+    latitude: float,
+    start: dt.date,
+    end: dt.date,
+    step_minutes: int = 15,
+    orientation_deg: float = 0.0,
+) -> dict:
+    """
+    Mean daily hours of direct sun per tower (`sunlight_hours`, each step weighted by
+    the sunlit share of the tower's silhouette), the same for an unshaded tower
+    (`clear_sky_hours`) and their ratio (`sun_fraction`, 1 when the sun never clears
+    the minimum elevation).
+    """
+    xy = np.array(towers, dtype=float).reshape(-1, 2)
+    if not len(xy):
+        raise ValueError("At least one tower is required")
+    if height <= 0 or radius <= 0:
+        raise ValueError("Tower height and radius must be positive")
+    sun, days = sun_path(latitude, start, end, step_minutes, orientation_deg)
+    step_hours = step_minutes / 60.0
+    lit = np.zeros(len(xy))
+    lateral = radius * ((np.arange(SHADING_LATERAL_SAMPLES) + 0.5) * 2 / SHADING_LATERAL_SAMPLES - 1)
+    pairs = 0
+    if len(sun) and len(xy) > 1:
+        # the longest shadow falls at the lowest sun
+        reach = 2 * radius + height * float(np.max(np.hypot(sun[:, 0], sun[:, 1]) / sun[:, 2]))
+        i, j = candidate_pairs(xy, reach)
+        if np.any(np.hypot(*(xy[j] - xy[i]).T) < 2 * radius):
+            raise ValueError("Towers overlap: spacing must exceed the tower diameter")
+        pairs = len(i) // 2
+        chunk = max(1, _CHUNK_CELLS // (len(xy) * len(lateral)))
+        for first in range(0, len(sun), chunk):
+            shadow = _shadow_chunk(xy, i, j, sun[first:first + chunk], height, radius, lateral)
+            lit += (1.0 - shadow.mean(axis=2) / height).sum(axis=1)
+    else:
+        lit += len(sun)
+    clear = len(sun) * step_hours / days
+    hours = lit * step_hours / days
+    return {
+        "days": days,
+        "sun_steps": len(sun),
+        "occluder_pairs": pairs,
+        "clear_sky_hours": round(clear, 3),
+        "sunlight_hours": np.round(hours, 3).tolist(),
+        "sun_fraction": np.round(hours / clear if clear else np.ones(len(xy)), 4).tolist(),
+    }
+
+
+def shaded_readings(readings: Sequence[float], sun_fraction: Sequence[float]) -> np.ndarray:
+    """One reading row per tower: `readings` with sunlight_hours scaled by the tower's sun fraction."""
+    rows = np.tile(np.asarray(readings, dtype=float), (len(sun_fraction), 1))
+    rows[:, _SUNLIGHT] *= np.asarray(sun_fraction, dtype=float)
+    return rows
+
+
+def simulate_shading(
+    towers: Optional[Sequence[Tuple[float, float]]],
+    height: float,
+    radius: float,
+    latitude: float,
+    start: dt.date,
+    end: dt.date,
+    step_minutes: int = 15,
+    orientation_deg: float = 0.0,
+    readings: Optional[Sequence[float]] = None,
+    layout: Optional[dict] = None,
+) -> dict:
+    """
+    shade_towers for `towers` or the towers placed from `layout` (greedy_tower_placement
+    arguments), plus, when site `readings` (READING_COLUMNS order, sunlight_hours as
+    measured in the open) are given, every tower scored in one score_readings batch
+    with its own shaded sunlight hours.
+    """
+    if (towers is None) == (layout is None):
+        raise ValueError("Provide exactly one of towers or layout")
+    if layout is not None:
+        towers = greedy_tower_placement(**layout)
+    result = shade_towers(towers, height, radius, latitude, start, end, step_minutes, orientation_deg)
+    result["tower_x"], result["tower_y"] = (np.array(towers, dtype=float).reshape(-1, 2).T).tolist()
+    if readings is None:
+        return result
+    rows = shaded_readings(readings, result["sun_fraction"])
+    batch = score_readings(rows, quantization=_QUANT_STEPS)
+    crops = batch["crops"]
+    scored = batch["valid"] & ~batch["rule_rejected"] & ~batch["impossible"]
+    confidence = np.where(scored[:, None], batch["confidence"], np.nan)
+    result["scores"] = {
+        "crops": crops,
+        "effective_sunlight_hours": np.round(rows[:, _SUNLIGHT], 3).tolist(),
+        "recommended_crop": [crops[r] if r >= 0 else None for r in batch["recommended"].tolist()],
+        "suitability_class": batch["suitability_class"].tolist(),
+        "confidence": [[None if math.isnan(v) else v for v in row] for row in confidence.tolist()],
+        "model_rows": batch["model_rows"],
+    }
+    return result
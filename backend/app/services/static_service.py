@@ -0,0 +1,199 @@
+"""
+Compact, cacheable variants of generated layout images.
+
+Layout PNGs are named after a hash of their bytes (optimized_tower_layout_<16 hex>.png),
+so a URL never changes meaning and can be cached forever. Smaller encodings of each
+image are produced once, on first request, and kept under STATIC_VARIANT_DIR:
+
+- png8: palettized (IMAGE_PALETTE_COLORS colours) and optimized PNG. The layouts are
+  flat-coloured charts, so this is about 4x smaller than the 220 dpi original, but lossy:
+  it is only sent when asked for.
+- webp: lossless WebP, only when Pillow was built with WebP support.
+- thumb: any of the formats above, IMAGE_THUMBNAIL_PX on the long side.
+
+A variant is named "<size>.<format>" (full.png is the original). Each encoded file has
+a JSON sidecar with its size in bytes and the time it took to encode; the original's
+sidecar holds the render time.
+"""
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from PIL import Image, features
+
+from app.core.config import IMAGE_PALETTE_COLORS, IMAGE_THUMBNAIL_PX
+from app.core.telemetry import IMAGE_ENCODE_SECONDS
+from app.core.utils import atomic_write
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "data"
+STATIC_VARIANT_DIR = STATIC_DIR / "variants"
+
+FORMATS = {"png": "image/png", "png8": "image/png", "webp": "image/webp"}
+SIZES = ("full", "thumb")
+ORIGINAL = "full.png"
+
+IMAGE_STEM = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+HASHED_STEM = re.compile(r"_([0-9a-f]{16})$")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=1)
+def webp_supported() -> bool:
+    return bool(features.check("webp"))
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in FORMATS if fmt != "webp" or webp_supported()]
+
+
+def stem_hash(stem: str) -> Optional[str]:
+    """The content hash embedded in the image name, None for names that are not content-hashed."""
+    match = HASHED_STEM.search(stem)
+    return match.group(1) if match else None
+
+
+def _sidecar(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
+
+
+def publish_image(rendered: Path, prefix: str, render_seconds: float) -> Path:
+    """Move a freshly rendered PNG to its content-hashed name and record its size and render time."""
+    data = rendered.read_bytes()
+    path = STATIC_DIR / f"{prefix}_{content_hash(data)}.png"
+    os.replace(rendered, path)
+    STATIC_VARIANT_DIR.mkdir(parents=True, exist_ok=True)
+    info = {"variant": ORIGINAL, "bytes": len(data), "encode_seconds": round(render_seconds, 4)}
+    atomic_write(_sidecar(STATIC_VARIANT_DIR / path.name), json.dumps(info).encode())
+    return path
+
+
+def original_path(stem: str) -> Optional[Path]:
+    if not IMAGE_STEM.match(stem):
+        return None
+    path = STATIC_DIR / f"{stem}.png"
+    return path if path.is_file() else None
+
+
+def variant_path(stem: str, variant: str) -> Path:
+    if variant == ORIGINAL:
+        return STATIC_DIR / f"{stem}.png"
+    size, fmt = variant.split(".")
+    return STATIC_VARIANT_DIR / f"{stem}.{size}.{fmt}.{'webp' if fmt == 'webp' else 'png'}"
+
+
+def variant_info(stem: str, variant: str) -> Optional[dict]:
+    """Size and encode time of a variant that exists, None if it has not been encoded yet."""
+    path = variant_path(stem, variant)
+    sidecar = _sidecar(STATIC_VARIANT_DIR / path.name)
+    if sidecar.exists():
+        return json.loads(sidecar.read_text())
+    if variant == ORIGINAL and path.is_file():
+        # images rendered before content hashing have no sidecar
+        return {"variant": ORIGINAL, "bytes": path.stat().st_size, "encode_seconds": None}
+    return None
+
+
+def encode_image(source: Path, variant: str) -> bytes:
+    size, fmt = variant.split(".")
+    with Image.open(source) as original:
+        image = original.convert("RGB")
+    if size == "thumb":
+        image.thumbnail((IMAGE_THUMBNAIL_PX, IMAGE_THUMBNAIL_PX), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    if fmt == "png8":
+        image.quantize(colors=IMAGE_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE).save(buffer, "PNG", optimize=True)
+    elif fmt == "webp":
+        image.save(buffer, "WEBP", lossless=True, method=4)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def encode_variant(stem: str, variant: str) -> Optional[dict]:
+    """Encode one variant from the original (once) and return its info; None for an unknown image."""
+    info = variant_info(stem, variant)
+    if info is not None:
+        return info
+    source = original_path(stem)
+    if source is None:
+        return None
+
+    t0 = time.perf_counter()
+    data = encode_image(source, variant)
+    elapsed = time.perf_counter() - t0
+
+    path = variant_path(stem, variant)
+    STATIC_VARIANT_DIR.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, data)
+    info = {"variant": variant, "bytes": len(data), "encode_seconds": round(elapsed, 4)}
+    atomic_write(_sidecar(path), json.dumps(info).encode())
+    IMAGE_ENCODE_SECONDS.labels(variant).observe(elapsed)
+    return info
+
+
+def accepts_webp(accept: Optional[str]) -> bool:
+    """Only an explicit image/webp entry counts; */* clients (curl, scripts) keep getting PNG."""
+    for part in (accept or "").split(","):
+        media, _, params = part.strip().partition(";")
+        if media.strip().lower() == "image/webp":
+            q = params.replace(" ", "").partition("q=")[2]
+            try:
+                return float(q) > 0 if q else True
+            except ValueError:
+                return True
+    return False
+
+
+def negotiate_variant(size: str, fmt: Optional[str], accept: Optional[str]) -> str:
+    """
+    The requested format, else lossless WebP for clients that list image/webp, else PNG
+    (the original bytes at full size). The lossy png8 is never picked on the client's behalf.
+    """
+    if not fmt:
+        fmt = "webp" if webp_supported() and accepts_webp(accept) else "png"
+    return f"{size}.{fmt}"
+
+
+def resolve_variant(stem: str, size: str = "full", fmt: Optional[str] = None, accept: Optional[str] = None, encode: bool = True) -> Optional[Tuple[str, Path]]:
+    """
+    The variant to send for a request as (variant, path). A missing variant is encoded
+    first unless encode=False, in which case None means "not cached yet".
+    """
+    if original_path(stem) is None:
+        return None
+    variant = negotiate_variant(size, fmt, accept)
+    info = encode_variant(stem, variant) if encode else variant_info(stem, variant)
+    if info is None:
+        return None
+    return variant, variant_path(stem, variant)
+
+
+def report_variants(stem: str) -> Optional[dict]:
+    """Encode every variant of an image (once) and report bytes and encode time for each."""
+    if original_path(stem) is None:
+        return None
+    original = variant_info(stem, ORIGINAL)
+    variants = []
+    for size in SIZES:
+        for fmt in available_formats():
+            info = dict(encode_variant(stem, f"{size}.{fmt}"))
+            info["media_type"] = FORMATS[fmt]
+            info["ratio"] = round(info["bytes"] / original["bytes"], 4)
+            info["url"] = f"/static/{stem}.png?format={fmt}" + ("&size=thumb" if size == "thumb" else "")
+            variants.append(info)
+    return {
+        "image": f"{stem}.png",
+        "content_hashed": stem_hash(stem) is not None,
+        "original_bytes": original["bytes"],
+        "render_seconds": original["encode_seconds"],
+        "variants": variants,
+    }
@@ -0,0 +1,464 @@
+"""
+Streaming sensor ingestion with rolling windows and change-triggered rescoring.
+
+Towers push readings over WebSocket or NDJSON (see api/stream.py). A reading is
+only folded into its tower's ring of STREAM_BUCKET_SECONDS-wide buckets (count,
+sum, min, max per feature); nothing is scored on ingest. All towers share slab
+arrays with one row per tower, so memory is fixed by STREAM_MAX_TOWERS (least
+recently updated towers are evicted beyond that) and aggregates for many towers
+are computed in one vectorized step.
+
+Every STREAM_RESCORE_INTERVAL_SECONDS the rescorer takes the towers updated since
+the previous pass and builds a key from each one's windowed mean: the mean
+quantized to STREAM_QUANTIZATION bins plus its validation, gating and
+impossible-condition outcome. Only towers whose key changed are scored, together
+in one score_readings call on the predict workload. Subscribers receive an event
+only when a tower's result differs from the last one sent. When a new model version
+is served (see app/models/registry.py), every tower is rescored once the workers
+have had time to load it.
+
+All state is owned by the event loop thread, so no locks are needed.
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from app.core.config import (
+    MODEL_RELOAD_CHECK_SECONDS,
+    STREAM_BUCKET_SECONDS,
+    STREAM_MAX_TOWERS,
+    STREAM_QUANTIZATION,
+    STREAM_RESCORE_INTERVAL_SECONDS,
+    STREAM_SUBSCRIBER_QUEUE,
+    STREAM_WINDOWS_SECONDS,
+)
+from app.core.crop_catalog import READING_COLUMNS
+from app.core.schemas import SensorReading
+from app.core.telemetry import STREAM_EVENTS, STREAM_READINGS, STREAM_TOWER_CHECKS, STREAM_TOWERS
+from app.models.crop_recommendation import get_model_version, is_model_available
+from app.services.executor import WorkloadRejected, run_workload
+from app.services.ml_service import (
+    gating_mask,
+    impossible_mask,
+    score_readings,
+    validate_and_gate_inputs,
+    validate_inputs,
+    validation_mask,
+)
+
+logger = logging.getLogger("aeroponic.stream")
+
+MAX_REPORTED_ERRORS = 100
+N_FEATURES = len(READING_COLUMNS)
+_QUANT_STEPS = np.array([STREAM_QUANTIZATION[c] for c in READING_COLUMNS])
+
+_ACCEPTED = STREAM_READINGS.labels("accepted")
+_REJECTED = STREAM_READINGS.labels("rejected")
+_SKIPPED = STREAM_TOWER_CHECKS.labels("skipped")
+_RESCORED = STREAM_TOWER_CHECKS.labels("rescored")
+_DEFERRED = STREAM_TOWER_CHECKS.labels("deferred")
+_SENT = STREAM_EVENTS.labels("sent")
+_DROPPED = STREAM_EVENTS.labels("dropped")
+
+
+class TowerStore:
+    """Bucketed ring buffers for up to `max_towers` towers, one slab row per tower."""
+
+    def __init__(
+        self,
+        max_towers: int = STREAM_MAX_TOWERS,
+        bucket_seconds: float = STREAM_BUCKET_SECONDS,
+        windows: Iterable[float] = STREAM_WINDOWS_SECONDS,
+        initial_capacity: int = 64,
+    ):
+        self.max_towers = max_towers
+        self.bucket_seconds = bucket_seconds
+        self.windows = list(windows)
+        self.n_buckets = max(1, math.ceil(max(self.windows) / bucket_seconds))
+        # tower id -> slab row, least recently updated first
+        self.rows: "OrderedDict[str, int]" = OrderedDict()
+        self.tower_ids: List[Optional[str]] = []
+        self.dirty: Set[int] = set()
+        # last pushed event per tower
+        self.events: Dict[str, dict] = {}
+        self.capacity = 0
+        self._grow(min(initial_capacity, max_towers))
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - self.capacity
+        b, f = self.n_buckets, N_FEATURES
+
+        def extend(name, shape, fill, dtype):
+            block = np.full((extra,) + shape, fill, dtype=dtype)
+            current = getattr(self, name, None)
+            setattr(self, name, block if current is None else np.concatenate([current, block]))
+
+        extend("bucket_id", (b,), -1, np.int64)
+        extend("newest", (), -1, np.int64)
+        extend("count", (b,), 0, np.int32)
+        extend("sums", (b, f), 0.0, np.float64)
+        extend("mins", (b, f), np.inf, np.float32)
+        extend("maxs", (b, f), -np.inf, np.float32)
+        # last rescoring key: quantized mean bins + validation, gating and impossible outcome
+        extend("keys", (f + 3,), 0, np.int64)
+        extend("has_key", (), False, bool)
+        self.tower_ids.extend([None] * extra)
+        self.capacity = capacity
+
+    def _reset_row(self, row: int) -> None:
+        self.bucket_id[row] = -1
+        self.newest[row] = -1
+        self.count[row] = 0
+        self.sums[row] = 0.0
+        self.mins[row] = np.inf
+        self.maxs[row] = -np.inf
+        self.has_key[row] = False
+
+    def _assign(self, tower_id: str) -> int:
+        if len(self.rows) < self.capacity:
+            row = len(self.rows)
+        elif self.capacity < self.max_towers:
+            row = self.capacity
+            self._grow(min(self.capacity * 2, self.max_towers))
+        else:
+            evicted, row = self.rows.popitem(last=False)
+            self.events.pop(evicted, None)
+            self.dirty.discard(row)
+            self._reset_row(row)
+        self.rows[tower_id] = row
+        self.tower_ids[row] = tower_id
+        return row
+
+    def add(self, tower_id: str, values, timestamp: float) -> bool:
+        """Fold one reading into the tower's current bucket. Returns False for readings older than the ring."""
+        row = self.rows.get(tower_id)
+        if row is None:
+            row = self._assign(tower_id)
+        else:
+            self.rows.move_to_end(tower_id)
+        bucket = int(timestamp // self.bucket_seconds)
+        if bucket <= self.newest[row] - self.n_buckets:
+            return False
+        self.newest[row] = max(self.newest[row], bucket)
+        j = bucket % self.n_buckets
+        if self.bucket_id[row, j] != bucket:
+            self.bucket_id[row, j] = bucket
+            self.count[row, j] = 0
+            self.sums[row, j] = 0.0
+            self.mins[row, j] = np.inf
+            self.maxs[row, j] = -np.inf
+        values = np.asarray(values, dtype=float)
+        self.count[row, j] += 1
+        self.sums[row, j] += values
+        np.minimum(self.mins[row, j], values, out=self.mins[row, j], casting="unsafe")
+        np.maximum(self.maxs[row, j], values, out=self.maxs[row, j], casting="unsafe")
+        self.dirty.add(row)
+        return True
+
+    def aggregates(self, rows: np.ndarray, window: float, now: float):
+        """(count, mean, min, max) over the last `window` seconds for each row; NaN where empty."""
+        # Buckets in the window sit at the same ring slots for every tower, so only those are gathered
+        n_recent = min(self.n_buckets, max(1, math.ceil(window / self.bucket_seconds)))
+        recent = int(now // self.bucket_seconds) - np.arange(n_recent)
+        ix = np.ix_(rows, recent % self.n_buckets)
+        in_window = self.bucket_id[ix] == recent
+        count = (self.count[ix] * in_window).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.einsum("rb,rbf->rf", in_window, self.sums[ix]) / count[:, None]
+        lo = np.where(in_window[..., None], self.mins[ix], np.inf).min(axis=1)
+        hi = np.where(in_window[..., None], self.maxs[ix], -np.inf).max(axis=1)
+        empty = count == 0
+        lo[empty] = np.nan
+        hi[empty] = np.nan
+        return count, mean, lo, hi
+
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ("bucket_id", "newest", "count", "sums", "mins", "maxs", "keys", "has_key"))
+
+
+class Subscription:
+    """A subscriber's bounded event queue; the oldest event is dropped when it is full."""
+
+    def __init__(self, towers: Optional[Set[str]] = None, maxsize: int = STREAM_SUBSCRIBER_QUEUE):
+        self.towers = towers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event: dict) -> None:
+        if self.towers is not None and event["tower_id"] not in self.towers:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            _DROPPED.inc()
+        self.queue.put_nowait(event)
+        _SENT.inc()
+
+
+_store = TowerStore()
+_subscriptions: Set[Subscription] = set()
+# model version the stored results came from, and when to rescore every tower after it changed
+_scored_version: Optional[str] = None
+_invalidate_at: Optional[float] = None
+
+
+# ---------------------------------------------
+# INGESTION
+# ---------------------------------------------
+def ingest_reading(reading: SensorReading, now: Optional[float] = None) -> bool:
+    values = (
+        reading.temperature, reading.humidity, reading.sunlight_hours,
+        reading.water_ph, reading.air_quality_index, reading.wind_speed,
+    )
+    timestamp = reading.timestamp if reading.timestamp is not None else (now or time.time())
+    ok = _store.add(reading.tower_id, values, timestamp)
+    (_ACCEPTED if ok else _REJECTED).inc()
+    return ok
+
+
+def ingest_lines(lines: Iterable[str], first_line: int = 1) -> Tuple[int, int, List[dict]]:
+    """
+    Ingest NDJSON lines; each line holds one reading object or a JSON array of them.
+    Returns (accepted, rejected, first MAX_REPORTED_ERRORS errors as {"line", "error"}).
+    """
+    accepted = rejected = 0
+    errors: List[dict] = []
+
+    def reject(line_no, message):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_no, "error": message})
+
+    now = time.time()
+    for line_no, line in enumerate(lines, start=first_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            _REJECTED.inc()
+            reject(line_no, f"invalid JSON: {e}")
+            continue
+        for item in payload if isinstance(payload, list) else [payload]:
+            try:
+                reading = SensorReading.model_validate(item)
+            except ValidationError as e:
+                _REJECTED.inc()
+                first = e.errors()[0]
+                reject(line_no, f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+                continue
+            if ingest_reading(reading, now):
+                accepted += 1
+            else:
+                reject(line_no, "reading is older than the rolling window")
+    return accepted, rejected, errors
+
+
+# ---------------------------------------------
+# RESCORING
+# ---------------------------------------------
+def _gate_codes(readings: np.ndarray) -> np.ndarray:
+    """Which validate_and_gate_inputs rule fails first (0 = passes), so a change of reason also counts."""
+    t, ph, aqi = readings[:, 0], readings[:, 3], readings[:, 4]
+    return np.select([(t > 40) | (t < 10), (ph < 4.8) | (ph > 7.2), aqi > 180], [1, 2, 3], 0)
+
+
+def rescoring_keys(means: np.ndarray) -> np.ndarray:
+    bins = np.floor(means / _QUANT_STEPS)
+    return np.column_stack([
+        bins,
+        validation_mask(means),
+        _gate_codes(means),
+        impossible_mask(means) & gating_mask(means),
+    ]).astype(np.int64)
+
+
+def check_updated(store: TowerStore, now: float):
+    """
+    Take the towers updated since the last pass and return (rows, tower ids, means,
+    keys) for those whose rescoring key changed. The others count as skipped.
+    """
+    if not store.dirty:
+        return np.empty(0, dtype=int), [], np.empty((0, N_FEATURES)), np.empty((0, N_FEATURES + 3), dtype=np.int64)
+    rows = np.fromiter(store.dirty, dtype=int, count=len(store.dirty))
+    store.dirty = set()
+    count, means, _, _ = store.aggregates(rows, store.windows[0], now)
+    has_data = count > 0
+    rows, means = rows[has_data], means[has_data]
+    keys = rescoring_keys(means)
+    changed = ~store.has_key[rows] | (store.keys[rows] != keys).any(axis=1)
+    _SKIPPED.inc(int((~changed).sum()))
+    return rows[changed], [store.tower_ids[r] for r in rows[changed]], means[changed], keys[changed]
+
+
+def _tower_result(batch: dict, i: int, reading: np.ndarray) -> dict:
+    t, h, s, ph, aqi, w = reading.tolist()
+    if not batch["valid"][i]:
+        return {"status": "invalid", "detail": validate_inputs(t, h, s, ph, aqi, w), "recommended_crops": [], "scores": []}
+    if batch["rule_rejected"][i]:
+        return {"status": "rule_rejection", "detail": validate_and_gate_inputs(t, ph, aqi)[1], "recommended_crops": [], "scores": []}
+    if batch["impossible"][i]:
+        return {"status": "impossible", "detail": "Environmental conditions are unsuitable for aeroponic crop growth", "recommended_crops": [], "scores": []}
+    crops = batch["crops"]
+    best = batch["recommended"][i]
+    return {
+        "status": "scored",
+        "recommended_crops": [crops[best]] if best >= 0 else [],
+        "scores": [
+            {
+                "crop": crop,
+                "suitability_class": int(batch["suitability_class"][i, j]),
+                "confidence": float(batch["confidence"][i, j]),
+                "agronomic_ok": bool(batch["agronomic_ok"][i, j]),
+            }
+            for j, crop in enumerate(crops)
+        ],
+    }
+
+
+def apply_scores(store: TowerStore, rows, tower_ids, means, keys, batch: dict, now: float) -> List[dict]:
+    """Record new keys and return events for towers whose result changed."""
+    events = []
+    for i, (row, tower_id) in enumerate(zip(rows, tower_ids)):
+        if store.tower_ids[row] != tower_id:
+            continue  # evicted and reused while scoring
+        store.keys[row] = keys[i]
+        store.has_key[row] = True
+        result = _tower_result(batch, i, means[i])
+        previous = store.events.get(tower_id)
+        if previous is not None and all(previous[k] == v for k, v in result.items()):
+            continue
+        event = {
+            "type": "tower_update",
+            "tower_id": tower_id,
+            "timestamp": now,
+            "window_seconds": store.windows[0],
+            "inputs": {c: round(float(v), 3) for c, v in zip(READING_COLUMNS, means[i])},
+            **result,
+        }
+        store.events[tower_id] = event
+        events.append(event)
+    return events
+
+
+def _check_model_version(store: TowerStore, now: float) -> None:
+    """
+    After the served model changes, drop every tower's rescoring key so the next pass
+    scores them all. Pool workers check for a new version at most every
+    MODEL_RELOAD_CHECK_SECONDS, so this waits that long after the change is seen here.
+    """
+    global _scored_version, _invalidate_at
+    version = get_model_version()
+    if version != _scored_version:
+        if _scored_version is not None:
+            _invalidate_at = now + MODEL_RELOAD_CHECK_SECONDS
+        _scored_version = version
+    if _invalidate_at is not None and now >= _invalidate_at:
+        _invalidate_at = None
+        store.dirty.update(np.flatnonzero(store.has_key).tolist())
+        store.has_key[:] = False
+
+
+async def rescore_updated(now: Optional[float] = None) -> int:
+    """One rescoring pass; returns the number of events published."""
+    now = now or time.time()
+    _check_model_version(_store, now)
+    rows, tower_ids, means, keys = check_updated(_store, now)
+    if not len(rows):
+        return 0
+    if not is_model_available():
+        _DEFERRED.inc(len(rows))
+        return 0
+    try:
+        batch = await run_workload("predict", score_readings, means)
+    except WorkloadRejected:
+        # predict queue full: retry these towers on the next pass
+        _store.dirty.update(int(r) for r, t in zip(rows, tower_ids) if _store.tower_ids[r] == t)
+        _DEFERRED.inc(len(rows))
+        return 0
+    _RESCORED.inc(len(rows))
+    events = apply_scores(_store, rows, tower_ids, means, keys, batch, now)
+    for event in events:
+        for subscription in list(_subscriptions):
+            subscription.offer(event)
+    return len(events)
+
+
+async def run_rescorer(interval: float = STREAM_RESCORE_INTERVAL_SECONDS) -> None:
+    """Background task started by the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await rescore_updated()
+        except Exception:
+            logger.exception("Stream rescoring pass failed")
+        _update_gauges()
+
+
+# ---------------------------------------------
+# SUBSCRIBERS AND QUERIES
+# ---------------------------------------------
+def subscribe(towers: Optional[Set[str]] = None) -> Subscription:
+    subscription = Subscription(towers)
+    _subscriptions.add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    _subscriptions.discard(subscription)
+
+
+def latest_events(towers: Optional[Set[str]] = None) -> List[dict]:
+    if towers is None:
+        return list(_store.events.values())
+    return [_store.events[t] for t in towers if t in _store.events]
+
+
+def _as_reading_dict(values: np.ndarray) -> dict:
+    return {c: (None if np.isnan(v) else round(float(v), 3)) for c, v in zip(READING_COLUMNS, values)}
+
+
+def tower_snapshot(tower_id: str, now: Optional[float] = None) -> Optional[dict]:
+    row = _store.rows.get(tower_id)
+    if row is None:
+        return None
+    now = now or time.time()
+    windows = {}
+    for window in _store.windows:
+        count, mean, lo, hi = _store.aggregates(np.array([row]), window, now)
+        windows[f"{window:g}s"] = {
+            "count": int(count[0]),
+            "mean": _as_reading_dict(mean[0]),
+            "min": _as_reading_dict(lo[0]),
+            "max": _as_reading_dict(hi[0]),
+        }
+    return {"tower_id": tower_id, "windows": windows, "latest": _store.events.get(tower_id)}
+
+
+def _update_gauges() -> None:
+    STREAM_TOWERS.labels("tracked").set(len(_store.rows))
+    STREAM_TOWERS.labels("capacity").set(_store.capacity)
+    STREAM_TOWERS.labels("subscribers").set(len(_subscriptions))
+
+
+def stats() -> dict:
+    _update_gauges()
+    return {
+        "towers": len(_store.rows),
+        "max_towers": _store.max_towers,
+        "pending_rescore": len(_store.dirty),
+        "subscribers": len(_subscriptions),
+        "dropped_events": sum(s.dropped for s in _subscriptions),
+        "buffer_bytes": _store.memory_bytes(),
+        "bucket_seconds": _store.bucket_seconds,
+        "windows_seconds": _store.windows,
+    }
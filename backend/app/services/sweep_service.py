@@ -0,0 +1,89 @@
+"""
+What-if sweeps: how every crop's class and confidence change as one or two readings
+move over a grid while the others stay fixed.
+
+The whole grid is scored by ml_service.score_grid: the forest is walked once for all
+points (grid_service), then the usual validation, gating, agronomic rules, penalties and
+recommendations run vectorized over grid x crops. The response holds the axis values
+and arrays shaped like the grid (crops first for per-crop arrays), ready for plotting.
+"""
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from app.core import serialization
+from app.core.config import SWEEP_MAX_POINTS
+from app.services.ml_service import READING_COLUMNS, score_grid
+
+# status codes in the `status` grid
+STATUSES = ("scored", "invalid", "rule_rejected", "impossible")
+
+
+def axis_count(start: float, stop: float, step: float) -> int:
+    return int(math.floor((stop - start) / step + 1e-9)) + 1
+
+
+def axis_values(start: float, stop: float, step: float) -> np.ndarray:
+    """start, start + step, ... up to stop inclusive (within float error), without accumulated drift."""
+    return np.round(start + step * np.arange(axis_count(start, stop, step)), 10)
+
+
+def validate_axes(axes: List[dict]) -> None:
+    """ValueError for repeated variables, empty ranges or grids over SWEEP_MAX_POINTS."""
+    names = [axis["variable"] for axis in axes]
+    if len(set(names)) != len(names):
+        raise ValueError("Each variable can only be swept on one axis")
+    points = 1
+    for axis in axes:
+        if axis["stop"] < axis["start"]:
+            raise ValueError(f"{axis['variable']}: stop must not be below start")
+        points *= axis_count(axis["start"], axis["stop"], axis["step"])
+        if points > SWEEP_MAX_POINTS:
+            raise ValueError(f"The grid has more than {SWEEP_MAX_POINTS} points; use a larger step")
+
+
+def status_codes(result: dict) -> np.ndarray:
+    """score_readings outcome per reading as an index into STATUSES."""
+    status = np.zeros(len(result["valid"]), dtype=np.int8)
+    status[~result["valid"]] = STATUSES.index("invalid")
+    status[result["rule_rejected"]] = STATUSES.index("rule_rejected")
+    status[result["impossible"]] = STATUSES.index("impossible")
+    return status
+
+
+def sweep(base: dict, axes: List[dict], mode: Optional[str] = None) -> dict:
+    """
+    `base` holds every reading column; `axes` is [{"variable", "start", "stop", "step"}]
+    (one or two). Grid arrays are (len(axis 1)[, len(axis 2)]); per-crop arrays have the
+    crop first.
+    """
+    names = [axis["variable"] for axis in axes]
+    values = [axis_values(axis["start"], axis["stop"], axis["step"]) for axis in axes]
+    result = score_grid([base[column] for column in READING_COLUMNS], list(zip(names, values)), mode=mode)
+    shape = tuple(len(v) for v in values)
+
+    def per_crop(array, dtype=None):
+        array = np.moveaxis(np.asarray(array).reshape(shape + (-1,)), -1, 0)
+        return np.ascontiguousarray(array, dtype=dtype)
+
+    return {
+        "variables": names,
+        "axes": {name: v for name, v in zip(names, values)},
+        "shape": list(shape),
+        "fixed": {column: base[column] for column in READING_COLUMNS if column not in names},
+        "crops": list(result["crops"]),
+        "status_labels": list(STATUSES),
+        "status": status_codes(result).reshape(shape),
+        # index into crops, -1 when nothing is recommended
+        "recommended": result["recommended"].reshape(shape),
+        "suitability_class": per_crop(result["suitability_class"], np.int8),
+        "confidence": per_crop(result["confidence"]),
+        "agronomic_ok": per_crop(result["agronomic_ok"]),
+        "model_rows": result["model_rows"],
+    }
+
+
+def sweep_encoded(base: dict, axes: List[dict], mode: Optional[str] = None, fmt: str = "json") -> bytes:
+    """sweep() encoded in the worker, so large grids are not serialized on the event loop."""
+    return serialization.encode(sweep(base, axes, mode), fmt)
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.annealing_service import Site, anneal_tower_placement, hex_lattice
+from app.services.optimization_service import greedy_tower_placement
+
+OBSTACLES = [
+    {"shape": "rect", "x_min": 6.0, "y_min": 5.0, "x_max": 13.4, "y_max": 9.3},
+    {"shape": "circle", "x": 20.0, "y": 16.0, "radius": 3.1},
+]
+
+
+def assert_valid_layout(positions, site):
+    for i, p in enumerate(positions):
+        assert site.allows(*p), p
+        for q in positions[i + 1:]:
+            assert math.dist(p, q) >= site.min_spacing
+
+
+@pytest.mark.parametrize("farm", [(20, 20, 2.5), (37.3, 19.1, 1.7), (10, 10, 0.5)])
+def test_hex_lattice_matches_greedy_placer(farm):
+    assert hex_lattice(*farm) == greedy_tower_placement(*farm, 10 ** 6)
+
+
+def test_annealing_respects_site_and_beats_lattice():
+    site = Site(28, 24, 2.0, OBSTACLES)
+    result = anneal_tower_placement(28, 24, 2.0, 1000, OBSTACLES, restarts=2, time_budget_s=1.0, seed=7)
+    stats = result["stats"]
+    assert_valid_layout(result["positions"], site)
+    assert len(result["positions"]) >= stats["lattice_towers"]
+    assert [run["start"] for run in stats["runs"]] == ["lattice", "poisson_disk"]
+    assert stats["runs"][0]["seed"] != stats["runs"][1]["seed"]
+    assert stats["runs"][0]["history"][-1][1] == stats["runs"][0]["best_towers"]
+
+    # an irregular boundary and a tower cap
+    triangle = [(0, 0), (28, 0), (0, 24)]
+    capped = anneal_tower_placement(28, 24, 2.0, 40, boundary=triangle, restarts=1, time_budget_s=0.5, seed=1)
+    assert len(capped["positions"]) == 40
+    assert_valid_layout(capped["positions"], Site(28, 24, 2.0, boundary=triangle))
+
+
+@pytest.mark.usefixtures("outputs")
+def test_placement_endpoint_engines():
+    client = TestClient(app)
+    body = {"farm_length": 28, "farm_width": 24, "min_spacing": 2.0, "max_towers": 1000, "obstacles": OBSTACLES}
+    hex_result = client.post("/placement/", json=body).json()
+    assert hex_result["engine"] == "hex"
+    assert_valid_layout([tuple(p) for p in hex_result["tower_positions"]], Site(28, 24, 2.0, OBSTACLES))
+
+    body.update(engine="anneal", time_budget_s=0.5, restarts=2, seed=3)
+    response = client.post("/placement/", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["engine"] == "anneal" and result["annealing"]["restarts"] == 2
+    assert result["total_towers"] >= hex_result["total_towers"]
+
+    body["obstacles"] = [{"shape": "hexagon"}]
+    assert client.post("/placement/", json=body).status_code == 422
@@ -0,0 +1,102 @@
+import itertools
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.assignment_service import AssignmentInfeasible, assign_crops, plan_assignment
+from app.services.optimization_service import greedy_tower_placement
+
+CROPS = ["lettuce", "basil", "mint"]
+# two rows of three towers, 2.5 m apart
+TOWERS = [(0.0, 0.0), (2.5, 0.0), (5.0, 0.0), (1.25, 2.2), (3.75, 2.2), (6.25, 2.2)]
+
+
+def brute_force(score, limits, conflict_pairs, neighbours):
+    best = None
+    for combo in itertools.product(range(-1, len(CROPS)), repeat=len(score)):
+        counts = [combo.count(j) for j in range(len(CROPS))]
+        if any(not lo <= n <= hi for n, (lo, hi) in zip(counts, limits)):
+            continue
+        if any(np.isnan(score[i, j]) for i, j in enumerate(combo) if j >= 0):
+            continue
+        if any({combo[i], combo[k]} in conflict_pairs or (combo[i], combo[k]) in conflict_pairs for i, k in neighbours):
+            continue
+        value = sum(score[i, j] for i, j in enumerate(combo) if j >= 0)
+        best = value if best is None else max(best, value)
+    return best
+
+
+def check_feasible(result, score, limits, no_adjacent_same, incompatible, neighbours):
+    crops = [a["crop"] for a in result["assignments"]]
+    for j, crop in enumerate(CROPS):
+        assert limits[j][0] <= crops.count(crop) <= limits[j][1]
+    for i, crop in enumerate(crops):
+        assert crop is None or not np.isnan(score[i, CROPS.index(crop)])
+    for i, k in neighbours:
+        if crops[i] and crops[k]:
+            assert not (crops[i] == crops[k] and crops[i] in no_adjacent_same)
+            assert {crops[i], crops[k]} not in [set(p) for p in incompatible]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_brute_force_and_respects_rules(seed):
+    rng = np.random.default_rng(seed)
+    score = rng.uniform(0, 100, (len(TOWERS), len(CROPS)))
+    score[rng.random(score.shape) < 0.15] = np.nan
+    limits = {"lettuce": {"max": 2}, "basil": {"min": 1}}
+    bounds = [(0, 2), (1, 6), (0, 6)]
+    neighbours = [(0, 1), (1, 2), (0, 3), (1, 3), (1, 4), (2, 4), (2, 5), (3, 4), (4, 5)]
+
+    # without adjacency rules the LP is exact
+    exact = assign_crops(TOWERS, score, CROPS, limits)
+    assert exact["status"] == "optimal" and exact["optimality_gap"] == 0
+    assert exact["total_suitability"] == pytest.approx(brute_force(score, bounds, [], []), abs=1e-3)
+
+    # with rules the result is feasible and within the reported gap of the optimum
+    result = assign_crops(TOWERS, score, CROPS, limits, no_adjacent_same=["mint"], incompatible_pairs=[("lettuce", "basil")], adjacency_m=2.6)
+    assert result["adjacent_pairs"] == len(neighbours)
+    check_feasible(result, score, bounds, ["mint"], [("lettuce", "basil")], neighbours)
+    optimum = brute_force(score, bounds, [(2, 2), {0, 1}], neighbours)
+    assert result["total_suitability"] <= optimum + 1e-3 <= result["upper_bound"] + 2e-3
+    assert result["total_suitability"] >= (1 - result["optimality_gap"]) * result["upper_bound"] - 1e-3
+
+
+def test_infeasible_limits_and_cell_lookup():
+    score = np.full((len(TOWERS), len(CROPS)), 50.0)
+    with pytest.raises(AssignmentInfeasible):
+        assign_crops(TOWERS, score, CROPS, {"mint": {"min": 4}}, no_adjacent_same=["mint"], adjacency_m=2.6)
+
+    # 2 x 3 grid of 2.5 m cells; basil only pays off in the right-hand column
+    grids = {"lettuce": [[10, 10, 10], [10, 10, 10]], "basil": [[0, 0, 90], [None, None, 90]]}
+    result = plan_assignment(towers=TOWERS, cell_suitability=grids, cell_size_m=2.5)
+    assert [a["crop"] for a in result["assignments"]] == ["lettuce", "lettuce", "basil", "lettuce", "lettuce", "basil"]
+
+    # a farm too small for one tower gets an empty assignment
+    small_farm = {"farm_length": 2, "farm_width": 2, "min_spacing": 3, "max_towers": 10}
+    no_towers = plan_assignment(towers=[], suitability=[])
+    for empty in (no_towers, plan_assignment(layout=small_farm, cell_suitability=grids, cell_size_m=2.5)):
+        assert empty["assignments"] == [] and empty["status"] == "optimal" and empty["total_suitability"] == 0
+
+
+def test_assign_endpoint_scales_to_placement_limit():
+    towers = greedy_tower_placement(100, 100, 2.5, 1000)
+    rng = np.random.default_rng(0)
+    suitability = rng.uniform(0, 100, (len(towers), 5)).round(1).tolist()
+    client = TestClient(app)
+    body = {
+        "layout": {"farm_length": 100, "farm_width": 100, "min_spacing": 2.5, "max_towers": 1000},
+        "suitability": suitability,
+        "crop_limits": {"mint": {"max": 50}, "rosemary": {"min": 100}},
+        "no_adjacent_same": ["mint", "basil"],
+        "incompatible_pairs": [["mint", "rosemary"]],
+    }
+    response = client.post("/placement/assign", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["crop_counts"]["mint"] <= 50 and result["crop_counts"]["rosemary"] >= 100
+    assert result["optimality_gap"] < 0.01 and result["elapsed_seconds"] < 1.0
+
+    body["towers"] = towers
+    assert client.post("/placement/assign", json=body).status_code == 422
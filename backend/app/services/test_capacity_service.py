@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.annealing_service import hex_lattice
+from app.services.capacity_service import binding_spacing, binding_spacings, capacity, lattice_counts, spacing_grid
+from app.services.optimization_service import greedy_tower_placement
+
+
+def test_counts_match_the_placer():
+    # 4.1 and 0.7 lose about half of the lattice to rounding; 2.5 and 1.25 lose none
+    configs = [(20, 20, 2.5), (20, 20, 4.1), (14.3, 64, 4.1), (30, 12.5, 0.7), (10, 10, 1.25), (25, 8, 1.37), (3, 3, 4.0)]
+    expected = [len(greedy_tower_placement(length, width, spacing, 10**6)) for length, width, spacing in configs]
+    assert lattice_counts(*map(np.array, zip(*configs))).tolist() == expected
+
+    rng = random.Random(3)
+    configs = []
+    while len(configs) < 300:
+        spacing = rng.choice([round(rng.uniform(0.5, 10), 2), round(rng.uniform(0.5, 10), 1), rng.uniform(0.5, 10)])
+        length, width = (rng.choice([rng.uniform(1, 100), rng.randint(1, 100)]) for _ in range(2))
+        if length * width / spacing ** 2 < 5000:
+            configs.append((length, width, spacing))
+    expected = [len(hex_lattice(*config)) for config in configs]
+    assert lattice_counts(*map(np.array, zip(*configs))).tolist() == expected
+
+
+def test_capacity_caps_and_finds_the_binding_spacing():
+    result = capacity(20, 20, [1.5, 2.5, 4.1], 15, binding=True)
+    assert result["lattice_towers"] == [len(hex_lattice(20, 20, s)) for s in (1.5, 2.5, 4.1)]
+    assert result["total_towers"] == [len(greedy_tower_placement(20, 20, s, 15)) for s in (1.5, 2.5, 4.1)]
+    assert result["max_towers_binding"] == [True, True, False]
+    assert result["towers_per_100m2"] == [3.75, 3.75, 3.0]
+
+    binding = result["binding_spacing"][0]
+    assert len(hex_lattice(20, 20, binding)) >= 15
+    larger = spacing_grid()[spacing_grid() > binding]
+    assert (lattice_counts(20, 20, larger) < 15).all()
+    # rounding makes the count uneven: a smaller spacing can fall short again
+    assert binding > 4.1
+    assert binding_spacing(5, 5, 1000) is None
+    # the search runs for all farm sizes at once and matches the one-by-one result
+    assert binding_spacings([20, 5, 20, 33.3], [20, 5, 20, 18.4], [15, 1000, 15, 200]).tolist() == pytest.approx(
+        [binding, np.nan, binding, binding_spacing(33.3, 18.4, 200)], nan_ok=True
+    )
+    assert "binding_spacing" not in capacity(20, 20, 2.0, 15)
+
+
+def test_lists_must_broadcast():
+    assert capacity([20, 30], 20, 2.0, 1000)["configs"] == 2
+    with pytest.raises(ValueError):
+        capacity([20, 30], [20, 30, 40], 2.0, 1000)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from app.core.config import DRIFT_MIN_READINGS, DRIFT_TRAINING_DATASET
+from app.core.crop_catalog import READING_COLUMNS
+from app.models.crop_recommendation import get_registry_version
+from app.services.drift_service import DriftMonitor, build_reference, histogram
+
+
+def _training_readings() -> np.ndarray:
+    return pd.read_csv(DRIFT_TRAINING_DATASET, usecols=READING_COLUMNS)[READING_COLUMNS].to_numpy(float)
+
+
+def _monitor(reference, window=2000) -> DriftMonitor:
+    monitor = DriftMonitor(window=window)
+    monitor.reference, monitor.reference_version = reference, get_registry_version()
+    return monitor
+
+
+def test_window_counts_match_a_histogram_of_the_latest_readings():
+    rng = np.random.default_rng(1)
+    readings = np.column_stack([rng.uniform(-10, 60, 5000)] + [rng.normal(m, 2, 5000) for m in (60, 8, 6, 100, 1)])
+    # values on bin edges and range ends
+    readings[:6, 0] = [0.0, 0.9, 45.0, -0.1, 44.99, 22.5]
+    single, batched = DriftMonitor(window=1000), DriftMonitor(window=1000)
+    for row in readings.tolist():
+        single.observe(row)
+    for start in range(0, len(readings), 333):
+        batched.observe_batch(readings[start:start + 333])
+    assert np.array_equal(single.window_counts(), batched.window_counts())
+    assert single.observed == batched.observed == 5000
+    # 4 sub-windows of 250 and 5000 readings: the newest sub-window was just cleared
+    counts = single.window_counts()
+    latest = readings[-int(counts[0].sum()):]
+    assert len(latest) == 750
+    expected = [histogram(latest[:, j], *edges) for j, edges in enumerate(single.edges.values())]
+    assert np.array_equal(counts, expected)
+    assert len(single._windows) == 4 and all(len(w) == single._size for w in single._windows)
+
+
+def test_training_data_is_stable_and_a_shift_drifts():
+    training = _training_readings()
+    reference = build_reference(training)
+
+    monitor = _monitor(reference)
+    monitor.observe_batch(training[: DRIFT_MIN_READINGS - 1])
+    assert {f["status"] for f in monitor.report()["features"].values()} == {"warming_up"}
+
+    rng = np.random.default_rng(2)
+    replay = training[rng.integers(0, len(training), 2000)]
+    monitor = _monitor(reference)
+    monitor.observe_batch(replay)
+    report = monitor.report()
+    assert report["drifted"] == []
+    assert all(f["status"] == "stable" and f["ks"] < 0.05 for f in report["features"].values())
+
+    shifted = replay.copy()
+    shifted[:, READING_COLUMNS.index("temperature")] += 10
+    monitor = _monitor(reference)
+    for row in shifted.tolist():
+        monitor.observe(row)
+    report = monitor.report()
+    assert report["drifted"] == ["temperature"]
+    assert report["features"]["temperature"]["ks"] > 0.2
+    assert report["features"]["temperature"]["above_range"] > 0
+
+    assert {f["status"] for f in _monitor(None).report()["features"].values()} == {"no_reference"}
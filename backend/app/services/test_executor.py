@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import telemetry
+from app.main import app
+from app.services import executor
+
+
+@pytest.mark.usefixtures("outputs")
+def test_full_queue_is_rejected_with_retry_after(monkeypatch):
+    monkeypatch.setitem(executor._in_flight, "render", executor.WORKLOAD_QUEUE_LIMITS["render"])
+    client = TestClient(app)
+
+    response = client.post("/placement/", json={"farm_length": 10, "farm_width": 10, "min_spacing": 2, "max_towers": 5})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == str(executor.RETRY_AFTER_SECONDS)
+    # cheap routes are not admission-controlled
+    assert client.get("/").status_code == 200
+
+
+def test_thread_fallback_runs_and_releases_slot(monkeypatch):
+    monkeypatch.setattr(executor, "PROCESS_POOL_WORKERS", 0)
+    result = asyncio.run(executor.run_workload("predict", sum, [1, 2, 3]))
+    assert result == 6
+    assert executor._in_flight["predict"] == 0
+
+
+def test_worker_telemetry_is_merged_back(metrics_registry):
+    hist = telemetry.Histogram("test_worker_seconds", "worker histogram", buckets=(1.0,))
+    hist.observe(0.5)
+    deltas = telemetry.drain()
+    assert hist.labels().counts == [0, 0]
+
+    telemetry.merge(deltas)
+    assert hist.labels().counts == [1, 0]
+    assert hist.labels().sum == pytest.approx(0.5)
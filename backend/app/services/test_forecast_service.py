@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app.core.config import FORECAST_ISSUE_INTERVAL_SECONDS, FORECAST_RECHECK_SECONDS
+from app.models.crop_recommendation import is_model_available
+from app.services.forecast_service import HOUR, StubForecast, forecast_timeline, get_forecast, set_provider, suitable_windows
+
+needs_model = pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+
+T0 = 1_700_000_000 // FORECAST_ISSUE_INTERVAL_SECONDS * FORECAST_ISSUE_INTERVAL_SECONDS
+
+
+class CountingStub(StubForecast):
+    def __init__(self, lag: float = 0):
+        self.calls, self.lag = 0, lag
+
+    def fetch(self, lat, lon, now):
+        self.calls += 1
+        # an upstream that publishes `lag` seconds after the scheduled issue time
+        return super().fetch(lat, lon, now - self.lag)
+
+
+@pytest.fixture
+def stub():
+    provider = CountingStub()
+    set_provider(provider)
+    yield provider
+    set_provider(None)
+
+
+def test_series_cached_per_tile_until_the_next_issue(stub):
+    first = get_forecast(12.971, 77.594, now=T0 + 60)
+    assert get_forecast(12.968, 77.591, now=T0 + 2 * HOUR) is first and stub.calls == 1
+    assert get_forecast(13.5, 77.594, now=T0 + 60) is not first and stub.calls == 2
+
+    later = get_forecast(12.97, 77.59, now=T0 + FORECAST_ISSUE_INTERVAL_SECONDS + 60)
+    assert later.issued_at == first.issued_at + FORECAST_ISSUE_INTERVAL_SECONDS and stub.calls == 3
+
+
+def test_unpublished_issue_is_rechecked_at_most_every_recheck_interval(stub):
+    stub.lag = FORECAST_RECHECK_SECONDS * 3
+    due = T0 + FORECAST_ISSUE_INTERVAL_SECONDS
+    get_forecast(12.97, 77.59, now=T0 + 60)
+    # the new issue is due but not out yet: the upstream still returns the old one
+    assert get_forecast(12.97, 77.59, now=due + 1).issued_at == T0 and stub.calls == 2
+    get_forecast(12.97, 77.59, now=due + FORECAST_RECHECK_SECONDS / 2)
+    assert stub.calls == 2
+    assert get_forecast(12.97, 77.59, now=due + FORECAST_RECHECK_SECONDS * 4).issued_at == due and stub.calls == 3
+
+
+def test_window_drops_past_hours_and_windows_are_runs():
+    series = StubForecast().fetch(12.97, 77.59, T0)
+    window = series.window(T0 + 5 * HOUR + 10, 24)
+    assert window.start == T0 + 5 * HOUR and len(window) == 24
+    assert window.values["temperature"][0] == series.values["temperature"][5]
+
+    mask = np.array([[1, 1, 0, 1, 1, 1], [0, 0, 0, 0, 0, 0], [1, 0, 0, 0, 0, 1]], dtype=bool)
+    assert suitable_windows(mask) == [(0, 0, 2), (0, 3, 6), (2, 0, 1), (2, 5, 6)]
+    assert suitable_windows(mask, min_hours=3) == [(0, 3, 6)]
+
+
+@needs_model
+def test_timeline_windows_follow_the_hourly_scores():
+    series = StubForecast().fetch(12.97, 77.59, T0).window(T0, 96)
+    fixed = {"sunlight_hours": 8.0, "water_ph": 6.2, "air_quality_index": 40.0}
+    timeline = forecast_timeline(series, fixed, min_class=1, min_confidence=50)
+    crops = timeline["crops"]
+    assert timeline["model_rows"] == 96 * len(crops) and timeline["confidence"].shape == (len(crops), 96)
+
+    for i, crop in enumerate(crops):
+        suitable = np.zeros(96, dtype=bool)
+        for w in timeline["windows"][crop]:
+            suitable[w["start_hour"]:w["end_hour"]] = True
+        expected = (timeline["suitability_class"][i] >= 1) & (np.nan_to_num(timeline["confidence"][i]) >= 50) & (timeline["status"] == 0)
+        # agronomic checks can only remove hours
+        assert not (suitable & ~expected).any()
+        assert suitable.sum() == timeline["suitable_hours"][i]
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.services.history_service import HistoryStore, HistoryWriter, prediction_record
+from app.services.ml_service import predict_crop_scores
+
+HOUR = 3600.0
+DAY_START = 1_700_006_400.0  # a UTC midnight
+READINGS = [
+    (22, 65, 8, 6.2, 40, 1.0),
+    (30, 80, 12, 6.8, 120, 2.5),
+    (12, 30, 1, 5.0, 50, 4.5),
+    (2, 50, 5, 6.0, 30, 1.0),  # rule rejection
+]
+
+
+def _records():
+    results = [predict_crop_scores(*reading) for reading in READINGS]
+    records = []
+    for i in range(24):
+        reading = READINGS[i % len(READINGS)]
+        records.append(prediction_record(reading, results[i % len(READINGS)], None, f"farm-{i % 2}", "v1", DAY_START + i * HOUR / 4 + 1))
+    return records
+
+
+def test_rollups_match_the_raw_rows(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite3")
+    records = _records()
+    # split across transactions: the rollups are incremented, not rebuilt
+    store.write(records[:7])
+    store.write(records[7:])
+    assert {r["status"] for r in records} == {"scored", "rule_rejected"}
+
+    hourly = store.crop_rollups("hour", location="farm-1", crop="basil")
+    assert [row["start"] for row in hourly] == [DAY_START + h * HOUR for h in range(6)]
+    for row in hourly:
+        raw = [r for r in records if r["location"] == "farm-1" and row["start"] <= r["ts"] < row["start"] + HOUR]
+        classes = [r["scores"]["basil"][0] for r in raw]
+        confidences = [r["scores"]["basil"][1] for r in raw if r["scores"]["basil"][1] is not None]
+        assert row["predictions"] == len(raw)
+        assert (row["suitable"], row["marginal"], row["unsuitable"]) == (classes.count(2), classes.count(1), classes.count(0))
+        assert row["recommended"] == sum(r["recommended"] == "basil" for r in raw)
+        assert row["mean_confidence"] == pytest.approx(sum(confidences) / len(confidences), abs=0.01)
+
+    # summed over both locations
+    (daily,) = store.crop_rollups("day", crop="basil")
+    assert daily["start"] == DAY_START and daily["predictions"] == len(records)
+
+    locations = store.location_rollups("day")
+    assert [row["location"] for row in locations] == ["farm-0", "farm-1"]
+    farm0 = [r for r in records if r["location"] == "farm-0"]
+    assert locations[0]["predictions"] == len(farm0)
+    assert locations[0]["rule_rejected"] == sum(r["status"] == "rule_rejected" for r in farm0)
+    assert locations[0]["mean_inputs"]["temperature"] == pytest.approx(sum(r["inputs"][0] for r in farm0) / len(farm0), abs=1e-3)
+
+    trail = store.predictions(location="farm-0", limit=3)
+    assert [row["ts"] for row in trail] == sorted((r["ts"] for r in farm0), reverse=True)[:3]
+    assert trail[0]["scores"]["basil"] == list(farm0[-1]["scores"]["basil"])
+
+
+@pytest.mark.parametrize("overflow, kept", [("drop_oldest", [2, 3, 4]), ("drop_newest", [0, 1, 2]), ("block", [0, 1, 2])])
+def test_full_buffer_follows_the_overflow_policy(tmp_path, overflow, kept):
+    async def fill():
+        # no writer task is running, so a blocked record times out and is dropped
+        writer = HistoryWriter(HistoryStore(tmp_path / "history.sqlite3"), max_records=3, overflow=overflow, block_seconds=0.01)
+        accepted = [await writer.record({"n": n}) for n in range(5)]
+        return writer, accepted
+
+    writer, accepted = asyncio.run(fill())
+    assert [r["n"] for r in writer._buffer] == kept
+    assert accepted == ([True] * 5 if overflow == "drop_oldest" else [True] * 3 + [False] * 2)
+    assert writer.stats()["dropped"] == 2
+
+
+def test_writer_flushes_in_batches_and_on_shutdown(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite3")
+    records = _records()
+
+    async def run():
+        writer = HistoryWriter(store, batch_rows=10, flush_seconds=60)
+        task = asyncio.create_task(writer.run())
+        for record in records[:10]:
+            await writer.record(record)
+        # a full batch wakes the writer long before flush_seconds
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if writer.counts["written"]:
+                break
+        assert writer.counts["written"] == 10 and len(writer) == 0
+        for record in records[10:]:
+            await writer.record(record)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.stats()["written"] == len(records) and writer.stats()["buffered"] == 0
+    assert len(store.predictions(limit=1000)) == len(records)
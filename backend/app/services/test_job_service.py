@@ -0,0 +1,125 @@
+import asyncio
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from app.core.config import ENCODER_PATH, JOB_MAX_ATTEMPTS, MODEL_PATH
+from app.models import crop_recommendation, registry
+from app.services.job_service import JobStore, pid_alive, run_job
+
+
+def test_queue_claims_in_order_and_records_outcomes_once(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    first = store.enqueue("retrain", {"n_estimators": 20})
+    second = store.enqueue("retrain", {})
+    assert store.claim()["id"] == first["id"]
+
+    assert store.request_cancel(second["id"])["status"] == "cancelled"
+    assert store.claim() is None
+    # a running job is only flagged; the runner stops it
+    assert store.request_cancel(first["id"])["cancel_requested"]
+
+    assert store.finish(first["id"], "succeeded", result={"published": None})
+    assert not store.finish(first["id"], "failed", error="too late")
+    job = store.get(first["id"])
+    assert job["status"] == "succeeded" and job["result"] == {"published": None} and job["params"] == {"n_estimators": 20}
+    assert [e["data"]["status"] for e in store.events(first["id"])] == ["queued", "running", "succeeded"]
+    assert len(store.events(first["id"], after=store.events(first["id"])[0]["id"])) == 2
+
+
+def test_recover_requeues_jobs_whose_process_died(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    interrupted, exhausted, running = (store.enqueue("retrain", {}) for _ in range(3))
+    for job in (interrupted, exhausted, running):
+        store.claim()
+    store.set_pid(interrupted["id"], dead.pid)
+    store.set_pid(exhausted["id"], dead.pid)
+    store.set_pid(running["id"], 1)
+    for _ in range(JOB_MAX_ATTEMPTS - 1):
+        with store._connect() as conn:
+            conn.execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (exhausted["id"],))
+
+    alive = store.recover(pid_alive)
+    assert [job["id"] for job in alive] == [running["id"]]
+    assert store.get(interrupted["id"])["status"] == "queued"
+    assert store.get(exhausted["id"])["status"] == "failed"
+
+
+def test_retrain_job_publishes_a_version_that_serving_reloads(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    store.enqueue("retrain", {"samples_per_crop": 60, "seed": 7, "n_estimators": 20})
+    job = asyncio.run(run_job(store, store.claim(), registry=tmp_path / "registry"))
+    assert job["status"] == "succeeded", job["error"]
+
+    version = job["result"]["published"]["version"]
+    assert registry.current_version(tmp_path / "registry") == version
+    finished = [e["data"] for e in store.events(job["id"]) if e["type"] == "stage" and e["data"]["state"] == "finished"]
+    assert [e["stage"] for e in finished] == ["generate", "train", "calibrate", "evaluate", "publish"]
+    assert all(e["seconds"] >= 0 for e in finished) and not store.workdir(job["id"]).exists()
+
+    monkeypatch.setattr(registry, "MODEL_REGISTRY_DIR", tmp_path / "registry")
+    try:
+        assert crop_recommendation.reload_if_changed(force=True)
+        assert crop_recommendation.get_registry_version() == version
+        assert len(crop_recommendation.get_model().estimators_) == 20
+        # the version is named after the model hash, and its calibration table was fitted for it
+        assert crop_recommendation.get_model_version().startswith(version.split("-")[1])
+        assert crop_recommendation.get_calibrated_model() is not None
+    finally:
+        monkeypatch.undo()
+        crop_recommendation.reload_if_changed(force=True)
+    assert crop_recommendation.get_registry_version() is None
+
+
+def test_a_version_that_fails_to_load_is_not_reported_as_serving(tmp_path, monkeypatch):
+    broken = tmp_path / "registry" / "broken"
+    broken.mkdir(parents=True)
+    for name in registry.REQUIRED:
+        (broken / registry.ARTIFACTS[name]).write_bytes(b"not a pickle")
+    registry.activate("broken", tmp_path / "registry")
+    with pytest.raises(ValueError):
+        registry.activate("..", tmp_path / "registry")
+
+    monkeypatch.setattr(registry, "MODEL_REGISTRY_DIR", tmp_path / "registry")
+    try:
+        assert not crop_recommendation.reload_if_changed(force=True)
+        assert crop_recommendation.get_registry_version() is None
+        assert crop_recommendation.is_model_available()
+    finally:
+        monkeypatch.undo()
+        crop_recommendation.reload_if_changed(force=True)
+    assert crop_recommendation.get_registry_version() is None
+
+
+@pytest.mark.skipif(not crop_recommendation.is_model_available(), reason="model artifacts not available")
+def test_getters_only_read_and_the_watcher_reloads(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    source.mkdir()
+    shutil.copy(MODEL_PATH, source / registry.ARTIFACTS["model"])
+    shutil.copy(ENCODER_PATH, source / registry.ARTIFACTS["encoder"])
+    registry.publish(source, "copy", {}, tmp_path / "registry")
+
+    async def watch():
+        watcher = asyncio.create_task(crop_recommendation.run_model_watcher(interval=0.01))
+        for _ in range(500):
+            await asyncio.sleep(0.01)
+            if crop_recommendation.get_registry_version() == "copy":
+                break
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+
+    monkeypatch.setattr(registry, "MODEL_REGISTRY_DIR", tmp_path / "registry")
+    try:
+        # no getter loads the new version on the caller's thread
+        assert crop_recommendation.is_model_available()
+        assert crop_recommendation.get_model_version() and crop_recommendation.get_registry_version() is None
+        asyncio.run(watch())
+        assert crop_recommendation.get_registry_version() == "copy"
+    finally:
+        monkeypatch.undo()
+        crop_recommendation.reload_if_changed(force=True)
+    assert crop_recommendation.get_registry_version() is None
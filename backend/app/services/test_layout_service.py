@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from app.services.layout_service import TOWER_DTYPE, LayoutNotFound, LayoutStore
+
+
+def _grid(n=10, spacing=2.0):
+    xs, ys = np.meshgrid(np.arange(n) * spacing + 1, np.arange(n) * spacing + 1)
+    return np.column_stack([xs.ravel(), ys.ravel()])
+
+
+def test_versions_round_trip_through_the_store(tmp_path):
+    store = LayoutStore(tmp_path)
+    towers = _grid(3)
+    crops = ["lettuce", None, "basil"] * 3
+    first = store.save("north", towers, 6.0, 6.0, 2.0, crops=crops, note="initial")
+    second = store.save("north", towers[:4], 6.0, 6.0, 2.0)
+    assert (first["version"], second["version"]) == (1, 2)
+    assert first["crops"] == ["basil", "lettuce"]
+
+    meta, records = store.load("north", 1)
+    assert isinstance(records, np.memmap) and records.dtype == TOWER_DTYPE
+    assert np.array_equal(np.column_stack([records["x"], records["y"]]), towers)
+    assert records["crop"].tolist() == [1, -1, 0] * 3
+    assert meta["note"] == "initial"
+    assert store.load("north")[0]["towers"] == 4
+    assert [m["version"] for m in store.versions("north")] == [2, 1]
+    assert [(entry["name"], entry["versions"]) for entry in store.names()] == [("north", 2)]
+    assert not [p for p in (tmp_path / "north").iterdir() if p.name.startswith(".")]
+
+
+def test_diff_classifies_towers(tmp_path):
+    store = LayoutStore(tmp_path)
+    old = _grid()
+    new = old.copy()
+    new[0] += 0.005  # within tolerance
+    new[1] += (0.3, -0.2)  # moved
+    new = np.vstack([np.delete(new, [2, 3], axis=0), [[30.0, 30.0]]])  # 2 removed, 1 added
+    crops = ["kale"] * len(old)
+    new_crops = ["kale"] * len(new)
+    new_crops[5] = "chard"
+    store.save("farm", old, 30.0, 30.0, 2.0, crops=crops)
+    store.save("farm", new, 32.0, 32.0, 2.0, crops=new_crops)
+
+    result = store.diff("farm", 1)
+    assert result["max_move"] == pytest.approx(0.998)
+    assert result["counts"] == {
+        "old_towers": 100,
+        "new_towers": 99,
+        "unchanged": 97,
+        "moved": 1,
+        "added": 1,
+        "removed": 2,
+        "crop_changed": 1,
+    }
+    assert result["removed"]["index"].tolist() == [2, 3]
+    assert result["added"]["index"].tolist() == [98]
+    assert result["moved"]["old_index"].tolist() == [1]
+    assert result["moved"]["dx"][0] == pytest.approx(0.3)
+    assert result["crop_changed"]["old_index"].tolist() == [7]
+    assert result["crop_changed"]["new_crop"] == ["chard"]
+    # a tighter max_move turns the move into a removal and an addition
+    assert store.diff("farm", 1, 2, max_move=0.2)["counts"]["moved"] == 0
+
+
+def test_invalid_input_and_missing_layouts(tmp_path):
+    store = LayoutStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.save("../escape", _grid(2), 4.0, 4.0)
+    with pytest.raises(ValueError):
+        store.save("ok", _grid(2), 4.0, 4.0, crops=["kale"])
+    with pytest.raises(LayoutNotFound):
+        store.load("ok")
+    store.save("ok", _grid(2), 4.0, 4.0)
+    with pytest.raises(LayoutNotFound):
+        store.load("ok", 7)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.crop_recommendation import is_model_available
+from app.services.microclimate_service import _QUANT_STEPS, cell_centers, compute_microclimate, interpolate, kriging_weights
+from app.services.ml_service import score_readings
+
+SENSORS = np.array([[1.0, 1.0], [9.0, 2.0], [5.0, 8.0], [2.0, 9.0]])
+VALUES = np.array([
+    [18.0, 55, 4.0, 5.8, 40, 0.5],
+    [26.0, 70, 7.0, 6.6, 120, 1.5],
+    [22.0, 60, 5.5, 6.2, 60, 1.0],
+    [20.0, 65, 5.0, 6.0, 90, 0.8],
+])
+
+
+def point(x, y, values):
+    keys = ["temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"]
+    return {"x": x, "y": y, **dict(zip(keys, values))}
+
+
+@pytest.mark.parametrize("method", ["idw", "kriging"])
+def test_interpolation_is_exact_at_sensors_and_bounded(method):
+    assert np.allclose(interpolate(SENSORS, SENSORS, VALUES, method), VALUES, atol=1e-4)
+    _, _, centers = cell_centers(10, 10, 0.5)
+    grid = interpolate(centers, SENSORS, VALUES, method)
+    assert grid.shape == (400, 6)
+    assert (grid >= VALUES.min(axis=0)).all() and (grid <= VALUES.max(axis=0)).all()
+    assert np.allclose(kriging_weights(centers, SENSORS).sum(axis=1), 1.0)
+
+
+@pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+def test_quantized_scoring_keeps_exact_rules_and_dedupes_model_rows():
+    _, _, centers = cell_centers(10, 10, 0.25)
+    readings = interpolate(centers, SENSORS, VALUES, "idw")
+    exact = score_readings(readings, mode="full", use_specialists=False)
+    quantized = score_readings(readings, mode="full", use_specialists=False, quantization=_QUANT_STEPS)
+    for key in ("valid", "rule_rejected", "impossible", "agronomic_ok"):
+        assert (exact[key] == quantized[key]).all()
+    assert quantized["model_rows"] < exact["model_rows"] == readings.size // 6 * len(exact["crops"])
+    # bins are small next to the class boundaries the model learned
+    assert (exact["suitability_class"] == quantized["suitability_class"]).mean() > 0.95
+
+    pruned = score_readings(readings, mode="pruned", use_specialists=False, quantization=_QUANT_STEPS)
+    assert (pruned["model_scored"] == pruned["agronomic_ok"]).all()
+
+
+@pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+@pytest.mark.usefixtures("outputs")
+def test_heatmap_and_tower_scores():
+    sensors = [point(x, y, v) for (x, y), v in zip(SENSORS.tolist(), VALUES.tolist())]
+    result = compute_microclimate(sensors, farm_length=10, farm_width=8, cell_size_m=1.0, towers=[(1.0, 1.0), (5.0, 5.0)])
+    assert (result["n_rows"], result["n_cols"]) == (8, 10)
+    lettuce = result["heatmap"]["lettuce"]
+    assert len(lettuce["confidence"]) == 8 and len(lettuce["confidence"][0]) == 10
+    assert 0 <= lettuce["suitable_cells"] <= 80
+    assert len(result["best_crop"]) == 8
+    assert [t["x"] for t in result["tower_scores"]] == [1.0, 5.0]
+    assert result["tower_scores"][0]["inputs"]["temperature"] == 18.0
+    with pytest.raises(ValueError):
+        compute_microclimate(sensors, 100, 100, 0.1)
+
+    client = TestClient(app)
+    body = {"farm_length": 10, "farm_width": 8, "min_spacing": 2.5, "max_towers": 6, "cell_size_m": 1.0,
+            "sensor_points": sensors, "interpolation": "kriging"}
+    response = client.post("/placement/", json=body)
+    assert response.status_code == 200
+    microclimate, grid = response.json()["microclimate"], response.json()["grid"]
+    assert microclimate["method"] == "kriging" and len(microclimate["tower_scores"]) == 6
+    # the heatmap and the grid block describe the same cells
+    assert (grid["n_rows"], grid["n_cols"], grid["cell_size_m"]) == (microclimate["n_rows"], microclimate["n_cols"], 1.0) == (8, 10, 1.0)
@@ -0,0 +1,172 @@
+import random
+
+import pytest
+
+from app.models.crop_recommendation import is_model_available
+from app.services.ml_service import predict_crop_scores, score_readings
+
+pytestmark = pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+
+
+def test_score_readings_matches_single_reading_path():
+    rng = random.Random(3)
+    readings = [
+        (rng.uniform(5, 45), rng.uniform(40, 95), rng.uniform(3, 13), rng.uniform(4.7, 7.3), rng.uniform(20, 190), rng.uniform(0.2, 2.6))
+        for _ in range(60)
+    ]
+    batch = score_readings(readings)
+    assert len(batch["crops"]) == batch["confidence"].shape[1]
+
+    for i, reading in enumerate(readings):
+        single = predict_crop_scores(*reading)
+        if single.get("rule_rejection"):
+            assert batch["rule_rejected"][i]
+            continue
+        assert batch["valid"][i] and not batch["rule_rejected"][i]
+        for j, entry in enumerate(single["all_scores"]):
+            assert entry["suitability_class"] == batch["suitability_class"][i, j]
+            assert entry["confidence"] == batch["confidence"][i, j]
+            assert entry["model_raw_score"] == batch["model_raw_score"][i, j]
+            assert entry["agronomic_ok"] == batch["agronomic_ok"][i, j]
+        best = batch["recommended"][i]
+        assert single["recommended_crops"] == ([batch["crops"][best]] if best >= 0 else [])
+
+
+def test_invalid_rows_are_flagged_not_scored():
+    batch = score_readings([[60, 50, 5, 6.0, 50, 1.0]])
+    assert not batch["valid"][0]
+    assert batch["recommended"][0] == -1
+
+
+def test_pruned_mode_only_scores_eligible_crops(monkeypatch):
+    from app.services import ml_service
+
+    rng = random.Random(5)
+    readings = [
+        (rng.uniform(15, 30), rng.uniform(40, 80), rng.uniform(3, 9), rng.uniform(5.4, 7.0), rng.uniform(20, 175), rng.uniform(0.2, 2.6))
+        for _ in range(80)
+    ]
+    full = score_readings(readings, mode="full", use_specialists=False)
+    pruned = score_readings(readings, mode="pruned", use_specialists=False)
+    assert (pruned["model_scored"] == full["agronomic_ok"]).all()
+    assert (pruned["recommended"] == full["recommended"]).all()
+    eligible = full["agronomic_ok"]
+    assert (pruned["confidence"][eligible] == full["confidence"][eligible]).all()
+
+    # No eligible crop: the model is never called
+    calls = []
+    monkeypatch.setattr(ml_service, "_model_outputs", lambda *a: calls.append(a))
+    result = predict_crop_scores(12, 30, 1, 5.0, 50, 4.5, mode="pruned")
+    assert calls == []
+    assert result["recommended_crops"] == []
+    assert all(s["confidence"] is None and not s["agronomic_ok"] for s in result["all_scores"])
+
+
+def test_specialists_are_routed_by_crop_code(monkeypatch):
+    import numpy as np
+
+    from app.services import ml_service
+
+    class Constant:
+        classes_ = np.array([0, 1, 2])
+
+        def predict_proba(self, X):
+            assert list(X.columns) == ml_service.READING_COLUMNS
+            return np.tile([0.0, 0.0, 1.0], (len(X), 1))
+
+    serving = ml_service.get_serving()
+    basil = int(serving.encoder.transform(["basil"])[0])
+    serving = serving._replace(specialists={basil: Constant()})
+    monkeypatch.setattr(ml_service, "get_serving", lambda: serving)
+    readings = [(22, 60, 6, 6.0, 60, 1.0)]
+    routed = score_readings(readings, use_specialists=True)
+    shared = score_readings(readings, use_specialists=False)
+    j = routed["crops"].index("basil")
+    assert routed["model_raw_score"][0, j] == 2.0
+    others = [i for i in range(len(routed["crops"])) if i != j]
+    assert (routed["confidence"][0, others] == shared["confidence"][0, others]).all()
+
+
+def test_one_request_scores_and_reports_one_model_version(monkeypatch):
+    from app.models import crop_recommendation
+    from app.services import ml_service
+
+    serving = crop_recommendation.get_serving()
+    model_outputs = ml_service._model_outputs
+
+    def reload_midway(*args):
+        # a reload lands while the request is being scored
+        monkeypatch.setattr(crop_recommendation, "_serving", serving._replace(version="other"))
+        return model_outputs(*args)
+
+    monkeypatch.setattr(ml_service, "_model_outputs", reload_midway)
+    result = predict_crop_scores(22, 65, 8, 6.2, 40, 1.0)
+    assert result["model_version"] == serving.version
+    assert predict_crop_scores(22, 65, 8, 6.2, 40, 1.0)["model_version"] == "other"
+
+
+def test_batch_endpoint_layouts_and_encodings():
+    from fastapi.testclient import TestClient
+    import orjson
+
+    msgpack = pytest.importorskip("msgpack")
+
+    from app.main import app
+
+    client = TestClient(app)
+    readings = [(22, 65, 8, 6.2, 40, 1.0), (35, 50, 10, 7.5, 200, 1.0), (18, 80, 6, 6.0, 60, 0.5)]
+    body = {"readings": [dict(zip(("temperature", "humidity", "sunlight_hours", "water_ph", "air_quality_index", "wind_speed"), r)) for r in readings]}
+    rows = client.post("/predict/batch", json=body)
+    assert rows.status_code == 200 and rows.headers["content-type"] == "application/json"
+    results = rows.json()["results"]
+    for reading, result in zip(readings, results):
+        single = predict_crop_scores(*reading)
+        assert result["status"] == ("rule_rejected" if single.get("rule_rejection") else "scored")
+        assert result["recommended_crops"] == single["recommended_crops"]
+        assert result["all_scores"] == [{k: v for k, v in entry.items() if k != "explanation"} for entry in single["all_scores"]]
+
+    columnar = client.post("/predict/batch?layout=columnar", json=body, headers={"Accept": "application/msgpack"})
+    assert columnar.headers["content-type"] == "application/msgpack"
+    columns = msgpack.unpackb(columnar.content)
+    assert columns["status"] == [r["status"] for r in results]
+    assert columns["confidence"] == [[e["confidence"] for e in r["all_scores"]] for r in results]
+    assert orjson.loads(client.post("/predict/batch?layout=columnar", json=body).content) == columns
+
+
+def test_contributions_add_up_and_leave_scores_unchanged():
+    plain = predict_crop_scores(22, 65, 8, 6.2, 40, 1.0)
+    explained = predict_crop_scores(22, 65, 8, 6.2, 40, 1.0, explain=True)
+    assert [e["confidence"] for e in explained["all_scores"]] == [e["confidence"] for e in plain["all_scores"]]
+    entries = [e["contributions"] for e in explained["all_scores"] if e.get("contributions")]
+    assert entries
+    for entry in entries:
+        assert abs(entry["bias"] + sum(entry["features"].values()) - entry["model_probability"]) < 0.01
+
+    batch = score_readings([(22, 65, 8, 6.2, 40, 1.0), (35, 50, 10, 7.5, 200, 1.0)], explain=True)
+    assert batch["contributions"].shape == batch["confidence"].shape + (len(batch["contribution_features"]),)
+
+
+def test_explanation_flags_are_range_checks():
+    from app.services.ml_service import CROP_CATALOG, generate_explanation
+
+    # basil wants 20-30 C and 50-70 % humidity; the old one-sided checks passed 2 C and 99 %
+    assert "Temperature within preferred range" not in generate_explanation("basil", 2, 65, 8, 6.2, 40, 1.0)
+    assert "Humidity within preferred range" not in generate_explanation("basil", 22, 99, 8, 6.2, 40, 1.0)
+    assert "Humidity within preferred range" in generate_explanation("basil", 22, 65, 8, 6.2, 40, 1.0)
+    temperature_ok, humidity_ok = CROP_CATALOG.explanation_flags([(2, 99, 8, 6.2, 40, 1.0)])
+    basil = CROP_CATALOG.index["basil"]
+    assert not temperature_ok[0, basil] and not humidity_ok[0, basil]
+
+
+def test_explain_query_parameter():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    reading = {"temperature": 22, "humidity": 65, "sunlight_hours": 8, "water_ph": 6.2, "air_quality_index": 40, "wind_speed": 1.0}
+    single = client.post("/predict/?explain=true", json=reading).json()
+    assert any(e.get("contributions") for e in single["all_scores"])
+    assert "contributions" not in client.post("/predict/", json=reading).json()["all_scores"][0]
+    columns = client.post("/predict/batch?explain=true&layout=columnar", json={"readings": [reading]}).json()
+    assert len(columns["contributions"][0][0]) == len(columns["contribution_features"])
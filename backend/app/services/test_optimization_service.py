@@ -14,7 +14,9 @@ def test_generate_placement_image(tmp_path):
     optimization_service.generate_placement_image(positions, 10, 10, 2, str(output_path))
     assert output_path.exists()
 
-def test_optimize_tower_placement():
+def test_optimize_tower_placement(tmp_path, monkeypatch):
+    # the image goes to app/data relative to the working directory
+    monkeypatch.chdir(tmp_path)
     result = optimization_service.optimize_tower_placement(10, 10, 2, 5)
     assert isinstance(result, dict)
     assert "total_towers" in result
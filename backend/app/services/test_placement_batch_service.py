@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import WORKLOAD_QUEUE_LIMITS
+from app.main import app
+from app.services import placement_batch_service
+from app.services.placement_batch_service import config_key, packing, place_batch
+
+
+def test_equivalent_configs_share_a_key():
+    config = {"farm_length": 20.0, "farm_width": 16.0, "min_spacing": 2.5, "max_towers": 30, "output": "image"}
+    tiles = dict(config, output="tiles")
+    assert config_key(config, render=False) == config_key(dict(reversed(list(tiles.items()))), render=False)
+    assert config_key(config, render=True) != config_key(tiles, render=True)
+    # a full hex lattice on a 1 m spacing packs 2 / sqrt(3) towers per m2
+    assert packing({"farm_length": 10.0, "farm_width": 10.0, "min_spacing": 1.0}, 115) == {"towers_per_100m2": 115.0, "packing_ratio": 0.9959}
+
+
+@pytest.mark.usefixtures("outputs")
+def test_batch_streams_one_line_per_config_and_a_summary():
+    client = TestClient(app)
+    configs = [
+        {"farm_length": 20, "farm_width": 16, "min_spacing": 2.5, "max_towers": 30},
+        {"farm_length": 30, "farm_width": 16, "min_spacing": 2.0, "max_towers": 500},
+        {"farm_length": 20.0, "farm_width": 16.0, "min_spacing": 2.5, "max_towers": 30},
+        {"farm_length": 20, "farm_width": 16, "min_spacing": 2.5, "max_towers": 30, "boundary": [[0, 0], [30, 0], [0, 30]]},
+    ]
+    response = client.post("/placement/batch", json={"configs": configs})
+    assert response.status_code == 200 and response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    rows, summary = {line["index"]: line for line in lines[:-1]}, lines[-1]["summary"]
+
+    assert sorted(rows) == [0, 1, 2, 3]
+    assert rows[2]["duplicate_of"] == 0 and rows[2]["result"] == rows[0]["result"]
+    assert rows[0]["result"]["image_url"] is None
+    single = client.post("/placement/", json=configs[1]).json()
+    assert rows[1]["result"]["tower_positions"] == single["tower_positions"]
+    assert rows[3]["result"]["total_towers"] < rows[0]["result"]["total_towers"]
+
+    assert summary["configs"] == 4 and summary["unique_configs"] == 3 and summary["failed"] == 0
+    assert [row["total_towers"] for row in summary["rows"]] == [rows[i]["result"]["total_towers"] for i in range(4)]
+
+    rendered = client.post("/placement/batch", json={"configs": configs[:1], "render": True}).text.splitlines()
+    assert json.loads(rendered[0])["result"]["image_url"].startswith("/static/optimized_tower_layout_")
+    assert client.post("/placement/batch", json={"configs": []}).status_code == 422
+
+
+def test_a_failing_config_is_reported_on_its_line(monkeypatch):
+    async def place(config, output):
+        if config["min_spacing"] == 3.0:
+            raise ValueError("no room")
+        return {"total_towers": 4}
+
+    monkeypatch.setattr(placement_batch_service, "place_towers_async", place)
+    configs = [{"farm_length": 10.0, "farm_width": 10.0, "min_spacing": s, "max_towers": 4, "engine": "hex", "output": "image"} for s in (2.0, 3.0)]
+
+    async def collect():
+        return [line async for line in place_batch(configs)]
+
+    *rows, last = asyncio.run(collect())
+    failed = next(row for row in rows if row["index"] == 1)
+    assert failed == {"index": 1, "config_key": 1, "duplicate_of": None, "error": "no room", "status_code": 422}
+    assert last["summary"]["failed"] == 1 and last["summary"]["rows"][1]["packing_ratio"] is None
+
+
+@pytest.mark.usefixtures("outputs")
+def test_anneal_configs_keep_their_restarts_within_the_queue_limit(monkeypatch):
+    monkeypatch.setitem(WORKLOAD_QUEUE_LIMITS, "anneal", 6)
+    monkeypatch.setattr(placement_batch_service, "PLACEMENT_BATCH_CONCURRENCY", 8)
+    configs = [
+        {"farm_length": 12.0 + i, "farm_width": 10.0, "min_spacing": 2.0, "max_towers": 40, "engine": "anneal",
+         "restarts": 3, "time_budget_s": 0.2, "seed": i, "output": "image"}
+        for i in range(4)
+    ]
+
+    async def collect():
+        return [line async for line in place_batch(configs)]
+
+    *rows, last = asyncio.run(collect())
+    # without the restart slots, 4 configs x 3 restarts would overrun a queue of 6
+    assert last["summary"]["failed"] == 0
+    assert [row["result"]["annealing"]["restarts"] for row in rows] == [3] * 4
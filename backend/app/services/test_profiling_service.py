@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import profiling_service
+
+PAYLOAD = {"farm_length": 10, "farm_width": 10, "min_spacing": 2, "max_towers": 5}
+
+pytestmark = pytest.mark.usefixtures("outputs")
+
+
+def _configure(monkeypatch, tmp_path, ring_size=2):
+    monkeypatch.setattr(profiling_service, "PROFILING_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiling_service, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(profiling_service, "PROFILE_RING_SIZE", ring_size)
+
+
+def test_requests_without_opt_in_are_not_profiled(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    plain = client.post("/placement/", json=PAYLOAD)
+    wrong_token = client.post("/placement/?profile=1", json=PAYLOAD, headers={"X-Admin-Token": "nope"})
+
+    assert plain.status_code == 200 and "x-profile-id" not in plain.headers
+    assert wrong_token.headers["x-profile-status"] == "forbidden"
+    assert profiling_service.list_profile_files() == []
+
+
+def test_profiles_are_stored_in_a_bounded_ring_and_downloadable(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, ring_size=2)
+    client = TestClient(app)
+    headers = {"X-Profile": "1", "X-Admin-Token": "secret"}
+
+    ids = [client.post("/placement/", json=PAYLOAD, headers=headers).headers["x-profile-id"] for _ in range(3)]
+
+    listed = client.get("/profiles/", headers={"X-Admin-Token": "secret"}).json()["profiles"]
+    assert len(listed) == 2
+    assert ids[0] not in {p["id"] for p in listed}
+
+    profile = client.get(f"/profiles/{ids[-1]}", headers={"X-Admin-Token": "secret"}).json()
+    assert profile["route"] == "placement"
+    assert profile["top_allocations"]
+    assert client.get(f"/profiles/{ids[-1]}/collapsed", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert client.get(f"/profiles/{ids[-1]}").status_code == 403
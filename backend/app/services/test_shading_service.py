@@ -0,0 +1,68 @@
+import datetime as dt
+import math
+
+import numpy as np
+import pytest
+
+from app.core.config import SHADING_LATERAL_SAMPLES
+from app.services.optimization_service import greedy_tower_placement
+from app.services.shading_service import shade_towers, shaded_readings, sun_path
+
+EQUINOX = dt.date(2024, 3, 20)
+
+
+def _ray_traced_hours(xy, height, radius, sun, days, step_hours):
+    """Every ray of every tower against every other tower, one at a time."""
+    k = SHADING_LATERAL_SAMPLES
+    lateral = radius * ((np.arange(k) + 0.5) * 2 / k - 1)
+    lit = np.zeros(len(xy))
+    for x, y, z in sun:
+        horizontal = math.hypot(x, y)
+        ux, uy, tan_elevation = x / horizontal, y / horizontal, z / horizontal
+        for a in range(len(xy)):
+            for o in lateral:
+                surface = math.sqrt(radius ** 2 - o ** 2)
+                ox, oy = xy[a, 0] - o * uy + surface * ux, xy[a, 1] + o * ux + surface * uy
+                shadow = 0.0
+                for b in range(len(xy)):
+                    along = (xy[b, 0] - ox) * ux + (xy[b, 1] - oy) * uy
+                    across = (xy[b, 1] - oy) * ux - (xy[b, 0] - ox) * uy
+                    if b == a or abs(across) >= radius:
+                        continue
+                    entry = along - math.sqrt(radius ** 2 - across ** 2)
+                    if entry > 0:
+                        shadow = max(shadow, min(height - entry * tan_elevation, height))
+                lit[a] += (1 - shadow / height) / k
+    return lit * step_hours / days
+
+
+def test_matches_ray_tracing():
+    xy = np.array(greedy_tower_placement(6, 5, 0.8, 100))
+    start, end = EQUINOX, EQUINOX + dt.timedelta(days=1)
+    result = shade_towers(xy.tolist(), 2.0, 0.2, 52, start, end, step_minutes=30, orientation_deg=20)
+    sun, days = sun_path(52, start, end, 30, 20)
+    expected = _ray_traced_hours(xy, 2.0, 0.2, sun, days, 0.5)
+    assert np.allclose(result["sunlight_hours"], expected, atol=1e-3)
+    assert min(result["sun_fraction"]) < 0.7 < max(result["sun_fraction"]) == 1.0
+
+
+def test_open_sky_and_shade_direction():
+    # at the equator on the equinox the sun is up 12 h, 2 x 20 min of it below 5 degrees
+    alone = shade_towers([(5, 5), (50, 50)], 2.0, 0.15, 0, EQUINOX, EQUINOX, step_minutes=1)
+    assert alone["sunlight_hours"] == [alone["clear_sky_hours"]] * 2
+    assert alone["clear_sky_hours"] == pytest.approx(12 - 2 / 3, abs=0.02)
+    assert alone["sun_fraction"] == [1.0, 1.0]
+
+    # in the northern winter the sun stays south: the northern tower is shaded, not the southern one
+    pair = shade_towers([(5, 5), (5, 6)], 2.0, 0.15, 50, dt.date(2024, 12, 1), dt.date(2024, 12, 31))
+    south, north = pair["sun_fraction"]
+    assert south == 1.0 and north < 0.9
+
+
+def test_validation_and_readings():
+    with pytest.raises(ValueError, match="overlap"):
+        shade_towers([(5, 5), (5, 5.2)], 2.0, 0.15, 50, EQUINOX, EQUINOX)
+    with pytest.raises(ValueError, match="before"):
+        shade_towers([(5, 5)], 2.0, 0.15, 50, EQUINOX, EQUINOX - dt.timedelta(days=1))
+    rows = shaded_readings([22, 60, 12, 6.2, 40, 1.5], [1.0, 0.5])
+    assert rows.tolist() == [[22, 60, 12, 6.2, 40, 1.5], [22, 60, 6, 6.2, 40, 1.5]]
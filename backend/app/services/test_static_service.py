@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.static_service import accepts_webp, variant_path, webp_supported
+
+
+def test_accept_negotiation():
+    assert accepts_webp("image/avif,image/webp,image/apng,*/*;q=0.8")
+    assert not accepts_webp("*/*")
+    assert not accepts_webp("image/webp;q=0, image/png")
+    assert not accepts_webp(None)
+
+
+def test_layout_images_are_hashed_cached_and_negotiated(outputs):
+    client = TestClient(app)
+    body = {"farm_length": 20, "farm_width": 16, "min_spacing": 2.5, "max_towers": 30}
+    result = client.post("/placement/", json=body).json()
+    url = result["image_url"]
+    stem = url.rsplit("/", 1)[1][:-4]
+    assert (outputs / f"{stem}.png").exists()
+    # same layout, same bytes, same URL
+    assert client.post("/placement/", json=body).json()["image_url"] == url
+
+    response = client.get(url)
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"] and "Accept" in response.headers["vary"]
+    # the original bytes, with nothing encoded on the way (the lossy png8 only on request)
+    assert response.headers["etag"].endswith('-full.png"') and response.content == (outputs / f"{stem}.png").read_bytes()
+    assert not variant_path(stem, "full.png8").exists()
+    assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    thumb = client.get(result["image_thumbnail_url"])
+    assert thumb.status_code == 200 and len(thumb.content) < len(response.content)
+    assert thumb.headers["etag"].endswith('-thumb.png"')
+    forced = client.get(url + "?format=png8")
+    assert forced.headers["etag"].endswith('-full.png8"') and "Accept" not in forced.headers.get("vary", "")
+    assert len(forced.content) < len(response.content)
+    if webp_supported():
+        webp = client.get(url, headers={"Accept": "image/webp,*/*"})
+        assert webp.headers["content-type"] == "image/webp" and webp.headers["etag"].endswith('-full.webp"')
+
+    report = client.get(url + "/variants").json()
+    variants = {v["variant"]: v for v in report["variants"]}
+    assert report["content_hashed"] and variants["full.png"]["bytes"] == report["original_bytes"]
+    assert variants["full.png8"]["bytes"] < report["original_bytes"] and variants["thumb.png8"]["encode_seconds"] > 0
+    assert ("full.webp" in variants) == webp_supported()
+
+    assert client.get("/static/nope.png").status_code == 404
+    assert client.get(url + "?format=gif").status_code == 422
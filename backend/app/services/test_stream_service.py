@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import stream as stream_api
+from app.main import app
+from app.models.crop_recommendation import is_model_available
+from app.services import stream_service
+
+NOW = 1_700_000_000.0
+
+
+def reading(tower_id, temperature=22.0, timestamp=NOW, **overrides):
+    values = {"temperature": temperature, "humidity": 60, "sunlight_hours": 5, "water_ph": 6.0, "air_quality_index": 50, "wind_speed": 1.0}
+    values.update(overrides)
+    return json.dumps({"tower_id": tower_id, "timestamp": timestamp, **values})
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fresh = stream_service.TowerStore(max_towers=8, bucket_seconds=10, windows=[60, 300])
+    monkeypatch.setattr(stream_service, "_store", fresh)
+
+    async def inline(workload, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+    monkeypatch.setattr(stream_service, "run_workload", inline)
+    return fresh
+
+
+def test_rolling_windows_and_bounded_towers(store):
+    store.add("a", (20, 60, 5, 6.0, 50, 1.0), NOW - 5)
+    store.add("a", (24, 60, 5, 6.0, 70, 1.0), NOW - 1)
+    store.add("a", (40, 60, 5, 6.0, 50, 1.0), NOW - 200)
+    count, mean, lo, hi = store.aggregates(np.array([store.rows["a"]]), 60, NOW)
+    assert count[0] == 2 and mean[0, 0] == 22 and lo[0, 0] == 20 and hi[0, 4] == 70
+    count, mean, _, hi = store.aggregates(np.array([store.rows["a"]]), 300, NOW)
+    assert count[0] == 3 and hi[0, 0] == 40
+    # older than the ring
+    assert not store.add("a", (20, 60, 5, 6.0, 50, 1.0), NOW - 10_000)
+
+    for i in range(20):
+        store.add(f"t{i}", (20, 60, 5, 6.0, 50, 1.0), NOW)
+    assert len(store.rows) == store.capacity == 8
+    assert "a" not in store.rows and "t19" in store.rows
+
+
+@pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+def test_only_changed_results_are_pushed(store):
+    async def scenario():
+        subscription = stream_service.subscribe({"t1"})
+        try:
+            stream_service.ingest_lines([reading("t1"), reading("t2")])
+            assert await stream_service.rescore_updated(NOW) == 2
+            assert subscription.queue.qsize() == 1
+            first = subscription.queue.get_nowait()
+            assert first["status"] == "scored" and first["inputs"]["temperature"] == 22.0
+
+            # same quantization bin: not rescored
+            stream_service.ingest_lines([reading("t1", temperature=22.1)])
+            rows, _, _, _ = stream_service.check_updated(store, NOW)
+            assert len(rows) == 0
+
+            # crosses a gating threshold: rescored and pushed
+            stream_service.ingest_lines([reading("t1", temperature=45.0) for _ in range(20)])
+            assert await stream_service.rescore_updated(NOW) == 1
+            event = subscription.queue.get_nowait()
+            assert event["status"] == "rule_rejection" and event["detail"] == "Temperature outside safe bounds"
+        finally:
+            stream_service.unsubscribe(subscription)
+    asyncio.run(scenario())
+
+
+def test_ndjson_and_websocket_ingestion(store):
+    client = TestClient(app)
+    body = "\n".join([reading("a"), "{not json", reading("b", water_ph=9.5), json.dumps([json.loads(reading("c"))])])
+    response = client.post("/stream/ingest", content=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["accepted"] == 2 and data["rejected"] == 2
+    assert [e["line"] for e in data["errors"]] == [2, 3]
+
+    with client.websocket_connect("/stream/ingest") as ws:
+        ws.send_text(reading("d") + "\n" + reading("d", humidity=5))
+        reply = ws.receive_json()
+        assert reply["rejected"] == 1 and reply["errors"][0]["line"] == 2
+
+    assert set(store.rows) == {"a", "c", "d"}
+    assert client.get("/stream/towers/missing").status_code == 404
+    assert client.get("/stream/stats").json()["towers"] == 3
+
+
+def test_ndjson_lines_split_across_chunks_and_the_line_cap(store, monkeypatch):
+    client = TestClient(app)
+    body = (reading("a") + "\n" + reading("b")).encode()
+    response = client.post("/stream/ingest", content=iter([body[:7], body[7:50], body[50:]]))
+    assert response.json() == {"accepted": 2, "rejected": 0, "errors": []}
+
+    monkeypatch.setattr(stream_api, "STREAM_MAX_LINE_BYTES", 200)
+    huge = json.dumps([json.loads(reading("c"))] * 5).encode()
+    response = client.post("/stream/ingest", content=iter([reading("d").encode() + b"\n", huge[:150], huge[150:]]))
+    assert response.status_code == 413 and "Line 2" in response.json()["detail"]
+    response = client.post("/stream/ingest", content=reading("e").encode() + b"\n" + huge + b"\n")
+    assert response.status_code == 413
+    assert set(store.rows) == {"a", "b", "d", "e"}
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.models.crop_recommendation import is_model_available
+from app.services.grid_service import forest_grid_proba
+from app.services.ml_service import READING_COLUMNS, score_grid, score_readings
+from app.services.sweep_service import axis_values
+
+needs_model = pytest.mark.skipif(not is_model_available(), reason="model artifacts not available")
+
+
+def test_grid_matches_predict_proba_point_by_point():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, size=(500, 4))
+    y = (X[:, 0] + X[:, 1] > 10).astype(int) + (X[:, 2] > 7)
+    forest = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    fixed = np.array([3.0, 4.0, 8.5, 1.0])
+    a, b = np.linspace(-1, 11, 37), np.linspace(0, 10, 23)
+
+    grid = forest_grid_proba(forest, fixed, [(0, a), (1, b)])
+    points = np.tile(fixed, (len(a) * len(b), 1))
+    points[:, 0], points[:, 1] = np.repeat(a, len(b)), np.tile(b, len(a))
+    assert grid.shape == (len(a), len(b), 3)
+    assert np.allclose(grid.reshape(-1, 3), forest.predict_proba(points), atol=1e-12)
+
+    line = forest_grid_proba(forest, fixed, [(2, a)])
+    points = np.tile(fixed, (len(a), 1))
+    points[:, 2] = a
+    assert np.allclose(line.reshape(-1, 3), forest.predict_proba(points), atol=1e-12)
+
+
+def test_axis_values_include_stop_without_drift():
+    values = axis_values(10, 40, 0.15)
+    assert len(values) == 201 and values[-1] == 40.0 and values[1] == 10.15
+
+
+@needs_model
+def test_score_grid_equals_scoring_every_point():
+    base = (22, 65, 8, 6.2, 40, 1.0)
+    axes = [("temperature", axis_values(5, 44, 0.5)), ("humidity", axis_values(20, 100, 4))]
+    grid = score_grid(base, axes)
+    points = np.tile(np.array(base, dtype=float), (len(axes[0][1]) * len(axes[1][1]), 1))
+    points[:, 0] = np.repeat(axes[0][1], len(axes[1][1]))
+    points[:, 1] = np.tile(axes[1][1], len(axes[0][1]))
+    expected = score_readings(points)
+    for key in ("suitability_class", "agronomic_ok", "recommended", "rule_rejected"):
+        assert np.array_equal(grid[key], expected[key]), key
+    assert np.allclose(grid["confidence"], expected["confidence"], equal_nan=True)
+
+
+@needs_model
+def test_sweep_endpoint():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    base = dict(zip(READING_COLUMNS, (22, 65, 8, 6.2, 40, 1.0)))
+    body = {"base": base, "axes": [{"variable": "temperature", "start": 10, "stop": 40, "step": 0.25}, {"variable": "humidity", "start": 40, "stop": 90, "step": 5}]}
+    result = client.post("/predict/sweep", json=body).json()
+    assert result["shape"] == [121, 11] and result["variables"] == ["temperature", "humidity"]
+    assert "temperature" not in result["fixed"] and result["fixed"]["water_ph"] == 6.2
+    crops = len(result["crops"])
+    assert np.array(result["suitability_class"]).shape == (crops, 121, 11) and np.array(result["status"]).shape == (121, 11)
+
+    line = client.post("/predict/sweep", json={"base": base, "axes": body["axes"][:1]}).json()
+    assert line["shape"] == [121] and np.array(line["confidence"]).shape == (crops, 121)
+    # the sweep's humidity=65 column is the 1-D temperature sweep
+    assert np.array_equal(np.array(result["suitability_class"])[:, :, 5], np.array(line["suitability_class"]))
+
+    assert client.post("/predict/sweep", json={"base": base, "axes": body["axes"][:1] * 2}).status_code == 422
+    huge = {"base": base, "axes": [{"variable": "temperature", "start": 0, "stop": 45, "step": 1e-6}]}
+    assert client.post("/predict/sweep", json=huge).status_code == 422
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.tile_service import max_zoom, tile_bounds, tile_path
+
+
+def test_zoom_levels_and_bounds():
+    # 100 m farm with 0.5 m cells: labels (28 px) fit from z=5 (~41 px per cell), one more level for reading
+    assert max_zoom(100, 100, 0.5) == 6
+    assert max_zoom(10, 10, 2.5) == 0
+    spec = {"farm_length": 100, "farm_width": 50}
+    # the farm sits in the top-left corner of the 100 m world square
+    assert tile_bounds(spec, 0, 0, 0) == (0, 100, -50, 50)
+    assert tile_bounds(spec, 1, 1, 0) == (50, 100, 0, 50)
+
+
+def test_tiles_are_rendered_on_demand_and_cached(outputs):
+    client = TestClient(app)
+    body = {"farm_length": 100, "farm_width": 100, "min_spacing": 2.5, "max_towers": 1000, "cell_size_m": 0.5, "output": "tiles"}
+    result = client.post("/placement/", json=body).json()
+    tiles = result["tiles"]
+    assert result["image_url"] is None and tiles["max_zoom"] == 6
+    # the same layout hashes to the same pyramid
+    assert client.post("/placement/", json=body).json()["tiles"]["layout_hash"] == tiles["layout_hash"]
+
+    url = tiles["url_template"].format(z=6, x=10, y=60)
+    path = tile_path(tiles["layout_hash"], 6, 10, 60)
+    assert path.is_relative_to(outputs) and not path.exists()
+    response = client.get(url)
+    assert response.status_code == 200 and response.headers["content-type"] == "image/png"
+    assert response.content[:8] == b"\x89PNG\r\n\x1a\n" and path.exists()
+    assert "immutable" in response.headers["cache-control"]
+    assert client.get(url).content == response.content
+
+    assert client.get(tiles["url_template"].format(z=7, x=0, y=0)).status_code == 404
+    assert client.get(tiles["url_template"].format(z=1, x=2, y=0)).status_code == 404
+    assert client.get("/static/tiles/not-a-hash/0/0/0.png").status_code == 404
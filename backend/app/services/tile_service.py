@@ -0,0 +1,188 @@
+"""
+Zoomable tile pyramid for placement layouts.
+
+A single PNG of a 100 m farm at fine cell sizes is either unreadable or huge.
+With output="tiles" the placement call only stores the layout (positions, grid,
+obstacles) under STATIC_TILE_DIR/<layout hash>/layout.json. Tiles are rendered
+on first request and kept next to it as <z>/<x>/<y>.png, so clients only pay for
+the tiles they actually view.
+
+Tile scheme: the farm sits in the top-left corner of a square world whose side is
+max(farm_length, farm_width). Zoom z has 2**z x 2**z tiles of TILE_SIZE pixels.
+x runs along farm_length, and tile row 0 is at the top (largest tower y), as in
+web map tiles. Each tile only draws the cells and towers that intersect it. Cell
+labels appear once a cell is at least TILE_LABEL_MIN_PX wide; tower numbers once
+towers are TILE_LABEL_MIN_PX apart.
+"""
+import hashlib
+import io
+import json
+import math
+import re
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import matplotlib
+matplotlib.use("Agg")
+
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle, Polygon, Rectangle
+
+from app.core.config import TILE_LABEL_MIN_PX, TILE_MAX_ZOOM, TILE_SIZE
+from app.core.telemetry import RENDER_STAGE_SECONDS
+from app.core.utils import atomic_write
+
+STATIC_TILE_DIR = Path(__file__).resolve().parent.parent / "data" / "tiles"
+LAYOUT_HASH = re.compile(r"^[0-9a-f]{16}$")
+TOWER_RADIUS_M = 0.28
+
+_RENDER_TILE = RENDER_STAGE_SECONDS.labels("tile")
+
+
+def layout_hash(spec: dict) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+def max_zoom(farm_length: float, farm_width: float, cell: float) -> int:
+    """One zoom level past the first where cell labels fit, capped at TILE_MAX_ZOOM."""
+    side = max(farm_length, farm_width)
+    # pixels per cell at zoom z: TILE_SIZE * 2**z * cell / side; the extra level is the factor 2
+    needed = math.log2(max(TILE_LABEL_MIN_PX * 2 * side / (TILE_SIZE * cell), 1.0))
+    return min(TILE_MAX_ZOOM, int(math.ceil(needed)))
+
+
+def _cell_label(row: int, col: int) -> str:
+    # same labels as the eligible_cells list returned by optimize_tower_placement
+    return (chr(ord('A') + row) if row < 26 else str(row + 1)) + str(col + 1)
+
+
+def save_layout(
+    positions: Sequence[Tuple[float, float]],
+    farm_length: float,
+    farm_width: float,
+    min_spacing: float,
+    cell: float,
+    obstacles: Optional[List[dict]] = None,
+    boundary: Optional[List[Tuple[float, float]]] = None,
+) -> dict:
+    """Store the layout once under its hash and return the tile metadata for the API response."""
+    spec = {
+        "farm_length": farm_length,
+        "farm_width": farm_width,
+        "min_spacing": min_spacing,
+        "cell": cell,
+        "positions": [list(p) for p in positions],
+        "obstacles": obstacles or [],
+        "boundary": [list(p) for p in boundary] if boundary else None,
+    }
+    key = layout_hash(spec)
+    layout_dir = STATIC_TILE_DIR / key
+    path = layout_dir / "layout.json"
+    if not path.exists():
+        layout_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, json.dumps(spec).encode())
+    return {
+        "layout_hash": key,
+        "url_template": f"/static/tiles/{key}/{{z}}/{{x}}/{{y}}.png",
+        "tile_size": TILE_SIZE,
+        "min_zoom": 0,
+        "max_zoom": max_zoom(farm_length, farm_width, cell),
+        "world_size_m": max(farm_length, farm_width),
+    }
+
+
+def load_layout(key: str) -> Optional[dict]:
+    if not LAYOUT_HASH.match(key):
+        return None
+    path = STATIC_TILE_DIR / key / "layout.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def tile_path(key: str, z: int, x: int, y: int) -> Path:
+    return STATIC_TILE_DIR / key / str(z) / str(x) / f"{y}.png"
+
+
+def tile_bounds(spec: dict, z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(x_min, x_max, y_min, y_max) in meters; tile row 0 is at the top."""
+    size = max(spec["farm_length"], spec["farm_width"]) / 2 ** z
+    top = spec["farm_width"]
+    return x * size, (x + 1) * size, top - (y + 1) * size, top - y * size
+
+
+def render_tile(key: str, z: int, x: int, y: int) -> Optional[str]:
+    """Path of the tile PNG, rendering it first if needed; None for an unknown layout or tile."""
+    spec = load_layout(key)
+    if spec is None or not (0 <= z <= max_zoom(spec["farm_length"], spec["farm_width"], spec["cell"])) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return None
+    path = tile_path(key, z, x, y)
+    if path.exists():
+        return str(path)
+
+    t0 = time.perf_counter()
+    x0, x1, y0, y1 = tile_bounds(spec, z, x, y)
+    px_per_m = TILE_SIZE / (x1 - x0)
+    length, width, cell = spec["farm_length"], spec["farm_width"], spec["cell"]
+
+    fig = Figure(figsize=(TILE_SIZE / 100, TILE_SIZE / 100), dpi=100)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+
+    # cells intersecting the tile (clipped to the farm)
+    c0, c1 = max(int(x0 // cell), 0), min(int(math.ceil(min(x1, length) / cell)), int(math.ceil(length / cell)))
+    r0, r1 = max(int(y0 // cell), 0), min(int(math.ceil(min(y1, width) / cell)), int(math.ceil(width / cell)))
+    positions = np.array(spec["positions"], dtype=float).reshape(-1, 2)
+    pad = TOWER_RADIUS_M + cell
+    visible = np.flatnonzero(
+        (positions[:, 0] >= x0 - pad) & (positions[:, 0] <= x1 + pad) & (positions[:, 1] >= y0 - pad) & (positions[:, 1] <= y1 + pad)
+    )
+    if c1 > c0 and r1 > r0:
+        occupied = {(int(py // cell), int(px // cell)) for px, py in positions[visible].tolist()}
+        cells = [
+            Rectangle((col * cell, row * cell), min(cell, length - col * cell), min(cell, width - row * cell))
+            for row, col in occupied if r0 <= row < r1 and c0 <= col < c1
+        ]
+        ax.add_collection(PatchCollection(cells, facecolor="#dcfce7", edgecolor="none", zorder=1))
+        if cell * px_per_m >= 3:
+            xs = [c * cell for c in range(c0, c1 + 1)]
+            ys = [r * cell for r in range(r0, r1 + 1)]
+            lines = [[(gx, r0 * cell), (gx, min(r1 * cell, width))] for gx in xs] + [[(c0 * cell, gy), (min(c1 * cell, length), gy)] for gy in ys]
+            ax.add_collection(LineCollection(lines, colors="#cbd5e1", linewidths=0.6, zorder=2))
+        if cell * px_per_m >= TILE_LABEL_MIN_PX:
+            for row in range(r0, r1):
+                for col in range(c0, c1):
+                    ax.text((col + 0.5) * cell, (row + 0.5) * cell, _cell_label(row, col), ha="center", va="center", fontsize=6, color="#0b3954", zorder=2)
+
+    ax.add_patch(Rectangle((0, 0), length, width, linewidth=1.5, edgecolor="#0b3d91", facecolor="none", zorder=3))
+    for obstacle in spec["obstacles"]:
+        if obstacle["shape"] == "rect":
+            patch = Rectangle((obstacle["x_min"], obstacle["y_min"]), obstacle["x_max"] - obstacle["x_min"], obstacle["y_max"] - obstacle["y_min"])
+        else:
+            patch = Circle((obstacle["x"], obstacle["y"]), obstacle["radius"])
+        patch.set(facecolor="#94a3b8", edgecolor="#475569", alpha=0.8, zorder=3)
+        ax.add_patch(patch)
+    if spec["boundary"]:
+        ax.add_patch(Polygon(spec["boundary"], closed=True, linewidth=1.5, linestyle="--", edgecolor="#0b3d91", facecolor="none", zorder=3))
+
+    if len(visible):
+        # towers keep their physical size but never shrink below 2 px
+        radius = max(TOWER_RADIUS_M, 1.0 / px_per_m)
+        ax.add_collection(PatchCollection([Circle(tuple(p), radius) for p in positions[visible].tolist()], color="#0b5cff", zorder=4))
+        if spec["min_spacing"] * px_per_m >= TILE_LABEL_MIN_PX:
+            for i in visible.tolist():
+                px, py = positions[i]
+                ax.text(px, py + radius + 0.15, str(i + 1), ha="center", fontsize=7, fontweight="bold", color="#021124", zorder=5)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, buffer.getvalue())
+    _RENDER_TILE.observe(time.perf_counter() - t0)
+    return str(path)
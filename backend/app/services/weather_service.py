@@ -1,8 +1,25 @@
+import os
+import threading
+import time
+
 import requests
 
+from app.core.config import WEATHER_CACHE_TTL_SECONDS
+from app.core.telemetry import CACHE_REQUESTS, WEATHER_FETCH_SECONDS, timed
+
 # 🔑 OpenWeather API Key
 # (Later you can move this to .env)
-API_KEY = "YOUR_OPENWEATHER_API_KEY"
+API_KEY = os.getenv("OPENWEATHER_API_KEY", "YOUR_OPENWEATHER_API_KEY")
+
+# Upstream base URL; point it at a local stub for offline load tests
+BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+
+# (lat, lon) rounded to 2 decimals (~1 km) -> (fetched_at, result)
+_coords_cache = {}
+_coords_cache_lock = threading.Lock()
+_COORDS_CACHE_MAX_ENTRIES = 4096
+_CACHE_HIT = CACHE_REQUESTS.labels("weather", "hit")
+_CACHE_MISS = CACHE_REQUESTS.labels("weather", "miss")
 
 
 def fetch_environment_by_city(city: str):
@@ -10,7 +27,7 @@ def fetch_environment_by_city(city: str):
     Fetch temperature & humidity using city name
     """
     url = (
-        f"https://api.openweathermap.org/data/2.5/weather"
+        f"{BASE_URL}/weather"
         f"?q={city},IN&appid={API_KEY}&units=metric"
     )
 
@@ -27,12 +44,31 @@ def fetch_environment_by_city(city: str):
     }
 
 
+@timed(WEATHER_FETCH_SECONDS.labels())
 def fetch_environment_by_coords(lat: float, lon: float):
     """
-    Fetch environment & weather using latitude and longitude
+    Fetch environment & weather using latitude and longitude.
+    Results are cached per ~1 km tile for WEATHER_CACHE_TTL_SECONDS.
     """
+    key = (round(lat, 2), round(lon, 2))
+    now = time.monotonic()
+    cached = _coords_cache.get(key)
+    if cached is not None and now - cached[0] < WEATHER_CACHE_TTL_SECONDS:
+        _CACHE_HIT.inc()
+        return dict(cached[1])
+    _CACHE_MISS.inc()
+
+    result = _fetch_coords_upstream(lat, lon)
+    with _coords_cache_lock:
+        if len(_coords_cache) >= _COORDS_CACHE_MAX_ENTRIES:
+            _coords_cache.clear()
+        _coords_cache[key] = (now, result)
+    return dict(result)
+
+
+def _fetch_coords_upstream(lat: float, lon: float):
     url = (
-        f"https://api.openweathermap.org/data/2.5/weather"
+        f"{BASE_URL}/weather"
         f"?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
     )
 
@@ -1,55 +1,90 @@
-import pandas as pd
+"""
+Plots a tower layout: a saved layout from the layout store (--layout NAME [--version N])
+or, by default, the positions in app/data/optimized_tower_positions_auto_grid.csv.
+Run from the backend/ folder:
+
+    python -m app.visualization.visualize_placement [--layout NAME] [--version N]
+"""
+import argparse
+
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import EllipseCollection
 
 FARM_LENGTH = 20
 FARM_WIDTH = 20
 TOWER_RADIUS = 0.6  # visual only
+CSV_PATH = "app/data/optimized_tower_positions_auto_grid.csv"
 
-df = pd.read_csv("app/data/optimized_tower_positions_auto_grid.csv")
 
-fig, ax = plt.subplots(figsize=(8, 8))
-ax.set_facecolor("#f4f9f4")
+def load_positions(layout=None, version=None):
+    """(x, y, farm_length, farm_width) from the layout store, or from CSV_PATH without a layout name."""
+    if layout is None:
+        df = pd.read_csv(CSV_PATH, usecols=["x_meter", "y_meter"])
+        return df["x_meter"].to_numpy(float), df["y_meter"].to_numpy(float), FARM_LENGTH, FARM_WIDTH
+    from app.services.layout_service import get_store
 
-# Farm boundary
-ax.add_patch(
-    plt.Rectangle(
-        (0, 0),
-        FARM_LENGTH,
-        FARM_WIDTH,
-        edgecolor="darkgreen",
-        facecolor="none",
-        linewidth=3
-    )
-)
+    meta, records = get_store().load(layout, version)
+    return records["x"], records["y"], meta["farm_length"], meta["farm_width"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plot a tower layout")
+    parser.add_argument("--layout", help="name of a saved layout (default: the auto-grid CSV)")
+    parser.add_argument("--version", type=int, default=None, help="layout version (default: the latest)")
+    parser.add_argument("--output", default="optimized_tower_layout_final.png")
+    parser.add_argument("--show", action="store_true")
+    args = parser.parse_args(argv)
 
-# Towers
-for i, row in df.iterrows():
+    x, y, farm_length, farm_width = load_positions(args.layout, args.version)
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ax.set_facecolor("#f4f9f4")
+
+    # Farm boundary
     ax.add_patch(
-        plt.Circle(
-            (row["x_meter"], row["y_meter"]),
-            TOWER_RADIUS,
+        plt.Rectangle(
+            (0, 0),
+            farm_length,
+            farm_width,
             edgecolor="darkgreen",
-            facecolor="#66bb6a",
-            linewidth=2
+            facecolor="none",
+            linewidth=3
         )
     )
-    ax.text(
-        row["x_meter"],
-        row["y_meter"],
-        str(i + 1),
-        ha="center",
-        va="center",
-        fontsize=8
+
+    # Towers: one collection for all circles instead of a patch per tower
+    diameters = np.full(len(x), 2 * TOWER_RADIUS)
+    ax.add_collection(
+        EllipseCollection(
+            diameters,
+            diameters,
+            np.zeros(len(x)),
+            units="xy",
+            offsets=np.column_stack([x, y]),
+            offset_transform=ax.transData,
+            edgecolors="darkgreen",
+            facecolors="#66bb6a",
+            linewidths=2
+        )
     )
+    for i, (tx, ty) in enumerate(zip(x.tolist(), y.tolist()), start=1):
+        ax.text(tx, ty, str(i), ha="center", va="center", fontsize=8)
+
+    ax.set_xlim(0, farm_length)
+    ax.set_ylim(0, farm_width)
+    ax.set_aspect("equal")
+    ax.grid(True, linestyle="--", alpha=0.4)
+
+    ax.set_title("Optimized Aeroponic Tower Placement")
+    ax.set_xlabel("Farm Length (m)")
+    ax.set_ylabel("Farm Width (m)")
 
-ax.set_xlim(0, FARM_LENGTH)
-ax.set_ylim(0, FARM_WIDTH)
-ax.set_aspect("equal")
-ax.grid(True, linestyle="--", alpha=0.4)
+    plt.savefig(args.output, dpi=300)
+    if args.show:
+        plt.show()
 
-ax.set_title("Optimized Aeroponic Tower Placement")
-ax.set_xlabel("Farm Length (m)")
-ax.set_ylabel("Farm Width (m)")
 
-plt.savefig("optimized_tower_layout_final.png", dpi=300)
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,883 @@
+"""
+Micro-benchmarks for the backend hot paths.
+
+Run from the backend/ folder:
+
+    python -m benchmarks.bench run --output benchmarks/baseline.json
+    python -m benchmarks.bench run --output current.json
+    python -m benchmarks.bench compare benchmarks/baseline.json current.json
+
+`run` times every case, records its tracemalloc peak and writes the raw samples
+to a versioned JSON file. `compare` flags cases whose timings are significantly
+slower (Mann-Whitney U test + minimum slowdown) or whose peak memory grew, and
+exits non-zero so it can gate CI. Everything runs in-process and offline.
+"""
+import argparse
+import datetime
+import gc
+import json
+import logging
+import math
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+BASELINE_SCHEMA_VERSION = 1
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Default regression gates used by `compare`
+DEFAULT_ALPHA = 0.01
+DEFAULT_MIN_SLOWDOWN = 0.05
+DEFAULT_MAX_MEMORY_GROWTH = 0.10
+MIN_MEMORY_GROWTH_BYTES = 64 * 1024
+
+
+class SkipCase(Exception):
+    """Raised by a case setup when the case cannot run in this environment."""
+
+
+class Case:
+    def __init__(self, name: str, group: str, setup: Callable[[], Callable[[], object]], params: dict, repeats: int = 15):
+        self.name = name
+        self.group = group
+        self.setup = setup
+        self.params = params
+        self.repeats = repeats
+
+
+CASES: List[Case] = []
+# resources of the case being run (temporary directories, patches), released after it
+_case_resources = ExitStack()
+
+
+def case(group: str, repeats: int = 15, **params):
+    """Register a benchmark. The decorated function returns the callable to time."""
+    def decorator(setup):
+        suffix = ",".join(f"{k}={v}" for k, v in params.items())
+        name = f"{group}[{suffix}]" if suffix else group
+        CASES.append(Case(name, group, lambda: setup(**params), params, repeats))
+        return setup
+    return decorator
+
+
+# ---------------------------------------------
+# INPUT GENERATORS
+# ---------------------------------------------
+def random_readings(n: int, seed: int = 42) -> List[dict]:
+    """Deterministic readings spread over the valid `PredictionInput` ranges."""
+    rng = random.Random(seed)
+    return [
+        {
+            "temperature": round(rng.uniform(8, 42), 2),
+            "humidity": round(rng.uniform(30, 95), 1),
+            "sunlight_hours": round(rng.uniform(2, 12), 1),
+            "water_ph": round(rng.uniform(4.6, 7.6), 2),
+            "air_quality_index": round(rng.uniform(10, 220)),
+            "wind_speed": round(rng.uniform(0.1, 3.0), 2),
+        }
+        for _ in range(n)
+    ]
+
+
+def synthetic_catalog(n_crops: int, seed: int = 42):
+    """A CropCatalog with `n_crops` rows made by jittering the real catalog's bounds."""
+    import numpy as np
+
+    from app.core.config import CROP_CATALOG
+    from app.core.crop_catalog import CropCatalog
+
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, len(CROP_CATALOG), n_crops)
+    shift = rng.normal(0, 1.5, (n_crops, 1)) * (CROP_CATALOG.upper[base] - CROP_CATALOG.lower[base]) / 4
+    names = [f"{CROP_CATALOG.names[b]}_{i}" for i, b in enumerate(base)]
+    return CropCatalog(names, CROP_CATALOG.lower[base] + shift, CROP_CATALOG.upper[base] + shift, CROP_CATALOG.aqi_max[base])
+
+
+def case_temp_dir(prefix: str) -> Path:
+    """A temporary directory that is removed once the current case has run."""
+    path = Path(tempfile.mkdtemp(prefix=prefix))
+    _case_resources.callback(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def isolated_outputs() -> Path:
+    """
+    Send everything POST /placement/ writes (images, variants, tiles) to a temporary
+    directory for the rest of the current case. Rendering normally runs in spawned pool
+    workers, which a patch in this process would not reach, so the pools are disabled
+    and workloads run on threads here.
+    """
+    from app.services import executor, placement_service, static_service, tile_service
+
+    out_dir = case_temp_dir("bench_static_")
+    for target, name, value in (
+        (executor, "PROCESS_POOL_WORKERS", 0),
+        (placement_service, "DATA_DIR", out_dir),
+        (static_service, "STATIC_DIR", out_dir),
+        (static_service, "STATIC_VARIANT_DIR", out_dir / "variants"),
+        (tile_service, "STATIC_TILE_DIR", out_dir / "tiles"),
+    ):
+        _case_resources.enter_context(mock.patch.object(target, name, value))
+    return out_dir
+
+
+@contextmanager
+def offline_weather():
+    """Stub the OpenWeather upstream so /environment can be timed offline."""
+    payload = {
+        "main": {"temp": 24.3, "humidity": 61},
+        "weather": [{"description": "clear sky"}],
+        "wind": {"speed": 1.7},
+        "name": "Benchmark",
+    }
+    response = mock.Mock(status_code=200)
+    response.json.return_value = payload
+    with mock.patch("app.services.weather_service.requests.get", return_value=response):
+        yield
+
+
+# ---------------------------------------------
+# CASES
+# ---------------------------------------------
+for _batch in (1, 10, 100):
+    @case("predict_crop_scores", repeats=5 if _batch == 100 else 15, batch=_batch)
+    def _predict_case(batch):
+        from app.models.crop_recommendation import is_model_available
+        from app.services.ml_service import predict_crop_scores
+
+        if not is_model_available():
+            raise SkipCase("model artifacts not available")
+        readings = random_readings(batch)
+
+        def run():
+            for reading in readings:
+                predict_crop_scores(**reading)
+        return run
+
+
+@case("score_readings", repeats=5, batch=100)
+def _score_readings_case(batch, mode="full"):
+    from app.models.crop_recommendation import is_model_available
+    from app.services.ml_service import READING_COLUMNS, score_readings
+
+    if not is_model_available():
+        raise SkipCase("model artifacts not available")
+    readings = [[r[c] for c in READING_COLUMNS] for r in random_readings(batch)]
+    return lambda: score_readings(readings, mode=mode, use_specialists=False)
+
+
+case("score_readings", repeats=5, batch=100, mode="pruned")(_score_readings_case)
+
+
+# Cost of explain=True (tree-path contributions) next to plain scoring; rows are readings
+for _rows in (1, 200, 2000):
+    for _explain in (False, True):
+        @case("contributions", repeats=3 if _rows == 2000 else 10, rows=_rows, explain=_explain)
+        def _contributions_case(rows, explain):
+            from app.models.crop_recommendation import is_model_available
+            from app.services.ml_service import READING_COLUMNS, predict_crop_scores, score_readings
+
+            if not is_model_available():
+                raise SkipCase("model artifacts not available")
+            readings = random_readings(rows)
+            if rows == 1:
+                return lambda: predict_crop_scores(**readings[0], use_specialists=False, explain=explain)
+            values = [[r[c] for c in READING_COLUMNS] for r in readings]
+            return lambda: score_readings(values, use_specialists=False, explain=explain)
+
+
+# What-if sweep of temperature x humidity around one reading: grid evaluation of the
+# forest (score_grid) against scoring every grid point (score_readings)
+for _side in (50, 200):
+    for _impl in ("grid", "points"):
+        @case("sweep", repeats=5, side=_side, impl=_impl)
+        def _sweep_case(side, impl):
+            import numpy as np
+
+            from app.models.crop_recommendation import is_model_available
+            from app.services.ml_service import score_grid, score_readings
+
+            if not is_model_available():
+                raise SkipCase("model artifacts not available")
+            base = (22.0, 65.0, 8.0, 6.2, 40.0, 1.0)
+            axes = [("temperature", np.linspace(5, 44, side)), ("humidity", np.linspace(20, 100, side))]
+            if impl == "grid":
+                return lambda: score_grid(base, axes, use_specialists=False)
+            points = np.tile(np.array(base), (side * side, 1))
+            points[:, 0], points[:, 1] = np.repeat(axes[0][1], side), np.tile(axes[1][1], side)
+            return lambda: score_readings(points, use_specialists=False)
+
+
+# Forecast suitability timeline over a cached stub forecast: all hours x crops in one
+# call (batched) against one /predict/ scoring per hour (per_hour)
+for _hours in (24, 120):
+    for _impl in ("batched", "per_hour"):
+        @case("forecast_timeline", repeats=5, hours=_hours, impl=_impl)
+        def _forecast_timeline_case(hours, impl):
+            from app.models.crop_recommendation import is_model_available
+            from app.services.forecast_service import StubForecast, forecast_timeline
+            from app.services.ml_service import predict_crop_scores
+
+            if not is_model_available():
+                raise SkipCase("model artifacts not available")
+            series = StubForecast().fetch(12.97, 77.59, 1_700_000_000).window(1_700_000_000, hours)
+            fixed = {"sunlight_hours": 8.0, "water_ph": 6.2, "air_quality_index": 40.0}
+            if impl == "batched":
+                return lambda: forecast_timeline(series, fixed)
+            t, h, w = (series.values[c] for c in ("temperature", "humidity", "wind_speed"))
+
+            def run():
+                for i in range(hours):
+                    predict_crop_scores(t[i], h[i], 8.0, 6.2, 40.0, w[i], use_specialists=False)
+            return run
+
+
+# Rule engine only (agronomic mask, AQI penalty, explanation flags) over 200 readings;
+# impl=loop is the former per-crop dict lookup, kept as the reference point
+for _crops in (5, 100, 1000):
+    for _impl in ("vectorized", "loop"):
+        @case("crop_rules", repeats=5, crops=_crops, impl=_impl)
+        def _crop_rules_case(crops, impl):
+            import numpy as np
+
+            from app.services.ml_service import READING_COLUMNS
+
+            catalog = synthetic_catalog(crops)
+            readings = np.array([[r[c] for c in READING_COLUMNS] for r in random_readings(200)])
+            if impl == "vectorized":
+                def run():
+                    catalog.agronomic_mask(readings)
+                    catalog.aqi_penalty(readings)
+                    catalog.explanation_flags(readings)
+                return run
+
+            constraints = catalog.as_constraints()
+
+            def run():
+                for t, h, s, ph, aqi, w in readings.tolist():
+                    for c in constraints.values():
+                        (c["temp"][0] <= t <= c["temp"][1] and c["hum"][0] <= h <= c["hum"][1]
+                         and c["sun"][0] <= s <= c["sun"][1] and c["ph"][0] <= ph <= c["ph"][1]
+                         and c["wind"][0] <= w <= c["wind"][1])
+                        if aqi > c["aqi"]:
+                            max(0.1, 1.0 - (aqi - c["aqi"]) / max(20.0, float(c["aqi"])))
+                        (t <= c["temp"][1], h >= c["hum"][0])
+            return run
+
+
+for _farm in (10, 50, 100):
+    for _spacing in (0.5, 2.5, 10):
+        @case("greedy_tower_placement", farm=_farm, spacing=_spacing)
+        def _placement_case(farm, spacing):
+            from app.services.optimization_service import greedy_tower_placement
+
+            return lambda: greedy_tower_placement(farm, farm, spacing, 1000)
+
+
+for _grid in (10, 25, 50):
+    @case("generate_placement_image", repeats=3 if _grid == 50 else 5, grid=_grid)
+    def _image_case(grid):
+        from app.services.optimization_service import generate_placement_image, greedy_tower_placement
+
+        farm = 20.0
+        cell = farm / grid
+        positions = greedy_tower_placement(farm, farm, max(cell, 0.5), 1000)
+        out_dir = case_temp_dir("bench_img_")
+
+        return lambda: generate_placement_image(positions, farm, farm, cell, str(out_dir / "layout.png"), cell_size_m=cell)
+
+
+def _stream_store(towers: int):
+    import numpy as np
+
+    from app.services import stream_service
+
+    store = stream_service.TowerStore(max_towers=towers)
+    rng = np.random.default_rng(1)
+    now = time.time()
+    values = np.column_stack([
+        rng.uniform(15, 30, towers), rng.uniform(40, 80, towers), rng.uniform(3, 9, towers),
+        rng.uniform(5.4, 7.0, towers), rng.uniform(20, 175, towers), rng.uniform(0.2, 2.6, towers),
+    ])
+    for i in range(towers):
+        store.add(f"tower-{i}", values[i], now)
+    return store, values, now
+
+
+@case("stream", repeats=5, op="ingest_ndjson_x10000", towers=5000)
+def _stream_ingest_case(op, towers):
+    from app.services import stream_service
+
+    store, values, now = _stream_store(towers)
+    lines = [
+        json.dumps({"tower_id": f"tower-{i % towers}", **dict(zip(stream_service.READING_COLUMNS, values[i % towers].tolist()))})
+        for i in range(10000)
+    ]
+
+    def run():
+        with mock.patch.object(stream_service, "_store", store):
+            stream_service.ingest_lines(lines)
+    return run
+
+
+@case("stream", repeats=5, op="check_unchanged", towers=5000)
+def _stream_check_case(op, towers):
+    from app.services import stream_service
+
+    store, _, now = _stream_store(towers)
+    rows, _, _, keys = stream_service.check_updated(store, now)
+    store.keys[rows] = keys
+    store.has_key[rows] = True
+
+    def run():
+        store.dirty = set(range(towers))
+        stream_service.check_updated(store, now)
+    return run
+
+
+def synthetic_batch_result(rows: int, crops: int = 5, seed: int = 0) -> dict:
+    """A score_readings-shaped result (no model needed) for the serialization cases."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    valid = rng.random(rows) > 0.02
+    rule_rejected = valid & (rng.random(rows) < 0.1)
+    scored = valid & ~rule_rejected
+    agronomic_ok = scored[:, None] & (rng.random((rows, crops)) < 0.7)
+    confidence = np.where(scored[:, None], rng.uniform(30, 99, (rows, crops)).round(2), np.nan)
+    confidence[rule_rejected] = 100.0
+    return {
+        "crops": ["lettuce", "basil", "parsley", "mint", "rosemary"][:crops],
+        "valid": valid,
+        "rule_rejected": rule_rejected,
+        "impossible": np.zeros(rows, dtype=bool),
+        "agronomic_ok": agronomic_ok,
+        "suitability_class": np.where(scored[:, None], rng.integers(0, 3, (rows, crops)), 0),
+        "confidence": confidence,
+        "model_raw_score": np.where(scored[:, None], rng.uniform(0, 2, (rows, crops)).round(3), np.nan),
+        "recommended": np.where(agronomic_ok.any(axis=1), rng.integers(0, crops, rows), -1),
+    }
+
+
+# /predict/batch response bodies: FastAPI's default encoder (rows only) vs orjson and MessagePack, rows vs columnar
+for _rows in (1000, 10000, 100000):
+    for _layout, _encodings in (("rows", ("fastapi", "json", "msgpack")), ("columnar", ("json", "msgpack"))):
+        for _encoding in _encodings:
+            @case("batch_serialization", repeats=3 if _rows == 100000 else 10, rows=_rows, layout=_layout, encoding=_encoding)
+            def _batch_serialization_case(rows, layout, encoding):
+                import json
+
+                from app.core import serialization
+                from app.services.ml_service import batch_columns, batch_rows
+
+                if encoding == "msgpack" and not serialization.msgpack_available():
+                    raise SkipCase("msgpack not installed")
+                columns = batch_columns(synthetic_batch_result(rows))
+                if encoding == "fastapi":
+                    from fastapi.encoders import jsonable_encoder
+
+                    # what returning the dict from the route did: jsonable_encoder + JSONResponse.render
+                    return lambda: json.dumps(jsonable_encoder(batch_rows(columns)), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+                if layout == "columnar":
+                    return lambda: serialization.encode(columns, encoding)
+                return lambda: serialization.encode(batch_rows(columns), encoding)
+
+
+# Encoding one variant of a 220 dpi layout (what the first request for it pays)
+for _variant in ("full.png8", "full.webp", "thumb.png8"):
+    @case("image_variant", repeats=5, variant=_variant)
+    def _image_variant_case(variant):
+        from app.services.optimization_service import generate_placement_image, greedy_tower_placement
+        from app.services.static_service import encode_image, webp_supported
+
+        if variant.endswith("webp") and not webp_supported():
+            raise SkipCase("Pillow built without WebP support")
+        source = case_temp_dir("bench_variant_") / "layout.png"
+        generate_placement_image(greedy_tower_placement(40, 30, 2.5, 1000), 30, 40, 2.5, str(source), cell_size_m=2.5)
+
+        return lambda: encode_image(source, variant)
+
+
+# The lattice reproduction the annealing engine starts from, on the densest allowed layout
+@case("hex_lattice", repeats=5, farm=100, spacing=0.5)
+def _hex_lattice_case(farm, spacing):
+    from app.services.annealing_service import hex_lattice
+
+    return lambda: hex_lattice(farm, farm, spacing)
+
+
+# Tower counts for 50 spacings on one farm: one placer run per spacing vs the vectorized count
+for _mode in ("vectorized", "placer"):
+    @case("capacity", repeats=3, mode=_mode, farm=50, spacings=50)
+    def _capacity_case(mode, farm, spacings):
+        import numpy as np
+
+        spacing = np.round(np.linspace(0.5, 5.0, spacings), 2)
+        if mode == "vectorized":
+            from app.services.capacity_service import lattice_counts
+
+            return lambda: lattice_counts(farm, farm, spacing)
+        from app.services.optimization_service import greedy_tower_placement
+
+        return lambda: [len(greedy_tower_placement(farm, farm, float(s), 10 ** 9)) for s in spacing]
+
+
+# Binding spacing for the most distinct farm sizes a request may ask for, searched together
+@case("capacity", repeats=3, mode="binding_spacing", farms=100, max_towers=1000)
+def _binding_spacing_case(mode, farms, max_towers):
+    import numpy as np
+
+    from app.services.capacity_service import binding_spacings
+
+    rng = np.random.default_rng(0)
+    length, width = np.round(rng.uniform(20, 100, (2, farms)), 1)
+    return lambda: binding_spacings(length, width, max_towers)
+
+
+# 937 hex-placed towers (2.5 m spacing) shading each other, 15-minute sun steps at 45 degrees north
+for _days in (30, 183):
+    @case("shading", repeats=3, towers=1000, days=_days)
+    def _shading_case(towers, days):
+        import datetime as dt
+
+        from app.services.optimization_service import greedy_tower_placement
+        from app.services.shading_service import shade_towers
+
+        layout = greedy_tower_placement(100, 100, 2.5, towers)
+        start = dt.date(2024, 4, 1)
+        return lambda: shade_towers(layout, 2.0, 0.15, 45, start, start + dt.timedelta(days=days - 1))
+
+
+# ~940 hex-placed towers x 5 crops; rules=adjacency switches from the exact LP to the LP-bounded heuristic
+for _rules in ("none", "adjacency"):
+    @case("assign_crops", repeats=5, towers=1000, rules=_rules)
+    def _assign_case(towers, rules):
+        import numpy as np
+
+        from app.services.assignment_service import assign_crops
+        from app.services.optimization_service import greedy_tower_placement
+
+        positions = greedy_tower_placement(100, 100, 2.5, towers)
+        suitability = np.random.default_rng(0).uniform(0, 100, (len(positions), 5))
+        crops = ["lettuce", "basil", "parsley", "mint", "rosemary"]
+        limits = {"mint": {"max": 50}, "rosemary": {"min": 100}}
+        adjacency = {"no_adjacent_same": ["mint", "basil"], "incompatible_pairs": [("mint", "rosemary")]} if rules == "adjacency" else {}
+        return lambda: assign_crops(positions, suitability, crops, limits, **adjacency)
+
+
+# 100 x 100 m farm at 0.5 m cells (40k cells), 12 in-farm sensors, ~900 towers
+for _method in ("idw", "kriging"):
+    @case("microclimate", repeats=3, cells=40000, method=_method)
+    def _microclimate_case(cells, method):
+        import numpy as np
+
+        from app.models.crop_recommendation import is_model_available
+        from app.services.microclimate_service import compute_microclimate
+        from app.services.optimization_service import greedy_tower_placement
+
+        if not is_model_available():
+            raise SkipCase("model artifacts not available")
+        rng = np.random.default_rng(3)
+        sensors = [
+            {"x": float(x), "y": float(y), **reading}
+            for x, y, reading in zip(rng.uniform(0, 100, 12), rng.uniform(0, 100, 12), random_readings(12))
+        ]
+        towers = greedy_tower_placement(100, 100, 2.5, 1000)
+        return lambda: compute_microclimate(sensors, 100, 100, 0.5, towers, method)
+
+
+@case("telemetry", op="observe_x10000")
+def _telemetry_observe_case(op):
+    from app.core.telemetry import PREDICT_STAGE_SECONDS
+
+    child = PREDICT_STAGE_SECONDS.labels("benchmark")
+    values = [i * 1e-5 for i in range(10000)]
+
+    def run():
+        for v in values:
+            child.observe(v)
+    return run
+
+
+@case("telemetry", op="render")
+def _telemetry_render_case(op):
+    from app.core.telemetry import render_prometheus
+
+    return render_prometheus
+
+
+ROUTES = {
+    "root": ("GET", "/", None),
+    "predict": ("POST", "/predict/", random_readings(1)[0]),
+    "placement": ("POST", "/placement/", {"farm_length": 20, "farm_width": 20, "min_spacing": 2.5, "max_towers": 15}),
+    "environment": ("GET", "/environment/coords?lat=17.38&lon=78.48", None),
+    "metrics_summary": ("GET", "/metrics/summary", None),
+    "metrics_distribution": ("GET", "/metrics/distribution", None),
+    "telemetry": ("GET", "/telemetry/metrics", None),
+}
+
+for _route in ROUTES:
+    @case("router", repeats=5 if _route == "metrics_summary" else 15, route=_route)
+    def _router_case(route):
+        try:
+            from fastapi.testclient import TestClient
+        except Exception as e:  # httpx is required by the test client
+            raise SkipCase(f"fastapi TestClient unavailable: {e}")
+        from app.main import app
+
+        method, url, body = ROUTES[route]
+        client = TestClient(app)
+        isolated_outputs()
+
+        def run():
+            with offline_weather():
+                response = client.request(method, url, json=body)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{method} {url} -> {response.status_code}")
+            return response
+
+        probe = run()
+        if probe.status_code >= 400:
+            raise SkipCase(f"{method} {url} returned {probe.status_code}")
+        return run
+
+
+# 24 farm configurations (4 of them repeated): one POST /placement/ each, as planners did
+# before, against one POST /placement/batch with and without rendering
+BATCH_CONFIGS = [
+    {"farm_length": length, "farm_width": 16, "min_spacing": spacing, "max_towers": 500}
+    for length in (10, 20, 30, 40, 50) for spacing in (2.0, 3.0, 4.0, 5.0)
+]
+BATCH_CONFIGS += BATCH_CONFIGS[:4]
+
+for _mode in ("sequential", "batch", "batch_render"):
+    @case("placement_batch", repeats=3, configs=len(BATCH_CONFIGS), mode=_mode)
+    def _placement_batch_case(configs, mode):
+        try:
+            from fastapi.testclient import TestClient
+        except Exception as e:  # httpx is required by the test client
+            raise SkipCase(f"fastapi TestClient unavailable: {e}")
+        from app.main import app
+
+        client = TestClient(app)
+        isolated_outputs()
+
+        def run():
+            if mode == "sequential":
+                for config in BATCH_CONFIGS:
+                    client.post("/placement/", json=config).raise_for_status()
+            else:
+                body = {"configs": BATCH_CONFIGS, "render": mode == "batch_render"}
+                client.post("/placement/batch", json=body).raise_for_status()
+        return run
+
+
+# request path (record = buffer append) vs the writer's batched transaction vs one transaction per call
+for _mode in ("record", "batched_write", "per_call_write"):
+    @case("history", repeats=5, records=1000, mode=_mode)
+    def _history_case(records, mode):
+        import asyncio
+
+        from app.services.history_service import HistoryStore, HistoryWriter, prediction_record
+        from app.services.ml_service import predict_crop_scores
+
+        reading = (22, 65, 8, 6.2, 40, 1.0)
+        result = predict_crop_scores(*reading)
+        batch = [prediction_record(reading, result, None, f"farm-{i % 10}", "bench", 1_700_000_000 + i * 60) for i in range(records)]
+        store = HistoryStore(case_temp_dir("bench_history_") / "history.sqlite3")
+
+        async def record_all():
+            writer = HistoryWriter(store, max_records=records)
+            for record in batch:
+                await writer.record(record)
+
+        def run():
+            if mode == "record":
+                asyncio.run(record_all())
+            elif mode == "batched_write":
+                store.write(batch)
+            else:
+                for record in batch:
+                    store.write([record])
+        return run
+
+
+# Drift monitor: per-reading observe (the /predict/ path), one observe_batch over the same
+# readings (/predict/batch) and computing the report against a reference
+for _mode in ("observe", "observe_batch", "report"):
+    @case("drift", repeats=5, readings=10000, mode=_mode)
+    def _drift_case(readings, mode):
+        import numpy as np
+
+        from app.models.crop_recommendation import get_registry_version
+        from app.services.drift_service import DriftMonitor, build_reference
+        from app.services.ml_service import READING_COLUMNS
+
+        rows = [tuple(r[c] for c in READING_COLUMNS) for r in random_readings(readings)]
+        monitor = DriftMonitor()
+        if mode == "observe":
+            def run():
+                for row in rows:
+                    monitor.observe(row)
+            return run
+        array = np.asarray(rows, dtype=float)
+        if mode == "observe_batch":
+            return lambda: monitor.observe_batch(array)
+        monitor.observe_batch(array)
+        monitor.reference, monitor.reference_version = build_reference(array[::2]), get_registry_version()
+        return monitor.report
+
+
+# Layout store: saving a version, opening one memory-mapped vs parsing the same towers from
+# CSV (how layouts were kept before), and diffing two versions
+for _mode in ("save", "load_mmap", "load_csv", "diff"):
+    @case("layout_store", repeats=10, towers=10000, mode=_mode)
+    def _layout_store_case(towers, mode):
+        import numpy as np
+        import pandas as pd
+
+        from app.services.layout_service import LayoutStore
+
+        side = int(np.ceil(np.sqrt(towers)))
+        xs, ys = np.meshgrid(np.arange(side) + 0.5, np.arange(side) + 0.5)
+        positions = np.column_stack([xs.ravel(), ys.ravel()])[:towers]
+        crops = [("lettuce", "basil", "kale")[i % 3] for i in range(towers)]
+        root = case_temp_dir("bench_layouts_")
+        store = LayoutStore(root)
+        if mode == "save":
+            return lambda: store.save("bench", positions, side, side, 1.0, crops=crops)
+        if mode == "load_csv":
+            csv_path = root / "towers.csv"
+            pd.DataFrame({"x_meter": positions[:, 0], "y_meter": positions[:, 1], "crop": crops}).to_csv(csv_path, index=False)
+            return lambda: pd.read_csv(csv_path)
+        store.save("bench", positions, side, side, 1.0, crops=crops)
+        if mode == "load_mmap":
+            return lambda: store.load("bench")
+        rng = np.random.default_rng(0)
+        moved = positions + rng.normal(0, 0.05, positions.shape) * (rng.random(towers) < 0.1)[:, None]
+        store.save("bench", moved[: towers - towers // 100], side, side, 1.0, crops=crops[: towers - towers // 100])
+        return lambda: store.diff("bench", 1, 2)
+
+
+# ---------------------------------------------
+# RUNNER
+# ---------------------------------------------
+def measure(fn: Callable[[], object], repeats: int) -> dict:
+    result = fn()  # warm-up (imports, caches, lazy model load)
+
+    samples = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    # Memory is measured on a separate run: tracemalloc slows allocation-heavy code down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stats = {
+        "samples_s": samples,
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min_s": min(samples),
+        "peak_bytes": peak,
+    }
+    if isinstance(result, (bytes, bytearray)):
+        # encoder cases return their output, so the payload size is recorded with the timing
+        stats["payload_bytes"] = len(result)
+    return stats
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmarks(pattern: Optional[str] = None, repeats: Optional[int] = None) -> dict:
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    from app.core.config import VERSION
+    from app.services.optimization_service import logger as optimization_logger
+
+    # Per-call INFO logging would dominate the cheaper cases
+    optimization_logger.setLevel(logging.WARNING)
+
+    results: Dict[str, dict] = {}
+    for c in CASES:
+        if pattern and pattern not in c.name:
+            continue
+        entry = {"group": c.group, "params": c.params}
+        try:
+            fn = c.setup()
+            entry.update(status="ok", **measure(fn, repeats or c.repeats))
+            payload = f"   payload {entry['payload_bytes'] / 1024:10.1f} KiB" if "payload_bytes" in entry else ""
+            print(f"{c.name:<55} median {entry['median_s'] * 1000:10.3f} ms   peak {entry['peak_bytes'] / 1024:10.1f} KiB{payload}")
+        except SkipCase as e:
+            entry.update(status="skipped", reason=str(e))
+            print(f"{c.name:<55} skipped: {e}")
+        finally:
+            _case_resources.close()
+        results[c.name] = entry
+
+    return {
+        "schema_version": BASELINE_SCHEMA_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "app_version": VERSION,
+        "git_commit": git_commit(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "cases": results,
+    }
+
+
+# ---------------------------------------------
+# COMPARISON
+# ---------------------------------------------
+def mann_whitney_u(a: List[float], b: List[float]) -> float:
+    """
+    Two-sided Mann-Whitney U test (normal approximation with tie correction).
+    Returns the p-value for the hypothesis that `a` and `b` come from the same distribution.
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(pooled)
+    tie_term = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        avg_rank = (i + j) / 2.0 + 1
+        for k in range(i, j + 1):
+            ranks[k] = avg_rank
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+
+    r1 = sum(r for r, (_, g) in zip(ranks, pooled) if g == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    mu = n1 * n2 / 2.0
+    sigma = math.sqrt(n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u1 - mu) - 0.5) / sigma
+    return min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def compare_results(
+    baseline: dict,
+    current: dict,
+    alpha: float = DEFAULT_ALPHA,
+    min_slowdown: float = DEFAULT_MIN_SLOWDOWN,
+    max_memory_growth: float = DEFAULT_MAX_MEMORY_GROWTH,
+) -> List[dict]:
+    """Return one row per case present in both files, flagging regressions."""
+    for doc in (baseline, current):
+        if doc.get("schema_version") != BASELINE_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported baseline schema_version: {doc.get('schema_version')}")
+
+    rows = []
+    for name, base in baseline["cases"].items():
+        cur = current["cases"].get(name)
+        if cur is None or base.get("status") != "ok" or cur.get("status") != "ok":
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] > 0 else 1.0
+        p_value = mann_whitney_u(base["samples_s"], cur["samples_s"])
+        slower = ratio > 1.0 + min_slowdown and p_value < alpha
+        growth = cur["peak_bytes"] - base["peak_bytes"]
+        memory = growth > MIN_MEMORY_GROWTH_BYTES and growth > base["peak_bytes"] * max_memory_growth
+        rows.append({
+            "case": name,
+            "baseline_median_s": base["median_s"],
+            "current_median_s": cur["median_s"],
+            "ratio": ratio,
+            "p_value": p_value,
+            "baseline_peak_bytes": base["peak_bytes"],
+            "current_peak_bytes": cur["peak_bytes"],
+            "time_regression": slower,
+            "memory_regression": memory,
+        })
+    return rows
+
+
+def print_comparison(rows: List[dict]) -> None:
+    print(f"{'case':<55} {'base ms':>10} {'cur ms':>10} {'ratio':>7} {'p':>8} {'peak KiB':>18}")
+    for r in rows:
+        flags = []
+        if r["time_regression"]:
+            flags.append("SLOWER")
+        if r["memory_regression"]:
+            flags.append("MEMORY")
+        print(
+            f"{r['case']:<55} {r['baseline_median_s'] * 1000:10.3f} {r['current_median_s'] * 1000:10.3f} "
+            f"{r['ratio']:7.2f} {r['p_value']:8.4f} "
+            f"{r['baseline_peak_bytes'] / 1024:8.0f}->{r['current_peak_bytes'] / 1024:<8.0f} {' '.join(flags)}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backend micro-benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run benchmarks and write a results JSON")
+    run_p.add_argument("--output", "-o", default="benchmarks/baseline.json")
+    run_p.add_argument("--filter", "-k", default=None, help="only run cases whose name contains this string")
+    run_p.add_argument("--repeats", "-n", type=int, default=None, help="override the per-case repeat count")
+
+    cmp_p = sub.add_parser("compare", help="compare a results JSON against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    cmp_p.add_argument("--min-slowdown", type=float, default=DEFAULT_MIN_SLOWDOWN)
+    cmp_p.add_argument("--max-memory-growth", type=float, default=DEFAULT_MAX_MEMORY_GROWTH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(args.filter, args.repeats)
+        out = Path(args.output)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(results, indent=2))
+        print("Results saved to", out)
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    rows = compare_results(baseline, current, args.alpha, args.min_slowdown, args.max_memory_growth)
+    print_comparison(rows)
+    regressions = [r for r in rows if r["time_regression"] or r["memory_regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) detected")
+        return 1
+    print("\nNo regressions detected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+"""
+Concurrent load generator for the API (replaces the old one-shot smoke_test.py).
+
+By default it starts the API under uvicorn on a free local port, with the
+OpenWeather upstream replaced by an in-process stub, drives it with a
+configurable request mix for a fixed duration and writes a JSON report:
+
+    python -m benchmarks.loadgen --concurrency 16 --duration 30 -o load.json
+    python -m benchmarks.loadgen --mix predict=3,placement=1 --inputs stress
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 --requests 2   # smoke test
+
+The report contains throughput, p50/p95/p99/max latency and error rates per
+endpoint plus server RSS samples over time (Linux /proc, summed over the server
+and its worker processes), so two builds can be compared by diffing the files.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+REPORT_SCHEMA_VERSION = 1
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "predict=6,placement=2,environment=1,root=1"
+
+
+# ---------------------------------------------
+# INPUT DISTRIBUTIONS
+# ---------------------------------------------
+def predict_payload(rng: random.Random, inputs: str) -> dict:
+    if inputs == "ideal":
+        # Around lettuce/parsley/mint optimum: exercises the full model path
+        return {
+            "temperature": round(rng.gauss(21, 2), 2),
+            "humidity": round(rng.gauss(65, 5), 1),
+            "sunlight_hours": round(rng.gauss(5, 0.5), 1),
+            "water_ph": round(rng.gauss(6.0, 0.15), 2),
+            "air_quality_index": round(rng.uniform(20, 90)),
+            "wind_speed": round(rng.uniform(0.5, 1.4), 2),
+        }
+    if inputs == "stress":
+        # Includes gated readings and schema violations (422s) to exercise error paths
+        return {
+            "temperature": round(rng.uniform(-5, 50), 2),
+            "humidity": round(rng.uniform(10, 100), 1),
+            "sunlight_hours": round(rng.uniform(0, 24), 1),
+            "water_ph": round(rng.uniform(4.0, 8.5), 2),
+            "air_quality_index": round(rng.uniform(0, 450)),
+            "wind_speed": round(rng.uniform(0, 6), 2),
+        }
+    return {
+        "temperature": round(rng.uniform(0, 45), 2),
+        "humidity": round(rng.uniform(20, 100), 1),
+        "sunlight_hours": round(rng.uniform(0, 24), 1),
+        "water_ph": round(rng.uniform(4.5, 8.0), 2),
+        "air_quality_index": round(rng.uniform(0, 500)),
+        "wind_speed": round(rng.uniform(0, 5), 2),
+    }
+
+
+def placement_payload(rng: random.Random, inputs: str) -> dict:
+    if inputs == "stress":
+        return {
+            "farm_length": round(rng.uniform(20, 100), 1),
+            "farm_width": round(rng.uniform(20, 100), 1),
+            "min_spacing": round(rng.uniform(0.5, 2.0), 2),
+            "max_towers": rng.randint(200, 1000),
+        }
+    if inputs == "ideal":
+        return {"farm_length": 20.0, "farm_width": 20.0, "min_spacing": 2.5, "max_towers": 15}
+    return {
+        "farm_length": round(rng.uniform(5, 50), 1),
+        "farm_width": round(rng.uniform(5, 50), 1),
+        "min_spacing": round(rng.uniform(1.0, 5.0), 2),
+        "max_towers": rng.randint(5, 200),
+    }
+
+
+def build_request(endpoint: str, rng: random.Random, inputs: str) -> Tuple[str, str, Optional[dict]]:
+    if endpoint == "predict":
+        return "POST", "/predict/", predict_payload(rng, inputs)
+    if endpoint == "placement":
+        return "POST", "/placement/", placement_payload(rng, inputs)
+    if endpoint == "environment":
+        return "GET", f"/environment/coords?lat={rng.uniform(-60, 60):.3f}&lon={rng.uniform(-180, 180):.3f}", None
+    if endpoint == "root":
+        return "GET", "/", None
+    raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Request mix must contain at least one positive weight")
+    return mix
+
+
+# ---------------------------------------------
+# MINIMAL KEEP-ALIVE HTTP/1.1 CLIENT
+# ---------------------------------------------
+class Connection:
+    """One persistent connection per virtual user; avoids third-party async HTTP clients."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[dict], timeout: float) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            + ("Content-Type: application/json\r\n" if body is not None else "")
+            + "\r\n"
+        )
+        self.writer.write(head.encode() + data)
+        try:
+            return await asyncio.wait_for(self._read_response(), timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _read_response(self) -> Tuple[int, bytes]:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b"".join(chunks)
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+
+# ---------------------------------------------
+# LOCAL SERVER + STUBBED WEATHER UPSTREAM
+# ---------------------------------------------
+class _WeatherStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({
+            "main": {"temp": 24.3, "humidity": 61},
+            "weather": [{"description": "clear sky"}],
+            "wind": {"speed": 1.7},
+            "name": "Stub",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_weather_stub() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _WeatherStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, weather_url: str, extra_args: List[str]) -> subprocess.Popen:
+    env = dict(os.environ, OPENWEATHER_BASE_URL=weather_url)
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", *extra_args]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_until_ready(host: str, port: int, proc: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        conn = Connection(host, port)
+        try:
+            status, _ = await conn.request("GET", "/", None, timeout=2)
+            if status == 200:
+                return
+        except (OSError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            await conn.close()
+        await asyncio.sleep(0.25)
+    raise RuntimeError("server did not become ready in time")
+
+
+def _child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def read_rss_bytes(pid: int) -> Optional[int]:
+    """RSS of the server and all its descendants (process-pool workers included)."""
+    total, found = 0, False
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except OSError:
+            continue
+        stack.extend(_child_pids(current))
+    return total if found else None
+
+
+# ---------------------------------------------
+# LOAD LOOP
+# ---------------------------------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], errors: int, count: int) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "status_counts": statuses,
+        "latency_ms": {
+            "mean": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            "p50": percentile(ordered, 50) * 1000,
+            "p95": percentile(ordered, 95) * 1000,
+            "p99": percentile(ordered, 99) * 1000,
+            "max": ordered[-1] * 1000 if ordered else 0.0,
+        },
+    }
+
+
+async def run_load(args, host: str, port: int, server_pid: Optional[int]) -> dict:
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    records: Dict[str, dict] = {name: {"latencies": [], "statuses": {}, "errors": 0, "count": 0} for name in names}
+    rss_samples: List[List[float]] = []
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + args.duration if args.requests is None else None
+
+    def next_ticket() -> bool:
+        nonlocal issued
+        if args.requests is not None:
+            if issued >= args.requests:
+                return False
+        elif time.perf_counter() >= deadline:
+            return False
+        issued += 1
+        return True
+
+    async def user(worker_id: int):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        conn = Connection(host, port)
+        try:
+            while next_ticket():
+                endpoint = rng.choices(names, weights)[0]
+                method, path, body = build_request(endpoint, rng, args.inputs)
+                rec = records[endpoint]
+                t0 = time.perf_counter()
+                try:
+                    status, _ = await conn.request(method, path, body, args.timeout)
+                    key = str(status)
+                except (OSError, asyncio.TimeoutError, ConnectionError, ValueError) as e:
+                    status, key = None, type(e).__name__
+                rec["latencies"].append(time.perf_counter() - t0)
+                rec["count"] += 1
+                rec["statuses"][key] = rec["statuses"].get(key, 0) + 1
+                # 4xx from deliberately invalid inputs are expected; transport errors and 5xx are not
+                if status is None or status >= 500:
+                    rec["errors"] += 1
+        finally:
+            await conn.close()
+
+    async def sample_rss():
+        while True:
+            rss = read_rss_bytes(server_pid)
+            if rss is not None:
+                rss_samples.append([round(time.perf_counter() - started, 3), rss])
+            await asyncio.sleep(args.rss_interval)
+
+    sampler = asyncio.create_task(sample_rss()) if server_pid else None
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    if sampler is not None:
+        sampler.cancel()
+        rss = read_rss_bytes(server_pid)
+        if rss is not None:
+            rss_samples.append([round(elapsed, 3), rss])
+
+    all_latencies = [v for r in records.values() for v in r["latencies"]]
+    all_statuses: Dict[str, int] = {}
+    for r in records.values():
+        for k, v in r["statuses"].items():
+            all_statuses[k] = all_statuses.get(k, 0) + v
+    total = sum(r["count"] for r in records.values())
+    total_errors = sum(r["errors"] for r in records.values())
+
+    return {
+        "schema_version": REPORT_SCHEMA_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration if args.requests is None else None,
+            "requests": args.requests,
+            "mix": mix,
+            "inputs": args.inputs,
+            "seed": args.seed,
+        },
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+        "overall": summarize(all_latencies, all_statuses, total_errors, total),
+        "endpoints": {name: summarize(r["latencies"], r["statuses"], r["errors"], r["count"]) for name, r in records.items()},
+        "server_rss_bytes": rss_samples,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['overall']['count']} requests in {report['elapsed_s']:.1f}s -> {report['throughput_rps']:.1f} req/s")
+    print(f"{'endpoint':<12} {'count':>7} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, s in [*report["endpoints"].items(), ("overall", report["overall"])]:
+        lat = s["latency_ms"]
+        print(f"{name:<12} {s['count']:7d} {s['error_rate'] * 100:6.2f} {lat['p50']:9.1f} {lat['p95']:9.1f} {lat['p99']:9.1f} {lat['max']:9.1f}")
+    if report["server_rss_bytes"]:
+        rss = [v for _, v in report["server_rss_bytes"]]
+        print(f"server RSS: start {rss[0] / 2**20:.1f} MiB, peak {max(rss) / 2**20:.1f} MiB, end {rss[-1] / 2**20:.1f} MiB")
+
+
+async def main_async(args) -> dict:
+    proc = stub = None
+    if args.base_url:
+        parts = urlsplit(args.base_url)
+        host, port = parts.hostname, parts.port or 80
+        server_pid = args.server_pid
+    else:
+        stub = start_weather_stub()
+        host, port = "127.0.0.1", free_port()
+        proc = start_server(port, f"http://127.0.0.1:{stub.server_address[1]}", args.server_arg)
+        server_pid = proc.pid
+    try:
+        await wait_until_ready(host, port, proc)
+        return await run_load(args, host, port, server_pid)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if stub is not None:
+            stub.shutdown()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent API load generator")
+    parser.add_argument("--base-url", default=None, help="target an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid to sample RSS from when using --base-url")
+    parser.add_argument("--server-arg", action="append", default=[], help="extra argument passed to uvicorn (repeatable)")
+    parser.add_argument("--concurrency", "-c", type=int, default=8)
+    parser.add_argument("--duration", "-d", type=float, default=20.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", "-n", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. predict=6,placement=2,environment=1,root=1")
+    parser.add_argument("--inputs", choices=["uniform", "ideal", "stress"], default="uniform", help="input distribution")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", "-o", default=None, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print("Report saved to", args.output)
+    return 1 if report["overall"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
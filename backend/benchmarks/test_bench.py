@@ -0,0 +1,35 @@
+import random
+
+from benchmarks import bench
+
+
+def _doc(samples, peak=1_000_000):
+    return {
+        "schema_version": bench.BASELINE_SCHEMA_VERSION,
+        "cases": {
+            "case": {
+                "status": "ok",
+                "samples_s": samples,
+                "median_s": sorted(samples)[len(samples) // 2],
+                "peak_bytes": peak,
+            }
+        },
+    }
+
+
+def test_compare_flags_significant_slowdown():
+    rng = random.Random(0)
+    base = [0.010 + rng.uniform(0, 0.001) for _ in range(15)]
+    slow = [0.015 + rng.uniform(0, 0.001) for _ in range(15)]
+    row = bench.compare_results(_doc(base), _doc(slow))[0]
+    assert row["time_regression"]
+    assert row["p_value"] < bench.DEFAULT_ALPHA
+
+
+def test_compare_ignores_noise_and_flags_memory_growth():
+    rng = random.Random(1)
+    base = [0.010 + rng.uniform(0, 0.002) for _ in range(15)]
+    same = [0.010 + rng.uniform(0, 0.002) for _ in range(15)]
+    row = bench.compare_results(_doc(base), _doc(same, peak=2_000_000))[0]
+    assert not row["time_regression"]
+    assert row["memory_regression"]